@@ -0,0 +1,121 @@
+"""Partition market_data by timeframe and month
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Таблица, созданная DatabaseManager.create_tables, пересоздается как
+секционированная: LIST по timeframe, внутри - RANGE по timestamp помесячно.
+Создаются секции для всех месяцев с данными плюс текущий и следующий,
+дальнейшие месяцы создает MarketDataRepository.ensure_partitions.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    'id, pair_id, timeframe, timestamp, open, high, low, close, volume, '
+    'order_blocks, liquidity_zones, volume_profile, cvd, structure, created_at'
+)
+
+COLUMN_DEFINITIONS = """
+    id integer NOT NULL DEFAULT nextval('market_data_id_seq'),
+    pair_id integer REFERENCES trading_pairs (id),
+    timeframe timeframe NOT NULL,
+    timestamp timestamptz NOT NULL,
+    open double precision NOT NULL,
+    high double precision NOT NULL,
+    low double precision NOT NULL,
+    close double precision NOT NULL,
+    volume double precision NOT NULL,
+    order_blocks json,
+    liquidity_zones json,
+    volume_profile json,
+    cvd double precision,
+    structure marketstructure,
+    created_at timestamptz NOT NULL DEFAULT now()
+"""
+
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    tf text;
+    month timestamp;
+    last_month timestamp;
+BEGIN
+    FOREACH tf IN ARRAY enum_range(NULL::timeframe)::text[] LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF market_data FOR VALUES IN (%L) PARTITION BY RANGE (timestamp)',
+            'market_data_' || lower(tf), tf
+        );
+
+        SELECT
+            least(date_trunc('month', min(timestamp AT TIME ZONE 'UTC')), date_trunc('month', now() AT TIME ZONE 'UTC')),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '1 month'
+        INTO month, last_month
+        FROM market_data_unpartitioned
+        WHERE timeframe::text = tf;
+
+        WHILE month <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                'market_data_' || lower(tf) || '_' || to_char(month, 'YYYY_MM'),
+                'market_data_' || lower(tf),
+                month AT TIME ZONE 'UTC',
+                (month + interval '1 month') AT TIME ZONE 'UTC'
+            );
+            month := month + interval '1 month';
+        END LOOP;
+    END LOOP;
+END $$
+"""
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE market_data RENAME TO market_data_unpartitioned')
+    op.execute('ALTER INDEX IF EXISTS idx_market_data_pair_timeframe RENAME TO idx_market_data_unpartitioned')
+    op.execute('ALTER INDEX IF EXISTS ix_market_data_timestamp RENAME TO ix_market_data_unpartitioned_timestamp')
+    op.execute('ALTER SEQUENCE market_data_id_seq OWNED BY NONE')
+
+    op.execute(f"""
+        CREATE TABLE market_data ({COLUMN_DEFINITIONS},
+            PRIMARY KEY (id, timeframe, timestamp)
+        ) PARTITION BY LIST (timeframe)
+    """)
+    op.execute(
+        'CREATE UNIQUE INDEX idx_market_data_pair_timeframe ON market_data (pair_id, timeframe, timestamp)'
+    )
+    op.execute('CREATE INDEX ix_market_data_timestamp ON market_data (timestamp)')
+    op.execute(CREATE_PARTITIONS)
+
+    # Дубликаты свечей старой таблицы схлопываются по уникальному ключу
+    op.execute(f"""
+        INSERT INTO market_data ({COLUMNS})
+        SELECT {COLUMNS} FROM market_data_unpartitioned
+        ORDER BY id DESC
+        ON CONFLICT (pair_id, timeframe, timestamp) DO NOTHING
+    """)
+    op.execute('DROP TABLE market_data_unpartitioned')
+    op.execute('ALTER SEQUENCE market_data_id_seq OWNED BY market_data.id')
+
+
+def downgrade() -> None:
+    op.execute('ALTER SEQUENCE market_data_id_seq OWNED BY NONE')
+    op.execute('ALTER TABLE market_data RENAME TO market_data_partitioned')
+    op.execute('ALTER INDEX idx_market_data_pair_timeframe RENAME TO idx_market_data_partitioned')
+    op.execute('ALTER INDEX ix_market_data_timestamp RENAME TO ix_market_data_partitioned_timestamp')
+
+    op.execute(f'CREATE TABLE market_data ({COLUMN_DEFINITIONS}, PRIMARY KEY (id))')
+    op.execute(
+        'CREATE UNIQUE INDEX idx_market_data_pair_timeframe ON market_data (pair_id, timeframe, timestamp)'
+    )
+    op.execute('CREATE INDEX ix_market_data_timestamp ON market_data (timestamp)')
+    op.execute(f'INSERT INTO market_data ({COLUMNS}) SELECT {COLUMNS} FROM market_data_partitioned')
+
+    op.execute('DROP TABLE market_data_partitioned CASCADE')
+    op.execute('ALTER SEQUENCE market_data_id_seq OWNED BY market_data.id')
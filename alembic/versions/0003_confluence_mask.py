@@ -0,0 +1,49 @@
+"""Add confluence factor bitmasks to trades and signals
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('trades', 'signals')
+
+# Факторы на момент ревизии: бит фактора - позиция в кортеже
+# (копия src.config.constants.CONFLUENCE_FACTORS, не импортируется,
+# чтобы правки констант не меняли результат этой миграции)
+CONFLUENCE_FACTORS = (
+    'order_block',
+    'liquidity_sweep',
+    'equal_levels',
+    'session_level',
+    'multiple_touches',
+    'depth_wall',
+    'cvd_divergence',
+    'order_flow',
+    'value_area',
+    'poc_confluence',
+    'poc_touch',
+)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('confluence_mask', sa.BigInteger(), nullable=False, server_default='0'))
+        for bit, name in enumerate(CONFLUENCE_FACTORS):
+            op.execute(sa.text(
+                f'UPDATE {table} SET confluence_mask = confluence_mask | :bit '
+                f'WHERE confluence_factor::jsonb ? :name'
+            ).bindparams(bit=1 << bit, name=name))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'confluence_mask')
@@ -0,0 +1,344 @@
+"""
+Архив свечей на диске
+
+Один файл на (пару, таймфрейм): заголовок фиксированного размера и
+записи по 6 float64 (timestamp_ms, open, high, low, close, volume) -
+тот же формат строк (n, 6), что у CandleStore.load и бэктеста. Файл
+только дописывается, записи отсортированы по времени, поэтому колонка
+timestamp служит индексом: диапазон находится бинарным поиском по
+memory-mapped файлу, а результат - срез без копирования.
+
+Количество записей определяется размером файла; недописанная при сбое
+запись игнорируется.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from src.config.constants import TIMEFRAME_SECONDS, TimeFrame
+from src.analysis.candle_store import CandleStore, CandleWindow, window_from_rows
+
+ARCHIVE_MAGIC = b'SMCCNDL1'
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = '.candles'
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u2'),
+    ('columns', '<u2'),
+    ('interval', '<i8'),         # длительность свечи, мс
+    ('symbol', 'S24'),
+    ('timeframe', 'S8'),
+    ('reserved', 'V12'),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+COLUMNS = 6
+RECORD_SIZE = COLUMNS * 8
+
+# Таймфреймы, получаемые компактизацией из 1m
+COMPACT_TIMEFRAMES = (TimeFrame.M5, TimeFrame.M15, TimeFrame.M30, TimeFrame.H1, TimeFrame.H4, TimeFrame.D1)
+
+ArchiveKey = Tuple[str, TimeFrame]
+
+
+class ArchiveFormatError(ValueError):
+    """Файл не является архивом свечей или имеет другую версию"""
+
+
+def read_header(path: Union[str, Path]) -> np.void:
+    """Прочитать и проверить заголовок файла архива"""
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if not len(header) or header[0]['magic'] != ARCHIVE_MAGIC:
+        raise ArchiveFormatError(f'{path} is not a candle archive')
+    if header[0]['version'] != ARCHIVE_VERSION or header[0]['columns'] != COLUMNS:
+        raise ArchiveFormatError(f'Unsupported archive version in {path}')
+    return header[0]
+
+
+def open_archive_file(path: Union[str, Path]) -> np.ndarray:
+    """
+    Открыть файл архива в режиме memory-map
+
+    Returns:
+        Массив (n, 6) только для чтения
+    """
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    if not count:
+        return np.zeros((0, COLUMNS), dtype=np.float64)
+    return np.memmap(path, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(count, COLUMNS))
+
+
+def aggregate(rows: np.ndarray, timeframe: TimeFrame, complete_until: Optional[int] = None) -> np.ndarray:
+    """
+    Собрать свечи старшего таймфрейма из младших
+
+    Args:
+        rows: Свечи (n, 6) по возрастанию времени
+        timeframe: Целевой таймфрейм
+        complete_until: Время (мс), до которого данные полные; свечи,
+            заканчивающиеся позже, не возвращаются
+
+    Returns:
+        Массив (m, 6) закрытых свечей timeframe
+    """
+    interval = TIMEFRAME_SECONDS[TimeFrame(timeframe)] * 1000
+    if not len(rows):
+        return np.zeros((0, COLUMNS), dtype=np.float64)
+
+    buckets = rows[:, 0].astype(np.int64) // interval * interval
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(rows)])) - 1
+
+    result = np.empty((len(starts), COLUMNS), dtype=np.float64)
+    result[:, 0] = buckets[starts]
+    result[:, 1] = rows[starts, 1]
+    result[:, 2] = np.maximum.reduceat(rows[:, 2], starts)
+    result[:, 3] = np.minimum.reduceat(rows[:, 3], starts)
+    result[:, 4] = rows[ends, 4]
+    result[:, 5] = np.add.reduceat(rows[:, 5], starts)
+
+    if complete_until is not None:
+        result = result[result[:, 0] + interval <= complete_until]
+    return result
+
+
+class CandleArchive:
+    """Каталог файлов архива свечей"""
+
+    def __init__(self, root: Union[str, Path, None] = None):
+        """
+        Args:
+            root: Каталог архива (по умолчанию settings.ARCHIVE_DIR)
+        """
+        if root is None:
+            # Настройки читаются лениво: бэктест открывает файлы архива без .env
+            from src.config.settings import settings
+            root = settings.ARCHIVE_DIR
+        self.root = Path(root)
+        self._maps: Dict[ArchiveKey, Tuple[int, np.ndarray]] = {}
+
+    def path(self, symbol: str, timeframe: TimeFrame) -> Path:
+        """Путь к файлу пары и таймфрейма"""
+        return self.root / symbol / f'{TimeFrame(timeframe).value}{ARCHIVE_SUFFIX}'
+
+    def __contains__(self, key: ArchiveKey) -> bool:
+        return self.path(*key).exists()
+
+    def _create(self, symbol: str, timeframe: TimeFrame) -> Path:
+        path = self.path(symbol, timeframe)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = ARCHIVE_MAGIC
+            header['version'] = ARCHIVE_VERSION
+            header['columns'] = COLUMNS
+            header['interval'] = TIMEFRAME_SECONDS[timeframe] * 1000
+            header['symbol'] = symbol.encode()
+            header['timeframe'] = timeframe.value.encode()
+            with open(path, 'wb') as file:
+                file.write(header.tobytes())
+        return path
+
+    def rows(self, symbol: str, timeframe: TimeFrame) -> np.ndarray:
+        """
+        Все свечи пары на таймфрейме (memory-map, без копирования)
+
+        Отображение переоткрывается, только если файл вырос.
+        """
+        key = (symbol, TimeFrame(timeframe))
+        path = self.path(*key)
+        if not path.exists():
+            return np.zeros((0, COLUMNS), dtype=np.float64)
+
+        size = path.stat().st_size
+        cached = self._maps.get(key)
+        if cached is None or cached[0] != size:
+            cached = self._maps[key] = (size, open_archive_file(path))
+        return cached[1]
+
+    def read(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Свечи в диапазоне времени открытия [start, end) в мс
+
+        Returns:
+            Срез memory-map (n, 6)
+        """
+        rows = self.rows(symbol, timeframe)
+        timestamps = rows[:, 0]
+        first = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+        last = int(np.searchsorted(timestamps, end, side='left')) if end is not None else len(rows)
+        return rows[first:last]
+
+    def window(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> CandleWindow:
+        """Свечи диапазона как CandleWindow (колонки цен - представления файла)"""
+        return window_from_rows(self.read(symbol, timeframe, start, end))
+
+    def tail(self, symbol: str, timeframe: TimeFrame, count: int) -> np.ndarray:
+        """Последние count свечей"""
+        rows = self.rows(symbol, timeframe)
+        return rows[max(len(rows) - count, 0):]
+
+    def last_timestamp(self, symbol: str, timeframe: TimeFrame) -> Optional[int]:
+        """Время открытия последней свечи в архиве"""
+        rows = self.rows(symbol, timeframe)
+        return int(rows[-1, 0]) if len(rows) else None
+
+    def append(self, symbol: str, timeframe: TimeFrame, rows: np.ndarray) -> int:
+        """
+        Дописать закрытые свечи
+
+        Свечи не новее последней в архиве пропускаются, кроме свечи с тем же
+        временем - она перезаписывается на месте.
+
+        Args:
+            rows: Массив (n, 6) по возрастанию времени
+
+        Returns:
+            Количество записанных свечей
+        """
+        timeframe = TimeFrame(timeframe)
+        rows = np.ascontiguousarray(rows, dtype='<f8').reshape(-1, COLUMNS)
+        if not len(rows):
+            return 0
+
+        path = self._create(symbol, timeframe)
+        last = self.last_timestamp(symbol, timeframe)
+        written = 0
+        if last is not None:
+            start = int(np.searchsorted(rows[:, 0], last, side='left'))
+            if start < len(rows) and rows[start, 0] == last:
+                count = (path.stat().st_size - HEADER_SIZE) // RECORD_SIZE
+                with open(path, 'r+b') as file:
+                    file.seek(HEADER_SIZE + (count - 1) * RECORD_SIZE)
+                    file.write(rows[start].tobytes())
+                start += 1
+                written = 1
+            rows = rows[start:]
+
+        if len(rows):
+            with open(path, 'r+b') as file:
+                # Отбрасываем недописанную при сбое запись
+                count = (os.fstat(file.fileno()).st_size - HEADER_SIZE) // RECORD_SIZE
+                file.seek(HEADER_SIZE + count * RECORD_SIZE)
+                file.truncate()
+                file.write(rows.tobytes())
+        return written + len(rows)
+
+    def compact(
+        self,
+        symbol: str,
+        timeframes: Iterable[TimeFrame] = COMPACT_TIMEFRAMES,
+        source: TimeFrame = TimeFrame.M1
+    ) -> Dict[TimeFrame, int]:
+        """
+        Построить старшие таймфреймы из архива source
+
+        Пересчитываются только свечи после последней записанной в целевом
+        архиве; незакрытая последняя свеча не записывается.
+
+        Returns:
+            Количество дописанных свечей по таймфреймам
+        """
+        source = TimeFrame(source)
+        rows = self.rows(symbol, source)
+        if not len(rows):
+            return {}
+        complete_until = int(rows[-1, 0]) + TIMEFRAME_SECONDS[source] * 1000
+
+        written = {}
+        for timeframe in map(TimeFrame, timeframes):
+            last = self.last_timestamp(symbol, timeframe)
+            start = last + TIMEFRAME_SECONDS[timeframe] * 1000 if last is not None else None
+            candles = aggregate(self.read(symbol, source, start), timeframe, complete_until)
+            written[timeframe] = self.append(symbol, timeframe, candles)
+        return written
+
+    def warm_up(
+        self,
+        store: CandleStore,
+        symbols: Iterable[str],
+        timeframes: Iterable[TimeFrame],
+        limit: int
+    ) -> int:
+        """
+        Прогреть CandleStore последними свечами из архива (без обращения к Postgres)
+
+        Returns:
+            Общее количество загруженных свечей
+        """
+        loaded = 0
+        for symbol in symbols:
+            for timeframe in timeframes:
+                rows = self.tail(symbol, timeframe, limit)
+                if len(rows):
+                    loaded += store.load(symbol, timeframe, rows)
+        return loaded
+
+    async def import_from_db(
+        self,
+        repository,
+        pair_ids: Dict[str, int],
+        timeframes: Iterable[TimeFrame],
+        batch_size: int = 50000
+    ) -> int:
+        """
+        Дописать в архив свечи из Postgres, которых в нем еще нет
+
+        Args:
+            repository: MarketDataRepository
+            pair_ids: Соответствие symbol -> id торговой пары
+            timeframes: Таймфреймы
+            batch_size: Свечей за один запрос
+
+        Returns:
+            Количество записанных свечей
+        """
+        written = 0
+        for symbol, pair_id in pair_ids.items():
+            for timeframe in map(TimeFrame, timeframes):
+                while True:
+                    last = self.last_timestamp(symbol, timeframe)
+                    rows = await repository.get_ohlcv_range(
+                        pair_id, timeframe, start=last + 1 if last is not None else None, limit=batch_size
+                    )
+                    written += self.append(symbol, timeframe, rows)
+                    if len(rows) < batch_size:
+                        break
+        return written
+
+    async def export_to_db(
+        self,
+        repository,
+        pair_ids: Dict[str, int],
+        timeframes: Iterable[TimeFrame],
+        batch_size: int = 50000
+    ) -> int:
+        """
+        Выгрузить в Postgres свечи архива новее последней свечи в таблице
+
+        Returns:
+            Количество выгруженных свечей
+        """
+        exported = 0
+        for symbol, pair_id in pair_ids.items():
+            for timeframe in map(TimeFrame, timeframes):
+                last = await repository.get_last_timestamp(pair_id, timeframe)
+                rows = self.read(symbol, timeframe, start=last + 1 if last is not None else None)
+                for offset in range(0, len(rows), batch_size):
+                    exported += await repository.insert_ohlcv(pair_id, timeframe, rows[offset:offset + batch_size])
+        return exported
@@ -0,0 +1,300 @@
+"""
+Колоночное хранилище свечей в памяти
+
+Для каждой пары (symbol, TimeFrame) хранится кольцевой буфер NumPy
+с колонками timestamp/open/high/low/close/volume. Буфер записывается
+"зеркально" (каждая свеча пишется в позиции i и i + capacity), поэтому
+любое окно из последних N свечей - это непрерывный срез без копирования.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import TimeFrame
+
+
+class Candle(NamedTuple):
+    """Закрытая свеча (timestamp в миллисекундах UTC)"""
+    timestamp: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class CandleWindow(NamedTuple):
+    """Окно свечей - набор read-only представлений колонок буфера"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+
+# Порядок строк в массиве цен/объема буфера
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Емкость буферов по умолчанию для каждого таймфрейма
+DEFAULT_CAPACITY: Dict[TimeFrame, int] = {
+    TimeFrame.M1: 1440,
+    TimeFrame.M5: 864,
+    TimeFrame.M15: 672,
+    TimeFrame.M30: 672,
+    TimeFrame.H1: 720,
+    TimeFrame.H4: 540,
+    TimeFrame.D1: 365,
+}
+
+StoreKey = Tuple[str, TimeFrame]
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class CandleBuffer:
+    """Кольцевой буфер свечей одной пары на одном таймфрейме"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError('Capacity must be positive')
+
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._prices = np.zeros((len(PRICE_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._head = 0  # позиция для следующей записи в [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Время открытия последней свечи в буфере"""
+        if not self._size:
+            return None
+        return int(self._timestamps[self._head - 1 + self.capacity])
+
+    def append(
+        self,
+        timestamp: int,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float
+    ) -> bool:
+        """
+        Добавить закрытую свечу
+
+        Повторная доставка свечи с тем же временем перезаписывает последнюю,
+        более старые свечи игнорируются.
+
+        Returns:
+            True, если свеча записана
+        """
+        last = self.last_timestamp
+        if last is not None and timestamp < last:
+            return False
+
+        if last is not None and timestamp == last:
+            position = self._head - 1
+            if position < 0:
+                position += self.capacity
+        else:
+            position = self._head
+            self._head = (self._head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+        mirror = position + self.capacity
+        self._timestamps[position] = self._timestamps[mirror] = timestamp
+        prices = self._prices
+        prices[0, position] = prices[0, mirror] = open
+        prices[1, position] = prices[1, mirror] = high
+        prices[2, position] = prices[2, mirror] = low
+        prices[3, position] = prices[3, mirror] = close
+        prices[4, position] = prices[4, mirror] = volume
+        return True
+
+    def append_candle(self, candle: Candle) -> bool:
+        """Добавить закрытую свечу из Candle"""
+        return self.append(*candle)
+
+    def extend(self, timestamps: np.ndarray, prices: np.ndarray) -> int:
+        """
+        Пакетно добавить свечи (используется при прогреве)
+
+        Args:
+            timestamps: Массив времени открытия (мс), отсортированный по возрастанию
+            prices: Массив формы (5, n) в порядке PRICE_COLUMNS
+
+        Returns:
+            Количество записанных свечей
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+
+        last = self.last_timestamp
+        if last is not None:
+            # Новее последней свечи; совпадающую по времени перезаписываем
+            start = int(np.searchsorted(timestamps, last, side='left'))
+            if start < len(timestamps) and timestamps[start] == last:
+                self.append(int(timestamps[start]), *prices[:, start])
+                start += 1
+            timestamps = timestamps[start:]
+            prices = prices[:, start:]
+
+        count = len(timestamps)
+        if not count:
+            return 0
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            prices = prices[:, -self.capacity:]
+            count = self.capacity
+
+        positions = (self._head + np.arange(count)) % self.capacity
+        for target in (positions, positions + self.capacity):
+            self._timestamps[target] = timestamps
+            self._prices[:, target] = prices
+
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        return count
+
+    def window(self, size: Optional[int] = None) -> CandleWindow:
+        """
+        Получить последние size свечей без копирования
+
+        Args:
+            size: Размер окна (по умолчанию - все свечи в буфере)
+
+        Returns:
+            CandleWindow с представлениями колонок в хронологическом порядке
+        """
+        size = self._size if size is None else min(size, self._size)
+        end = self._head + self.capacity
+        start = end - size
+
+        prices = self._prices[:, start:end]
+        return CandleWindow(
+            _readonly(self._timestamps[start:end]),
+            *(_readonly(row) for row in prices)
+        )
+
+    def last(self) -> Optional[Candle]:
+        """Последняя свеча в буфере"""
+        if not self._size:
+            return None
+        position = self._head - 1 + self.capacity
+        return Candle(int(self._timestamps[position]), *self._prices[:, position].tolist())
+
+
+class CandleStore:
+    """Хранилище свечей всех пар и таймфреймов"""
+
+    def __init__(self, capacity: Optional[Dict[TimeFrame, int]] = None):
+        self._capacity = {**DEFAULT_CAPACITY, **(capacity or {})}
+        self._buffers: Dict[StoreKey, CandleBuffer] = {}
+
+    def __contains__(self, key: StoreKey) -> bool:
+        return key in self._buffers
+
+    def keys(self) -> List[StoreKey]:
+        """Список пар (symbol, TimeFrame), для которых есть буферы"""
+        return list(self._buffers)
+
+    def buffer(self, symbol: str, timeframe: TimeFrame) -> CandleBuffer:
+        """Получить (или создать) буфер для пары и таймфрейма"""
+        key = (symbol, TimeFrame(timeframe))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = CandleBuffer(self._capacity[key[1]])
+        return buffer
+
+    def append(self, symbol: str, timeframe: TimeFrame, candle: Candle) -> bool:
+        """Добавить закрытую свечу"""
+        return self.buffer(symbol, timeframe).append(*candle)
+
+    def window(self, symbol: str, timeframe: TimeFrame, size: Optional[int] = None) -> CandleWindow:
+        """Окно последних свечей пары без копирования"""
+        return self.buffer(symbol, timeframe).window(size)
+
+    def last_timestamp(self, symbol: str, timeframe: TimeFrame) -> Optional[int]:
+        """Время последней свечи пары на таймфрейме"""
+        key = (symbol, TimeFrame(timeframe))
+        buffer = self._buffers.get(key)
+        return buffer.last_timestamp if buffer else None
+
+    def load(self, symbol: str, timeframe: TimeFrame, rows: np.ndarray) -> int:
+        """
+        Загрузить свечи из массива строк
+
+        Args:
+            symbol: Символ пары
+            timeframe: Таймфрейм
+            rows: Массив формы (n, 6): timestamp, open, high, low, close, volume
+
+        Returns:
+            Количество записанных свечей
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if not len(rows):
+            return 0
+        order = np.argsort(rows[:, 0], kind='stable')
+        rows = rows[order]
+        return self.buffer(symbol, timeframe).extend(rows[:, 0].astype(np.int64), rows[:, 1:].T)
+
+    async def warm_up(
+        self,
+        repository,
+        pair_ids: Dict[str, int],
+        timeframes: Iterable[TimeFrame],
+        limit: Optional[int] = None
+    ) -> int:
+        """
+        Прогреть хранилище историей из Postgres одним запросом
+
+        Args:
+            repository: MarketDataRepository
+            pair_ids: Соответствие symbol -> id торговой пары
+            timeframes: Таймфреймы для загрузки
+            limit: Количество свечей на пару (по умолчанию - емкость буфера)
+
+        Returns:
+            Общее количество загруженных свечей
+        """
+        timeframes = [TimeFrame(tf) for tf in timeframes]
+        limit = limit or max(self._capacity[tf] for tf in timeframes)
+        symbols = {pair_id: symbol for symbol, pair_id in pair_ids.items()}
+
+        history = await repository.get_latest_ohlcv(list(symbols), timeframes, limit)
+
+        loaded = 0
+        for (pair_id, timeframe), rows in history.items():
+            loaded += self.load(symbols[pair_id], timeframe, rows)
+        return loaded
+
+
+def window_from_rows(rows: np.ndarray) -> CandleWindow:
+    """
+    Представить массив строк (n, 6) как CandleWindow
+
+    Args:
+        rows: timestamp, open, high, low, close, volume по строкам
+
+    Returns:
+        CandleWindow (колонки цен - представления rows)
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    return CandleWindow(rows[:, 0].astype(np.int64), *rows[:, 1:].T)
+
+
+def window_to_rows(window: CandleWindow) -> np.ndarray:
+    """Собрать CandleWindow в непрерывный массив (n, 6) для передачи между процессами"""
+    return np.column_stack(window)
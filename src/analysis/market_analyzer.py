@@ -0,0 +1,436 @@
+"""
+Мультитаймфреймовый анализ на основе минутных свечей
+
+Старшие таймфреймы не загружаются с биржи отдельно, а собираются из
+закрытых минутных свечей: каждая новая пачка минуток агрегируется
+векторно (aggregate) и сливается с незакрытой свечой каждого таймфрейма.
+Свеча старшего таймфрейма записывается в CandleStore только после
+закрытия, поэтому анализ выполняется лишь на тех таймфреймах, где
+появилась новая свеча, а все таймфреймы строятся из одних и тех же
+данных и согласованы между собой. Незакрытая свеча (вместе с
+формирующейся минуткой) доступна через partial().
+
+Структура рынка ведется конечным автоматом на каждую пару и таймфрейм
+(StructureTracker): он получает swing-точки по мере подтверждения и
+закрытия свечей, фиксирует слом структуры (BOS - пробой в сторону
+тренда, CHoCH - против тренда) и хранит только последние экстремумы,
+то есть O(1) памяти на серию. События рассылаются подписчикам
+MarketStructureMonitor, текущая структура сохраняется в market_data
+пачками снимков.
+"""
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.config.constants import LIQUIDITY_SETTINGS, TIMEFRAME_SECONDS, MarketStructure, TimeFrame
+from src.analysis.candle_archive import aggregate
+from src.analysis.candle_store import Candle, CandleStore, window_to_rows
+from src.strategy.indicators.swing_points import SwingIndexRegistry, SwingPoint, SwingPointIndex
+
+ResamplerKey = Tuple[str, TimeFrame]
+
+# Типы событий структуры
+BOS = 'bos'
+CHOCH = 'choch'
+
+
+def _merge(bar: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Продолжить свечу bar более поздними данными other того же интервала"""
+    return np.array([
+        bar[0], bar[1], max(bar[2], other[2]), min(bar[3], other[3]), other[4], bar[5] + other[5]
+    ])
+
+
+class TimeframeResampler:
+    """Сборка старших таймфреймов из потока минутных свечей"""
+
+    def __init__(self, store: CandleStore, timeframes: Iterable[TimeFrame], base: TimeFrame = TimeFrame.M1):
+        """
+        Args:
+            store: Хранилище свечей (минутки и собранные таймфреймы)
+            timeframes: Таймфреймы анализа; собираются те, что кратны base
+            base: Исходный таймфрейм
+        """
+        self.store = store
+        self.base = TimeFrame(base)
+        self.base_ms = TIMEFRAME_SECONDS[self.base] * 1000
+        self.timeframes = sorted(
+            (
+                tf for tf in {TimeFrame(tf) for tf in timeframes}
+                if TIMEFRAME_SECONDS[tf] > TIMEFRAME_SECONDS[self.base]
+                and TIMEFRAME_SECONDS[tf] % TIMEFRAME_SECONDS[self.base] == 0
+            ),
+            key=TIMEFRAME_SECONDS.get
+        )
+        self._partial: Dict[ResamplerKey, np.ndarray] = {}
+        self._forming: Dict[str, np.ndarray] = {}
+        self._seeded: Set[str] = set()
+
+    def seeded(self, symbol: str) -> bool:
+        """Восстановлены ли незакрытые свечи пары"""
+        return symbol in self._seeded
+
+    def seed_limit(self, now: Optional[int] = None) -> int:
+        """
+        Количество минуток, покрывающее текущую свечу самого старшего таймфрейма
+
+        Столько свечей base нужно загрузить при первом обращении к паре,
+        чтобы незакрытые свечи собирались с начала интервала.
+        """
+        if not self.timeframes:
+            return 1
+        now = now if now is not None else int(time.time() * 1000)
+        interval = TIMEFRAME_SECONDS[self.timeframes[-1]] * 1000
+        return int((now - now // interval * interval) // self.base_ms) + 2
+
+    def seed(self, symbol: str):
+        """
+        Восстановить незакрытые свечи пары из минуток в хранилище
+
+        Закрытые свечи старших таймфреймов до этого момента берутся из
+        истории биржи, сборка начинается с текущего интервала.
+        """
+        self._seeded.add(symbol)
+        if (symbol, self.base) not in self.store:
+            return
+
+        rows = window_to_rows(self.store.window(symbol, self.base))
+        if not len(rows):
+            return
+        last_end = rows[-1, 0] + self.base_ms
+        for timeframe in self.timeframes:
+            interval = TIMEFRAME_SECONDS[timeframe] * 1000
+            bucket = rows[-1, 0] // interval * interval
+            bar = aggregate(rows[rows[:, 0] >= bucket], timeframe)[0]
+            if bar[0] + interval <= last_end:
+                self._partial.pop((symbol, timeframe), None)
+            else:
+                self._partial[(symbol, timeframe)] = bar
+
+    def update(self, symbol: str, rows: np.ndarray, now: Optional[int] = None) -> Dict[TimeFrame, np.ndarray]:
+        """
+        Принять минутные свечи (например, ответ get_klines)
+
+        Закрытые свечи, которых еще нет в хранилище, записываются в него и
+        продвигают старшие таймфреймы; последняя незакрытая свеча
+        запоминается как формирующаяся.
+
+        Args:
+            symbol: Символ пары
+            rows: Свечи base (n, 6) по возрастанию времени
+            now: Текущее время (мс), по умолчанию - сейчас
+
+        Returns:
+            Новые закрытые свечи по таймфреймам (включая base)
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        now = now if now is not None else int(time.time() * 1000)
+        complete = rows[:, 0] + self.base_ms <= now
+        closed_rows = rows[complete]
+        if len(rows) and not complete[-1]:
+            self._forming[symbol] = rows[-1]
+        else:
+            self._forming.pop(symbol, None)
+
+        last = self.store.last_timestamp(symbol, self.base)
+        new = closed_rows[closed_rows[:, 0] > last] if last is not None else closed_rows
+        self.store.load(symbol, self.base, closed_rows)
+
+        if symbol not in self._seeded:
+            self.seed(symbol)
+            return {self.base: new} if len(new) else {}
+        return self.advance(symbol, new)
+
+    async def on_candle(self, symbol: str, timeframe: TimeFrame, candle: Candle):
+        """Обработчик закрытых свечей MarketDataStream (свеча уже в хранилище)"""
+        if TimeFrame(timeframe) != self.base:
+            return
+        self._forming.pop(symbol, None)
+        if symbol not in self._seeded:
+            self.seed(symbol)
+        else:
+            self.advance(symbol, np.array([candle], dtype=np.float64))
+
+    def advance(self, symbol: str, rows: np.ndarray) -> Dict[TimeFrame, np.ndarray]:
+        """
+        Продвинуть старшие таймфреймы новыми закрытыми минутками
+
+        Args:
+            symbol: Символ пары
+            rows: Новые закрытые свечи base (n, 6), уже записанные в хранилище
+
+        Returns:
+            Закрытые свечи по таймфреймам (включая base)
+        """
+        if not len(rows):
+            return {}
+        closed = {self.base: rows}
+        last_end = rows[-1, 0] + self.base_ms
+        for timeframe in self.timeframes:
+            interval = TIMEFRAME_SECONDS[timeframe] * 1000
+            key = (symbol, timeframe)
+            bars = aggregate(rows, timeframe)
+            partial = self._partial.pop(key, None)
+            if partial is not None:
+                if partial[0] == bars[0, 0]:
+                    bars[0] = _merge(partial, bars[0])
+                else:
+                    # Интервал закончился без последних минуток (пропуск данных)
+                    bars = np.vstack((partial[None], bars))
+
+            complete = bars[:, 0] + interval <= last_end
+            if not complete[-1]:
+                self._partial[key] = bars[-1]
+            bars = bars[complete]
+            if len(bars):
+                self.store.load(symbol, timeframe, bars)
+                closed[timeframe] = bars
+        return closed
+
+    def partial(self, symbol: str, timeframe: TimeFrame) -> Optional[Candle]:
+        """
+        Незакрытая свеча таймфрейма с учетом формирующейся минутки
+
+        Returns:
+            Candle или None, если данных текущего интервала еще нет
+        """
+        timeframe = TimeFrame(timeframe)
+        forming = self._forming.get(symbol)
+        if timeframe == self.base:
+            bar = forming
+        else:
+            interval = TIMEFRAME_SECONDS[timeframe] * 1000
+            bar = self._partial.get((symbol, timeframe))
+            if forming is not None:
+                bucket = forming[0] // interval * interval
+                if bar is None or bar[0] != bucket:
+                    bar = np.array([bucket, *forming[1:]])
+                else:
+                    bar = _merge(bar, forming)
+        if bar is None:
+            return None
+        return Candle(int(bar[0]), *bar[1:].tolist())
+
+
+class StructureEvent(NamedTuple):
+    """Слом структуры рынка"""
+    pair: str
+    timeframe: TimeFrame
+    kind: str                   # BOS или CHOCH
+    direction: int              # 1 - пробой вверх, -1 - вниз
+    level: float                # пробитый swing-уровень
+    timestamp: int              # свеча пробоя
+    structure: MarketStructure  # структура после события
+
+
+StructureHandler = Callable[[StructureEvent], Awaitable[None]]
+
+
+class StructureTracker:
+    """
+    Конечный автомат структуры одной серии свечей
+
+    Состояния - MarketStructure. Закрытие выше последнего непробитого
+    swing high переводит в BULLISH_TREND (CHoCH, если тренд был
+    медвежьим, иначе BOS), закрытие ниже swing low - в BEARISH_TREND.
+    Пара подтвержденных swing-точек внутри предыдущего диапазона (нижний
+    максимум и верхний минимум) переводит тренд в CONSOLIDATION; направление
+    последнего тренда сохраняется для классификации следующего пробоя.
+    """
+
+    __slots__ = (
+        'pair', 'timeframe', 'swings', 'structure', 'trend',
+        'high', 'low', 'previous_high', 'previous_low', 'high_broken', 'low_broken'
+    )
+
+    def __init__(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        swings: Optional[SwingPointIndex] = None,
+        depth: int = LIQUIDITY_SETTINGS['swing_depth']
+    ):
+        """
+        Args:
+            swings: Общий индекс swing-точек серии (SwingIndexRegistry);
+                без него автомат ведет собственный индекс и наполняет его в append()
+        """
+        self.pair = pair
+        self.timeframe = TimeFrame(timeframe)
+        # Собственному индексу достаточно хранить по одной последней точке
+        self.swings = swings if swings is not None else SwingPointIndex(depth=depth, max_swings=1)
+        self.swings.subscribe(self.on_swing)
+        self.reset()
+
+    def reset(self):
+        """Сбросить состояние автомата (индекс строится заново)"""
+        self.structure = MarketStructure.UNDEFINED
+        self.trend = 0
+        self.high: Optional[SwingPoint] = None
+        self.low: Optional[SwingPoint] = None
+        self.previous_high: Optional[float] = None
+        self.previous_low: Optional[float] = None
+        self.high_broken = False
+        self.low_broken = False
+
+    def on_swing(self, point: SwingPoint):
+        """Подтверждена swing-точка"""
+        if point.is_high:
+            self.previous_high = self.high.price if self.high is not None else None
+            self.high, self.high_broken = point, False
+        else:
+            self.previous_low = self.low.price if self.low is not None else None
+            self.low, self.low_broken = point, False
+
+        if self.trend and None not in (self.high, self.low, self.previous_high, self.previous_low) \
+                and self.high.price < self.previous_high and self.low.price > self.previous_low:
+            self.structure = MarketStructure.CONSOLIDATION
+
+    def on_close(self, timestamp: int, close: float) -> Optional[StructureEvent]:
+        """Закрытие свечи: проверить пробой последних swing-уровней"""
+        if self.high is not None and not self.high_broken and close > self.high.price:
+            self.high_broken = True
+            return self._break(1, self.high.price, timestamp)
+        if self.low is not None and not self.low_broken and close < self.low.price:
+            self.low_broken = True
+            return self._break(-1, self.low.price, timestamp)
+        return None
+
+    def _break(self, direction: int, level: float, timestamp: int) -> StructureEvent:
+        kind = CHOCH if self.trend == -direction else BOS
+        self.trend = direction
+        self.structure = MarketStructure.BULLISH_TREND if direction > 0 else MarketStructure.BEARISH_TREND
+        return StructureEvent(self.pair, self.timeframe, kind, direction, level, int(timestamp), self.structure)
+
+    def append(self, timestamp: int, high: float, low: float, close: float) -> Optional[StructureEvent]:
+        """Обработать закрытую свечу (для собственного индекса)"""
+        self.swings.append(timestamp, high, low)
+        return self.on_close(timestamp, close)
+
+
+class MarketStructureMonitor:
+    """
+    Структура рынка по всем парам и таймфреймам с рассылкой событий
+
+    Монитор работает в процессе, который рассылает события, и читает свечи
+    из его CandleStore. Swing-индекс серии общий с другими потребителями
+    реестра того же процесса; процессы пула анализа ведут собственные
+    реестры, так как серия не закреплена за процессом.
+    """
+
+    def __init__(
+        self,
+        store: CandleStore,
+        depth: int = LIQUIDITY_SETTINGS['swing_depth'],
+        swings: Optional[SwingIndexRegistry] = None
+    ):
+        """
+        Args:
+            store: Хранилище свечей, из которого читаются новые закрытые свечи
+            depth: Глубина подтверждения swing-точек (если реестр не передан)
+            swings: Общие индексы swing-точек (тот же реестр, что у SMCStrategy)
+        """
+        self.store = store
+        self.swings = swings or SwingIndexRegistry(depth=depth)
+        self.trackers: Dict[ResamplerKey, StructureTracker] = {}
+        self._handlers: List[StructureHandler] = []
+        self._events: List[StructureEvent] = []
+        self._dirty: Set[ResamplerKey] = set()
+        # Серии, состояние которых восстанавливается по истории без событий
+        self._silent: Set[ResamplerKey] = set()
+
+    def subscribe(self, handler: StructureHandler):
+        """Подписаться на события BOS / CHoCH"""
+        self._handlers.append(handler)
+
+    def structure(self, pair: str, timeframe: TimeFrame) -> MarketStructure:
+        tracker = self.trackers.get((pair, TimeFrame(timeframe)))
+        return tracker.structure if tracker is not None else MarketStructure.UNDEFINED
+
+    def _tracker(self, key: ResamplerKey) -> StructureTracker:
+        tracker = self.trackers.get(key)
+        if tracker is not None:
+            return tracker
+        index = self.swings.index(*key)
+        tracker = self.trackers[key] = StructureTracker(*key, swings=index)
+        self.swings.subscribe(
+            *key,
+            on_close=lambda timestamp, close: self._on_close(key, timestamp, close),
+            on_reset=lambda: self._on_reset(key)
+        )
+        self._silent.add(key)
+        if index.last_index >= 0:
+            # Свечи, поданные в общий индекс до подписки, автомат не видел
+            self.swings.reset(*key)
+        return tracker
+
+    def _on_reset(self, key: ResamplerKey):
+        self.trackers[key].reset()
+        self._silent.add(key)
+
+    def _on_close(self, key: ResamplerKey, timestamp: int, close: float):
+        event = self.trackers[key].on_close(timestamp, close)
+        self._dirty.add(key)
+        if event is not None and key not in self._silent:
+            self._events.append(event)
+
+    def sync(self, pair: str, timeframe: TimeFrame) -> List[StructureEvent]:
+        """
+        Обработать закрытые свечи серии, появившиеся в хранилище с прошлого вызова
+
+        Свечи подаются через общий индекс swing-точек: если серию уже
+        синхронизировал другой потребитель реестра, ее события стоят в
+        очереди publish. Первый вызов (и перестройка индекса после
+        разрыва истории) восстанавливает состояние по окну без событий.
+
+        Returns:
+            Новые события, поставленные в очередь publish этим вызовом
+        """
+        key = (pair, TimeFrame(timeframe))
+        if key not in self.store:
+            return []
+        self._tracker(key)
+        queued = len(self._events)
+        self.swings.sync(pair, key[1], self.store.window(*key))
+        self._silent.discard(key)
+        return self._events[queued:]
+
+    async def publish(self) -> int:
+        """
+        Разослать накопленные события подписчикам
+
+        Returns:
+            Количество событий
+        """
+        events, self._events = self._events, []
+        for event in events:
+            for handler in self._handlers:
+                try:
+                    await handler(event)
+                except Exception as e:
+                    logger.error(f'Structure event handler failed for {event.pair} {event.timeframe.value}: {e!r}')
+        return len(events)
+
+    async def snapshot(self, writer, pair_ids: Dict[str, int]) -> int:
+        """
+        Записать текущую структуру серий, обновленных с прошлого снимка
+
+        Args:
+            writer: MarketDataWriter (снимок на последней закрытой свече)
+            pair_ids: Идентификаторы пар по символам
+
+        Returns:
+            Количество снимков
+        """
+        keys, self._dirty = self._dirty, set()
+        written = 0
+        for pair, timeframe in keys:
+            pair_id = pair_ids.get(pair)
+            if pair_id is None:
+                continue
+            rows = window_to_rows(self.store.window(pair, timeframe, 1))
+            await writer.add_snapshot(pair_id, timeframe, rows[-1], structure=self.trackers[(pair, timeframe)].structure)
+            written += 1
+        return written
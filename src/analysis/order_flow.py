@@ -0,0 +1,466 @@
+"""
+Order flow: footprint-бары по потоку сделок
+
+Сделки агрегируются в бары таймфрейма пачками: объем покупок и продаж
+раскладывается по ценовым уровням (шаг цены tick_size) в заранее
+выделенные массивы текущего бара одним np.bincount на пачку. Если
+диапазон бара не помещается в массив, шаг уровня удваивается (соседние
+уровни сливаются без потери объема).
+
+После каждой пачки и при закрытии бара пересчитываются диагональные
+imbalance, stacked imbalance и absorption, при закрытии бар сжимается
+до footprint_rows строк и записывается в кольцевой буфер. Буфер
+"зеркальный", как у CandleBuffer, поэтому окно последних баров -
+FootprintWindow из представлений массивов без копирования.
+"""
+import math
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.constants import CVD_SETTINGS, ORDER_FLOW_SETTINGS, TIMEFRAME_SECONDS, TimeFrame
+from src.analysis.candle_store import DEFAULT_CAPACITY
+
+# Сделка: side = 1 - агрессор покупатель, -1 - продавец
+TICK_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('price', '<f8'),
+    ('quantity', '<f8'),
+    ('side', 'i1'),
+])
+
+# Порядок строк в массиве значений закрытых баров
+BAR_COLUMNS = (
+    'open', 'high', 'low', 'close', 'buy_volume', 'sell_volume',
+    'poc', 'row_price', 'row_size', 'large_buy', 'large_sell',
+)
+# Порядок строк в массиве сигналов закрытых баров
+FLAG_COLUMNS = ('stacked_imbalance', 'absorption')
+
+# Относительный шаг уровня, если tick_size не задан
+DEFAULT_TICK_PRECISION = 4
+
+
+class FootprintWindow(NamedTuple):
+    """Окно footprint-баров - read-only представления массивов буфера"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    buy_volume: np.ndarray
+    sell_volume: np.ndarray
+    poc: np.ndarray                 # нижняя граница уровня с наибольшим объемом
+    row_price: np.ndarray           # нижняя граница первой строки footprint
+    row_size: np.ndarray            # высота строки footprint
+    large_buy: np.ndarray           # объем крупных покупок
+    large_sell: np.ndarray          # объем крупных продаж
+    stacked_imbalance: np.ndarray   # длина серии imbalance: > 0 покупки, < 0 продажи (int8)
+    absorption: np.ndarray          # 1 - поглощение продаж у минимума, -1 - покупок у максимума (int8)
+    rows: np.ndarray                # (бары, footprint_rows, 2): покупки и продажи по строкам снизу вверх
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @property
+    def delta(self) -> np.ndarray:
+        """Дельта баров (покупки - продажи)"""
+        return self.buy_volume - self.sell_volume
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def ticks_from_messages(trades: Sequence[dict]) -> np.ndarray:
+    """
+    Преобразовать сделки потока BingX в массив TICK_DTYPE
+
+    Args:
+        trades: Сообщения сделок (T - время, p - цена, q - объем,
+            m - покупатель был мейкером)
+
+    Returns:
+        Сделки, отсортированные по времени
+    """
+    ticks = np.empty(len(trades), dtype=TICK_DTYPE)
+    ticks['timestamp'] = [int(trade['T']) for trade in trades]
+    ticks['price'] = [float(trade['p']) for trade in trades]
+    ticks['quantity'] = [float(trade['q']) for trade in trades]
+    ticks['side'] = [-1 if trade['m'] else 1 for trade in trades]
+    return ticks[np.argsort(ticks['timestamp'], kind='stable')]
+
+
+def imbalances(buy: np.ndarray, sell: np.ndarray, ratio: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Диагональные imbalance по уровням (снизу вверх)
+
+    Покупки на уровне сравниваются с продажами уровнем ниже, продажи -
+    с покупками уровнем выше.
+
+    Returns:
+        (imbalance покупок, imbalance продаж) - булевы массивы уровней
+    """
+    buying = np.zeros(len(buy), dtype=bool)
+    selling = np.zeros(len(sell), dtype=bool)
+    buying[1:] = (buy[1:] > 0) & (buy[1:] >= ratio * sell[:-1])
+    selling[:-1] = (sell[:-1] > 0) & (sell[:-1] >= ratio * buy[1:])
+    return buying, selling
+
+
+def longest_run(flags: np.ndarray) -> int:
+    """Длина самой длинной серии True"""
+    if not flags.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], flags.view(np.int8), [0])))
+    return int((np.flatnonzero(edges < 0) - np.flatnonzero(edges > 0)).max())
+
+
+def stacked_imbalance(buy: np.ndarray, sell: np.ndarray, ratio: float, levels: int) -> int:
+    """
+    Stacked imbalance бара
+
+    Returns:
+        Длина самой длинной серии не короче levels: со знаком плюс для
+        покупок, минус для продаж; 0 - нет серии (или серии равны)
+    """
+    buying, selling = imbalances(buy, sell, ratio)
+    up, down = longest_run(buying), longest_run(selling)
+    up, down = (up if up >= levels else 0), (down if down >= levels else 0)
+    if up == down:
+        return 0
+    return up if up > down else -down
+
+
+def absorption(buy: np.ndarray, sell: np.ndarray, close_level: int, depth: int, volume: float, ratio: float) -> int:
+    """
+    Поглощение агрессивного объема у экстремума бара
+
+    Продажи в нижних depth уровнях не меньше volume и в ratio раз больше
+    покупок там же, а бар закрылся выше этой зоны - продажи поглощены
+    лимитными покупками (1). Покупки у максимума - зеркально (-1).
+
+    Args:
+        buy, sell: Объемы по уровням бара снизу вверх
+        close_level: Уровень цены закрытия
+        depth: Высота зоны у экстремума в уровнях
+        volume: Минимальный поглощенный объем
+        ratio: Минимальное отношение объемов сторон в зоне
+    """
+    size = len(buy)
+    if size <= depth:
+        return 0
+    sold, bought = sell[:depth].sum(), buy[:depth].sum()
+    if close_level >= depth and sold >= volume and sold >= ratio * bought:
+        return 1
+    bought, sold = buy[-depth:].sum(), sell[-depth:].sum()
+    if close_level < size - depth and bought >= volume and bought >= ratio * sold:
+        return -1
+    return 0
+
+
+class FootprintAggregator:
+    """Footprint-бары одной пары на одном таймфрейме"""
+
+    def __init__(
+        self,
+        timeframe: TimeFrame,
+        tick_size: Optional[float] = None,
+        capacity: Optional[int] = None,
+        rows: int = ORDER_FLOW_SETTINGS['footprint_rows'],
+        levels: int = ORDER_FLOW_SETTINGS['footprint_levels'],
+        imbalance_ratio: float = ORDER_FLOW_SETTINGS['imbalance_ratio'],
+        large_order_threshold: float = ORDER_FLOW_SETTINGS['large_order_threshold'],
+        stacked_levels: int = ORDER_FLOW_SETTINGS['stacked_imbalance'],
+        absorption_volume: float = CVD_SETTINGS['absorption_volume']
+    ):
+        """
+        Args:
+            timeframe: Таймфрейм баров
+            tick_size: Шаг ценового уровня (по умолчанию - 10^-4 от цены
+                первой сделки бара, округленно до степени 10)
+            capacity: Количество хранимых закрытых баров
+            rows: Строк в сжатом footprint бара
+            levels: Размер рабочих массивов текущего бара (уровней)
+            imbalance_ratio: Отношение объемов для imbalance
+            large_order_threshold: Минимальный объем крупной сделки
+            stacked_levels: Минимальная серия imbalance
+            absorption_volume: Минимальный объем для absorption
+        """
+        self.timeframe = TimeFrame(timeframe)
+        self.interval = TIMEFRAME_SECONDS[self.timeframe] * 1000
+        self.tick_size = tick_size
+        self.capacity = capacity or DEFAULT_CAPACITY[self.timeframe]
+        self.rows = rows
+        self.levels = levels
+        self.imbalance_ratio = imbalance_ratio
+        self.large_order_threshold = large_order_threshold
+        self.stacked_levels = stacked_levels
+        self.absorption_volume = absorption_volume
+
+        # Закрытые бары (зеркальный кольцевой буфер)
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.zeros((len(BAR_COLUMNS), 2 * self.capacity), dtype=np.float64)
+        self._flags = np.zeros((len(FLAG_COLUMNS), 2 * self.capacity), dtype=np.int8)
+        self._footprints = np.zeros((2 * self.capacity, rows, 2), dtype=np.float64)
+        self._head = 0
+        self._size = 0
+
+        # Текущий бар: объемы по уровням origin + i с шагом tick
+        self._buy = np.zeros(levels, dtype=np.float64)
+        self._sell = np.zeros(levels, dtype=np.float64)
+        self._bar_start: Optional[int] = None
+        self._tick = 0.0
+        self._origin = 0
+        self._lo = self._hi = 0
+        self._ohlc = [0.0, 0.0, 0.0, 0.0]
+        self._large = [0.0, 0.0]
+        self._stacked = 0
+        self._absorption = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _level(self, price):
+        # Допуск против округления: 100.1 / 0.1 = 1000.999...
+        return np.floor(price / self._tick + 1e-9).astype(np.int64)
+
+    def _open_bar(self, bar_start: int, price: float):
+        self._bar_start = bar_start
+        self._tick = self.tick_size or 10.0 ** (math.floor(math.log10(price)) - DEFAULT_TICK_PRECISION)
+        self._origin = int(self._level(price)) - self.levels // 2
+        self._lo = self._hi = self.levels // 2
+        self._buy[:] = 0.0
+        self._sell[:] = 0.0
+        self._ohlc = [price, price, price, price]
+        self._large = [0.0, 0.0]
+        self._stacked = self._absorption = 0
+
+    def _coarsen(self):
+        """Удвоить шаг уровня, слив соседние уровни текущего бара"""
+        touched = slice(self._lo, self._hi + 1)
+        origin = self._origin // 2
+        index = (self._origin + np.arange(self._lo, self._hi + 1)) // 2 - origin
+        buy = np.bincount(index, weights=self._buy[touched])
+        sell = np.bincount(index, weights=self._sell[touched])
+        self._buy[:] = 0.0
+        self._sell[:] = 0.0
+        self._buy[:len(buy)] = buy
+        self._sell[:len(sell)] = sell
+        self._origin = origin
+        self._lo, self._hi = int(index[0]), int(index[-1])
+        self._tick *= 2
+
+    def _fit(self, low: float, high: float):
+        """Разместить в рабочих массивах диапазон цен [low, high] вместе с уже занятыми уровнями"""
+        while True:
+            first = min(int(self._level(low)), self._origin + self._lo)
+            last = max(int(self._level(high)), self._origin + self._hi)
+            if last - first < self.levels:
+                break
+            self._coarsen()
+
+        if first >= self._origin and last < self._origin + self.levels:
+            return
+        # Сдвиг: занятый диапазон переносится в середину массивов
+        origin = first - (self.levels - (last - first + 1)) // 2
+        shift = self._origin - origin
+        touched = slice(self._lo, self._hi + 1)
+        buy, sell = self._buy[touched].copy(), self._sell[touched].copy()
+        self._buy[:] = 0.0
+        self._sell[:] = 0.0
+        self._lo += shift
+        self._hi += shift
+        self._buy[self._lo:self._hi + 1] = buy
+        self._sell[self._lo:self._hi + 1] = sell
+        self._origin = origin
+
+    def _add_segment(self, price: np.ndarray, quantity: np.ndarray, side: np.ndarray):
+        """Добавить сделки одного бара"""
+        low, high = float(price.min()), float(price.max())
+        self._fit(low, high)
+
+        index = self._level(price) - self._origin
+        first, last = int(index.min()), int(index.max())
+        buying = side > 0
+        span = slice(first, last + 1)
+        self._buy[span] += np.bincount(index - first, weights=quantity * buying, minlength=last - first + 1)
+        self._sell[span] += np.bincount(index - first, weights=quantity * ~buying, minlength=last - first + 1)
+        self._lo, self._hi = min(self._lo, first), max(self._hi, last)
+
+        ohlc = self._ohlc
+        ohlc[1], ohlc[2], ohlc[3] = max(ohlc[1], high), min(ohlc[2], low), float(price[-1])
+
+        large = quantity >= self.large_order_threshold
+        if large.any():
+            self._large[0] += float(quantity[large & buying].sum())
+            self._large[1] += float(quantity[large & ~buying].sum())
+
+    def _footprint_depth(self) -> int:
+        """Уровней в одной строке сжатого footprint"""
+        return -(-(self._hi - self._lo + 1) // self.rows)
+
+    def _update_signals(self):
+        """Пересчитать сигналы текущего бара по занятым уровням"""
+        touched = slice(self._lo, self._hi + 1)
+        buy, sell = self._buy[touched], self._sell[touched]
+        self._stacked = stacked_imbalance(buy, sell, self.imbalance_ratio, self.stacked_levels)
+        close_level = int(self._level(self._ohlc[3])) - self._origin - self._lo
+        self._absorption = absorption(
+            buy, sell, close_level, self._footprint_depth(), self.absorption_volume, self.imbalance_ratio
+        )
+
+    def _summary(self) -> Tuple[tuple, np.ndarray]:
+        """Значения BAR_COLUMNS и сжатый footprint (rows, 2) текущего бара"""
+        touched = slice(self._lo, self._hi + 1)
+        buy, sell = self._buy[touched], self._sell[touched]
+        depth = self._footprint_depth()
+        rows = np.arange(len(buy)) // depth
+
+        footprint = np.zeros((self.rows, 2))
+        footprint[:rows[-1] + 1, 0] = np.bincount(rows, weights=buy)
+        footprint[:rows[-1] + 1, 1] = np.bincount(rows, weights=sell)
+        values = (
+            *self._ohlc,
+            float(buy.sum()),
+            float(sell.sum()),
+            (self._origin + self._lo + int(np.argmax(buy + sell))) * self._tick,
+            (self._origin + self._lo) * self._tick,
+            depth * self._tick,
+            *self._large,
+        )
+        return values, footprint
+
+    def _close_bar(self):
+        """Сжать текущий бар до footprint и записать в буфер"""
+        # Бар мог открыться и закрыться внутри одной пачки - сигналы еще не посчитаны
+        self._update_signals()
+        values, footprint = self._summary()
+        position = self._head
+        for target in (position, position + self.capacity):
+            self._timestamps[target] = self._bar_start
+            self._values[:, target] = values
+            self._flags[:, target] = (self._stacked, self._absorption)
+            self._footprints[target] = footprint
+
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self._bar_start = None
+
+    def add(self, ticks: np.ndarray) -> int:
+        """
+        Добавить сделки (TICK_DTYPE, по возрастанию времени)
+
+        Сделки старше текущего бара игнорируются.
+
+        Returns:
+            Количество закрытых баров
+        """
+        if not len(ticks):
+            return 0
+        timestamps, prices = ticks['timestamp'], ticks['price']
+        buckets = timestamps // self.interval * self.interval
+        bounds = np.flatnonzero(buckets[1:] != buckets[:-1]) + 1
+
+        closed = 0
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(ticks)]))):
+            bucket = int(buckets[start])
+            if self._bar_start is not None and bucket != self._bar_start:
+                if bucket < self._bar_start:
+                    continue
+                self._close_bar()
+                closed += 1
+            if self._bar_start is None:
+                self._open_bar(bucket, float(prices[start]))
+            self._add_segment(prices[start:end], ticks['quantity'][start:end], ticks['side'][start:end])
+
+        if self._bar_start is not None:
+            self._update_signals()
+        return closed
+
+    def close(self, now: int) -> bool:
+        """
+        Закрыть текущий бар, если его интервал закончился к now (мс)
+
+        Нужно, когда после окончания интервала сделок еще не было.
+        """
+        if self._bar_start is None or self._bar_start + self.interval > now:
+            return False
+        self._close_bar()
+        return True
+
+    def window(self, size: Optional[int] = None) -> FootprintWindow:
+        """Последние size закрытых баров без копирования"""
+        size = self._size if size is None else min(size, self._size)
+        end = self._head + self.capacity
+        start = end - size
+        return FootprintWindow(
+            _readonly(self._timestamps[start:end]),
+            *(_readonly(row) for row in self._values[:, start:end]),
+            *(_readonly(row) for row in self._flags[:, start:end]),
+            _readonly(self._footprints[start:end])
+        )
+
+    def partial(self) -> Optional[FootprintWindow]:
+        """Текущий (незакрытый) бар как окно из одного бара"""
+        if self._bar_start is None:
+            return None
+        values, footprint = self._summary()
+        return FootprintWindow(
+            np.array([self._bar_start], dtype=np.int64),
+            *(np.array([value]) for value in values),
+            np.array([self._stacked], dtype=np.int8),
+            np.array([self._absorption], dtype=np.int8),
+            footprint[None]
+        )
+
+
+class OrderFlowEngine:
+    """Footprint-бары всех пар и таймфреймов по потоку сделок"""
+
+    def __init__(
+        self,
+        timeframes: Sequence[TimeFrame],
+        tick_sizes: Optional[Dict[str, float]] = None,
+        **settings
+    ):
+        """
+        Args:
+            timeframes: Таймфреймы баров
+            tick_sizes: Шаг ценового уровня по символам
+            settings: Параметры FootprintAggregator
+        """
+        self.timeframes = [TimeFrame(tf) for tf in timeframes]
+        self.tick_sizes = dict(tick_sizes or {})
+        self.settings = settings
+        self._aggregators: Dict[str, List[FootprintAggregator]] = {}
+
+    def aggregators(self, symbol: str) -> List[FootprintAggregator]:
+        """Агрегаторы пары (создаются при первом обращении)"""
+        aggregators = self._aggregators.get(symbol)
+        if aggregators is None:
+            aggregators = self._aggregators[symbol] = [
+                FootprintAggregator(timeframe, self.tick_sizes.get(symbol), **self.settings)
+                for timeframe in self.timeframes
+            ]
+        return aggregators
+
+    def aggregator(self, symbol: str, timeframe: TimeFrame) -> FootprintAggregator:
+        return self.aggregators(symbol)[self.timeframes.index(TimeFrame(timeframe))]
+
+    def add(self, symbol: str, ticks: np.ndarray) -> int:
+        """Добавить сделки пары во все таймфреймы; возвращает количество закрытых баров"""
+        return sum(aggregator.add(ticks) for aggregator in self.aggregators(symbol))
+
+    async def on_trades(self, symbol: str, trades: List[dict]):
+        """Обработчик сделок MarketDataStream"""
+        self.add(symbol, ticks_from_messages(trades))
+
+    def window(self, symbol: str, timeframe: TimeFrame, size: Optional[int] = None) -> FootprintWindow:
+        """Окно закрытых footprint-баров пары без копирования"""
+        return self.aggregator(symbol, timeframe).window(size)
+
+    def partial(self, symbol: str, timeframe: TimeFrame) -> Optional[FootprintWindow]:
+        """Текущий footprint-бар пары"""
+        return self.aggregator(symbol, timeframe).partial()
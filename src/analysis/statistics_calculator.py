@@ -0,0 +1,399 @@
+"""
+Расчет статистики торговли (winrate, PnL, Sharpe ratio, просадка)
+
+Ключи результата совпадают с колонками модели Statistics.
+
+calculate_statistics считает статистику по массивам сделок целиком.
+StatisticsAccumulator дает тот же результат инкрементально - O(1) на
+закрытую сделку (среднее и дисперсия по Уэлфорду, текущий пик и просадка),
+а StatisticsTracker ведет аккумуляторы периодов daily/weekly/monthly/all_time.
+Состояние аккумуляторов сериализуется и хранится вместе со строками Statistics.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+HOUR_MS = 3600 * 1000
+
+PERIOD_TYPES = ('daily', 'weekly', 'monthly', 'all_time')
+
+# Версия формата сохраненного состояния аккумулятора
+STATE_VERSION = 1
+
+
+def _group_stats(pnl: np.ndarray, labels: np.ndarray) -> Dict[str, dict]:
+    """Краткая статистика по группам (сетапам или парам)"""
+    groups = {}
+    for label in np.unique(labels).tolist():
+        values = pnl[labels == label]
+        groups[str(label)] = {
+            'trades': int(len(values)),
+            'win_rate': float((values > 0).mean() * 100),
+            'total_pnl': float(values.sum()),
+        }
+    return groups
+
+
+def max_drawdown(pnl: np.ndarray, exit_time: np.ndarray) -> tuple:
+    """
+    Максимальная просадка кривой накопленного PnL
+
+    Returns:
+        (просадка в единицах PnL, самая долгая просадка в часах)
+    """
+    if not len(pnl):
+        return 0.0, 0
+    equity = np.concatenate(([0.0], np.cumsum(pnl)))
+    times = np.concatenate(([exit_time[0]], exit_time))
+    peaks = np.maximum.accumulate(equity)
+    drawdown = float((peaks - equity).max())
+
+    # Начало текущей просадки - время последнего обновления максимума
+    at_peak = equity >= peaks
+    peak_index = np.maximum.accumulate(np.where(at_peak, np.arange(len(equity)), 0))
+    duration = float((times - times[peak_index]).max()) / HOUR_MS
+    return drawdown, int(duration)
+
+
+def calculate_statistics(
+    pnl: np.ndarray,
+    pnl_percent: np.ndarray,
+    commission: np.ndarray,
+    rr: np.ndarray,
+    exit_time: np.ndarray,
+    setup: Optional[np.ndarray] = None,
+    pair: Optional[np.ndarray] = None
+) -> dict:
+    """
+    Рассчитать статистику по закрытым сделкам
+
+    Args:
+        pnl: PnL сделок (после комиссий) в порядке закрытия
+        pnl_percent: PnL в процентах депозита
+        commission: Комиссии
+        rr: Фактический результат в R
+        exit_time: Время закрытия (мс)
+        setup: Тип сетапа каждой сделки
+        pair: Пара каждой сделки
+
+    Returns:
+        Словарь с полями модели Statistics
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    total = len(pnl)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl <= 0]
+
+    gross_profit = float(wins.sum())
+    gross_loss = float(-losses.sum())
+    returns = np.asarray(pnl_percent, dtype=np.float64)
+    std = float(returns.std(ddof=1)) if total > 1 else 0.0
+    drawdown, duration = max_drawdown(pnl, np.asarray(exit_time))
+
+    return {
+        'total_trades': total,
+        'winning_trades': int(len(wins)),
+        'losing_trades': int(len(losses)),
+        'total_pnl': float(pnl.sum()),
+        'total_commision': float(np.sum(commission)),
+        'max_wind': float(wins.max()) if len(wins) else None,
+        'max_loss': float(losses.min()) if len(losses) else None,
+        'average_win': float(wins.mean()) if len(wins) else None,
+        'average_loss': float(losses.mean()) if len(losses) else None,
+        'win_rate': len(wins) / total * 100 if total else None,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else None,
+        'average_rr': float(np.mean(rr)) if total else None,
+        'sharpe_ratio': float(returns.mean()) / std if std > 0 else None,
+        'max_drawdown': drawdown,
+        'max_drawdown_duration': duration,
+        'stats_by_setup': _group_stats(pnl, np.asarray(setup)) if setup is not None and total else {},
+        'stats_by_pair': _group_stats(pnl, np.asarray(pair)) if pair is not None and total else {},
+    }
+
+
+class StatisticsAccumulator:
+    """Накопитель статистики с обновлением O(1) на сделку"""
+
+    def __init__(self):
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.total_pnl = 0.0
+        self.total_commission = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.max_win: Optional[float] = None
+        self.max_loss: Optional[float] = None
+        self.rr_sum = 0.0
+
+        # Уэлфорд для pnl_percent
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+
+        # Кривая накопленного PnL
+        self.peak = 0.0
+        self.peak_time: Optional[int] = None
+        self.max_drawdown = 0.0
+        self.max_drawdown_ms = 0
+        self.first_time: Optional[int] = None
+        self.last_time: Optional[int] = None
+
+        # Группы: [сделки, прибыльные, PnL]
+        self.by_setup: Dict[str, list] = {}
+        self.by_pair: Dict[str, list] = {}
+
+    def update(
+        self,
+        pnl: float,
+        pnl_percent: float,
+        commission: float,
+        rr: float,
+        exit_time: int,
+        setup: Optional[str] = None,
+        pair: Optional[str] = None
+    ):
+        """
+        Учесть закрытую сделку
+
+        Сделки должны поступать в порядке закрытия (как в calculate_statistics).
+
+        Args:
+            pnl: PnL после комиссий
+            pnl_percent: PnL в процентах депозита
+            commission: Комиссия
+            rr: Фактический результат в R
+            exit_time: Время закрытия (мс)
+            setup: Тип сетапа
+            pair: Пара
+        """
+        pnl = float(pnl)
+        self.total_trades += 1
+        self.total_pnl += pnl
+        self.total_commission += float(commission)
+        self.rr_sum += float(rr)
+
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+            self.max_win = pnl if self.max_win is None else max(self.max_win, pnl)
+        else:
+            self.gross_loss -= pnl
+            self.max_loss = pnl if self.max_loss is None else min(self.max_loss, pnl)
+
+        delta = float(pnl_percent) - self.return_mean
+        self.return_mean += delta / self.total_trades
+        self.return_m2 += delta * (float(pnl_percent) - self.return_mean)
+
+        exit_time = int(exit_time)
+        if self.first_time is None:
+            self.first_time = self.peak_time = exit_time
+        self.last_time = exit_time
+        if self.total_pnl >= self.peak:
+            self.peak, self.peak_time = self.total_pnl, exit_time
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.total_pnl)
+        self.max_drawdown_ms = max(self.max_drawdown_ms, exit_time - self.peak_time)
+
+        for groups, label in ((self.by_setup, setup), (self.by_pair, pair)):
+            if label is not None:
+                group = groups.setdefault(str(label), [0, 0, 0.0])
+                group[0] += 1
+                group[1] += pnl > 0
+                group[2] += pnl
+
+    @staticmethod
+    def _groups(groups: Dict[str, list]) -> Dict[str, dict]:
+        return {
+            label: {'trades': trades, 'win_rate': wins / trades * 100, 'total_pnl': pnl}
+            for label, (trades, wins, pnl) in sorted(groups.items())
+        }
+
+    def statistics(self) -> dict:
+        """Статистика в формате calculate_statistics"""
+        total = self.total_trades
+        losses = total - self.winning_trades
+        std = (self.return_m2 / (total - 1)) ** 0.5 if total > 1 else 0.0
+        return {
+            'total_trades': total,
+            'winning_trades': self.winning_trades,
+            'losing_trades': losses,
+            'total_pnl': self.total_pnl,
+            'total_commision': self.total_commission,
+            'max_wind': self.max_win,
+            'max_loss': self.max_loss,
+            'average_win': self.gross_profit / self.winning_trades if self.winning_trades else None,
+            'average_loss': -self.gross_loss / losses if losses else None,
+            'win_rate': self.winning_trades / total * 100 if total else None,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss > 0 else None,
+            'average_rr': self.rr_sum / total if total else None,
+            'sharpe_ratio': self.return_mean / std if std > 0 else None,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_duration': int(self.max_drawdown_ms / HOUR_MS),
+            'stats_by_setup': self._groups(self.by_setup),
+            'stats_by_pair': self._groups(self.by_pair),
+        }
+
+    def state(self) -> dict:
+        """Сериализуемое (JSON) состояние"""
+        return {'version': STATE_VERSION, **vars(self)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'StatisticsAccumulator':
+        """Восстановить аккумулятор из state()"""
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f'Unsupported statistics state version: {state.get("version")}')
+        accumulator = cls()
+        for name in vars(accumulator):
+            setattr(accumulator, name, state[name])
+        return accumulator
+
+    @classmethod
+    def from_trades(
+        cls,
+        pnl: np.ndarray,
+        pnl_percent: np.ndarray,
+        commission: np.ndarray,
+        rr: np.ndarray,
+        exit_time: np.ndarray,
+        setup: Optional[np.ndarray] = None,
+        pair: Optional[np.ndarray] = None
+    ) -> 'StatisticsAccumulator':
+        """Построить аккумулятор заново по всем сделкам"""
+        accumulator = cls()
+        count = len(pnl)
+        setup = setup if setup is not None else [None] * count
+        pair = pair if pair is not None else [None] * count
+        for row in zip(
+            np.asarray(pnl).tolist(), np.asarray(pnl_percent).tolist(), np.asarray(commission).tolist(),
+            np.asarray(rr).tolist(), np.asarray(exit_time).tolist(), list(setup), list(pair)
+        ):
+            accumulator.update(*row)
+        return accumulator
+
+
+def verify_statistics(incremental: dict, rebuilt: dict, rtol: float = 1e-9) -> List[str]:
+    """
+    Сравнить инкрементальную статистику с пересчитанной (calculate_statistics)
+
+    Returns:
+        Поля, значения которых расходятся
+    """
+    mismatched = []
+    for name, expected in rebuilt.items():
+        actual = incremental.get(name)
+        if isinstance(expected, dict):
+            same = isinstance(actual, dict) and expected.keys() == actual.keys() and all(
+                not verify_statistics(actual[key], value, rtol) for key, value in expected.items()
+            )
+        elif expected is None or actual is None:
+            same = expected is actual
+        else:
+            same = bool(np.isclose(actual, expected, rtol=rtol, atol=1e-9))
+        if not same:
+            mismatched.append(name)
+    return mismatched
+
+
+def period_bounds(period_type: str, moment: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Границы периода, содержащего moment
+
+    Returns:
+        (начало, конец) в UTC; для all_time - (None, None)
+    """
+    moment = moment.astimezone(timezone.utc)
+    day = datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    if period_type == 'daily':
+        return day, day + timedelta(days=1)
+    if period_type == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period_type == 'monthly':
+        start = day.replace(day=1)
+        return start, start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    if period_type == 'all_time':
+        return None, None
+    raise ValueError(f'Unknown period type: {period_type}')
+
+
+PeriodKey = Tuple[str, Optional[datetime]]
+
+
+class StatisticsTracker:
+    """
+    Аккумуляторы статистики пользователя по периодам
+
+    Каждая сделка обновляет четыре аккумулятора (день, неделя, месяц, все
+    время) - O(1) независимо от длины истории.
+    """
+
+    def __init__(self):
+        self.periods: Dict[PeriodKey, StatisticsAccumulator] = {}
+        self.dirty: set = set()
+
+    def add_trade(
+        self,
+        pnl: float,
+        pnl_percent: float,
+        commission: float,
+        rr: float,
+        exit_time: int,
+        setup: Optional[str] = None,
+        pair: Optional[str] = None
+    ) -> List[PeriodKey]:
+        """
+        Учесть закрытую сделку во всех периодах
+
+        Returns:
+            Ключи обновленных периодов
+        """
+        moment = datetime.fromtimestamp(exit_time / 1000, tz=timezone.utc)
+        keys = []
+        for period_type in PERIOD_TYPES:
+            key = (period_type, period_bounds(period_type, moment)[0])
+            accumulator = self.periods.get(key)
+            if accumulator is None:
+                accumulator = self.periods[key] = StatisticsAccumulator()
+            accumulator.update(pnl, pnl_percent, commission, rr, exit_time, setup, pair)
+            keys.append(key)
+        self.dirty.update(keys)
+        return keys
+
+    def statistics(self, period_type: str, moment: Optional[datetime] = None) -> Optional[dict]:
+        """Статистика периода, содержащего moment (по умолчанию - текущего)"""
+        key = (period_type, period_bounds(period_type, moment or datetime.now(timezone.utc))[0])
+        accumulator = self.periods.get(key)
+        return accumulator.statistics() if accumulator else None
+
+    def row(self, key: PeriodKey) -> dict:
+        """Значения строки Statistics периода, включая состояние аккумулятора"""
+        period_type, start = key
+        accumulator = self.periods[key]
+        if start is None:
+            start = datetime.fromtimestamp(accumulator.first_time / 1000, tz=timezone.utc)
+            end = None
+        else:
+            end = period_bounds(period_type, start)[1]
+        return {
+            'period_type': period_type,
+            'period_start': start,
+            'period_end': end,
+            **accumulator.statistics(),
+            'accumulator_state': accumulator.state(),
+        }
+
+    def pop_dirty(self) -> List[dict]:
+        """Строки периодов, измененных с прошлого вызова"""
+        rows = [self.row(key) for key in self.dirty]
+        self.dirty.clear()
+        return rows
+
+    def prune(self, before: datetime):
+        """Убрать из памяти завершившиеся до before периоды (строки уже сохранены)"""
+        for key in [key for key in self.periods if key[1] is not None and key not in self.dirty]:
+            if period_bounds(key[0], key[1])[1] <= before:
+                del self.periods[key]
+
+    def load(self, period_type: str, period_start: datetime, state: dict):
+        """Восстановить аккумулятор периода из сохраненного состояния"""
+        key = (period_type, None if period_type == 'all_time' else period_start)
+        self.periods[key] = StatisticsAccumulator.from_state(state)
@@ -0,0 +1,295 @@
+"""
+Потоковая оценка волатильности пар
+
+Оценки обновляются по каждой закрытой свече за O(1), без пересчета по
+истории:
+
+- EWMA квадратов лог-доходностей close-to-close;
+- EWMA дисперсии Паркинсона (high-low) и Гармана-Класса (OHLC);
+- ATR (сглаживание Уайлдера);
+- EWMA объема.
+
+Веса EWMA задаются периодом полураспада во времени (VOLATILITY_HALFLIFE),
+а не в свечах, поэтому оценки сопоставимы на любом таймфрейме. Суточная
+волатильность (%) - корень из дисперсии свечи, умноженной на число свечей
+в сутках; основная оценка - Гарман-Класс.
+
+VolatilityTracker классифицирует пары по порогам LOW_VOLATILITY_THRESHOLD
+и HIGH_VOLATILITY_THRESHOLD (режим плеча LEVERAGE_MULTIPLIERS, tier) и
+сохраняет метрики в trading_pairs пачками.
+"""
+import asyncio
+import math
+from typing import Callable, Dict, NamedTuple, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from src.config.constants import TIMEFRAME_SECONDS, TimeFrame
+from src.config.settings import settings
+from src.analysis.candle_store import Candle, CandleStore
+
+# Период полураспада весов EWMA (секунды)
+VOLATILITY_HALFLIFE = 24 * 3600
+# Период ATR (свечи)
+ATR_PERIOD = 14
+# Свечей до готовности оценки
+WARMUP_BARS = 20
+# Коэффициенты оценок по high-low
+PARKINSON_FACTOR = 1 / (4 * math.log(2))
+GARMAN_KLASS_FACTOR = 2 * math.log(2) - 1
+
+
+def volatility_regime(
+    volatility: Optional[float],
+    low: Optional[float] = None,
+    high: Optional[float] = None
+) -> str:
+    """
+    Режим волатильности (ключ LEVERAGE_MULTIPLIERS) по суточной волатильности (%)
+
+    Экстремальная волатильность - от удвоенного верхнего порога.
+    """
+    low = settings.LOW_VOLATILITY_THRESHOLD if low is None else low
+    high = settings.HIGH_VOLATILITY_THRESHOLD if high is None else high
+    if volatility is None or not np.isfinite(volatility):
+        return 'medium_volatility'
+    if volatility < low:
+        return 'low_volatility'
+    if volatility < high:
+        return 'medium_volatility'
+    if volatility < 2 * high:
+        return 'high_volatility'
+    return 'extreme_volatility'
+
+
+def volatility_tier(volatility: Optional[float], low: Optional[float] = None) -> int:
+    """tier пары: 1 - волатильность ниже нижнего порога, иначе 2"""
+    low = settings.LOW_VOLATILITY_THRESHOLD if low is None else low
+    return 1 if volatility is not None and volatility < low else 2
+
+
+class PairVolatility(NamedTuple):
+    """Метрики волатильности пары"""
+    daily_volatility: float         # %, Гарман-Класс
+    weekly_volatility: float        # %
+    close_volatility: float         # %, close-to-close
+    parkinson_volatility: float     # %
+    atr: float
+    atr_percent: float
+    average_volume: float
+    regime: str
+    tier: int
+
+
+class VolatilityEstimator:
+    """Оценки волатильности одной пары"""
+
+    __slots__ = (
+        'alpha', 'bars_per_day', 'atr_period', 'count', 'previous_close',
+        'close_variance', 'parkinson_variance', 'gk_variance', 'atr', 'volume', 'last_close'
+    )
+
+    def __init__(self, timeframe: TimeFrame, halflife: float = VOLATILITY_HALFLIFE, atr_period: int = ATR_PERIOD):
+        seconds = TIMEFRAME_SECONDS[TimeFrame(timeframe)]
+        self.alpha = 1 - math.exp(-math.log(2) * seconds / halflife)
+        self.bars_per_day = 86400 / seconds
+        self.atr_period = atr_period
+        self.count = 0
+        self.previous_close: Optional[float] = None
+        self.last_close = 0.0
+        self.close_variance = 0.0
+        self.parkinson_variance = 0.0
+        self.gk_variance = 0.0
+        self.atr = 0.0
+        self.volume = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= WARMUP_BARS
+
+    def update(self, open: float, high: float, low: float, close: float, volume: float):
+        """Учесть закрытую свечу"""
+        if min(open, high, low, close) <= 0:
+            return
+        hl = math.log(high / low)
+        co = math.log(close / open)
+        parkinson = PARKINSON_FACTOR * hl * hl
+        gk = 0.5 * hl * hl - GARMAN_KLASS_FACTOR * co * co
+        previous = self.previous_close
+        if previous is None:
+            ret = co
+            true_range = high - low
+        else:
+            ret = math.log(close / previous)
+            true_range = max(high - low, abs(high - previous), abs(low - previous))
+
+        if self.count == 0:
+            # Первая свеча задает начальные значения
+            self.close_variance, self.parkinson_variance, self.gk_variance = ret * ret, parkinson, gk
+            self.atr, self.volume = true_range, volume
+        else:
+            alpha = self.alpha
+            self.close_variance += alpha * (ret * ret - self.close_variance)
+            self.parkinson_variance += alpha * (parkinson - self.parkinson_variance)
+            self.gk_variance += alpha * (gk - self.gk_variance)
+            self.atr += (true_range - self.atr) / self.atr_period
+            self.volume += alpha * (volume - self.volume)
+        self.previous_close = self.last_close = close
+        self.count += 1
+
+    def daily(self, variance: float) -> float:
+        """Суточная волатильность (%) по дисперсии свечи"""
+        return math.sqrt(max(variance, 0.0) * self.bars_per_day) * 100
+
+    def metrics(self, low: Optional[float] = None, high: Optional[float] = None) -> PairVolatility:
+        daily = self.daily(self.gk_variance)
+        return PairVolatility(
+            daily_volatility=daily,
+            weekly_volatility=daily * math.sqrt(7),
+            close_volatility=self.daily(self.close_variance),
+            parkinson_volatility=self.daily(self.parkinson_variance),
+            atr=self.atr,
+            atr_percent=self.atr / self.last_close * 100 if self.last_close else 0.0,
+            average_volume=self.volume,
+            regime=volatility_regime(daily, low, high),
+            tier=volatility_tier(daily, low),
+        )
+
+
+class VolatilityTracker:
+    """Волатильность всех пар с пакетным сохранением в trading_pairs"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        timeframe: TimeFrame = TimeFrame.H1,
+        halflife: float = VOLATILITY_HALFLIFE,
+        low: Optional[float] = None,
+        high: Optional[float] = None
+    ):
+        """
+        Args:
+            session_factory: Контекстный менеджер сессии (db_manager.session)
+            timeframe: Таймфрейм свечей оценки
+            halflife: Период полураспада весов EWMA (секунды)
+            low, high: Пороги суточной волатильности (%, по умолчанию из settings)
+        """
+        self.session_factory = session_factory
+        self.timeframe = TimeFrame(timeframe)
+        self.halflife = halflife
+        self.low = settings.LOW_VOLATILITY_THRESHOLD if low is None else low
+        self.high = settings.HIGH_VOLATILITY_THRESHOLD if high is None else high
+        self.estimators: Dict[str, VolatilityEstimator] = {}
+        self._tiers: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def estimator(self, symbol: str) -> VolatilityEstimator:
+        estimator = self.estimators.get(symbol)
+        if estimator is None:
+            estimator = self.estimators[symbol] = VolatilityEstimator(self.timeframe, self.halflife)
+        return estimator
+
+    def seed(self, store: CandleStore, symbol: str) -> bool:
+        """
+        Начальные оценки по свечам хранилища (однократно при запуске)
+
+        Returns:
+            True, если оценка готова
+        """
+        if (symbol, self.timeframe) not in store:
+            return False
+        estimator = self.estimators[symbol] = VolatilityEstimator(self.timeframe, self.halflife)
+        window = store.window(symbol, self.timeframe)
+        for row in zip(window.open.tolist(), window.high.tolist(), window.low.tolist(), window.close.tolist(), window.volume.tolist()):
+            estimator.update(*row)
+        self._mark(symbol)
+        return estimator.ready
+
+    def update(self, symbol: str, candle: Candle):
+        """Учесть закрытую свечу пары"""
+        estimator = self.estimator(symbol)
+        estimator.update(candle.open, candle.high, candle.low, candle.close, candle.volume)
+        self._mark(symbol)
+
+    async def on_candle(self, symbol: str, timeframe: TimeFrame, candle: Candle):
+        """Обработчик закрытых свечей MarketDataStream"""
+        if TimeFrame(timeframe) == self.timeframe:
+            self.update(symbol, candle)
+
+    def _mark(self, symbol: str):
+        estimator = self.estimators[symbol]
+        if not estimator.ready:
+            return
+        self._dirty.add(symbol)
+        tier = estimator.metrics(self.low, self.high).tier
+        previous = self._tiers.get(symbol)
+        if previous is not None and previous != tier:
+            logger.info(f'{symbol} reclassified to tier {tier}')
+        self._tiers[symbol] = tier
+
+    def metrics(self, symbol: str) -> Optional[PairVolatility]:
+        """Метрики пары или None, если оценка не готова"""
+        estimator = self.estimators.get(symbol)
+        if estimator is None or not estimator.ready:
+            return None
+        return estimator.metrics(self.low, self.high)
+
+    def volatility(self) -> Dict[str, float]:
+        """Суточная волатильность готовых пар (%) - для RiskManager.evaluate"""
+        return {
+            symbol: estimator.daily(estimator.gk_variance)
+            for symbol, estimator in self.estimators.items() if estimator.ready
+        }
+
+    async def flush(self) -> int:
+        """
+        Сохранить метрики пар, изменившихся с прошлого сохранения
+
+        Returns:
+            Количество обновленных пар
+        """
+        if not self._dirty or self.session_factory is None:
+            return 0
+        # Модуль импортируется процессами анализа, ORM загружается только здесь
+        from src.database.repositories.pair_repo import PairRepository
+
+        symbols, self._dirty = self._dirty, set()
+        rows = []
+        for symbol in symbols:
+            metrics = self.metrics(symbol)
+            rows.append({
+                'symbol': symbol,
+                'daily_volatility': metrics.daily_volatility,
+                'weekly_volatility': metrics.weekly_volatility,
+                'average_volume': metrics.average_volume,
+                'tier': metrics.tier,
+            })
+        try:
+            async with self.session_factory() as session:
+                return await PairRepository(session).update_metrics(rows)
+        except Exception:
+            self._dirty |= symbols
+            raise
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f'Pair volatility flush failed: {e!r}')
+
+    def start(self, interval: float = settings.STATISTICS_UPDATE_INTERVAL):
+        """Запустить периодическое сохранение метрик"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def close(self):
+        """Остановить сохранение и записать остаток"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
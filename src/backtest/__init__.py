@@ -0,0 +1,3 @@
+"""
+src/backtest/__init__.py
+"""
\ No newline at end of file
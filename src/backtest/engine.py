@@ -0,0 +1,332 @@
+"""
+Движок исторического тестирования SMC-сетапов
+
+Сигналы генерирует тот же SMCStrategy, что и в реальной торговле, на
+скользящих окнах свечей (представления без копирования поверх
+memory-mapped файла). Исполнение сделок симулируется векторно для всех
+сигналов сразу: по матрице (сигналы x бары удержания) находятся первые
+касания стопа, частичных целей, уровня безубытка и тейк-профита.
+
+Правила внутри бара консервативные: если в одной свече достигнуты и стоп,
+и цель, считается, что первым сработал стоп.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.config.constants import RISK_MANAGEMENT, TimeFrame, TradingSide
+from src.analysis.candle_archive import ARCHIVE_SUFFIX, open_archive_file
+from src.analysis.candle_store import CandleWindow, window_from_rows
+from src.analysis.statistics_calculator import calculate_statistics
+from src.strategy import confluence
+from src.strategy.base_strategy import TradeSignal
+from src.strategy.smc_strategy import SMCStrategy
+
+# Поля записи о сделке
+TRADE_DTYPE = np.dtype([
+    ('setup', 'U32'),
+    ('pair', 'U20'),
+    ('side', 'i1'),
+    ('signal_index', 'i8'),
+    ('exit_index', 'i8'),
+    ('entry_time', 'i8'),
+    ('exit_time', 'i8'),
+    ('entry_price', 'f8'),
+    ('exit_price', 'f8'),
+    ('stop_loss', 'f8'),
+    ('take_profit', 'f8'),
+    ('position_size', 'f8'),
+    ('pnl', 'f8'),
+    ('pnl_percent', 'f8'),
+    ('commission', 'f8'),
+    ('rr', 'f8'),
+    ('exit_reason', 'U16'),
+])
+
+
+def load_candles(path: Union[str, Path]) -> np.ndarray:
+    """
+    Открыть файл свечей в режиме memory-map: .npy (n, 6) или файл архива свечей
+
+    Returns:
+        Массив только для чтения, данные читаются с диска по мере обращения
+    """
+    if Path(path).suffix == ARCHIVE_SUFFIX:
+        return open_archive_file(path)
+    return np.load(path, mmap_mode='r')
+
+
+@dataclass
+class BacktestConfig:
+    """Параметры бэктеста"""
+    balance: float = 10000.0
+    risk_percent: float = RISK_MANAGEMENT['max_risk_per_trade']
+    maker_fee: float = 0.02                 # % (как в TradingPair)
+    taker_fee: float = 0.05                 # %
+    lookback: int = 300                     # окно свечей для стратегии
+    max_holding: int = 500                  # максимум баров в сделке
+    partial_close_targets: Sequence[float] = tuple(RISK_MANAGEMENT['partial_close_targets'])
+    partial_close_percentages: Sequence[float] = tuple(RISK_MANAGEMENT['partial_close_percentages'])
+    breakeven_level: float = RISK_MANAGEMENT['breakeven_level']
+    one_position_per_pair: bool = True
+
+    @classmethod
+    def for_pair(cls, pair, **kwargs) -> 'BacktestConfig':
+        """Конфигурация с комиссиями торговой пары (TradingPair)"""
+        return cls(maker_fee=pair.maker_fee, taker_fee=pair.taker_fee, **kwargs)
+
+
+@dataclass
+class BacktestResult:
+    """Результат бэктеста"""
+    trades: np.ndarray                          # записи TRADE_DTYPE
+    statistics: dict                            # поля модели Statistics
+    signals: List[TradeSignal] = field(default_factory=list)
+
+
+def _first(mask: np.ndarray) -> np.ndarray:
+    """Индекс первого True по строкам (ширина матрицы, если True нет)"""
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+
+class BacktestEngine:
+    """Движок бэктеста"""
+
+    def __init__(self, strategy: Optional[SMCStrategy] = None, config: Optional[BacktestConfig] = None):
+        self.strategy = strategy or SMCStrategy()
+        self.config = config or BacktestConfig()
+
+    def generate_signals(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        candles: CandleWindow,
+        tier: int = 2,
+        indicators: Optional[Dict[str, Dict[int, Any]]] = None
+    ) -> Tuple[List[TradeSignal], np.ndarray]:
+        """
+        Прогнать стратегию по истории
+
+        Args:
+            indicators: Кэш результатов узлов индикаторов: имя узла ->
+                {время бара: результат}. Для полных окон (lookback свечей)
+                найденные результаты подставляются без пересчета, остальные
+                дописываются после расчета
+
+        Returns:
+            (сигналы, индексы баров, на закрытии которых они появились)
+        """
+        lookback = self.config.lookback
+        signals, indices = [], []
+        for index in range(1, len(candles)):
+            start = max(0, index + 1 - lookback)
+            window = CandleWindow(*(column[start:index + 1] for column in candles))
+            # Результат узла зависит от окна: кэшируются только окна полной длины
+            cached = indicators if indicators and index + 1 - start == lookback else None
+            bar = int(candles.timestamp[index])
+            preset = {
+                name: values[bar] for name, values in cached.items() if bar in values
+            } if cached else None
+            context, found = self.strategy.analyze(pair, timeframe, window, tier, indicators=preset)
+            if cached:
+                for name, values in cached.items():
+                    if name in context.indicators:
+                        values[bar] = context.indicators[name]
+            signals.extend(found)
+            indices.extend([index] * len(found))
+        return signals, np.asarray(indices, dtype=np.int64)
+
+    def simulate(
+        self,
+        candles: CandleWindow,
+        signal_index: np.ndarray,
+        side: np.ndarray,
+        entry: np.ndarray,
+        stop: np.ndarray,
+        take_profit: np.ndarray
+    ) -> np.ndarray:
+        """
+        Векторная симуляция исполнения сделок
+
+        Вход - по цене сигнала на закрытии бара signal_index, сопровождение
+        начинается со следующего бара. Частичные закрытия и перенос стопа
+        в безубыток - по RISK_MANAGEMENT (через config).
+
+        Args:
+            candles: Свечи
+            signal_index: Бар сигнала
+            side: 1 - лонг, -1 - шорт
+            entry, stop, take_profit: Уровни сделки
+
+        Returns:
+            Записи TRADE_DTYPE (поля setup/pair не заполнены)
+        """
+        config = self.config
+        count = len(candles)
+        keep = signal_index < count - 1
+        signal_index, side = signal_index[keep], side[keep].astype(np.float64)
+        entry, stop, take_profit = entry[keep], stop[keep], take_profit[keep]
+
+        trades = np.zeros(len(signal_index), dtype=TRADE_DTYPE)
+        if not len(trades):
+            return trades
+
+        horizon = config.max_holding
+        pad = np.full(horizon, np.nan)
+        rows = signal_index + 1
+        high = sliding_window_view(np.concatenate((np.asarray(candles.high, dtype=np.float64), pad)), horizon)[rows]
+        low = sliding_window_view(np.concatenate((np.asarray(candles.low, dtype=np.float64), pad)), horizon)[rows]
+        close = sliding_window_view(np.concatenate((np.asarray(candles.close, dtype=np.float64), pad)), horizon)[rows]
+
+        # Приводим шорты к лонгам: цены умножаются на направление
+        direction = side[:, None]
+        favorable = np.where(direction > 0, high, -low)
+        adverse = np.where(direction > 0, low, -high)
+        entry_d, stop_d, tp_d = side * entry, side * stop, side * take_profit
+        risk = entry_d - stop_d
+
+        columns = np.arange(horizon)
+        stop_hit = _first(adverse <= stop_d[:, None])
+        breakeven = _first(favorable >= (entry_d + config.breakeven_level * risk)[:, None])
+        breakeven_stop = _first((adverse <= entry_d[:, None]) & (columns > breakeven[:, None]))
+        target_hit = _first(favorable >= tp_d[:, None])
+
+        initial_stop = stop_hit <= breakeven
+        stop_bar = np.where(initial_stop, stop_hit, breakeven_stop)
+        stop_price = np.where(initial_stop, stop_d, entry_d)
+
+        available = np.minimum(horizon, count - rows)
+        by_stop = (stop_bar <= target_hit) & (stop_bar < available)
+        by_target = ~by_stop & (target_hit < available)
+        exit_bar = np.where(by_stop, stop_bar, np.where(by_target, target_hit, available - 1))
+        exit_d = np.where(
+            by_stop, stop_price,
+            np.where(by_target, tp_d, side * close[np.arange(len(rows)), exit_bar])
+        )
+
+        # Частичные закрытия
+        rr_target = (tp_d - entry_d) / risk
+        realized = np.zeros(len(rows))
+        remaining = np.ones(len(rows))
+        partial_notional = np.zeros(len(rows))
+        for target, percent in zip(config.partial_close_targets, config.partial_close_percentages):
+            hit = _first(favorable >= (entry_d + target * risk)[:, None])
+            done = (target < rr_target) & ((hit < exit_bar) | ((hit == exit_bar) & ~by_stop))
+            fraction = np.where(done, percent / 100, 0.0)
+            realized += fraction * target
+            remaining -= fraction
+            partial_notional += fraction * (entry + side * target * risk)
+
+        realized += remaining * (exit_d - entry_d) / risk
+        exit_price = side * exit_d
+
+        risk_amount = config.balance * config.risk_percent / 100
+        size = risk_amount / risk
+        # Частичные цели - лимитные ордера (maker), вход и остальные выходы - рыночные
+        commission = size * (
+            (entry + remaining * exit_price) * config.taker_fee + partial_notional * config.maker_fee
+        ) / 100
+        pnl = size * risk * realized - commission
+
+        exit_index = rows + exit_bar
+        timestamps = np.asarray(candles.timestamp)
+        trades['side'] = side
+        trades['signal_index'] = signal_index
+        trades['exit_index'] = exit_index
+        trades['entry_time'] = timestamps[signal_index]
+        trades['exit_time'] = timestamps[exit_index]
+        trades['entry_price'] = entry
+        trades['exit_price'] = exit_price
+        trades['stop_loss'] = stop
+        trades['take_profit'] = take_profit
+        trades['position_size'] = size
+        trades['pnl'] = pnl
+        trades['pnl_percent'] = pnl / config.balance * 100
+        trades['commission'] = commission
+        trades['rr'] = realized
+        trades['exit_reason'] = np.where(
+            by_stop, np.where(initial_stop, 'stop_loss', 'breakeven'),
+            np.where(by_target, 'take_profit', 'timeout')
+        )
+        return trades
+
+    def _filter_overlapping(self, trades: np.ndarray) -> np.ndarray:
+        """Оставить не более одной открытой позиции на пару"""
+        keep = np.zeros(len(trades), dtype=bool)
+        busy_until = {}
+        for position in np.argsort(trades['signal_index'], kind='stable').tolist():
+            pair = trades['pair'][position]
+            if trades['signal_index'][position] >= busy_until.get(pair, -1):
+                keep[position] = True
+                busy_until[pair] = trades['exit_index'][position]
+        return trades[keep]
+
+    @staticmethod
+    def signal_arrays(signals: List[TradeSignal], indices: np.ndarray) -> dict:
+        """Представить сигналы колонками для симуляции"""
+        masks = np.array([s.confluence_mask for s in signals], dtype=np.int64)
+        return {
+            'index': np.asarray(indices, dtype=np.int64),
+            'setup': np.array([s.setup_type for s in signals], dtype='U32'),
+            'side': np.array([1 if s.side == TradingSide.LONG else -1 for s in signals], dtype=np.int8),
+            'entry': np.array([s.entry_price for s in signals], dtype=np.float64),
+            'stop': np.array([s.stop_loss for s in signals], dtype=np.float64),
+            'take_profit': np.array([s.take_profit for s in signals], dtype=np.float64),
+            'mask': masks,
+            'factors': confluence.counts(masks),
+        }
+
+    def backtest_arrays(self, pair: str, candles: CandleWindow, arrays: dict) -> np.ndarray:
+        """
+        Симулировать сигналы, заданные колонками (см. signal_arrays)
+
+        Returns:
+            Записи TRADE_DTYPE в порядке закрытия
+        """
+        trades = self.simulate(
+            candles, arrays['index'], arrays['side'],
+            arrays['entry'], arrays['stop'], arrays['take_profit']
+        )
+        trades['setup'] = arrays['setup'][arrays['index'] < len(candles) - 1]
+        trades['pair'] = pair
+
+        if self.config.one_position_per_pair:
+            trades = self._filter_overlapping(trades)
+        return trades[np.argsort(trades['exit_time'], kind='stable')]
+
+    def run(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        candles: Union[CandleWindow, np.ndarray],
+        tier: int = 2
+    ) -> BacktestResult:
+        """
+        Выполнить бэктест пары на таймфрейме
+
+        Args:
+            pair: Символ пары
+            timeframe: Таймфрейм
+            candles: CandleWindow или массив (n, 6), в т.ч. memmap из load_candles()
+            tier: Tier пары
+
+        Returns:
+            BacktestResult
+        """
+        if not isinstance(candles, CandleWindow):
+            candles = window_from_rows(candles)
+
+        signals, indices = self.generate_signals(pair, timeframe, candles, tier)
+        trades = self.backtest_arrays(pair, candles, self.signal_arrays(signals, indices))
+        return BacktestResult(trades=trades, statistics=trade_statistics(trades), signals=signals)
+
+
+def trade_statistics(trades: np.ndarray) -> dict:
+    """Статистика (поля модели Statistics) по записям TRADE_DTYPE"""
+    return calculate_statistics(
+        trades['pnl'], trades['pnl_percent'], trades['commission'],
+        trades['rr'], trades['exit_time'], trades['setup'], trades['pair']
+    )
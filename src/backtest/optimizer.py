@@ -0,0 +1,429 @@
+"""
+Оптимизатор параметров стратегии (grid / random search, walk-forward)
+
+Параметры задаются ключами вида '<группа>.<имя>':
+    rr.<setup_type>              - RR_RATIOS
+    min_confluence.<setup_type>  - MIN_CONFLUENCE_FACTORS
+    cvd.<ключ>                   - CVD_SETTINGS (divergence_threshold, reset_period, divergence_lookback)
+    volume_profile.<ключ>        - VOLUME_PROFILE_SETTINGS (value_area_percentage)
+    order_block.<ключ>           - ORDER_BLOCK_SETTINGS
+
+Другие группы (например, order_flow - бэктест работает по свечам без
+потока сделок) отклоняются split_params с ValueError.
+
+Прогоны распределяются по пулу процессов. Свечи не передаются между
+процессами: воркер открывает файл набора (.npy или архив свечей) через memory-map, и все
+процессы читают одни и те же страницы из кэша ОС.
+
+Индикаторы зависят только от групп cvd/volume_profile/order_block.
+Кандидаты в сигналы (со всеми факторами confluence) считаются один раз на
+набор данных и значения этих групп и кэшируются в воркере; параметры
+rr/min_confluence применяются к кэшированным кандидатам без пересчета
+индикаторов. Задачи группируются так, чтобы одна задача перебирала все
+значения rr/min_confluence для одного набора индикаторных параметров.
+
+Результаты отдельных узлов индикаторов (CACHED_NODES) кэшируются по барам
+с ключом из параметров только своей группы: при переборе cvd.* ордер-блоки,
+профиль объема и зоны ликвидности не пересчитываются. Пул процессов
+создается один раз на оптимизатор, поэтому кэши воркеров переживают
+вызовы evaluate (окна walk-forward, повторные поиски).
+"""
+import itertools
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.constants import (
+    CVD_SETTINGS,
+    MIN_CONFLUENCE_FACTORS,
+    ORDER_BLOCK_SETTINGS,
+    RR_RATIOS,
+    SetupType,
+    TimeFrame,
+    VOLUME_PROFILE_SETTINGS,
+)
+from src.analysis.candle_store import CandleWindow, window_from_rows
+from src.backtest.engine import TRADE_DTYPE, BacktestConfig, BacktestEngine, load_candles, trade_statistics
+from src.strategy.indicators import CVDCalculator, OrderBlockDetector, VolumeProfileAnalyzer
+from src.strategy.setups import LiquidityGrab, OrderBlockReversal, PocBounce
+from src.strategy.smc_strategy import SMCStrategy
+
+Params = Dict[str, Any]
+
+# Группы параметров, не влияющие на индикаторы
+SETUP_GROUPS = ('rr', 'min_confluence')
+# Группы параметров индикаторов стратегии-кандидата (build_candidate_strategy)
+INDICATOR_GROUPS = ('cvd', 'volume_profile', 'order_block')
+
+# Сколько наборов кандидатов хранить в кэше воркера
+CANDIDATE_CACHE_SIZE = 64
+
+# Узлы индикаторов, кэшируемые по барам: (группа параметров узла, результат
+# зависит только от окна бара). Результаты, зависящие только от окна, общие
+# для всех сегментов набора; зоны ликвидности и структура рынка используют
+# swing-точки из общего индекса, накопленные до начала окна, и кэшируются
+# по сегменту
+CACHED_NODES: Dict[str, Tuple[Optional[str], bool]] = {
+    'order_blocks': ('order_block', True),
+    'volume_profile': ('volume_profile', True),
+    'liquidity_zones': (None, False),
+    'market_structure': (None, False),
+}
+# Сколько кэшей узлов хранить в воркере
+INDICATOR_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Набор исторических данных: файл .npy (n, 6) или архива свечей одной пары и таймфрейма"""
+    name: str
+    path: str
+    pair: str
+    timeframe: TimeFrame
+    tier: int = 2
+
+
+@dataclass
+class SweepResult:
+    """Результат прогона одного набора параметров"""
+    params: Params
+    statistics: dict
+    score: float
+
+
+@dataclass
+class WalkForwardFold:
+    """Окно walk-forward: подбор на train, проверка на test"""
+    train: Tuple[int, int]
+    test: Tuple[int, int]
+    best: SweepResult
+    out_of_sample: SweepResult
+
+
+@dataclass
+class ParameterGrid:
+    """Сетка значений параметров"""
+    values: Dict[str, Sequence[Any]] = field(default_factory=dict)
+
+    def __iter__(self) -> Iterator[Params]:
+        keys = list(self.values)
+        for combination in itertools.product(*(self.values[key] for key in keys)):
+            yield dict(zip(keys, combination))
+
+    def __len__(self) -> int:
+        return int(np.prod([len(values) for values in self.values.values()])) if self.values else 1
+
+    def sample(self, count: int, seed: Optional[int] = None) -> List[Params]:
+        """Случайная выборка комбинаций (random search)"""
+        rng = random.Random(seed)
+        if count >= len(self):
+            return list(self)
+        seen, samples = set(), []
+        while len(samples) < count:
+            params = {key: rng.choice(list(values)) for key, values in self.values.items()}
+            key = params_key(params)
+            if key not in seen:
+                seen.add(key)
+                samples.append(params)
+        return samples
+
+
+def _freeze(value: Any) -> Any:
+    """Хешируемое представление значения параметра (словари и списки - кортежи)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def params_key(params: Params) -> tuple:
+    """Ключ набора параметров для множеств и кэшей"""
+    return tuple(sorted((key, _freeze(value)) for key, value in params.items()))
+
+
+def split_params(params: Params) -> Tuple[Params, Params]:
+    """
+    Разделить параметры на индикаторные и параметры сетапов
+
+    Raises:
+        ValueError: Группа параметра не применяется стратегией-кандидатом
+    """
+    indicator, setup = {}, {}
+    for key, value in params.items():
+        group = key.split('.', 1)[0]
+        if group in SETUP_GROUPS:
+            setup[key] = value
+        elif group in INDICATOR_GROUPS:
+            indicator[key] = value
+        else:
+            raise ValueError(f'Unsupported optimizer parameter: {key}')
+    return indicator, setup
+
+
+def _group(params: Params, name: str, defaults: dict) -> dict:
+    prefix = f'{name}.'
+    return {**defaults, **{key[len(prefix):]: value for key, value in params.items() if key.startswith(prefix)}}
+
+
+def build_candidate_strategy(indicator_params: Params) -> SMCStrategy:
+    """
+    Стратегия для генерации кандидатов: индикаторы с заданными параметрами,
+    сетапы без порога confluence (порог применяется позже)
+    """
+    cvd = _group(indicator_params, 'cvd', CVD_SETTINGS)
+    profile = _group(indicator_params, 'volume_profile', VOLUME_PROFILE_SETTINGS)
+    blocks = _group(indicator_params, 'order_block', ORDER_BLOCK_SETTINGS)
+    return SMCStrategy(
+        setups=[OrderBlockReversal(min_confluence=0), LiquidityGrab(min_confluence=0), PocBounce(min_confluence=0)],
+        order_blocks=OrderBlockDetector(blocks['min_body_ratio'], blocks['max_age']),
+        volume_profile=VolumeProfileAnalyzer(profile['value_area_percentage'], profile['price_bin_resolution']),
+        cvd=CVDCalculator(cvd['reset_period'], cvd['divergence_threshold'], cvd['divergence_lookback'])
+    )
+
+
+def apply_setup_params(candidates: dict, setup_params: Params) -> dict:
+    """Отфильтровать кандидатов по min_confluence и пересчитать тейк по rr"""
+    rr = {setup.value: RR_RATIOS[setup] for setup in SetupType}
+    rr.update({key[len('rr.'):]: value for key, value in setup_params.items() if key.startswith('rr.')})
+    minimum = {setup.value: MIN_CONFLUENCE_FACTORS[setup] for setup in SetupType}
+    minimum.update({
+        key[len('min_confluence.'):]: value
+        for key, value in setup_params.items() if key.startswith('min_confluence.')
+    })
+
+    setups = candidates['setup']
+    keep = candidates['factors'] >= np.array([minimum[setup] for setup in setups.tolist()], dtype=np.int64)
+    selected = {key: values[keep] for key, values in candidates.items()}
+
+    ratios = np.array([rr[setup] for setup in selected['setup'].tolist()], dtype=np.float64)
+    risk = selected['entry'] - selected['stop']
+    selected['take_profit'] = selected['entry'] + risk * ratios
+    return selected
+
+
+# Состояние процесса-воркера
+_candles: Dict[str, np.ndarray] = {}
+_candidates: 'OrderedDict[tuple, dict]' = OrderedDict()
+_indicators: 'OrderedDict[tuple, Dict[int, Any]]' = OrderedDict()
+
+
+def _worker_candles(dataset: Dataset) -> np.ndarray:
+    if dataset.path not in _candles:
+        _candles[dataset.path] = load_candles(dataset.path)
+    return _candles[dataset.path]
+
+
+def _segment(dataset: Dataset, segment: Tuple[int, int], lookback: int) -> Tuple[CandleWindow, int]:
+    """Окно сегмента с запасом истории для индикаторов"""
+    start, end = segment
+    first = max(0, start - lookback)
+    return window_from_rows(_worker_candles(dataset)[first:end]), start - first
+
+
+def _node_cache(
+    dataset: Dataset,
+    segment: Tuple[int, int],
+    node: str,
+    indicator_params: Params,
+    config: BacktestConfig
+) -> Dict[int, Any]:
+    """Кэш результатов узла по времени бара для параметров его группы"""
+    group, window_only = CACHED_NODES[node]
+    prefix = f'{group}.'
+    params = params_key({
+        key: value for key, value in indicator_params.items() if group is not None and key.startswith(prefix)
+    })
+    key = (dataset, None if window_only else segment, config.lookback, node, params)
+    cache = _indicators.get(key)
+    if cache is not None:
+        _indicators.move_to_end(key)
+        return cache
+    cache = _indicators[key] = {}
+    if len(_indicators) > INDICATOR_CACHE_SIZE:
+        _indicators.popitem(last=False)
+    return cache
+
+
+def _worker_candidates(dataset: Dataset, segment: Tuple[int, int], indicator_params: Params, config: BacktestConfig) -> dict:
+    key = (dataset, segment, params_key(indicator_params), config.lookback)
+    cached = _candidates.get(key)
+    if cached is not None:
+        _candidates.move_to_end(key)
+        return cached
+
+    candles, offset = _segment(dataset, segment, config.lookback)
+    engine = BacktestEngine(build_candidate_strategy(indicator_params), config)
+    indicators = {node: _node_cache(dataset, segment, node, indicator_params, config) for node in CACHED_NODES}
+    signals, indices = engine.generate_signals(dataset.pair, dataset.timeframe, candles, dataset.tier, indicators)
+    arrays = engine.signal_arrays(signals, indices)
+    keep = arrays['index'] >= offset
+    cached = {name: values[keep] for name, values in arrays.items()}
+
+    _candidates[key] = cached
+    if len(_candidates) > CANDIDATE_CACHE_SIZE:
+        _candidates.popitem(last=False)
+    return cached
+
+
+def _evaluate_task(
+    dataset: Dataset,
+    segment: Tuple[int, int],
+    indicator_params: Params,
+    setup_variants: List[Params],
+    config: BacktestConfig
+) -> List[np.ndarray]:
+    """Задача воркера: все варианты параметров сетапов для одного набора индикаторных параметров"""
+    candidates = _worker_candidates(dataset, segment, indicator_params, config)
+    candles, _ = _segment(dataset, segment, config.lookback)
+    engine = BacktestEngine(config=config)
+    return [
+        engine.backtest_arrays(dataset.pair, candles, apply_setup_params(candidates, variant))
+        for variant in setup_variants
+    ]
+
+
+class Optimizer:
+    """Перебор параметров стратегии на пуле процессов"""
+
+    def __init__(
+        self,
+        datasets: Sequence[Dataset],
+        config: Optional[BacktestConfig] = None,
+        objective: str = 'total_pnl',
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            datasets: Наборы данных (пары/таймфреймы)
+            config: Параметры бэктеста
+            objective: Поле статистики для максимизации
+            max_workers: Количество процессов
+        """
+        self.datasets = list(datasets)
+        self.config = config or BacktestConfig()
+        self.objective = objective
+        self.max_workers = max_workers
+        self._lengths = {dataset.path: len(load_candles(dataset.path)) for dataset in self.datasets}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'Optimizer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Пул процессов (один на время жизни оптимизатора, чтобы сохранялись кэши воркеров)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        """Остановить пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _score(self, statistics: dict) -> float:
+        value = statistics.get(self.objective)
+        return float(value) if value is not None else float('-inf')
+
+    def evaluate(
+        self,
+        candidates: Sequence[Params],
+        segments: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> List[SweepResult]:
+        """
+        Прогнать наборы параметров по всем наборам данных
+
+        Args:
+            candidates: Наборы параметров
+            segments: Диапазон баров по каждому набору (path -> (start, end)),
+                по умолчанию - вся история
+
+        Returns:
+            Результаты, отсортированные по убыванию objective
+        """
+        candidates = list(candidates)
+        segments = segments or {path: (0, length) for path, length in self._lengths.items()}
+
+        # Группируем варианты по индикаторным параметрам
+        groups: Dict[tuple, List[int]] = {}
+        for position, params in enumerate(candidates):
+            indicator, _ = split_params(params)
+            groups.setdefault(params_key(indicator), []).append(position)
+
+        trades: List[List[np.ndarray]] = [[] for _ in candidates]
+        futures = {}
+        for indicator_key, positions in groups.items():
+            variants = [split_params(candidates[position])[1] for position in positions]
+            for dataset in self.datasets:
+                future = self.executor.submit(
+                    _evaluate_task, dataset, segments[dataset.path],
+                    dict(indicator_key), variants, self.config
+                )
+                futures[future] = positions
+
+        for future in as_completed(futures):
+            for position, result in zip(futures[future], future.result()):
+                trades[position].append(result)
+
+        results = []
+        for params, parts in zip(candidates, trades):
+            merged = np.concatenate(parts) if parts else np.zeros(0, dtype=TRADE_DTYPE)
+            merged = merged[np.argsort(merged['exit_time'], kind='stable')]
+            statistics = trade_statistics(merged)
+            results.append(SweepResult(params=params, statistics=statistics, score=self._score(statistics)))
+        return sorted(results, key=lambda result: result.score, reverse=True)
+
+    def grid_search(self, grid: ParameterGrid) -> List[SweepResult]:
+        """Полный перебор сетки"""
+        return self.evaluate(list(grid))
+
+    def random_search(self, grid: ParameterGrid, count: int, seed: Optional[int] = None) -> List[SweepResult]:
+        """Случайный поиск по сетке"""
+        return self.evaluate(grid.sample(count, seed))
+
+    def walk_forward(
+        self,
+        grid: ParameterGrid,
+        train_fraction: float = 0.25,
+        test_fraction: float = 0.1,
+        samples: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> List[WalkForwardFold]:
+        """
+        Walk-forward оптимизация: окна подбора и проверки сдвигаются на размер test
+
+        Args:
+            grid: Сетка параметров
+            train_fraction: Доля истории в окне подбора
+            test_fraction: Доля истории в окне проверки
+            samples: Количество случайных комбинаций (None - полный перебор)
+            seed: Зерно случайного поиска
+
+        Returns:
+            Окна с лучшими параметрами и их результатом вне выборки
+        """
+        candidates = grid.sample(samples, seed) if samples else list(grid)
+        folds = []
+        position = 0.0
+        while position + train_fraction + test_fraction <= 1.0 + 1e-9:
+            train, test = {}, {}
+            for path, length in self._lengths.items():
+                middle = int(length * (position + train_fraction))
+                train[path] = (int(length * position), middle)
+                test[path] = (middle, int(length * (position + train_fraction + test_fraction)))
+            best = self.evaluate(candidates, train)[0]
+            out_of_sample = self.evaluate([best.params], test)[0]
+
+            first = next(iter(self._lengths))
+            folds.append(WalkForwardFold(train[first], test[first], best, out_of_sample))
+            position += test_fraction
+        return folds
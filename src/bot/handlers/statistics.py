@@ -0,0 +1,36 @@
+"""
+Обработчики статистики торговли
+
+Статистика читается из кэша, при промахе - из аккумуляторов
+StatisticsService (без пересчета по истории сделок).
+Зависимости cache и statistics передаются через данные диспетчера.
+"""
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from src.analysis.statistics_calculator import PERIOD_TYPES
+from src.utils.cache import Cache, statistics_key
+from src.utils.formatters import format_statistics
+
+router = Router(name='statistics')
+
+
+@router.message(Command('stats'))
+async def show_statistics(message: Message, command: CommandObject, cache: Cache, statistics):
+    """/stats [daily|weekly|monthly|all_time]"""
+    period_type = (command.args or 'all_time').strip()
+    if period_type not in PERIOD_TYPES:
+        await message.answer(f'Usage: /stats [{"|".join(PERIOD_TYPES)}]')
+        return
+
+    user_id = message.from_user.id
+    stats = await cache.get_or_set(
+        statistics_key(user_id, period_type),
+        lambda: statistics.statistics(user_id, period_type),
+        kind='statistics'
+    )
+    if not stats:
+        await message.answer('No closed trades for this period')
+        return
+    await message.answer(format_statistics(stats, period_type), parse_mode='Markdown')
@@ -0,0 +1,49 @@
+"""
+Обработчики торговых команд
+
+Состояние счета и снимки индикаторов читаются из кэша: повторные
+запросы в пределах TTL не обращаются к бирже, а снимки индикаторов
+записывает планировщик анализа (пересчет по запросу не выполняется).
+Зависимости cache и client передаются через данные диспетчера.
+"""
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from src.config.constants import TimeFrame
+from src.utils.cache import Cache, balance_key, indicators_key, positions_key
+from src.utils.formatters import format_balance, format_positions, format_snapshot
+
+router = Router(name='trading')
+
+
+@router.message(Command('balance'))
+async def show_balance(message: Message, cache: Cache, client):
+    """/balance"""
+    balance = await cache.get_or_set(balance_key(), client.get_balance, kind='balance')
+    await message.answer(format_balance(balance or {}), parse_mode='Markdown')
+
+
+@router.message(Command('positions'))
+async def show_positions(message: Message, cache: Cache, client):
+    """/positions"""
+    positions = await cache.get_or_set(positions_key(), client.get_positions, kind='positions')
+    await message.answer(format_positions(positions or []), parse_mode='Markdown')
+
+
+@router.message(Command('levels'))
+async def show_levels(message: Message, command: CommandObject, cache: Cache):
+    """/levels PAIR [TIMEFRAME] - последний снимок индикаторов пары"""
+    args = (command.args or '').split()
+    try:
+        pair = args[0].upper()
+        timeframe = TimeFrame(args[1] if len(args) > 1 else TimeFrame.H1)
+    except (IndexError, ValueError):
+        await message.answer('Usage: /levels BTC-USDT [5m|15m|1h|4h]')
+        return
+
+    snapshot = await cache.get(indicators_key(pair, timeframe))
+    if snapshot is None:
+        await message.answer(f'No analysis for {pair} {timeframe.value} yet')
+        return
+    await message.answer(format_snapshot(snapshot), parse_mode='Markdown')
@@ -2,7 +2,7 @@
 Константы для торговой стратегии Smart Money Concepts
 """
 from enum import Enum
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 
 class TimeFrame(str, Enum):
@@ -16,6 +16,32 @@ class TimeFrame(str, Enum):
     D1 = "1d"
 
 
+# Длительность таймфреймов в секундах
+TIMEFRAME_SECONDS: Dict[TimeFrame, int] = {
+    TimeFrame.M1: 60,
+    TimeFrame.M5: 300,
+    TimeFrame.M15: 900,
+    TimeFrame.M30: 1800,
+    TimeFrame.H1: 3600,
+    TimeFrame.H4: 14400,
+    TimeFrame.D1: 86400,
+}
+
+
+# Хранение рыночных данных: месяцев истории в таблице market_data
+# (таймфреймы без записи хранятся без ограничения)
+MARKET_DATA_RETENTION_MONTHS: Dict[TimeFrame, int] = {
+    TimeFrame.M1: 1,
+    TimeFrame.M5: 3,
+}
+
+# Таймфреймы, в которые сворачиваются свечи перед удалением секции
+MARKET_DATA_ROLLUPS: Dict[TimeFrame, List[TimeFrame]] = {
+    TimeFrame.M1: [TimeFrame.M5, TimeFrame.M15, TimeFrame.M30, TimeFrame.H1, TimeFrame.H4, TimeFrame.D1],
+    TimeFrame.M5: [TimeFrame.M15, TimeFrame.M30, TimeFrame.H1, TimeFrame.H4, TimeFrame.D1],
+}
+
+
 class TradingSide(str, Enum):
     """Направление сделки"""
     LONG = "long"
@@ -61,6 +87,24 @@ RR_RATIOS: Dict[SetupType, float] = {
     SetupType.POC_BOUNCE: 3.0
 }
 
+# Факторы confluence: номер бита в маске - позиция в кортеже.
+# Маски хранятся в БД, поэтому новые факторы (в том числе факторы сетапов-плагинов)
+# добавляются только в конец
+CONFLUENCE_FACTORS: Tuple[str, ...] = (
+    'order_block',
+    'liquidity_sweep',
+    'equal_levels',
+    'session_level',
+    'multiple_touches',
+    'depth_wall',
+    'cvd_divergence',
+    'order_flow',
+    'value_area',
+    'poc_confluence',
+    'poc_touch',
+    'market_structure',
+)
+
 # Минимальные факторы confluence для каждого сетапа
 MIN_CONFLUENCE_FACTORS: Dict[SetupType, int] = {
     SetupType.ORDER_BLOCK_REVERSAL: 3,
@@ -93,10 +137,27 @@ LIQUIDITY_TIME_ZONES = {
     "overlap_eu_us": (13, 16)
 }
 
+# Параметры Order Blocks
+ORDER_BLOCK_SETTINGS = {
+    "min_body_ratio": 0.6,        # Минимальная доля тела импульсной свечи в ее диапазоне
+    "max_age": 300,               # Время жизни блока в свечах
+}
+
+# Параметры поиска ликвидности
+LIQUIDITY_SETTINGS = {
+    "swing_depth": 3,             # Свечей с каждой стороны для подтверждения swing-точки
+    "equal_level_tolerance": 0.1,  # Допуск (в % от цены) для равных максимумов/минимумов
+    "max_swings": 200,            # Сколько последних swing-точек хранить
+}
+
 # Параметры Volume Profile
 VOLUME_PROFILE_SETTINGS = {
     "value_area_percentage": 70,  # Процент объема для Value Area
     "min_node_size": 100,         # Минимальный размер узла
+    "price_bin_resolution": {     # Шаг ценового уровня в % от цены по tier пары
+        1: 0.05,
+        2: 0.1,
+    },
     "profile_periods": {
         TimeFrame.M15: 96,        # 24 часа для 15-минутного графика
         TimeFrame.H1: 24,         # 24 часа для часового графика
@@ -109,6 +170,7 @@ CVD_SETTINGS = {
     "divergence_threshold": 0.15,  # Порог для определения дивергенции
     "absorption_volume": 1000,     # Минимальный объем для absorption
     "reset_period": 24,           # Часы для сброса CVD
+    "divergence_lookback": 20,    # Окно (в свечах) для поиска дивергенции
 }
 
 # Параметры Order Flow
@@ -116,6 +178,17 @@ ORDER_FLOW_SETTINGS = {
     "imbalance_ratio": 3.0,       # Соотношение для imbalance
     "large_order_threshold": 100,  # BTC эквивалент для large orders
     "footprint_rows": 20,         # Количество строк в footprint
+    "footprint_levels": 512,      # Ценовых уровней (шагов цены) в рабочем массиве бара
+    "stacked_imbalance": 3,       # Подряд идущих imbalance для stacked imbalance
+}
+
+# Параметры стакана
+ORDER_BOOK_SETTINGS = {
+    "depth_percent": 1.0,         # Диапазон (в % от mid) для накопленной глубины
+    "wall_percent": 2.0,          # Диапазон (в % от mid) поиска стен
+    "wall_multiplier": 5.0,       # Стена - уровень объемом не меньше N медиан уровней диапазона
+    "zone_tolerance": 0.1,        # Допуск (в % от цены) между зоной ликвидности и стеной
+    "max_depth_share": 10.0,      # Максимальный объем позиции (в % глубины стороны входа в depth_percent)
 }
 
 # Настройки риск-менеджмента
@@ -125,6 +198,7 @@ RISK_MANAGEMENT = {
     "max_daily_trades": 5,
     "max_daily_loss": 5.0,        # Процент от депозита
     "max_weekly_drawdown": 15.0,
+    "max_correlated_risk": 4.0,   # Риск портфеля с учетом корреляции пар (% от депозита)
     "partial_close_targets": [1.0, 2.0],  # R-ratios для частичного закрытия
     "partial_close_percentages": [50, 30],  # Проценты позиции для закрытия
     "breakeven_level": 1.5,       # R-ratio для переноса стопа в безубыток
@@ -211,4 +285,13 @@ MESSAGE_TEMPLATES = {
 
 **Account Balance:** {balance} USDT
 """
-}
\ No newline at end of file
+}
+
+# Время жизни записей кэша (секунды)
+CACHE_TTL = {
+    "contracts": 3600,            # параметры контрактов биржи
+    "indicators": 86400,          # снимки индикаторов (ключ включает время свечи)
+    "balance": 10,                # баланс счета
+    "positions": 5,               # открытые позиции
+    "statistics": 60,             # статистика торговли
+}
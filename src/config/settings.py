@@ -1,6 +1,7 @@
-from typing import List, Optional
+import json
+from typing import Annotated, List, Optional
 from pydantic import Field, field_validator
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, NoDecode
 from pathlib import Path
 
 class Settings(BaseSettings):
@@ -8,7 +9,7 @@ class Settings(BaseSettings):
 
     # Bot settings
     BOT_TOKEN: str = Field(..., env='BOT_TOKEN')
-    ADMIN_IDS: List[int] = Field(..., env='ADMIN_IDS')
+    ADMIN_IDS: Annotated[List[int], NoDecode] = Field(..., env='ADMIN_IDS')
 
     # Database 
     DB_HOST: str = Field('localhost', env='DB_HOST')
@@ -16,6 +17,19 @@ class Settings(BaseSettings):
     DB_NAME: str = Field('crypto_db', env='DB_NAME')
     DB_USER: str = Field('admin', env='DB_USER')
     DB_PASSWORD: str = Field(..., env='DB_PASSWORD')
+    DB_POOL_SIZE: int = Field(10, env='DB_POOL_SIZE')
+    DB_MAX_OVERFLOW: int = Field(20, env='DB_MAX_OVERFLOW')
+    DB_POOL_RECYCLE: int = Field(1800, env='DB_POOL_RECYCLE')  # seconds
+    DB_STATEMENT_CACHE_SIZE: int = Field(500, env='DB_STATEMENT_CACHE_SIZE')
+    DB_WRITE_BATCH_SIZE: int = Field(50000, env='DB_WRITE_BATCH_SIZE')  # строк в буфере до сброса
+
+    # Redis
+    REDIS_HOST: str = Field('localhost', env='REDIS_HOST')
+    REDIS_PORT: int = Field(6379, env='REDIS_PORT')
+    REDIS_PASSWORD: Optional[str] = Field(None, env='REDIS_PASSWORD')
+    REDIS_DB: int = Field(0, env='REDIS_DB')
+    CACHE_PREFIX: str = Field('smc', env='CACHE_PREFIX')
+    CACHE_L1_SIZE: int = Field(2048, env='CACHE_L1_SIZE')  # записей в памяти процесса
 
     # BingX API
     BINGX_API_KEY: str = Field(..., env='BINGX_API_KEY')
@@ -36,11 +50,20 @@ class Settings(BaseSettings):
     CONFLUENCE_MIN_FACTORS: int = Field(3, env='CONFLUENCE_MIN_FACTORS')
 
     # Analysis interval
-    ANALYSIS_INTERVALS: List[str] = Field(
+    # Списки задаются через запятую: NoDecode отключает разбор значения как JSON
+    ANALYSIS_INTERVALS: Annotated[List[str], NoDecode] = Field(
         default=['5m', '15m', '1h', '4h'],
         env='ANALYSIS_INTERVALS'
     )
 
+    # Trading pairs
+    TIER1_PAIRS: Annotated[List[str], NoDecode] = Field(default=['BTC-USDT', 'ETH-USDT'], env='TIER1_PAIRS')
+    TIER2_PAIRS: Annotated[List[str], NoDecode] = Field(default=[], env='TIER2_PAIRS')
+
+    # Volatility settings (суточная волатильность, %)
+    LOW_VOLATILITY_THRESHOLD: float = Field(3.0, env='LOW_VOLATILITY_THRESHOLD')
+    HIGH_VOLATILITY_THRESHOLD: float = Field(10.0, env='HIGH_VOLATILITY_THRESHOLD')
+
     # Telegram settings
     SIGNAL_CHANNEL_ID: Optional[int] = Field(None, env='SIGNAL_CHANNEL_ID')
     LOG_CHANNEL_ID: Optional[int] = Field(None, env='LOG_CHANNEL_ID')
@@ -50,23 +73,42 @@ class Settings(BaseSettings):
     LOG_FILE: str = Field('logs/trading_bot.log', env='LOG_FILE')
 
     # Scheduler settings
-    MARKET_ANALYSIS_INTERVAL: int = Field(60, 'MARKET_ANALYSIS_INTERVAL') # seconds
-    STATISTICS_UPDATE_INTERVAL: int = Field(300, 'STATISTICS_UPDATE_INTERVAL') # seconds
+    MARKET_ANALYSIS_INTERVAL: int = Field(60, env='MARKET_ANALYSIS_INTERVAL') # seconds
+    STATISTICS_UPDATE_INTERVAL: int = Field(300, env='STATISTICS_UPDATE_INTERVAL') # seconds
+
+    # Analysis pipeline
+    ANALYSIS_WORKERS: Optional[int] = Field(None, env='ANALYSIS_WORKERS')  # процессы для расчета индикаторов
+    FETCH_CONCURRENCY: int = Field(8, env='FETCH_CONCURRENCY')  # одновременные запросы свечей
+    ANALYSIS_CHUNK_SIZE: int = Field(4, env='ANALYSIS_CHUNK_SIZE')  # пар в одной задаче пула
+    RESAMPLE_TIMEFRAMES: bool = Field(True, env='RESAMPLE_TIMEFRAMES')  # старшие таймфреймы из 1m
+
+    # Candle archive
+    ARCHIVE_DIR: str = Field('data/candles', env='ARCHIVE_DIR')
 
     @field_validator('ADMIN_IDS', mode='before')
     @classmethod
     def parse_admin_ids(cls, v):
+        if isinstance(v, str) and v.strip().startswith('['):
+            return json.loads(v)
         if isinstance(v, str):
             return [int(id.strip()) for id in v.split(',')]
         return v
     
-    @field_validator('ANALYSIS_INTERVALS', mode='before')
+    @field_validator('ANALYSIS_INTERVALS', 'TIER1_PAIRS', 'TIER2_PAIRS', mode='before')
     @classmethod
     def parse_intervals(cls, v):
+        if isinstance(v, str) and v.strip().startswith('['):
+            return json.loads(v)
         if isinstance(v, str):
-            return [interval.strip() for interval in v.split(',')]
+            return [interval.strip() for interval in v.split(',') if interval.strip()]
         return v
 
+    @property
+    def redis_url(self) -> str:
+        """Получить URL для подключения к Redis"""
+        password = f':{self.REDIS_PASSWORD}@' if self.REDIS_PASSWORD else ''
+        return f'redis://{password}{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}'
+
     @property
     def database_url(self) -> str:
         """Получить URL для подключения к БД"""
@@ -10,7 +10,6 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     AsyncEngine
 )
-from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 
 from src.config.settings import settings
@@ -28,8 +27,15 @@ class DatabaseManager:
         """Инициализация подключения к БД"""
         self.engine = create_async_engine(
             settings.database_url,
-            echo=settings.LOG_LEVEL,
-            poolcalss=NullPool
+            echo=settings.LOG_LEVEL == 'DEBUG',
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args={
+                # Кэш подготовленных выражений на каждое соединение пула
+                'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE
+            }
         )
         
         self.async_session_maker = async_sessionmaker(
@@ -10,18 +10,26 @@ from src.database.base import Base
 from src.database.models import TradingPair
 
 class MarketData(Base):
-    """Рыночные данные для анализа"""
+    """
+    Рыночные данные для анализа
+
+    Таблица секционирована по таймфрейму (LIST), каждая секция таймфрейма -
+    по месяцам (RANGE по timestamp). Месячные секции создает
+    MarketDataRepository.ensure_partitions, поэтому ключи секционирования
+    входят в первичный ключ.
+    """
     __tablename__ = 'market_data'
     __table_args__ = (
-        Index('idx_market_data_pair_timeframe', 'pair_id', 'timeframe', 'timestamp')
+        Index('idx_market_data_pair_timeframe', 'pair_id', 'timeframe', 'timestamp', unique=True),
+        {'postgresql_partition_by': 'LIST (timeframe)'}
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     pair_id: Mapped[int] = mapped_column(Integer, ForeignKey('trading_pairs.id'))
-    timeframe: Mapped[TimeFrame] = mapped_column(Enum(TimeFrame))
+    timeframe: Mapped[TimeFrame] = mapped_column(Enum(TimeFrame), primary_key=True)
 
     # OHLCV
-    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, index=True)
     open: Mapped[float] = mapped_column(Float)
     high: Mapped[float] = mapped_column(Float)
     low: Mapped[float] = mapped_column(Float)
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional, List
 
 from sqlalchemy import Integer, BigInteger, String, Float, Boolean, DateTime, JSON, ForeignKey, Enum
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 from sqlalchemy.sql import func
 
 from src.config.constants import SetupType, TradingSide
@@ -28,6 +28,7 @@ class Signal(Base):
 
     # Metadata
     confluence_factor: Mapped[List[str]] = mapped_column(JSON)
+    confluence_mask: Mapped[int] = mapped_column(BigInteger, default=0, server_default='0')
     message_id: Mapped[Optional[int]] = mapped_column(BigInteger)
     channel_id: Mapped[Optional[int]] = mapped_column(BigInteger)
 
@@ -38,4 +39,9 @@ class Signal(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    trade: Mapped[Optional['Trade']] = relationship(back_popultes='signals')
\ No newline at end of file
+    trade: Mapped[Optional['Trade']] = relationship(back_popultes='signals')
+
+    @validates('setup_type')
+    def validate_setup_type(self, key, value):
+        """Ключ сетапа (TradeSignal.setup_type) должен быть значением SetupType"""
+        return SetupType(value)
\ No newline at end of file
@@ -11,7 +11,7 @@ class Statistics(Base):
     """Статистика торговли"""
     __tablename__ = 'statistics'
     __table_args__ = (
-        Index('idx_statistics_user_period', 'user_id', 'period_type', 'period_start')
+        Index('idx_statistics_user_period', 'user_id', 'period_type', 'period_start'),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -51,6 +51,9 @@ class Statistics(Base):
     # By pairs
     stats_by_pair: Mapped[Optional[dict]] = mapped_column(JSON)
 
+    # Состояние StatisticsAccumulator для инкрементального обновления
+    accumulator_state: Mapped[Optional[dict]] = mapped_column(JSON)
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
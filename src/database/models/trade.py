@@ -50,6 +50,7 @@ class Trade(Base):
     # Confluence factor
     confluence_factor: Mapped[List[str]] = mapped_column(JSON)
     confluence_score: Mapped[int] = mapped_column(Integer)
+    confluence_mask: Mapped[int] = mapped_column(BigInteger, default=0, server_default='0')
 
     # Order IDs
     entry_order_id: Mapped[Optional[str]] = mapped_column(String(100))
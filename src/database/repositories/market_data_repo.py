@@ -0,0 +1,405 @@
+"""
+Репозиторий рыночных данных
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.constants import TIMEFRAME_SECONDS, TimeFrame
+from src.database.models import MarketData
+
+# Колонки, загружаемые через COPY (порядок полей записи)
+COPY_COLUMNS = (
+    'pair_id', 'timeframe', 'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'order_blocks', 'liquidity_zones', 'volume_profile', 'cvd', 'structure',
+)
+STAGE_TABLE = 'market_data_stage'
+
+# Временная таблица соединения; строки удаляются при commit
+CREATE_STAGE = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (
+    pair_id integer,
+    timeframe text,
+    timestamp timestamptz,
+    open double precision,
+    high double precision,
+    low double precision,
+    close double precision,
+    volume double precision,
+    order_blocks json,
+    liquidity_zones json,
+    volume_profile json,
+    cvd double precision,
+    structure text
+) ON COMMIT DELETE ROWS
+"""
+
+# Перенос из временной таблицы с upsert по (pair_id, timeframe, timestamp).
+# Индикаторы без значения в новой записи не затирают сохраненные.
+MERGE_STAGE = f"""
+INSERT INTO market_data (
+    pair_id, timeframe, timestamp, open, high, low, close, volume,
+    order_blocks, liquidity_zones, volume_profile, cvd, structure
+)
+SELECT
+    pair_id, timeframe::timeframe, timestamp, open, high, low, close, volume,
+    order_blocks, liquidity_zones, volume_profile, cvd, structure::marketstructure
+FROM {STAGE_TABLE}
+ON CONFLICT (pair_id, timeframe, timestamp) DO UPDATE SET
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume = EXCLUDED.volume,
+    order_blocks = COALESCE(EXCLUDED.order_blocks, market_data.order_blocks),
+    liquidity_zones = COALESCE(EXCLUDED.liquidity_zones, market_data.liquidity_zones),
+    volume_profile = COALESCE(EXCLUDED.volume_profile, market_data.volume_profile),
+    cvd = COALESCE(EXCLUDED.cvd, market_data.cvd),
+    structure = COALESCE(EXCLUDED.structure, market_data.structure)
+"""
+
+# Свертка свечей младшего таймфрейма в старший; существующие свечи не меняются
+ROLLUP = """
+INSERT INTO market_data (pair_id, timeframe, timestamp, open, high, low, close, volume)
+SELECT
+    pair_id,
+    CAST(:target AS timeframe),
+    bucket,
+    (array_agg(open ORDER BY timestamp))[1],
+    max(high),
+    min(low),
+    (array_agg(close ORDER BY timestamp DESC))[1],
+    sum(volume)
+FROM (
+    SELECT *, date_bin(CAST(:step AS interval), timestamp, TIMESTAMPTZ '1970-01-01 00:00:00+00') AS bucket
+    FROM market_data
+    WHERE timeframe = CAST(:source AS timeframe) AND timestamp >= :start AND timestamp < :end
+) source
+GROUP BY pair_id, bucket
+ON CONFLICT (pair_id, timeframe, timestamp) DO NOTHING
+"""
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца (UTC)"""
+    moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month: datetime) -> datetime:
+    """Начало следующего месяца"""
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def previous_month(month: datetime) -> datetime:
+    """Начало предыдущего месяца"""
+    return month.replace(year=month.year - (month.month == 1), month=(month.month - 2) % 12 + 1)
+
+
+def timeframe_partition(timeframe: TimeFrame) -> str:
+    """Имя секции таймфрейма"""
+    return f'market_data_{TimeFrame(timeframe).name.lower()}'
+
+
+def month_partition(timeframe: TimeFrame, month: datetime) -> str:
+    """Имя месячной секции таймфрейма"""
+    return f'{timeframe_partition(timeframe)}_{month:%Y_%m}'
+
+
+class MarketDataRepository:
+    """Репозиторий для работы с таблицей market_data"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_latest_ohlcv(
+        self,
+        pair_ids: List[int],
+        timeframes: List[TimeFrame],
+        limit: int
+    ) -> Dict[Tuple[int, TimeFrame], np.ndarray]:
+        """
+        Получить последние свечи для набора пар и таймфреймов одним запросом
+
+        Возвращаются только колонки OHLCV (без ORM-объектов), время
+        переводится в миллисекунды на стороне Postgres.
+
+        Args:
+            pair_ids: Идентификаторы торговых пар
+            timeframes: Таймфреймы
+            limit: Количество последних свечей на (пара, таймфрейм)
+
+        Returns:
+            Словарь (pair_id, timeframe) -> массив формы (n, 6)
+            [timestamp_ms, open, high, low, close, volume] по возрастанию времени
+        """
+        row_number = func.row_number().over(
+            partition_by=(MarketData.pair_id, MarketData.timeframe),
+            order_by=MarketData.timestamp.desc()
+        ).label('rn')
+
+        latest = (
+            select(
+                MarketData.pair_id,
+                MarketData.timeframe,
+                (func.extract('epoch', MarketData.timestamp) * 1000).label('ts'),
+                MarketData.open,
+                MarketData.high,
+                MarketData.low,
+                MarketData.close,
+                MarketData.volume,
+                row_number
+            )
+            .where(
+                MarketData.pair_id.in_(pair_ids),
+                MarketData.timeframe.in_(timeframes)
+            )
+            .subquery()
+        )
+
+        query = (
+            select(
+                latest.c.pair_id,
+                latest.c.timeframe,
+                latest.c.ts,
+                latest.c.open,
+                latest.c.high,
+                latest.c.low,
+                latest.c.close,
+                latest.c.volume
+            )
+            .where(latest.c.rn <= limit)
+            .order_by(latest.c.pair_id, latest.c.timeframe, latest.c.ts)
+        )
+
+        result = await self.session.execute(query)
+
+        grouped: Dict[Tuple[int, TimeFrame], list] = {}
+        for pair_id, timeframe, *ohlcv in result.tuples():
+            grouped.setdefault((pair_id, TimeFrame(timeframe)), []).append(ohlcv)
+
+        return {
+            key: np.asarray(rows, dtype=np.float64)
+            for key, rows in grouped.items()
+        }
+
+    async def get_ohlcv_range(
+        self,
+        pair_id: int,
+        timeframe: TimeFrame,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Получить свечи пары в диапазоне времени открытия [start, end)
+
+        Условия по timeframe и timestamp отсекают лишние секции таблицы,
+        читаются только месяцы из диапазона.
+
+        Args:
+            pair_id: Идентификатор торговой пары
+            timeframe: Таймфрейм
+            start, end: Границы диапазона (мс), None - без ограничения
+            limit: Максимум свечей (самые ранние из диапазона)
+
+        Returns:
+            Массив (n, 6) по возрастанию времени
+        """
+        ts = (func.extract('epoch', MarketData.timestamp) * 1000).label('ts')
+        query = (
+            select(ts, MarketData.open, MarketData.high, MarketData.low, MarketData.close, MarketData.volume)
+            .where(MarketData.pair_id == pair_id, MarketData.timeframe == timeframe)
+            .order_by(MarketData.timestamp)
+        )
+        if start is not None:
+            query = query.where(MarketData.timestamp >= ms_to_datetime(start))
+        if end is not None:
+            query = query.where(MarketData.timestamp < ms_to_datetime(end))
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await self.session.execute(query)
+        rows = result.all()
+        return np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+
+    async def get_last_timestamp(self, pair_id: int, timeframe: TimeFrame) -> Optional[int]:
+        """Время открытия (мс) последней свечи пары на таймфрейме"""
+        result = await self.session.execute(
+            select(func.extract('epoch', func.max(MarketData.timestamp)) * 1000)
+            .where(MarketData.pair_id == pair_id, MarketData.timeframe == timeframe)
+        )
+        last = result.scalar()
+        return int(last) if last is not None else None
+
+    async def insert_ohlcv(self, pair_id: int, timeframe: TimeFrame, rows: np.ndarray) -> int:
+        """
+        Записать свечи (только OHLCV) с upsert по времени
+
+        Args:
+            rows: Массив (n, 6): timestamp_ms, open, high, low, close, volume
+
+        Returns:
+            Количество записанных строк
+        """
+        return await self.copy_records(ohlcv_records(pair_id, timeframe, rows))
+
+    async def copy_records(self, records: Sequence[tuple]) -> int:
+        """
+        Массовая запись строк market_data через COPY во временную таблицу
+        и один INSERT ... ON CONFLICT
+
+        Выполняется в транзакции сессии; временная таблица очищается при commit.
+        Недостающие месячные секции создаются перед загрузкой.
+
+        Args:
+            records: Кортежи в порядке COPY_COLUMNS (timeframe/structure - имена
+                членов enum, JSON-поля - строки). Ключ (pair_id, timeframe,
+                timestamp) должен быть уникален в пределах вызова.
+
+        Returns:
+            Количество записанных строк
+        """
+        if not records:
+            return 0
+
+        months = {(record[1], record[2].year, record[2].month) for record in records}
+        for name, year, month in months:
+            start = datetime(year, month, 1, tzinfo=timezone.utc)
+            await self.ensure_partitions(TimeFrame[name], start, start)
+
+        # Выражение через сессию открывает транзакцию до обращения к драйверу
+        await self.session.execute(text(CREATE_STAGE))
+        connection = await self.session.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGE_TABLE, records=records, columns=COPY_COLUMNS
+        )
+        await self.session.execute(text(MERGE_STAGE))
+        await self.session.execute(text(f'TRUNCATE {STAGE_TABLE}'))
+        return len(records)
+
+    async def ensure_partitions(self, timeframe: TimeFrame, start: datetime, end: datetime) -> List[str]:
+        """
+        Создать секции таймфрейма за месяцы с start по end включительно
+
+        Returns:
+            Имена созданных (или уже существовавших) месячных секций
+        """
+        timeframe = TimeFrame(timeframe)
+        parent = timeframe_partition(timeframe)
+        await self.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {parent} PARTITION OF market_data "
+            f"FOR VALUES IN ('{timeframe.name}') PARTITION BY RANGE (timestamp)"
+        ))
+
+        names = []
+        month, last = month_start(start), month_start(end)
+        while month <= last:
+            name = month_partition(timeframe, month)
+            await self.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            ))
+            names.append(name)
+            month = next_month(month)
+        return names
+
+    async def list_partitions(self, timeframe: TimeFrame) -> List[datetime]:
+        """Месяцы, для которых существуют секции таймфрейма (по возрастанию)"""
+        parent = timeframe_partition(timeframe)
+        result = await self.session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :parent"
+            ),
+            {'parent': parent}
+        )
+        months = []
+        for name in result.scalars():
+            year, month = name[len(parent) + 1:].split('_')
+            months.append(datetime(int(year), int(month), 1, tzinfo=timezone.utc))
+        return sorted(months)
+
+    async def drop_partitions(self, timeframe: TimeFrame, before: datetime) -> List[str]:
+        """
+        Удалить месячные секции таймфрейма, целиком лежащие раньше before
+
+        Секция отсоединяется и удаляется целиком - без DELETE построчно и
+        без последующего VACUUM.
+
+        Returns:
+            Имена удаленных секций
+        """
+        timeframe = TimeFrame(timeframe)
+        parent = timeframe_partition(timeframe)
+        dropped = []
+        for month in await self.list_partitions(timeframe):
+            if next_month(month) > before:
+                break
+            name = month_partition(timeframe, month)
+            await self.session.execute(text(f'ALTER TABLE {parent} DETACH PARTITION {name}'))
+            await self.session.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+        return dropped
+
+    async def rollup(
+        self,
+        source: TimeFrame,
+        targets: Iterable[TimeFrame],
+        start: datetime,
+        end: datetime
+    ) -> Dict[TimeFrame, int]:
+        """
+        Свернуть свечи source за [start, end) в старшие таймфреймы
+
+        Уже существующие свечи целевых таймфреймов (например, загруженные
+        с биржи) не перезаписываются.
+
+        Returns:
+            Количество добавленных свечей по таймфреймам
+        """
+        source = TimeFrame(source)
+        added = {}
+        for target in map(TimeFrame, targets):
+            await self.ensure_partitions(target, start, max(start, end - timedelta(microseconds=1)))
+            result = await self.session.execute(text(ROLLUP), {
+                'source': source.name,
+                'target': target.name,
+                'step': timedelta(seconds=TIMEFRAME_SECONDS[target]),
+                'start': start,
+                'end': end,
+            })
+            added[target] = result.rowcount
+        return added
+
+
+def ohlcv_records(pair_id: int, timeframe: TimeFrame, rows: np.ndarray) -> List[tuple]:
+    """
+    Записи для copy_records из массива свечей (n, 6)
+
+    Дубликаты по времени схлопываются (остается последняя свеча).
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    if not len(rows):
+        return []
+
+    # Последнее вхождение каждого времени в порядке возрастания
+    reversed_ts = rows[::-1, 0]
+    _, first = np.unique(reversed_ts, return_index=True)
+    rows = rows[len(rows) - 1 - first]
+
+    name = TimeFrame(timeframe).name
+    return [
+        (pair_id, name, ms_to_datetime(timestamp), open, high, low, close, volume, None, None, None, None, None)
+        for timestamp, open, high, low, close, volume in rows.tolist()
+    ]
+
+
+def ms_to_datetime(timestamp: float) -> datetime:
+    """Миллисекунды UTC -> datetime"""
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
@@ -0,0 +1,162 @@
+"""
+Буферизованная запись рыночных данных
+
+Свечи и снимки индикаторов накапливаются в памяти и сбрасываются в
+market_data пачками через COPY + upsert (MarketDataRepository.copy_records):
+одна транзакция и один INSERT на пачку вместо строки на свечу.
+"""
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from loguru import logger
+
+from src.config.constants import MarketStructure, TimeFrame
+from src.config.settings import settings
+from src.database.repositories.market_data_repo import MarketDataRepository, ms_to_datetime, ohlcv_records
+
+SnapshotKey = Tuple[int, TimeFrame, int]
+
+
+def _json(value: Any) -> Optional[str]:
+    return orjson.dumps(value).decode() if value is not None else None
+
+
+class MarketDataWriter:
+    """Буфер записи свечей и снимков индикаторов в market_data"""
+
+    def __init__(self, session_factory: Callable, batch_size: Optional[int] = None):
+        """
+        Args:
+            session_factory: Контекстный менеджер сессии (db_manager.session)
+            batch_size: Строк в буфере, при котором выполняется сброс
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        self._candles: Dict[Tuple[int, TimeFrame], List[np.ndarray]] = {}
+        self._snapshots: Dict[SnapshotKey, tuple] = {}
+        self._pending = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._pending
+
+    async def add_candles(self, pair_id: int, timeframe: TimeFrame, rows: np.ndarray):
+        """
+        Добавить закрытые свечи (n, 6) в буфер
+
+        Сброс выполняется, когда буфер достигает batch_size.
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        if not len(rows):
+            return
+        self._candles.setdefault((pair_id, TimeFrame(timeframe)), []).append(rows)
+        self._pending += len(rows)
+        if self._pending >= self.batch_size:
+            await self.flush()
+
+    async def add_snapshot(
+        self,
+        pair_id: int,
+        timeframe: TimeFrame,
+        candle: np.ndarray,
+        order_blocks: Optional[List[dict]] = None,
+        liquidity_zones: Optional[List[dict]] = None,
+        volume_profile: Optional[dict] = None,
+        cvd: Optional[float] = None,
+        structure: Optional[MarketStructure] = None
+    ):
+        """
+        Добавить снимок индикаторов на закрытии свечи
+
+        Args:
+            candle: Свеча снимка [timestamp_ms, open, high, low, close, volume]
+            order_blocks, liquidity_zones, volume_profile: JSON-совместимые данные
+            cvd: Значение CVD
+            structure: Структура рынка
+        """
+        timeframe = TimeFrame(timeframe)
+        timestamp, open, high, low, close, volume = np.asarray(candle, dtype=np.float64).tolist()
+        key = (pair_id, timeframe, int(timestamp))
+        if key not in self._snapshots:
+            self._pending += 1
+        self._snapshots[key] = (
+            pair_id, timeframe.name, ms_to_datetime(timestamp), open, high, low, close, volume,
+            _json(order_blocks), _json(liquidity_zones), _json(volume_profile), cvd,
+            MarketStructure(structure).name if structure is not None else None,
+        )
+        if self._pending >= self.batch_size:
+            await self.flush()
+
+    @staticmethod
+    def _records(candles: Dict[Tuple[int, TimeFrame], List[np.ndarray]], snapshots: Dict[SnapshotKey, tuple]) -> List[tuple]:
+        """Записи COPY для содержимого буфера"""
+        records = []
+        for (pair_id, timeframe), chunks in candles.items():
+            rows = np.concatenate(chunks)
+            # Ключ записи уникален в пачке: для повторов свечи берется последняя версия
+            _, last = np.unique(rows[::-1, 0], return_index=True)
+            rows = rows[::-1][last]
+            # Снимок содержит ту же свечу и индикаторы - он заменяет запись свечи
+            covered = [key[2] for key in snapshots if key[:2] == (pair_id, timeframe)]
+            if covered:
+                rows = rows[~np.isin(rows[:, 0], covered)]
+            records.extend(ohlcv_records(pair_id, timeframe, rows))
+        records.extend(snapshots.values())
+        return records
+
+    def _restore(self, candles: Dict[Tuple[int, TimeFrame], List[np.ndarray]], snapshots: Dict[SnapshotKey, tuple]):
+        """Вернуть в буфер незаписанную пачку (данные, добавленные после нее, новее)"""
+        for key, chunks in candles.items():
+            self._candles[key] = chunks + self._candles.get(key, [])
+        self._snapshots = {**snapshots, **self._snapshots}
+        self._pending = sum(len(rows) for chunks in self._candles.values() for rows in chunks) + len(self._snapshots)
+
+    async def flush(self) -> int:
+        """
+        Записать буфер в базу
+
+        Буфер освобождается только после успешной записи: при ошибке пачка
+        возвращается в буфер и будет записана следующим сбросом.
+
+        Returns:
+            Количество записанных строк
+        """
+        async with self._lock:
+            candles, snapshots = self._candles, self._snapshots
+            self._candles, self._snapshots, self._pending = {}, {}, 0
+            records = self._records(candles, snapshots)
+            if not records:
+                return 0
+            try:
+                async with self.session_factory() as session:
+                    return await MarketDataRepository(session).copy_records(records)
+            except BaseException:
+                self._restore(candles, snapshots)
+                raise
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f'Market data flush failed: {e!r}')
+
+    def start(self, interval: float = 5.0):
+        """Запустить периодический сброс буфера"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def close(self):
+        """Остановить периодический сброс и записать остаток"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,60 @@
+"""
+Репозиторий торговых пар
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import TradingPair
+
+# Колонки метрик пары, обновляемые update_metrics
+METRIC_COLUMNS = ('daily_volatility', 'weekly_volatility', 'average_volume', 'tier')
+
+
+class PairRepository:
+    """Репозиторий для работы с таблицей trading_pairs"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_active(self) -> List[TradingPair]:
+        """Активные торговые пары"""
+        result = await self.session.execute(select(TradingPair).where(TradingPair.is_active.is_(True)))
+        return list(result.scalars())
+
+    async def get_ids(self, symbols: Sequence[str]) -> Dict[str, int]:
+        """Идентификаторы пар по символам"""
+        if not symbols:
+            return {}
+        result = await self.session.execute(
+            select(TradingPair.symbol, TradingPair.id).where(TradingPair.symbol.in_(list(symbols)))
+        )
+        return dict(result.tuples().all())
+
+    async def update_metrics(self, rows: Sequence[dict]) -> int:
+        """
+        Обновить метрики волатильности пар пачкой
+
+        Выполняется одним executemany UPDATE ... WHERE symbol = :symbol.
+
+        Args:
+            rows: symbol и значения METRIC_COLUMNS
+
+        Returns:
+            Количество строк в пачке
+        """
+        if not rows:
+            return 0
+        statement = (
+            update(TradingPair)
+            .where(TradingPair.symbol == bindparam('row_symbol'))
+            .values({column: bindparam(f'row_{column}') for column in METRIC_COLUMNS})
+        )
+        # Через Connection: ORM-режим пачки по первичному ключу не допускает WHERE
+        connection = await self.session.connection()
+        await connection.execute(statement, [
+            {'row_symbol': row['symbol'], **{f'row_{column}': row[column] for column in METRIC_COLUMNS}}
+            for row in rows
+        ])
+        return len(rows)
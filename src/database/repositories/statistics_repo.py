@@ -0,0 +1,61 @@
+"""
+Репозиторий статистики
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Statistics
+
+
+class StatisticsRepository:
+    """Репозиторий для работы с таблицей statistics"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_latest(self, user_id: int) -> List[Statistics]:
+        """Последняя строка каждого period_type пользователя"""
+        result = await self.session.execute(
+            select(Statistics)
+            .where(Statistics.user_id == user_id)
+            .distinct(Statistics.period_type)
+            .order_by(Statistics.period_type, Statistics.period_start.desc())
+        )
+        return list(result.scalars())
+
+    async def save_periods(self, user_id: int, rows: Sequence[dict]) -> int:
+        """
+        Сохранить строки периодов (StatisticsTracker.pop_dirty)
+
+        Существующие строки (user_id, period_type, period_start) обновляются,
+        остальные добавляются. all_time хранится одной строкой на пользователя.
+
+        Returns:
+            Количество сохраненных строк
+        """
+        if not rows:
+            return 0
+
+        keys = [(row['period_type'], row['period_start']) for row in rows if row['period_type'] != 'all_time']
+        query = select(Statistics).where(Statistics.user_id == user_id)
+        existing: Dict[tuple, Statistics] = {}
+        if keys:
+            result = await self.session.execute(
+                query.where(tuple_(Statistics.period_type, Statistics.period_start).in_(keys))
+            )
+            existing.update({(row.period_type, row.period_start): row for row in result.scalars()})
+        if any(row['period_type'] == 'all_time' for row in rows):
+            result = await self.session.execute(query.where(Statistics.period_type == 'all_time'))
+            existing.update({('all_time', None): row for row in result.scalars()})
+
+        for values in rows:
+            key = (values['period_type'], None if values['period_type'] == 'all_time' else values['period_start'])
+            statistics = existing.get(key)
+            if statistics is None:
+                self.session.add(Statistics(user_id=user_id, **values))
+            else:
+                for name, value in values.items():
+                    setattr(statistics, name, value)
+        return len(rows)
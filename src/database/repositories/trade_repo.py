@@ -0,0 +1,134 @@
+"""
+Репозиторий сделок
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.constants import PositionStatus
+from src.database.models import Trade, TradingPair
+from src.strategy import confluence
+
+
+class TradeRepository:
+    """Репозиторий для работы с таблицей trades"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_many(self, trades: Sequence[dict]) -> int:
+        """
+        Вставить сделки пачкой
+
+        Выполняется одним executemany (SQLAlchemy группирует строки в
+        многострочные INSERT), без создания ORM-объектов.
+
+        Args:
+            trades: Значения колонок Trade
+
+        Returns:
+            Количество вставленных сделок
+        """
+        if not trades:
+            return 0
+        await self.session.execute(insert(Trade), list(trades))
+        return len(trades)
+
+    async def add_many_returning_ids(self, trades: Sequence[dict]) -> List[int]:
+        """Вставить сделки пачкой и вернуть их id в порядке trades"""
+        if not trades:
+            return []
+        result = await self.session.execute(
+            insert(Trade).returning(Trade.id, sort_by_parameter_order=True),
+            list(trades)
+        )
+        return list(result.scalars())
+
+    async def update_many(self, rows: Sequence[dict]) -> int:
+        """
+        Обновить сделки пачкой по первичному ключу
+
+        Args:
+            rows: Значения колонок Trade, обязательно с id
+
+        Returns:
+            Количество обновленных сделок
+        """
+        if not rows:
+            return 0
+        await self.session.execute(update(Trade), list(rows))
+        return len(rows)
+
+    async def get_closed_trade_arrays(self, user_id: int) -> Dict[str, np.ndarray]:
+        """
+        Закрытые сделки пользователя колонками в порядке закрытия
+
+        Формат совпадает с аргументами calculate_statistics: pnl, pnl_percent,
+        commission, rr (фактический результат в R), exit_time (мс), setup, pair.
+        """
+        result = await self.session.execute(
+            select(
+                Trade.pnl_amoun,
+                Trade.pnl_percent,
+                Trade.commision,
+                Trade.pnl_amoun / func.nullif(Trade.risk_amount, 0),
+                func.extract('epoch', Trade.exit_time) * 1000,
+                Trade.status_type,
+                TradingPair.symbol
+            )
+            .join(TradingPair, TradingPair.id == Trade.pair_id)
+            .where(Trade.user_id == user_id, Trade.status == PositionStatus.CLOSED)
+            .order_by(Trade.exit_time, Trade.id)
+        )
+        rows = result.all()
+        columns = list(zip(*rows)) if rows else [()] * 7
+        numeric = [np.asarray(column, dtype=np.float64) for column in columns[:5]]
+        return {
+            'pnl': np.nan_to_num(numeric[0]),
+            'pnl_percent': np.nan_to_num(numeric[1]),
+            'commission': np.nan_to_num(numeric[2]),
+            'rr': np.nan_to_num(numeric[3]),
+            'exit_time': numeric[4].astype(np.int64),
+            'setup': np.array([setup.value for setup in columns[5]], dtype='U32'),
+            'pair': np.array(columns[6], dtype='U20'),
+        }
+
+    async def get_confluence_arrays(self, user_id: int) -> Dict[str, np.ndarray]:
+        """
+        Маски факторов и PnL закрытых сделок пользователя
+
+        Для confluence.win_rate / confluence.factor_win_rates.
+        """
+        result = await self.session.execute(
+            select(Trade.confluence_mask, Trade.pnl_amoun)
+            .where(Trade.user_id == user_id, Trade.status == PositionStatus.CLOSED)
+        )
+        rows = result.all()
+        masks, pnl = zip(*rows) if rows else ((), ())
+        return {
+            'mask': np.asarray(masks, dtype=np.int64),
+            'pnl': np.nan_to_num(np.asarray(pnl, dtype=np.float64)),
+        }
+
+    async def win_rate_by_factors(self, user_id: int, names: Iterable[str]) -> Tuple[int, Optional[float]]:
+        """
+        Win rate закрытых сделок, у которых есть все факторы names
+
+        Отбор выполняется в БД по маске: confluence_mask & required = required.
+
+        Returns:
+            (количество сделок, win rate в % или None без сделок)
+        """
+        required = confluence.encode(names)
+        result = await self.session.execute(
+            select(func.count(), func.count().filter(Trade.pnl_amoun > 0))
+            .where(
+                Trade.user_id == user_id,
+                Trade.status == PositionStatus.CLOSED,
+                Trade.confluence_mask.op('&')(required) == required
+            )
+        )
+        total, wins = result.one()
+        return total, wins / total * 100 if total else None
@@ -0,0 +1,98 @@
+"""
+Поток данных аккаунта BingX (WebSocket по listenKey)
+
+События исполнения ордеров (ORDER_TRADE_UPDATE) и изменения баланса и
+позиций (ACCOUNT_UPDATE) передаются подписчикам сразу после получения,
+без опроса REST. listenKey продлевается каждые LISTEN_KEY_REFRESH секунд,
+при обрыве соединения создается заново.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import websockets
+from loguru import logger
+
+from src.exchange.bingx_client import BingXClient
+from src.exchange.market_stream import MAX_RECONNECT_DELAY, RECONNECT_DELAY, WS_URL, decode_message
+
+# Период продления listenKey (секунды)
+LISTEN_KEY_REFRESH = 30 * 60
+
+OrderHandler = Callable[[dict], Awaitable[None]]
+AccountHandler = Callable[[dict], Awaitable[None]]
+
+
+class AccountStream:
+    """Поток событий аккаунта"""
+
+    def __init__(self, client: BingXClient, url: str = WS_URL):
+        self.client = client
+        self.url = url
+        self._order_handlers: List[OrderHandler] = []
+        self._account_handlers: List[AccountHandler] = []
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    def on_order(self, handler: OrderHandler):
+        """Подписаться на обновления ордеров (поле o события ORDER_TRADE_UPDATE)"""
+        self._order_handlers.append(handler)
+
+    def on_account(self, handler: AccountHandler):
+        """Подписаться на обновления баланса и позиций (поле a события ACCOUNT_UPDATE)"""
+        self._account_handlers.append(handler)
+
+    async def start(self):
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _keep_alive(self, listen_key: str):
+        while True:
+            await asyncio.sleep(LISTEN_KEY_REFRESH)
+            try:
+                await self.client.extend_listen_key(listen_key)
+            except Exception as e:
+                logger.warning(f'Failed to extend listen key: {e!r}')
+
+    async def _run(self):
+        delay = RECONNECT_DELAY
+        while self._running:
+            keep_alive = None
+            try:
+                listen_key = await self.client.create_listen_key()
+                keep_alive = asyncio.create_task(self._keep_alive(listen_key))
+                async with websockets.connect(f'{self.url}?listenKey={listen_key}', ping_interval=None) as ws:
+                    delay = RECONNECT_DELAY
+                    async for message in ws:
+                        data = decode_message(message)
+                        if data is None:
+                            await ws.send('Pong')
+                            continue
+                        await self._dispatch(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Account stream connection lost: {e!r}, reconnecting in {delay:.0f}s')
+            finally:
+                if keep_alive is not None:
+                    keep_alive.cancel()
+
+            if not self._running:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _dispatch(self, event: dict):
+        kind = event.get('e')
+        if kind == 'ORDER_TRADE_UPDATE':
+            for handler in self._order_handlers:
+                await handler(event.get('o') or {})
+        elif kind == 'ACCOUNT_UPDATE':
+            for handler in self._account_handlers:
+                await handler(event.get('a') or {})
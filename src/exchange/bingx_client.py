@@ -0,0 +1,360 @@
+"""
+Асинхронный клиент BingX (perpetual swap API)
+
+- одна общая aiohttp.ClientSession с keep-alive, кэшем DNS и лимитом соединений
+- token bucket на каждую группу лимитов BingX с учетом веса эндпоинта
+- одинаковые GET-запросы, выполняющиеся одновременно, объединяются в один
+- подпись HMAC-SHA256 от заранее подготовленного объекта hmac (copy + update)
+- параметры контрактов кэшируются в Cache (L1 + Redis), если он передан
+"""
+import asyncio
+import hashlib
+import hmac
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiohttp
+import numpy as np
+import orjson
+from loguru import logger
+
+from src.config.settings import settings
+from src.exchange.exceptions import (
+    BingXAPIError,
+    ExchangeConnectionError,
+    RateLimitError,
+)
+from src.utils.cache import Cache, contracts_key
+
+# Лимиты групп эндпоинтов: (вес, секунды)
+RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    'market': (100, 10.0),
+    'account': (100, 10.0),
+    'trade': (20, 1.0),
+}
+
+# Группа лимита и вес эндпоинта
+ENDPOINTS: Dict[str, Tuple[str, int]] = {
+    '/openApi/swap/v3/quote/klines': ('market', 1),
+    '/openApi/swap/v2/quote/contracts': ('market', 1),
+    '/openApi/swap/v2/quote/depth': ('market', 1),
+    '/openApi/swap/v2/quote/price': ('market', 1),
+    '/openApi/swap/v2/user/balance': ('account', 1),
+    '/openApi/swap/v2/user/positions': ('account', 1),
+    '/openApi/swap/v2/trade/openOrders': ('account', 1),
+    '/openApi/swap/v2/trade/order': ('trade', 1),
+    '/openApi/swap/v2/trade/batchOrders': ('trade', 5),
+    '/openApi/swap/v2/trade/leverage': ('trade', 1),
+    '/openApi/swap/v2/trade/closePosition': ('trade', 1),
+    '/openApi/user/auth/userDataStream': ('account', 1),
+}
+
+# Коды ответов BingX, означающие превышение лимита
+RATE_LIMIT_CODES = {100410, 100429}
+
+# Параметры пула соединений
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 32
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 10
+
+
+class TokenBucket:
+    """Token bucket: capacity токенов, восполняемых за period секунд"""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, weight: int = 1):
+        """Дождаться и списать weight токенов (ожидающие обслуживаются по очереди)"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                await asyncio.sleep((weight - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Обнулить бюджет так, чтобы он восстановился не раньше чем через seconds"""
+        self._refill()
+        self._tokens = -seconds * self.rate
+
+
+class BingXClient:
+    """Клиент BingX"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        rate_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+        cache: Optional[Cache] = None
+    ):
+        """
+        Args:
+            api_key: API ключ (по умолчанию из настроек)
+            secret_key: Секретный ключ (по умолчанию из настроек)
+            base_url: Базовый URL API
+            rate_limits: Лимиты групп эндпоинтов
+            cache: Кэш редко меняющихся ответов (None - без кэша)
+        """
+        self.api_key = api_key or settings.BINGX_API_KEY
+        self.base_url = (base_url or settings.BINGX_BASE_URL).rstrip('/')
+        self._hmac = hmac.new((secret_key or settings.BINGX_SECRET_KEY).encode(), digestmod=hashlib.sha256)
+        self._buckets = {
+            group: TokenBucket(capacity, period)
+            for group, (capacity, period) in (rate_limits or RATE_LIMITS).items()
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.cache = cache
+
+    async def __aenter__(self) -> 'BingXClient':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Общая сессия (создается при первом обращении)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                headers={'X-BX-APIKEY': self.api_key}
+            )
+        return self._session
+
+    async def close(self):
+        """Закрыть сессию"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def _query(self, params: Dict[str, Any], signed: bool) -> str:
+        """Собрать строку запроса (с подписью для приватных эндпоинтов)"""
+        if signed:
+            params = {**params, 'timestamp': int(time.time() * 1000)}
+        raw = '&'.join(f'{key}={value}' for key, value in params.items())
+        query = '&'.join(f'{key}={quote(str(value), safe="")}' for key, value in params.items())
+        if signed:
+            signer = self._hmac.copy()
+            signer.update(raw.encode())
+            query = f'{query}&signature={signer.hexdigest()}' if query else f'signature={signer.hexdigest()}'
+        return query
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False
+    ) -> Any:
+        """
+        Выполнить запрос к API
+
+        Одновременные GET-запросы с одинаковыми параметрами выполняются
+        один раз, остальные вызывающие получают тот же результат. Запрос
+        выполняется отдельной задачей: отмена одного из вызывающих (в том
+        числе первого) не отменяет его для остальных.
+
+        Returns:
+            Поле data ответа
+        """
+        params = {key: value for key, value in sorted((params or {}).items()) if value is not None}
+        if method != 'GET':
+            return await self._send(method, path, params, signed)
+
+        key = (path, signed, tuple(params.items()))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send(method, path, params, signed))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._request_done(key, done))
+        return await asyncio.shield(task)
+
+    def _request_done(self, key: tuple, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # ошибка передана ожидающим (или никто уже не ждет), не логируем как потерянную
+
+    async def _send(self, method: str, path: str, params: Dict[str, Any], signed: bool) -> Any:
+        group, weight = ENDPOINTS.get(path, ('market', 1))
+        bucket = self._buckets[group]
+        await bucket.acquire(weight)
+
+        url = f'{self.base_url}{path}?{self._query(params, signed)}'
+        try:
+            async with self.session.request(method, url) as response:
+                if response.status in (418, 429):
+                    retry_after = float(response.headers.get('Retry-After', 1))
+                    bucket.pause(retry_after)
+                    logger.warning(f'BingX rate limit on {path}, pausing {group} for {retry_after}s')
+                    raise RateLimitError(response.status, 'HTTP rate limit', path, retry_after)
+                status = response.status
+                body = await response.read()
+        except aiohttp.ClientError as e:
+            raise ExchangeConnectionError(f'{method} {path}: {e!r}') from e
+        except asyncio.TimeoutError as e:
+            raise ExchangeConnectionError(f'{method} {path}: timeout') from e
+
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict):
+            # Страница шлюза (502 и т.п.): исход запроса неизвестен, как при разрыве соединения
+            message = f'{method} {path}: HTTP {status}, non-JSON response {body[:100]!r}'
+            if status >= 500:
+                raise ExchangeConnectionError(message)
+            raise BingXAPIError(status, message, path)
+        code = int(data.get('code', 0))
+        if code in RATE_LIMIT_CODES:
+            bucket.pause(1.0)
+            raise RateLimitError(code, data.get('msg', ''), path)
+        if code != 0:
+            raise BingXAPIError(code, data.get('msg', ''), path)
+        return data.get('data')
+
+    # Market data
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int = 500,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Получить свечи
+
+        Returns:
+            Массив (n, 6): timestamp, open, high, low, close, volume по возрастанию времени
+        """
+        data = await self.request('GET', '/openApi/swap/v3/quote/klines', {
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit,
+            'startTime': start_time,
+            'endTime': end_time,
+        })
+        rows = np.array(
+            [(k['time'], k['open'], k['high'], k['low'], k['close'], k['volume']) for k in data or ()],
+            dtype=np.float64
+        ).reshape(-1, 6)
+        return rows[np.argsort(rows[:, 0], kind='stable')]
+
+    async def get_contracts(self) -> List[dict]:
+        """Параметры контрактов (шаг цены, минимальный объем и т.д.)"""
+        if self.cache is None:
+            return await self.request('GET', '/openApi/swap/v2/quote/contracts')
+        return await self.cache.get_or_set(
+            contracts_key(),
+            lambda: self.request('GET', '/openApi/swap/v2/quote/contracts'),
+            kind='contracts'
+        )
+
+    async def get_depth(self, symbol: str, limit: int = 100) -> dict:
+        """Снимок стакана"""
+        return await self.request('GET', '/openApi/swap/v2/quote/depth', {'symbol': symbol, 'limit': limit})
+
+    async def get_price(self, symbol: Optional[str] = None) -> Any:
+        """Последняя цена пары (или всех пар)"""
+        return await self.request('GET', '/openApi/swap/v2/quote/price', {'symbol': symbol})
+
+    # Account
+
+    async def get_balance(self) -> dict:
+        """Баланс фьючерсного счета"""
+        return await self.request('GET', '/openApi/swap/v2/user/balance', signed=True)
+
+    async def get_positions(self, symbol: Optional[str] = None) -> List[dict]:
+        """Открытые позиции"""
+        return await self.request('GET', '/openApi/swap/v2/user/positions', {'symbol': symbol}, signed=True)
+
+    async def get_open_orders(self, symbol: Optional[str] = None) -> dict:
+        """Открытые ордера"""
+        return await self.request('GET', '/openApi/swap/v2/trade/openOrders', {'symbol': symbol}, signed=True)
+
+    async def create_listen_key(self) -> str:
+        """Получить listenKey для потока данных аккаунта"""
+        response = await self.request('POST', '/openApi/user/auth/userDataStream')
+        return (response or {}).get('listenKey', '')
+
+    async def extend_listen_key(self, listen_key: str):
+        """Продлить действие listenKey (истекает через час без продления)"""
+        await self.request('PUT', '/openApi/user/auth/userDataStream', {'listenKey': listen_key})
+
+    # Trading
+
+    async def set_leverage(self, symbol: str, side: str, leverage: int) -> dict:
+        """Установить плечо (side: LONG/SHORT)"""
+        return await self.request('POST', '/openApi/swap/v2/trade/leverage', {
+            'symbol': symbol,
+            'side': side,
+            'leverage': leverage,
+        }, signed=True)
+
+    async def place_order(self, **params) -> dict:
+        """Разместить ордер (параметры в формате BingX)"""
+        return await self.request('POST', '/openApi/swap/v2/trade/order', params, signed=True)
+
+    async def place_batch_orders(self, orders: List[Dict[str, Any]]) -> dict:
+        """Разместить несколько ордеров одним запросом"""
+        return await self.request('POST', '/openApi/swap/v2/trade/batchOrders', {
+            'batchOrders': orjson.dumps(orders).decode(),
+        }, signed=True)
+
+    async def cancel_order(
+        self,
+        symbol: str,
+        order_id: Optional[str] = None,
+        client_order_id: Optional[str] = None
+    ) -> dict:
+        """Отменить ордер по id биржи или clientOrderID"""
+        return await self.request('DELETE', '/openApi/swap/v2/trade/order', {
+            'symbol': symbol,
+            'orderId': order_id,
+            'clientOrderID': client_order_id,
+        }, signed=True)
+
+    async def get_order(
+        self,
+        symbol: str,
+        order_id: Optional[str] = None,
+        client_order_id: Optional[str] = None
+    ) -> dict:
+        """Получить ордер по id биржи или clientOrderID"""
+        return await self.request('GET', '/openApi/swap/v2/trade/order', {
+            'symbol': symbol,
+            'orderId': order_id,
+            'clientOrderID': client_order_id,
+        }, signed=True)
+
+    async def close_position(self, position_id: str) -> dict:
+        """Закрыть позицию по рынку"""
+        return await self.request('POST', '/openApi/swap/v2/trade/closePosition', {
+            'positionId': position_id,
+        }, signed=True)
@@ -0,0 +1,30 @@
+"""
+Исключения модуля работы с биржей
+"""
+from typing import Optional
+
+
+class ExchangeError(Exception):
+    """Базовая ошибка биржи"""
+
+
+class ExchangeConnectionError(ExchangeError):
+    """Сетевая ошибка или таймаут при обращении к бирже"""
+
+
+class BingXAPIError(ExchangeError):
+    """Ошибка, возвращенная API BingX"""
+
+    def __init__(self, code: int, message: str, path: Optional[str] = None):
+        self.code = code
+        self.message = message
+        self.path = path
+        super().__init__(f'BingX API error {code} on {path}: {message}')
+
+
+class RateLimitError(BingXAPIError):
+    """Превышен лимит запросов"""
+
+    def __init__(self, code: int, message: str, path: Optional[str] = None, retry_after: Optional[float] = None):
+        super().__init__(code, message, path)
+        self.retry_after = retry_after
@@ -0,0 +1,239 @@
+"""
+Потоковые рыночные данные BingX (WebSocket)
+
+Подписки на свечи, сделки и стакан всех пар распределяются по небольшому
+числу соединений. Сообщения BingX приходят сжатыми gzip и декодируются
+orjson. Закрытая свеча определяется по приходу следующей свечи того же
+потока и сразу записывается в CandleStore и передается подписчикам.
+После переподключения пропущенные свечи догружаются через REST.
+"""
+import asyncio
+import gzip
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+import websockets
+from loguru import logger
+
+from src.config.constants import TIMEFRAME_SECONDS, TimeFrame
+from src.analysis.candle_store import Candle, CandleStore
+from src.exchange.bingx_client import BingXClient
+
+WS_URL = 'wss://open-api-swap.bingx.com/swap-market'
+
+# Максимум подписок в одном соединении
+STREAMS_PER_CONNECTION = 200
+# Задержки переподключения (секунды)
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+# Глубина стакана в потоке depth
+DEPTH_LEVELS = 20
+# Свечей в одном запросе догрузки после разрыва
+BACKFILL_LIMIT = 1000
+
+CandleHandler = Callable[[str, TimeFrame, Candle], Awaitable[None]]
+TradesHandler = Callable[[str, List[dict]], Awaitable[None]]
+DepthHandler = Callable[[str, dict], Awaitable[None]]
+
+
+def decode_message(message) -> Optional[dict]:
+    """
+    Декодировать сообщение BingX
+
+    Returns:
+        Словарь сообщения или None для служебного Ping
+    """
+    if isinstance(message, bytes):
+        message = gzip.decompress(message)
+    if message in (b'Ping', 'Ping'):
+        return None
+    return orjson.loads(message)
+
+
+class MarketDataStream:
+    """Менеджер потоков рыночных данных"""
+
+    def __init__(
+        self,
+        client: BingXClient,
+        store: CandleStore,
+        pairs: Sequence[str],
+        timeframes: Sequence[TimeFrame],
+        trades: bool = True,
+        depth: bool = True,
+        incremental_depth: bool = False,
+        url: str = WS_URL,
+        streams_per_connection: int = STREAMS_PER_CONNECTION
+    ):
+        """
+        Args:
+            client: REST-клиент для догрузки пропущенных свечей
+            store: Хранилище свечей
+            pairs: Символы пар
+            timeframes: Таймфреймы свечей
+            trades: Подписаться на сделки
+            depth: Подписаться на стакан
+            incremental_depth: Изменения стакана (incrDepth) вместо снимков
+                DEPTH_LEVELS уровней - для OrderBookManager
+            url: Адрес WebSocket API
+            streams_per_connection: Максимум подписок на соединение
+        """
+        self.client = client
+        self.store = store
+        self.url = url
+        self.timeframes = [TimeFrame(tf) for tf in timeframes]
+
+        self.streams: List[str] = []
+        for pair in pairs:
+            self.streams.extend(f'{pair}@kline_{tf.value}' for tf in self.timeframes)
+            if trades:
+                self.streams.append(f'{pair}@trade')
+            if depth:
+                self.streams.append(f'{pair}@incrDepth' if incremental_depth else f'{pair}@depth{DEPTH_LEVELS}@100ms')
+        self.streams_per_connection = streams_per_connection
+
+        self._forming: Dict[Tuple[str, TimeFrame], Candle] = {}
+        self._candle_handlers: List[CandleHandler] = []
+        self._trades_handlers: List[TradesHandler] = []
+        self._depth_handlers: List[DepthHandler] = []
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+    def on_candle(self, handler: CandleHandler):
+        """Подписаться на закрытые свечи"""
+        self._candle_handlers.append(handler)
+
+    def on_trades(self, handler: TradesHandler):
+        """Подписаться на сделки"""
+        self._trades_handlers.append(handler)
+
+    def on_depth(self, handler: DepthHandler):
+        """Подписаться на обновления стакана"""
+        self._depth_handlers.append(handler)
+
+    async def start(self):
+        """Открыть соединения и подписаться на потоки"""
+        self._running = True
+        size = self.streams_per_connection
+        for start in range(0, len(self.streams), size):
+            chunk = self.streams[start:start + size]
+            self._tasks.append(asyncio.create_task(self._run_connection(chunk)))
+        logger.info(f'Market stream started: {len(self.streams)} streams over {len(self._tasks)} connections')
+
+    async def stop(self):
+        """Закрыть все соединения"""
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run_connection(self, streams: List[str]):
+        """Поддерживать соединение с набором подписок, переподключаясь при обрыве"""
+        delay = RECONNECT_DELAY
+        reconnect = False
+        while self._running:
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=None) as ws:
+                    for stream in streams:
+                        await ws.send(orjson.dumps({
+                            'id': uuid.uuid4().hex,
+                            'reqType': 'sub',
+                            'dataType': stream,
+                        }).decode())
+                    if reconnect:
+                        await self._backfill(streams)
+                    delay = RECONNECT_DELAY
+
+                    async for message in ws:
+                        data = decode_message(message)
+                        if data is None:
+                            await ws.send('Pong')
+                            continue
+                        await self._dispatch(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Market stream connection lost: {e!r}, reconnecting in {delay:.0f}s')
+
+            if not self._running:
+                break
+            reconnect = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _dispatch(self, message: dict):
+        stream = message.get('dataType')
+        data = message.get('data')
+        if not stream or data is None:
+            return
+
+        pair, _, channel = stream.partition('@')
+        if channel.startswith('kline_'):
+            timeframe = TimeFrame(channel[len('kline_'):])
+            for item in data if isinstance(data, list) else (data,):
+                await self._on_kline(pair, timeframe, item)
+        elif channel == 'trade':
+            for handler in self._trades_handlers:
+                await handler(pair, data if isinstance(data, list) else [data])
+        elif channel.startswith('depth') or channel.startswith('incrDepth'):
+            for handler in self._depth_handlers:
+                await handler(pair, data)
+
+    async def _on_kline(self, pair: str, timeframe: TimeFrame, item: dict):
+        candle = Candle(
+            int(item['T']),
+            float(item['o']),
+            float(item['h']),
+            float(item['l']),
+            float(item['c']),
+            float(item['v'])
+        )
+        key = (pair, timeframe)
+        forming = self._forming.get(key)
+        self._forming[key] = candle
+        if forming is not None and candle.timestamp > forming.timestamp:
+            await self._close_candle(pair, timeframe, forming)
+
+    async def _close_candle(self, pair: str, timeframe: TimeFrame, candle: Candle):
+        if self.store.append(pair, timeframe, candle):
+            for handler in self._candle_handlers:
+                await handler(pair, timeframe, candle)
+
+    async def _backfill(self, streams: List[str]):
+        """Догрузить через REST свечи, закрывшиеся за время разрыва соединения"""
+        now = int(time.time() * 1000)
+        for stream in streams:
+            pair, _, channel = stream.partition('@')
+            if not channel.startswith('kline_'):
+                continue
+            timeframe = TimeFrame(channel[len('kline_'):])
+            last = self.store.last_timestamp(pair, timeframe)
+            if last is None:
+                continue
+
+            step = TIMEFRAME_SECONDS[timeframe] * 1000
+            start, total = last + step, 0
+            # Длинный разрыв догружается страницами от последней полученной свечи
+            while start + step <= now:
+                try:
+                    rows = await self.client.get_klines(
+                        pair, timeframe.value, limit=BACKFILL_LIMIT, start_time=start, end_time=now
+                    )
+                except Exception as e:
+                    logger.warning(f'Backfill failed for {pair} {timeframe.value}: {e!r}')
+                    break
+
+                closed = rows[rows[:, 0] + step <= now]
+                for row in closed.tolist():
+                    await self._close_candle(pair, timeframe, Candle(int(row[0]), *row[1:]))
+                total += len(closed)
+                if len(rows) < BACKFILL_LIMIT:
+                    break
+                start = int(rows[-1, 0]) + step
+
+            self._forming.pop((pair, timeframe), None)
+            if total:
+                logger.info(f'Backfilled {total} candles for {pair} {timeframe.value}')
@@ -0,0 +1,356 @@
+"""
+Локальная копия стакана (L2)
+
+Каждая сторона стакана - отсортированный список цен (bisect) и словарь
+объемов по ценам: обновление уровня - поиск O(log n) и вставка/удаление
+в список, лучшая цена - крайний элемент списка за O(1).
+
+Стакан наполняется потоком depth MarketDataStream: полный снимок (поток
+depthN или action=all потока incrDepth) заменяет стакан, изменения
+(action=update) применяются к нему. Изменения нумеруются lastUpdateId;
+при разрыве последовательности стакан помечается рассинхронизированным и
+заново загружается снимком REST, а изменения, пришедшие во время
+загрузки, применяются поверх снимка.
+"""
+import asyncio
+import bisect
+from pathlib import Path
+from statistics import median
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+import orjson
+from loguru import logger
+
+from src.config.constants import ORDER_BOOK_SETTINGS
+
+# Глубина снимка REST при пересинхронизации
+SNAPSHOT_LIMIT = 1000
+
+Levels = Iterable[Sequence[Union[str, float]]]
+
+
+class Wall(NamedTuple):
+    """Уровень стакана с аномально большим объемом"""
+    price: float
+    volume: float
+    is_bid: bool
+    ratio: float        # объем / медианный объем уровней диапазона
+
+
+class BookSide:
+    """Одна сторона стакана"""
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.prices: List[float] = []       # по возрастанию
+        self.volumes: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def clear(self):
+        self.prices.clear()
+        self.volumes.clear()
+
+    def set(self, price: float, volume: float):
+        """Установить объем уровня (0 - удалить уровень)"""
+        if volume > 0:
+            if price not in self.volumes:
+                bisect.insort(self.prices, price)
+            self.volumes[price] = volume
+        elif self.volumes.pop(price, None) is not None:
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def update(self, levels: Levels):
+        for price, volume in levels:
+            self.set(float(price), float(volume))
+
+    def best(self) -> Optional[float]:
+        """Лучшая цена: максимальная для bid, минимальная для ask"""
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.is_bid else self.prices[0]
+
+    def between(self, low: float, high: float) -> List[float]:
+        """Цены уровней в диапазоне [low, high] по возрастанию"""
+        return self.prices[bisect.bisect_left(self.prices, low):bisect.bisect_right(self.prices, high)]
+
+    def levels(self, count: int) -> List[tuple]:
+        """Лучшие count уровней (цена, объем) от лучшей цены"""
+        prices = self.prices[-count:][::-1] if self.is_bid else self.prices[:count]
+        return [(price, self.volumes[price]) for price in prices]
+
+
+class OrderBook:
+    """Стакан одной пары"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.update_id: Optional[int] = None
+        self.timestamp: Optional[int] = None
+        self.synced = False
+
+    def apply_snapshot(self, bids: Levels, asks: Levels, update_id: Optional[int] = None, timestamp: Optional[int] = None):
+        """Заменить стакан полным снимком"""
+        self.bids.clear()
+        self.asks.clear()
+        self.bids.update(bids)
+        self.asks.update(asks)
+        self.update_id = update_id
+        self.timestamp = timestamp
+        self.synced = True
+
+    def apply_update(
+        self,
+        bids: Levels,
+        asks: Levels,
+        update_id: Optional[int] = None,
+        previous_id: Optional[int] = None,
+        timestamp: Optional[int] = None
+    ) -> bool:
+        """
+        Применить изменения уровней
+
+        Args:
+            bids, asks: Уровни [цена, объем]; объем 0 - удаление уровня
+            update_id: Номер изменения
+            previous_id: Номер предыдущего изменения (по умолчанию - update_id - 1)
+
+        Returns:
+            False, если стакан не синхронизирован или последовательность
+            прервалась (изменение не применено, нужна пересинхронизация)
+        """
+        if not self.synced:
+            return False
+        if update_id is not None and self.update_id is not None:
+            if update_id <= self.update_id:
+                return True     # уже учтено снимком
+            expected = previous_id if previous_id is not None else update_id - 1
+            if expected != self.update_id:
+                self.synced = False
+                return False
+
+        self.bids.update(bids)
+        self.asks.update(asks)
+        if update_id is not None:
+            self.update_id = update_id
+        self.timestamp = timestamp or self.timestamp
+        return True
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self.asks.best()
+
+    @property
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    @property
+    def spread(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        if bid is None or ask is None:
+            return None
+        return ask - bid
+
+    def depth(self, percent: float = ORDER_BOOK_SETTINGS['depth_percent'], notional: bool = False) -> tuple:
+        """
+        Накопленный объем в пределах percent % от mid
+
+        Args:
+            notional: Объем в валюте котировки (цена * количество)
+
+        Returns:
+            (объем bid, объем ask)
+        """
+        mid = self.mid
+        if mid is None:
+            return 0.0, 0.0
+        offset = mid * percent / 100
+        result = []
+        for side, low, high in ((self.bids, mid - offset, mid), (self.asks, mid, mid + offset)):
+            prices = side.between(low, high)
+            volumes = side.volumes
+            result.append(sum(price * volumes[price] for price in prices) if notional else sum(volumes[price] for price in prices))
+        return tuple(result)
+
+    def imbalance(self, percent: float = ORDER_BOOK_SETTINGS['depth_percent']) -> float:
+        """Перевес bid над ask в пределах percent %: (bid - ask) / (bid + ask), в [-1, 1]"""
+        bid, ask = self.depth(percent)
+        total = bid + ask
+        return (bid - ask) / total if total > 0 else 0.0
+
+    def walls(
+        self,
+        percent: float = ORDER_BOOK_SETTINGS['wall_percent'],
+        multiplier: float = ORDER_BOOK_SETTINGS['wall_multiplier']
+    ) -> List[Wall]:
+        """
+        Стены в пределах percent % от mid
+
+        Стена - уровень с объемом не меньше multiplier медианных объемов
+        уровней своей стороны в том же диапазоне.
+
+        Returns:
+            Стены по убыванию объема
+        """
+        mid = self.mid
+        if mid is None:
+            return []
+        offset = mid * percent / 100
+        walls = []
+        for side, low, high in ((self.bids, mid - offset, mid), (self.asks, mid, mid + offset)):
+            prices = side.between(low, high)
+            if not prices:
+                continue
+            volumes = [side.volumes[price] for price in prices]
+            typical = median(volumes)
+            walls.extend(
+                Wall(price, volume, side.is_bid, volume / typical)
+                for price, volume in zip(prices, volumes)
+                if volume >= multiplier * typical
+            )
+        return sorted(walls, key=lambda wall: wall.volume, reverse=True)
+
+    def wall_near(
+        self,
+        price: float,
+        is_bid: bool,
+        tolerance: float = ORDER_BOOK_SETTINGS['zone_tolerance'],
+        percent: float = ORDER_BOOK_SETTINGS['wall_percent'],
+        multiplier: float = ORDER_BOOK_SETTINGS['wall_multiplier']
+    ) -> Optional[Wall]:
+        """Наибольшая стена стороны в пределах tolerance % от price"""
+        offset = price * tolerance / 100
+        for wall in self.walls(percent, multiplier):
+            if wall.is_bid == is_bid and abs(wall.price - price) <= offset:
+                return wall
+        return None
+
+    def apply_message(self, data: dict) -> bool:
+        """
+        Применить сообщение потока depth BingX
+
+        Сообщение без action или с action=all - полный снимок,
+        action=update - изменения.
+
+        Returns:
+            False, если нужна пересинхронизация
+        """
+        update_id = data.get('lastUpdateId')
+        update_id = int(update_id) if update_id is not None else None
+        timestamp = data.get('T')
+        if data.get('action', 'all') == 'all':
+            self.apply_snapshot(data.get('bids') or (), data.get('asks') or (), update_id, timestamp)
+            return True
+        return self.apply_update(data.get('bids') or (), data.get('asks') or (), update_id, timestamp=timestamp)
+
+
+class OrderBookManager:
+    """Стаканы пар по потоку depth с пересинхронизацией через REST"""
+
+    def __init__(self, client, snapshot_limit: int = SNAPSHOT_LIMIT):
+        """
+        Args:
+            client: Клиент биржи с методом get_depth(symbol, limit)
+            snapshot_limit: Глубина снимка при пересинхронизации
+        """
+        self.client = client
+        self.snapshot_limit = snapshot_limit
+        self.books: Dict[str, OrderBook] = {}
+        self._pending: Dict[str, List[dict]] = {}
+        self._resyncs: Dict[str, asyncio.Task] = {}
+
+    def book(self, symbol: str) -> OrderBook:
+        """Стакан пары (создается при первом обращении)"""
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol)
+        return book
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        """Синхронизированный стакан пары или None"""
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    async def on_depth(self, symbol: str, data: dict):
+        """Обработчик сообщений depth MarketDataStream"""
+        pending = self._pending.get(symbol)
+        if pending is not None:
+            # Идет загрузка снимка - изменения применяются после нее
+            pending.append(data)
+            return
+        book = self.book(symbol)
+        if not book.apply_message(data):
+            logger.warning(f'Order book {symbol} out of sync at update {data.get("lastUpdateId")}, resyncing')
+            self._pending[symbol] = [data]
+            self._resyncs[symbol] = asyncio.create_task(self.resync(symbol))
+
+    async def resync(self, symbol: str):
+        """Загрузить снимок стакана и применить накопленные изменения"""
+        book = self.book(symbol)
+        try:
+            snapshot = await self.client.get_depth(symbol, self.snapshot_limit)
+            update_id = snapshot.get('lastUpdateId')
+            book.apply_snapshot(
+                snapshot.get('bids') or (),
+                snapshot.get('asks') or (),
+                int(update_id) if update_id is not None else None,
+                snapshot.get('T')
+            )
+            # Без номера изменения в снимке последовательность отсчитывается от первого изменения
+            for data in self._pending.get(symbol, ()):
+                if not book.apply_message(data):
+                    logger.warning(f'Order book {symbol} snapshot is older than buffered updates')
+                    break
+        except Exception as e:
+            book.synced = False
+            logger.error(f'Order book {symbol} resync failed: {e!r}')
+        finally:
+            self._pending.pop(symbol, None)
+            self._resyncs.pop(symbol, None)
+
+    async def close(self):
+        """Отменить незавершенные пересинхронизации"""
+        for task in list(self._resyncs.values()):
+            task.cancel()
+        await asyncio.gather(*self._resyncs.values(), return_exceptions=True)
+        self._resyncs.clear()
+
+
+def replay_depth_file(path: Union[str, Path], symbol: Optional[str] = None) -> Dict[str, OrderBook]:
+    """
+    Воспроизвести записанные сообщения depth (по одному JSON на строку)
+
+    Строка - сообщение потока ({"dataType": "...", "data": {...}}) или его
+    поле data. Рассинхронизированный стакан остается с synced=False до
+    следующего полного снимка.
+
+    Args:
+        symbol: Символ для строк без dataType
+
+    Returns:
+        Стаканы по символам
+    """
+    books: Dict[str, OrderBook] = {}
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            message = orjson.loads(line)
+            if 'dataType' in message:
+                pair, data = message['dataType'].partition('@')[0], message.get('data')
+            else:
+                pair, data = symbol, message
+            if data is None:
+                continue
+            books.setdefault(pair, OrderBook(pair)).apply_message(data)
+    return books
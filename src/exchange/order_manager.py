@@ -0,0 +1,413 @@
+"""
+Исполнение сделок: вход с защитными ордерами (bracket)
+
+Вход, стоп (STOP_MARKET), частичные тейки по RISK_MANAGEMENT и
+финальный тейк (TAKE_PROFIT_MARKET) отправляются одним запросом
+batchOrders, поэтому позиция не остается без стопа между запросами.
+Без пакетного режима вход и защитные ордера отправляются одновременно.
+
+clientOrderID ордеров детерминированы (сделка + роль ордера): повторная
+отправка после сетевой ошибки не создает дубликатов, а состояние ордера
+с неизвестным исходом уточняется запросом по clientOrderID. Если
+какой-либо ордер не размещен, bracket откатывается: размещенные ордера
+отменяются, открытая позиция закрывается по рынку.
+
+Перенос стопа (безубыток) выполняется в порядке "новый стоп, затем
+отмена старого" - позиция защищена на каждом шаге.
+"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from src.config.constants import RISK_MANAGEMENT, OrderType, PositionStatus, TradingSide
+from src.exchange.exceptions import BingXAPIError, ExchangeConnectionError, ExchangeError
+from src.utils.logger import log_performance_metric
+
+# Префикс clientOrderID ордеров бота
+CLIENT_ID_PREFIX = 'smc'
+# Максимум ордеров в одном запросе batchOrders
+BATCH_LIMIT = 5
+# Ожидание исполнения входа (секунды) и интервал опроса
+FILL_TIMEOUT = 5.0
+FILL_POLL = 0.2
+# Статусы BingX исполненного и отмененного ордера
+FILLED_STATUSES = {'FILLED'}
+CANCELLED_STATUSES = {'CANCELED', 'CANCELLED', 'EXPIRED', 'REJECTED'}
+
+
+class BracketError(ExchangeError):
+    """Bracket не размещен (выполнен откат)"""
+
+
+def client_order_id(trade_id: int, role: str) -> str:
+    """clientOrderID ордера сделки (роль: entry, sl, tp, tp1, ...)"""
+    return f'{CLIENT_ID_PREFIX}-{trade_id}-{role}'
+
+
+def round_step(value: float, step: Optional[float]) -> float:
+    """Округлить объем вниз до шага контракта"""
+    if not step:
+        return value
+    return round(math.floor(value / step + 1e-9) * step, 12)
+
+
+@dataclass
+class OrderLeg:
+    """Ордер bracket"""
+    role: str
+    client_order_id: str
+    params: Dict[str, Any]
+    order_id: Optional[str] = None
+    status: Optional[str] = None
+    price: Optional[float] = None   # средняя цена исполнения
+
+    @property
+    def placed(self) -> bool:
+        return self.order_id is not None and self.status not in CANCELLED_STATUSES
+
+
+@dataclass
+class Bracket:
+    """Вход сделки с защитными ордерами"""
+    trade_id: int
+    symbol: str
+    side: TradingSide
+    quantity: float
+    entry_price: float              # плановая цена входа
+    stop_loss: float
+    take_profit: float
+    legs: Dict[str, OrderLeg] = field(default_factory=dict)
+    fill_price: Optional[float] = None
+    filled_at: Optional[datetime] = None
+    stop_version: int = 0
+    breakeven: bool = False
+
+    @property
+    def risk_per_unit(self) -> float:
+        return abs(self.entry_price - self.stop_loss)
+
+    @property
+    def direction(self) -> int:
+        return 1 if self.side == TradingSide.LONG else -1
+
+    def price_at(self, r_multiple: float) -> float:
+        """Цена, соответствующая r_multiple R от входа"""
+        return self.entry_price + self.direction * r_multiple * self.risk_per_unit
+
+    def order_id(self, role: str) -> Optional[str]:
+        leg = self.legs.get(role)
+        return leg.order_id if leg is not None else None
+
+    def trade_values(self) -> Dict[str, Any]:
+        """Значения колонок Trade после размещения"""
+        return {
+            'entry_order_id': self.order_id('entry'),
+            'stop_order_id': self.order_id('sl'),
+            'tp_order_id': self.order_id('tp'),
+            'entry_price': self.fill_price or self.entry_price,
+            'entry_time': self.filled_at,
+            'status': PositionStatus.OPEN,
+        }
+
+
+def _orders(response: Any) -> List[dict]:
+    """Ордера из ответа place_order / place_batch_orders"""
+    if not response:
+        return []
+    if isinstance(response, list):
+        return response
+    if 'orders' in response:
+        return response['orders'] or []
+    if 'order' in response:
+        return [response['order']]
+    return [response]
+
+
+def _client_id(order: dict) -> Optional[str]:
+    return order.get('clientOrderID') or order.get('clientOrderId')
+
+
+class OrderManager:
+    """Размещение и сопровождение bracket-ордеров"""
+
+    def __init__(
+        self,
+        client,
+        use_batch: bool = True,
+        partial_close_targets: Sequence[float] = tuple(RISK_MANAGEMENT['partial_close_targets']),
+        partial_close_percentages: Sequence[float] = tuple(RISK_MANAGEMENT['partial_close_percentages']),
+        breakeven_level: float = RISK_MANAGEMENT['breakeven_level'],
+        fill_timeout: float = FILL_TIMEOUT
+    ):
+        """
+        Args:
+            client: Клиент биржи (BingXClient или совместимый)
+            use_batch: Размещать bracket одним запросом batchOrders
+            partial_close_targets: Уровни частичного закрытия (R)
+            partial_close_percentages: Доли позиции для частичного закрытия (%)
+            breakeven_level: Уровень переноса стопа в безубыток (R)
+            fill_timeout: Ожидание исполнения входа (секунды)
+        """
+        self.client = client
+        self.use_batch = use_batch
+        self.partial_close_targets = list(partial_close_targets)
+        self.partial_close_percentages = list(partial_close_percentages)
+        self.breakeven_level = breakeven_level
+        self.fill_timeout = fill_timeout
+
+    # Построение ордеров
+
+    def _leg(self, bracket: Bracket, role: str, **params) -> OrderLeg:
+        close_side = 'SELL' if bracket.side == TradingSide.LONG else 'BUY'
+        leg = OrderLeg(role, client_order_id(bracket.trade_id, role), {
+            'symbol': bracket.symbol,
+            'side': close_side,
+            'positionSide': bracket.side.name,
+            **params,
+        })
+        leg.params['clientOrderID'] = leg.client_order_id
+        return leg
+
+    def build_legs(self, bracket: Bracket, quantity_step: Optional[float] = None) -> List[OrderLeg]:
+        """
+        Ордера bracket: вход, стоп, частичные тейки, финальный тейк
+
+        Стоп и финальный тейк закрывают всю оставшуюся позицию
+        (closePosition), частичные тейки - долю от объема входа.
+        """
+        entry = self._leg(bracket, 'entry', type=OrderType.MARKET.value, quantity=bracket.quantity)
+        entry.params['side'] = 'BUY' if bracket.side == TradingSide.LONG else 'SELL'
+        legs = [
+            entry,
+            self._leg(
+                bracket, 'sl', type=OrderType.STOP_MARKET.value,
+                stopPrice=bracket.stop_loss, closePosition='true'
+            ),
+        ]
+
+        remaining = bracket.quantity
+        for number, (target, percent) in enumerate(zip(self.partial_close_targets, self.partial_close_percentages), 1):
+            price = bracket.price_at(target)
+            quantity = round_step(bracket.quantity * percent / 100, quantity_step)
+            # Частичный тейк за финальным не нужен
+            if quantity <= 0 or quantity >= remaining or (price - bracket.take_profit) * bracket.direction >= 0:
+                continue
+            remaining -= quantity
+            legs.append(self._leg(
+                bracket, f'tp{number}', type=OrderType.TAKE_PROFIT_MARKET.value,
+                stopPrice=price, quantity=quantity
+            ))
+
+        legs.append(self._leg(
+            bracket, 'tp', type=OrderType.TAKE_PROFIT_MARKET.value,
+            stopPrice=bracket.take_profit, closePosition='true'
+        ))
+        if len(legs) > BATCH_LIMIT:
+            # Лишние частичные тейки не помещаются в один batchOrders
+            legs = legs[:BATCH_LIMIT - 1] + legs[-1:]
+        return legs
+
+    # Отправка
+
+    async def _recover(self, bracket: Bracket, legs: List[OrderLeg]):
+        """Уточнить по clientOrderID состояние ордеров с неизвестным исходом"""
+        async def check(leg: OrderLeg):
+            try:
+                order = _orders(await self.client.get_order(bracket.symbol, client_order_id=leg.client_order_id))
+            except ExchangeError:
+                return
+            if order:
+                self._update_leg(leg, order[0])
+
+        await asyncio.gather(*(check(leg) for leg in legs if leg.order_id is None))
+
+    @staticmethod
+    def _update_leg(leg: OrderLeg, order: dict):
+        if order.get('orderId') is not None:
+            leg.order_id = str(order['orderId'])
+        leg.status = order.get('status', leg.status)
+        leg.price = float(order.get('avgPrice') or 0) or leg.price
+
+    def _apply(self, legs: List[OrderLeg], response: Any):
+        by_id = {leg.client_order_id: leg for leg in legs}
+        for order in _orders(response):
+            leg = by_id.get(_client_id(order))
+            if leg is not None and order.get('orderId') is not None:
+                self._update_leg(leg, order)
+
+    async def _send_one(self, bracket: Bracket, leg: OrderLeg):
+        try:
+            self._apply([leg], await self.client.place_order(**leg.params))
+        except ExchangeConnectionError as e:
+            logger.warning(f'Order {leg.client_order_id} has unknown outcome: {e!r}')
+            await self._recover(bracket, [leg])
+        except BingXAPIError as e:
+            # Отказ при повторной отправке: ордер с этим clientOrderID уже может существовать
+            await self._recover(bracket, [leg])
+            if not leg.placed:
+                logger.error(f'Order {leg.client_order_id} rejected: {e}')
+
+    async def _send(self, bracket: Bracket, legs: List[OrderLeg]):
+        if not self.use_batch:
+            await asyncio.gather(*(self._send_one(bracket, leg) for leg in legs))
+            return
+        try:
+            self._apply(legs, await self.client.place_batch_orders([leg.params for leg in legs]))
+        except ExchangeError as e:
+            logger.warning(f'Batch order for trade {bracket.trade_id} failed: {e!r}')
+            await self._recover(bracket, legs)
+
+    async def place_bracket(
+        self,
+        bracket: Bracket,
+        signal_time: Optional[datetime] = None,
+        quantity_step: Optional[float] = None
+    ) -> Bracket:
+        """
+        Открыть позицию со стопом и тейками
+
+        Args:
+            bracket: Параметры сделки (legs заполняются здесь)
+            signal_time: Время сигнала - для метрики signal_to_fill
+            quantity_step: Шаг объема контракта
+
+        Returns:
+            Bracket с id ордеров и ценой исполнения входа
+
+        Raises:
+            BracketError: Какой-либо ордер не размещен; выполнен откат
+        """
+        started = time.perf_counter()
+        legs = self.build_legs(bracket, quantity_step)
+        bracket.legs = {leg.role: leg for leg in legs}
+
+        await self._send(bracket, legs)
+        log_performance_metric('bracket_placement', (time.perf_counter() - started) * 1000)
+
+        failed = [leg.role for leg in legs if not leg.placed]
+        if failed:
+            await self.rollback(bracket)
+            raise BracketError(f'Bracket for trade {bracket.trade_id} rolled back, not placed: {", ".join(failed)}')
+
+        await self._wait_fill(bracket)
+        if signal_time is not None and bracket.filled_at is not None:
+            log_performance_metric('signal_to_fill', (bracket.filled_at - signal_time).total_seconds() * 1000)
+        return bracket
+
+    async def _wait_fill(self, bracket: Bracket):
+        """Дождаться исполнения входа и запомнить цену"""
+        entry = bracket.legs['entry']
+        deadline = time.monotonic() + self.fill_timeout
+        while True:
+            if entry.status in FILLED_STATUSES:
+                bracket.filled_at = datetime.now(timezone.utc)
+                if entry.price is None:
+                    await self._refresh(bracket, entry)
+                bracket.fill_price = entry.price
+                return
+            if time.monotonic() >= deadline:
+                logger.warning(f'Entry {entry.client_order_id} not filled in {self.fill_timeout}s')
+                return
+            await asyncio.sleep(FILL_POLL)
+            await self._refresh(bracket, entry)
+
+    async def _refresh(self, bracket: Bracket, leg: OrderLeg):
+        try:
+            order = _orders(await self.client.get_order(bracket.symbol, client_order_id=leg.client_order_id))
+        except ExchangeError as e:
+            logger.warning(f'Failed to refresh {leg.client_order_id}: {e!r}')
+            return
+        if order:
+            self._update_leg(leg, order[0])
+
+    # Откат и сопровождение
+
+    async def _cancel(self, bracket: Bracket, leg: OrderLeg) -> bool:
+        try:
+            await self.client.cancel_order(bracket.symbol, client_order_id=leg.client_order_id)
+        except ExchangeError as e:
+            logger.error(f'Failed to cancel {leg.client_order_id}: {e!r}')
+            return False
+        leg.status = 'CANCELLED'
+        return True
+
+    async def cancel_protective(self, bracket: Bracket):
+        """Отменить неисполненные защитные ордера bracket (позиция закрыта)"""
+        protective = [
+            leg for role, leg in bracket.legs.items()
+            if role != 'entry' and leg.placed and leg.status not in FILLED_STATUSES
+        ]
+        await asyncio.gather(*(self._cancel(bracket, leg) for leg in protective))
+
+    async def rollback(self, bracket: Bracket):
+        """Отменить размещенные ордера bracket и закрыть открытую позицию"""
+        protective = [leg for role, leg in bracket.legs.items() if role != 'entry' and leg.placed]
+        await asyncio.gather(*(self._cancel(bracket, leg) for leg in protective))
+
+        entry = bracket.legs.get('entry')
+        if entry is None or not entry.placed:
+            return
+        if entry.status not in FILLED_STATUSES:
+            await self._refresh(bracket, entry)
+        if entry.status in FILLED_STATUSES:
+            await self.close(bracket, bracket.quantity, role='rollback')
+        else:
+            await self._cancel(bracket, entry)
+
+    async def close(self, bracket: Bracket, quantity: float, role: str = 'close') -> Optional[OrderLeg]:
+        """Закрыть часть позиции (или всю) рыночным ордером"""
+        leg = self._leg(bracket, role, type=OrderType.MARKET.value, quantity=quantity)
+        await self._send_one(bracket, leg)
+        bracket.legs[role] = leg
+        return leg if leg.placed else None
+
+    async def partial_close(self, bracket: Bracket, percent: float, quantity_step: Optional[float] = None) -> Optional[OrderLeg]:
+        """Закрыть percent % объема входа по рынку"""
+        quantity = round_step(bracket.quantity * percent / 100, quantity_step)
+        number = sum(role.startswith('close') for role in bracket.legs) + 1
+        return await self.close(bracket, quantity, role=f'close{number}')
+
+    async def move_stop(self, bracket: Bracket, stop_price: float) -> bool:
+        """
+        Перенести стоп: новый стоп размещается до отмены старого
+
+        Returns:
+            True, если новый стоп размещен
+        """
+        old = bracket.legs['sl']
+        bracket.stop_version += 1
+        leg = self._leg(
+            bracket, f'sl{bracket.stop_version}', type=OrderType.STOP_MARKET.value,
+            stopPrice=stop_price, closePosition='true'
+        )
+        await self._send_one(bracket, leg)
+        if not leg.placed:
+            logger.error(f'Failed to move stop of trade {bracket.trade_id} to {stop_price}')
+            return False
+
+        await self._cancel(bracket, old)
+        leg.role = 'sl'
+        bracket.legs['sl'] = leg
+        bracket.stop_loss = stop_price
+        return True
+
+    async def on_price(self, bracket: Bracket, price: float) -> bool:
+        """
+        Сопровождение позиции по текущей цене: перенос стопа в безубыток
+        на breakeven_level R (частичные тейки исполняет биржа)
+
+        Returns:
+            True, если стоп перенесен
+        """
+        if bracket.breakeven or bracket.risk_per_unit <= 0:
+            return False
+        if (price - bracket.price_at(self.breakeven_level)) * bracket.direction < 0:
+            return False
+        entry = bracket.fill_price or bracket.entry_price
+        bracket.breakeven = await self.move_stop(bracket, entry)
+        return bracket.breakeven
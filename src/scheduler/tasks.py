@@ -0,0 +1,141 @@
+"""
+Фоновые задачи планировщика
+
+Задачи анализа выполняются в процессах ProcessPoolExecutor, поэтому
+принимают и возвращают только сериализуемые данные. Задачи обслуживания
+базы данных - корутины, выполняются в цикле событий планировщика.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.config.constants import MARKET_DATA_RETENTION_MONTHS, MARKET_DATA_ROLLUPS, TimeFrame
+from src.analysis.candle_store import window_from_rows
+from src.exchange.order_book import Wall
+from src.strategy.base_strategy import TradeSignal
+from src.strategy.smc_strategy import SMCStrategy
+
+# (symbol, tier, {timeframe: массив свечей (n, 6)}, стены стакана или None,
+#  {timeframe: готовые результаты узлов индикаторов})
+PairPayload = Tuple[
+    str, int, Dict[TimeFrame, np.ndarray], Optional[List[Wall]], Dict[TimeFrame, Dict[str, Any]]
+]
+
+
+@dataclass
+class AnalysisResult:
+    """Результат анализа пары на одном таймфрейме"""
+    pair: str
+    timeframe: TimeFrame
+    signals: List[TradeSignal] = field(default_factory=list)
+    candles: int = 0
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+    snapshot: Optional[dict] = None     # MarketContext.snapshot() на последней свече
+    timings: Dict[str, float] = field(default_factory=dict)    # время узлов индикаторов (мс)
+
+
+# Стратегия создается один раз на процесс пула
+_strategy: Optional[SMCStrategy] = None
+
+
+def _get_strategy() -> SMCStrategy:
+    """
+    Стратегия процесса пула
+
+    Ее SwingIndexRegistry общий для серий, проанализированных этим
+    процессом, но не для основного процесса: структуру рынка ведет
+    MarketStructureMonitor планировщика (см. TradingScheduler.swings).
+    """
+    global _strategy
+    if _strategy is None:
+        _strategy = SMCStrategy()
+    return _strategy
+
+
+def analyze_pairs_chunk(chunk: List[PairPayload]) -> List[AnalysisResult]:
+    """
+    Рассчитать индикаторы и сетапы для группы пар
+
+    Args:
+        chunk: Пары с историей свечей по таймфреймам
+
+    Returns:
+        Результаты по каждой паре и таймфрейму
+    """
+    strategy = _get_strategy()
+    results = []
+    for pair, tier, history, walls, indicators in chunk:
+        for timeframe, rows in history.items():
+            started = time.perf_counter()
+            result = AnalysisResult(pair=pair, timeframe=timeframe, candles=len(rows))
+            before = {name: timing.total_ms for name, timing in strategy.timings.items()}
+            try:
+                context, result.signals = strategy.analyze(
+                    pair, timeframe, window_from_rows(rows), tier,
+                    indicators=indicators.get(timeframe), walls=walls
+                )
+                result.snapshot = context.snapshot()
+            except Exception as e:
+                result.error = f'{type(e).__name__}: {e}'
+            result.timings = {
+                name: timing.total_ms - before.get(name, 0.0)
+                for name, timing in strategy.timings.items()
+                if timing.total_ms != before.get(name)
+            }
+            result.elapsed_ms = (time.perf_counter() - started) * 1000
+            results.append(result)
+    return results
+
+
+async def maintain_market_data(session_factory: Callable, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Обслуживание секций market_data
+
+    Создает секции текущего и следующего месяца для всех таймфреймов,
+    затем для таймфреймов с ограниченным хранением сворачивает устаревшие
+    месяцы в старшие таймфреймы и удаляет их секции. Каждый месяц
+    обрабатывается в своей транзакции: свертка и удаление либо выполняются
+    вместе, либо не выполняются.
+
+    Args:
+        session_factory: Контекстный менеджер сессии (db_manager.session)
+        now: Текущее время (по умолчанию - сейчас, UTC)
+
+    Returns:
+        Количество добавленных свертками свечей по именам удаленных секций
+    """
+    # Модуль импортируется процессами анализа, ORM загружается только здесь
+    from src.database.repositories.market_data_repo import (
+        MarketDataRepository, month_start, next_month, previous_month
+    )
+
+    current = month_start(now or datetime.now(timezone.utc))
+    async with session_factory() as session:
+        repository = MarketDataRepository(session)
+        for timeframe in TimeFrame:
+            await repository.ensure_partitions(timeframe, current, next_month(current))
+
+    rolled_up = {}
+    for timeframe, months in MARKET_DATA_RETENTION_MONTHS.items():
+        cutoff = current
+        for _ in range(months):
+            cutoff = previous_month(cutoff)
+
+        async with session_factory() as session:
+            expired = [month for month in await MarketDataRepository(session).list_partitions(timeframe) if month < cutoff]
+
+        for month in expired:
+            async with session_factory() as session:
+                repository = MarketDataRepository(session)
+                added = await repository.rollup(
+                    timeframe, MARKET_DATA_ROLLUPS.get(timeframe, []), month, next_month(month)
+                )
+                for name in await repository.drop_partitions(timeframe, next_month(month)):
+                    rolled_up[name] = sum(added.values())
+                    logger.info(f'Dropped {name} after rolling up {rolled_up[name]} candles')
+    return rolled_up
@@ -0,0 +1,458 @@
+"""
+Планировщик анализа рынка
+
+Цикл анализа разделен на стадии:
+    1. загрузка свечей (I/O) - asyncio с ограничением числа одновременных запросов
+    2. индикаторы и сетапы (CPU) - ProcessPoolExecutor, пары группами по chunk_size
+Группа пар отправляется в пул сразу, как только для нее загружены все
+таймфреймы, а результаты обрабатываются по мере готовности. У каждой стадии
+свой дедлайн, поэтому медленная пара не растягивает цикл дольше интервала.
+При RESAMPLE_TIMEFRAMES с биржи загружаются только минутные свечи, старшие
+таймфреймы собирает TimeframeResampler. Структура рынка (BOS/CHoCH)
+обновляется в основном процессе по новым закрытым свечам
+(MarketStructureMonitor) и сохраняется в market_data пачкой после цикла;
+swing-индексы основного процесса и процессов пула раздельны (см.
+TradingScheduler.swings).
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from loguru import logger
+
+from src.config.constants import TIMEFRAME_SECONDS, TimeFrame
+from src.config.settings import settings
+from src.analysis.candle_store import CandleStore, window_to_rows
+from src.analysis.market_analyzer import MarketStructureMonitor, TimeframeResampler
+from src.exchange.order_book import OrderBookManager
+from src.strategy.indicators.swing_points import SwingIndexRegistry
+from src.scheduler.tasks import AnalysisResult, PairPayload, analyze_pairs_chunk, maintain_market_data
+from src.utils.cache import Cache
+from src.utils.logger import log_performance_metric
+
+ResultHandler = Callable[[AnalysisResult], Awaitable[None]]
+
+# Доли интервала анализа, отведенные стадиям
+FETCH_STAGE_SHARE = 0.4
+CYCLE_SHARE = 0.9
+# Таймаут одного запроса свечей (секунды)
+REQUEST_TIMEOUT = 10.0
+# Количество свечей, загружаемых для каждой пары и таймфрейма
+CANDLE_LIMIT = 300
+
+
+class AnalysisPipeline:
+    """Конвейер загрузки свечей и анализа пар"""
+
+    def __init__(
+        self,
+        client,
+        store: CandleStore,
+        pairs: Dict[str, int],
+        timeframes: Sequence[TimeFrame],
+        executor: ProcessPoolExecutor,
+        fetch_concurrency: int = 8,
+        chunk_size: int = 4,
+        candle_limit: int = CANDLE_LIMIT,
+        request_timeout: float = REQUEST_TIMEOUT,
+        fetch_candles: bool = True,
+        resampler: Optional[TimeframeResampler] = None,
+        structure: Optional[MarketStructureMonitor] = None,
+        books: Optional[OrderBookManager] = None
+    ):
+        """
+        Args:
+            client: Клиент биржи с методом get_klines(symbol, interval, limit)
+            store: Хранилище свечей
+            pairs: Пары и их tier
+            timeframes: Таймфреймы анализа
+            executor: Пул процессов для расчета индикаторов
+            fetch_concurrency: Максимум одновременных запросов свечей
+            chunk_size: Количество пар в одной задаче пула
+            candle_limit: Глубина истории для анализа
+            request_timeout: Таймаут одного запроса
+            fetch_candles: Загружать свечи через REST (False, если хранилище
+                наполняется потоком MarketDataStream)
+            resampler: Сборщик старших таймфреймов из минуток; если задан,
+                с биржи загружаются только минутки (старшие таймфреймы -
+                один раз при первом цикле пары), а анализ выполняется
+                только на таймфреймах с новой закрытой свечой
+            structure: Автомат структуры рынка; обновляется по новым
+                закрытым свечам перед анализом, структура передается сетапам
+                (узел market_structure) и попадает в снимок
+            books: Стаканы пар; стены синхронизированного стакана передаются
+                в анализ для зон ликвидности (фактор depth_wall)
+        """
+        self.client = client
+        self.store = store
+        self.pairs = pairs
+        self.timeframes = [TimeFrame(tf) for tf in timeframes]
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.candle_limit = candle_limit
+        self.request_timeout = request_timeout
+        self.fetch_candles = fetch_candles
+        self.resampler = resampler
+        self.structure = structure
+        self.books = books
+        # Последняя свеча серии, проанализированная без ошибки, и отправленная в пул
+        self._analyzed: Dict[tuple, int] = {}
+        self._submitted: Dict[tuple, int] = {}
+        self._semaphore = asyncio.Semaphore(fetch_concurrency)
+        self._handlers: List[ResultHandler] = []
+
+    def add_handler(self, handler: ResultHandler):
+        """Подписаться на результаты анализа"""
+        self._handlers.append(handler)
+
+    def _fetch_plan(self, pair: str) -> List[TimeFrame]:
+        """Таймфреймы пары, загружаемые с биржи в этом цикле"""
+        resampler = self.resampler
+        if resampler is None:
+            return self.timeframes
+        seeded = resampler.seeded(pair)
+        return [resampler.base] + [
+            timeframe for timeframe in self.timeframes
+            if timeframe != resampler.base and (not seeded or (pair, timeframe) not in self.store)
+        ]
+
+    async def _fetch(self, pair: str, timeframe: TimeFrame):
+        """Загрузить свечи пары в хранилище"""
+        resampler = self.resampler
+        limit = self.candle_limit
+        if resampler is not None and timeframe == resampler.base and not resampler.seeded(pair):
+            limit = min(max(limit, resampler.seed_limit()), self.store.buffer(pair, timeframe).capacity)
+
+        async with self._semaphore:
+            rows = await asyncio.wait_for(
+                self.client.get_klines(pair, timeframe.value, limit),
+                self.request_timeout
+            )
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+
+        if resampler is not None and timeframe == resampler.base:
+            resampler.update(pair, rows)
+            return
+        # В хранилище попадают только закрытые свечи: последняя свеча ответа
+        # биржи еще формируется. Для старших таймфреймов при сборке из
+        # минуток это история до начала сборки
+        step = TIMEFRAME_SECONDS[timeframe] * 1000
+        self.store.load(pair, timeframe, rows[rows[:, 0] + step <= time.time() * 1000])
+
+    def _payload(self, pair: str) -> Optional[PairPayload]:
+        """Собрать данные пары для процесса пула (из хранилища, в т.ч. прошлых циклов)"""
+        history, indicators = {}, {}
+        for timeframe in self.timeframes:
+            if (pair, timeframe) in self.store:
+                if self.structure is not None:
+                    self.structure.sync(pair, timeframe)
+                last = self.store.last_timestamp(pair, timeframe)
+                if self.resampler is not None and self._analyzed.get((pair, timeframe)) == last:
+                    # Новой закрытой свечи нет - состояние индикаторов не меняется
+                    continue
+                window = self.store.window(pair, timeframe, self.candle_limit)
+                if len(window) > 1:
+                    history[timeframe] = window_to_rows(window)
+                    if self.structure is not None:
+                        indicators[timeframe] = {'market_structure': self.structure.structure(pair, timeframe)}
+                    # Свеча считается проанализированной только по результату без ошибки
+                    self._submitted[(pair, timeframe)] = last
+        if not history:
+            return None
+        book = self.books.get(pair) if self.books is not None else None
+        return pair, self.pairs[pair], history, book.walls() if book is not None else None, indicators
+
+    async def run_cycle(self, fetch_deadline: float, cycle_deadline: float) -> List[AnalysisResult]:
+        """
+        Выполнить один цикл анализа
+
+        Args:
+            fetch_deadline: Время (секунды от старта) на загрузку свечей
+            cycle_deadline: Время (секунды от старта) на весь цикл
+
+        Returns:
+            Результаты, полученные до дедлайна
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        plans = {pair: self._fetch_plan(pair) for pair in self.pairs}
+        fetches: Dict[asyncio.Future, tuple] = {
+            asyncio.ensure_future(self._fetch(pair, timeframe)): (pair, timeframe)
+            for pair, timeframes in plans.items()
+            for timeframe in timeframes
+        } if self.fetch_candles else {}
+        remaining = {pair: len(timeframes) for pair, timeframes in plans.items()}
+        analyses: Dict[asyncio.Future, List[str]] = {}
+        ready: List[str] = []
+        results: List[AnalysisResult] = []
+
+        def submit(pairs: List[str]):
+            chunk = [payload for payload in map(self._payload, pairs) if payload]
+            if chunk:
+                future = loop.run_in_executor(self.executor, analyze_pairs_chunk, chunk)
+                analyses[future] = pairs
+
+        def pair_done(pair: str):
+            remaining[pair] -= 1
+            if not remaining[pair]:
+                ready.append(pair)
+                if len(ready) >= self.chunk_size:
+                    submit(ready[:])
+                    ready.clear()
+
+        if not self.fetch_candles:
+            pairs = list(self.pairs)
+            for start in range(0, len(pairs), self.chunk_size):
+                submit(pairs[start:start + self.chunk_size])
+
+        pending = set(fetches) | set(analyses)
+        while pending:
+            fetching = any(task in fetches for task in pending)
+            deadline = started + (fetch_deadline if fetching else cycle_deadline)
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(deadline - loop.time(), 0),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                late = [task for task in pending if task in (fetches if fetching else analyses)]
+                for task in late:
+                    task.cancel()
+                    pending.discard(task)
+
+                if fetching:
+                    pairs = sorted({fetches[task][0] for task in late})
+                    logger.warning(f'Fetch deadline exceeded, using cached candles for: {", ".join(pairs)}')
+                    for task in late:
+                        pair_done(fetches[task][0])
+                else:
+                    pairs = sorted({pair for task in late for pair in analyses[task]})
+                    logger.warning(f'Analysis deadline exceeded, skipped: {", ".join(pairs)}')
+
+            for task in done:
+                if task in fetches:
+                    pair, timeframe = fetches[task]
+                    if task.exception() is not None:
+                        logger.warning(f'Failed to fetch {pair} {timeframe.value}: {task.exception()!r}')
+                    pair_done(pair)
+                else:
+                    for result in task.result():
+                        results.append(result)
+                        if result.error:
+                            logger.error(f'Analysis failed for {result.pair} {result.timeframe.value}: {result.error}')
+                        elif (result.pair, result.timeframe) in self._submitted:
+                            self._analyzed[(result.pair, result.timeframe)] = self._submitted.pop((result.pair, result.timeframe))
+                        for handler in self._handlers:
+                            await handler(result)
+
+            if ready and not any(task in fetches for task in pending):
+                submit(ready[:])
+                ready.clear()
+            pending |= set(analyses) - {task for task in analyses if task.done()}
+            if self.structure is not None:
+                await self.structure.publish()
+
+        log_performance_metric('market_analysis_cycle', (loop.time() - started) * 1000)
+        self._log_timings(results)
+        return results
+
+    @staticmethod
+    def _log_timings(results: List[AnalysisResult]):
+        """Суммарное время узлов индикаторов за цикл (по убыванию)"""
+        totals: Dict[str, float] = {}
+        for result in results:
+            for name, elapsed in result.timings.items():
+                totals[name] = totals.get(name, 0.0) + elapsed
+        if not totals:
+            return
+        for name, elapsed in totals.items():
+            log_performance_metric(f'indicator_{name}', elapsed)
+        report = ', '.join(f'{name} {elapsed:.1f}ms' for name, elapsed in sorted(totals.items(), key=lambda item: -item[1]))
+        logger.debug(f'Indicator timings: {report}')
+
+
+class TradingScheduler:
+    """Планировщик периодических задач торгового бота"""
+
+    def __init__(
+        self,
+        client,
+        store: Optional[CandleStore] = None,
+        streaming: bool = False,
+        session_factory: Optional[Callable] = None,
+        statistics=None,
+        cache: Optional[Cache] = None,
+        books: Optional[OrderBookManager] = None
+    ):
+        """
+        Args:
+            client: Клиент биржи
+            store: Хранилище свечей (по умолчанию создается новое)
+            streaming: Свечи поступают из MarketDataStream, REST-опрос не нужен
+            session_factory: Контекстный менеджер сессии БД (db_manager.session)
+                для задач обслуживания market_data
+            statistics: StatisticsService, периодически сохраняющий статистику
+            cache: Кэш для снимков индикаторов (читают обработчики бота)
+            books: Стаканы пар (OrderBookManager потока depth)
+        """
+        self.client = client
+        self.store = store or CandleStore()
+        self.streaming = streaming
+        self.session_factory = session_factory
+        self.statistics = statistics
+        self.cache = cache
+        self.books = books
+        self.scheduler = AsyncIOScheduler(timezone='UTC')
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pipeline: Optional[AnalysisPipeline] = None
+        # В потоковом режиме обработчик on_candle подключается к MarketDataStream (таймфрейм 1m)
+        self.resampler = TimeframeResampler(
+            self.store, settings.ANALYSIS_INTERVALS
+        ) if settings.RESAMPLE_TIMEFRAMES else None
+        # Swing-индексы серий основного процесса. Серии не закреплены за
+        # процессами пула (группа пар уходит в любой свободный процесс), поэтому
+        # общий с пулом реестр потребовал бы обмена состоянием индекса на каждую
+        # свечу. Структура рынка ведется здесь: события BOS / CHoCH должны
+        # рассылаться один раз и по порядку, а индекс обновляется только новыми
+        # закрытыми свечами. Процессы пула ведут свои индексы для зон ликвидности
+        # (SMCStrategy.swings), в пределах процесса - один на серию
+        self.swings = SwingIndexRegistry()
+        self.structure = MarketStructureMonitor(self.store, swings=self.swings)
+        self._pair_ids: Optional[Dict[str, int]] = None
+        self._handlers: List[ResultHandler] = []
+        if cache is not None:
+            self.add_result_handler(self._cache_snapshot)
+
+    async def _cache_snapshot(self, result: AnalysisResult):
+        if result.snapshot is not None:
+            await self.cache.store_snapshot(result.snapshot)
+
+    def add_result_handler(self, handler: ResultHandler):
+        """Подписаться на результаты анализа рынка"""
+        self._handlers.append(handler)
+        if self.pipeline:
+            self.pipeline.add_handler(handler)
+
+    def start(self):
+        """Запустить пул процессов и задачи планировщика"""
+        pairs = {pair: 1 for pair in settings.TIER1_PAIRS}
+        pairs.update({pair: 2 for pair in settings.TIER2_PAIRS if pair not in pairs})
+
+        self.executor = ProcessPoolExecutor(max_workers=settings.ANALYSIS_WORKERS)
+        self.pipeline = AnalysisPipeline(
+            client=self.client,
+            store=self.store,
+            pairs=pairs,
+            timeframes=settings.ANALYSIS_INTERVALS,
+            executor=self.executor,
+            fetch_concurrency=settings.FETCH_CONCURRENCY,
+            chunk_size=settings.ANALYSIS_CHUNK_SIZE,
+            fetch_candles=not self.streaming,
+            resampler=self.resampler,
+            structure=self.structure,
+            books=self.books
+        )
+        for handler in self._handlers:
+            self.pipeline.add_handler(handler)
+
+        self.scheduler.add_job(
+            self.market_analysis,
+            'interval',
+            seconds=settings.MARKET_ANALYSIS_INTERVAL,
+            id='market_analysis',
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=settings.MARKET_ANALYSIS_INTERVAL // 2
+        )
+        if self.statistics:
+            self.scheduler.add_job(
+                self.statistics_update,
+                'interval',
+                seconds=settings.STATISTICS_UPDATE_INTERVAL,
+                id='statistics_update',
+                max_instances=1,
+                coalesce=True
+            )
+        if self.session_factory:
+            self.scheduler.add_job(
+                self.market_data_maintenance,
+                'cron',
+                hour=0,
+                minute=10,
+                id='market_data_maintenance',
+                max_instances=1,
+                coalesce=True,
+                next_run_time=datetime.now(timezone.utc)
+            )
+        self.scheduler.start()
+        logger.info(f'Trading scheduler started: {len(pairs)} pairs, {len(self.pipeline.timeframes)} timeframes')
+
+    async def market_analysis(self):
+        """Задача анализа рынка"""
+        interval = settings.MARKET_ANALYSIS_INTERVAL
+        started = time.perf_counter()
+        results = await self.pipeline.run_cycle(
+            fetch_deadline=interval * FETCH_STAGE_SHARE,
+            cycle_deadline=interval * CYCLE_SHARE
+        )
+        signals = sum(len(result.signals) for result in results)
+        logger.info(
+            f'Market analysis finished in {time.perf_counter() - started:.2f}s: '
+            f'{len(results)} series, {signals} signals'
+        )
+        if self.session_factory:
+            await self.structure_snapshot()
+
+    async def structure_snapshot(self):
+        """Сохранить структуру рынка серий, обновленных за цикл (одна пачка)"""
+        # ORM загружается только в основном процессе
+        from src.database.repositories.market_data_writer import MarketDataWriter
+        from src.database.repositories.pair_repo import PairRepository
+
+        try:
+            if self._pair_ids is None:
+                async with self.session_factory() as session:
+                    self._pair_ids = await PairRepository(session).get_ids(list(self.pipeline.pairs))
+            writer = MarketDataWriter(self.session_factory)
+            if await self.structure.snapshot(writer, self._pair_ids):
+                await writer.flush()
+        except Exception as e:
+            logger.error(f'Market structure snapshot failed: {e!r}')
+
+    async def statistics_update(self):
+        """Задача сохранения статистики (только измененные периоды)"""
+        try:
+            saved = await self.statistics.flush()
+        except Exception as e:
+            logger.error(f'Statistics update failed: {e!r}')
+            return
+        if saved:
+            logger.info(f'Statistics updated: {saved} periods saved')
+
+    async def market_data_maintenance(self):
+        """Задача обслуживания секций market_data (создание, свертка, удаление)"""
+        started = time.perf_counter()
+        try:
+            dropped = await maintain_market_data(self.session_factory)
+        except Exception as e:
+            logger.error(f'Market data maintenance failed: {e!r}')
+            return
+        logger.info(
+            f'Market data maintenance finished in {time.perf_counter() - started:.2f}s: '
+            f'{len(dropped)} partitions dropped'
+        )
+
+    async def shutdown(self):
+        """Остановить планировщик и пул процессов"""
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.statistics:
+            await self.statistics_update()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,343 @@
+"""
+Сопровождение открытых позиций по событиям
+
+Позиции не опрашиваются по расписанию: монитор подписан на поток сделок
+(MarketDataStream.on_trades) и поток ордеров аккаунта
+(AccountStream.on_order).
+
+Цены срабатывания (безубыток на breakeven_level R, частичные закрытия
+на partial_close_targets, если их не исполняет биржа тейками tpN)
+хранятся по парам в TriggerIndex - двух отсортированных списках:
+срабатывающих при росте цены и при падении. Пачка сделок проверяется по
+своим максимуму и минимуму бинарным поиском, поэтому обработка стоит
+O(log n + k) для n триггеров пары и k сработавших, независимо от числа
+открытых сделок.
+
+Исполнения ордеров сделок (clientOrderID smc-{trade_id}-{role})
+обновляют состояние сделки в памяти; изменения строк trades копятся и
+записываются пачкой (TradeRepository.update_many) раз в flush_interval.
+"""
+import asyncio
+import bisect
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from src.config.constants import PositionStatus
+from src.database.repositories.trade_repo import TradeRepository
+from src.exchange.order_manager import (
+    CANCELLED_STATUSES,
+    CLIENT_ID_PREFIX,
+    FILLED_STATUSES,
+    Bracket,
+    OrderManager,
+)
+
+# Роли ордеров, закрывающих позицию целиком, и причина выхода
+EXIT_REASONS = {'sl': 'stop_loss', 'tp': 'take_profit', 'close': 'manual', 'rollback': 'rollback'}
+# Период записи изменений сделок в базу (секунды)
+FLUSH_INTERVAL = 1.0
+
+
+class Trigger(NamedTuple):
+    """Цена срабатывания действия по сделке"""
+    price: float
+    trade_id: int
+    action: str         # breakeven или partial{n}
+
+
+def parse_client_id(client_id: Optional[str]) -> Optional[Tuple[int, str]]:
+    """(id сделки, роль) из clientOrderID ордера бота или None"""
+    if not client_id:
+        return None
+    prefix, _, rest = client_id.partition('-')
+    trade_id, _, role = rest.partition('-')
+    if prefix != CLIENT_ID_PREFIX or not trade_id.isdigit() or not role:
+        return None
+    return int(trade_id), role
+
+
+def order_role(role: str) -> str:
+    """Роль ордера без номера версии стопа: sl2 -> sl (tpN и closeN сохраняются)"""
+    return 'sl' if role.startswith('sl') and role[2:].isdigit() else role
+
+
+class TriggerIndex:
+    """Триггеры одной пары, отсортированные по цене"""
+
+    def __init__(self):
+        self._above: List[Trigger] = []     # срабатывают при цене >= price
+        self._below: List[Trigger] = []     # срабатывают при цене <= price
+
+    def __len__(self) -> int:
+        return len(self._above) + len(self._below)
+
+    def add(self, trigger: Trigger, above: bool):
+        bisect.insort(self._above if above else self._below, trigger)
+
+    def remove(self, trade_id: int):
+        """Удалить триггеры сделки (O(n), выполняется при закрытии сделки)"""
+        self._above = [trigger for trigger in self._above if trigger.trade_id != trade_id]
+        self._below = [trigger for trigger in self._below if trigger.trade_id != trade_id]
+
+    def crossed(self, high: float, low: float) -> List[Trigger]:
+        """
+        Забрать триггеры, пересеченные диапазоном цен [low, high]
+
+        Returns:
+            Сработавшие триггеры (удаляются из индекса)
+        """
+        fired = []
+        if self._above and self._above[0].price <= high:
+            index = bisect.bisect_right(self._above, (high, float('inf')))
+            fired.extend(self._above[:index])
+            del self._above[:index]
+        if self._below and self._below[-1].price >= low:
+            index = bisect.bisect_left(self._below, (low,))
+            fired.extend(self._below[index:])
+            del self._below[index:]
+        return fired
+
+
+@dataclass
+class MonitoredTrade:
+    """Открытая сделка под сопровождением"""
+    trade_id: int
+    user_id: int
+    bracket: Bracket
+    risk_amount: float
+    risk_percent: float
+    setup: Optional[str] = None
+    status: PositionStatus = PositionStatus.PENDING
+    pnl: float = 0.0
+    commission: float = 0.0
+    closed: Set[str] = field(default_factory=set)     # исполненные роли
+
+    @property
+    def symbol(self) -> str:
+        return self.bracket.symbol
+
+
+class PositionMonitor:
+    """Сопровождение открытых сделок по потокам цен и ордеров"""
+
+    def __init__(
+        self,
+        order_manager: OrderManager,
+        session_factory: Callable,
+        statistics: Optional[Any] = None,
+        quantity_step: Optional[Callable[[str], Optional[float]]] = None
+    ):
+        """
+        Args:
+            order_manager: Исполнение ордеров (перенос стопа, частичное закрытие)
+            session_factory: Контекстный менеджер сессии (db_manager.session)
+            statistics: Получатель закрытых сделок (StatisticsService или
+                совместимый, метод on_trade_closed)
+            quantity_step: Шаг объема контракта по символу
+        """
+        self.order_manager = order_manager
+        self.session_factory = session_factory
+        self.statistics = statistics
+        self.quantity_step = quantity_step
+        self.trades: Dict[int, MonitoredTrade] = {}
+        self.indexes: Dict[str, TriggerIndex] = {}
+        self._updates: Dict[int, Dict[str, Any]] = {}
+        self._actions: Set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.trades)
+
+    # Регистрация сделок
+
+    def add(self, trade: MonitoredTrade):
+        """Взять сделку на сопровождение и построить ее триггеры"""
+        self.trades[trade.trade_id] = trade
+        bracket = trade.bracket
+        if bracket.fill_price is not None and trade.status == PositionStatus.PENDING:
+            trade.status = PositionStatus.OPEN
+        if bracket.risk_per_unit <= 0:
+            return
+
+        index = self.indexes.setdefault(trade.symbol, TriggerIndex())
+        above = bracket.direction > 0
+        if not bracket.breakeven:
+            index.add(Trigger(bracket.price_at(self.order_manager.breakeven_level), trade.trade_id, 'breakeven'), above)
+        for number, target in enumerate(self.order_manager.partial_close_targets, 1):
+            # Частичные тейки, размещенные на бирже, исполняются без монитора
+            if f'tp{number}' in bracket.legs or f'tp{number}' in trade.closed:
+                continue
+            price = bracket.price_at(target)
+            if (price - bracket.take_profit) * bracket.direction < 0:
+                index.add(Trigger(price, trade.trade_id, f'partial{number}'), above)
+
+    def remove(self, trade_id: int) -> Optional[MonitoredTrade]:
+        """Снять сделку с сопровождения"""
+        trade = self.trades.pop(trade_id, None)
+        if trade is not None:
+            index = self.indexes.get(trade.symbol)
+            if index is not None:
+                index.remove(trade_id)
+                if not len(index):
+                    del self.indexes[trade.symbol]
+        return trade
+
+    # Поток цен
+
+    async def on_trades(self, pair: str, trades: Sequence[dict]):
+        """Обработчик сделок MarketDataStream"""
+        index = self.indexes.get(pair)
+        if index is None or not trades:
+            return
+        prices = [float(trade['p']) for trade in trades]
+        fired = index.crossed(max(prices), min(prices))
+        if fired:
+            self.on_price(fired)
+
+    def on_price(self, triggers: Sequence[Trigger]):
+        """Запустить действия сработавших триггеров, не задерживая поток"""
+        for trigger in triggers:
+            trade = self.trades.get(trigger.trade_id)
+            if trade is None:
+                continue
+            task = asyncio.create_task(self._run_action(trade, trigger))
+            self._actions.add(task)
+            task.add_done_callback(self._actions.discard)
+
+    async def _run_action(self, trade: MonitoredTrade, trigger: Trigger):
+        bracket = trade.bracket
+        try:
+            if trigger.action == 'breakeven':
+                if not bracket.breakeven and await self.order_manager.move_stop(bracket, bracket.fill_price or bracket.entry_price):
+                    bracket.breakeven = True
+                    self._update(trade.trade_id, stop_loss=bracket.stop_loss, stop_order_id=bracket.order_id('sl'))
+            else:
+                number = int(trigger.action[len('partial'):])
+                percent = self.order_manager.partial_close_percentages[number - 1]
+                step = self.quantity_step(bracket.symbol) if self.quantity_step else None
+                await self.order_manager.partial_close(bracket, percent, step)
+        except Exception as e:
+            logger.error(f'Trade {trade.trade_id} {trigger.action} at {trigger.price} failed: {e!r}')
+
+    # Поток ордеров
+
+    async def on_order(self, order: dict):
+        """
+        Обработчик обновлений ордеров AccountStream
+
+        Args:
+            order: Поле o события ORDER_TRADE_UPDATE (c - clientOrderId,
+                X - статус, ap - средняя цена, rp - реализованный PnL,
+                n - комиссия)
+        """
+        parsed = parse_client_id(order.get('c'))
+        if parsed is None:
+            return
+        trade = self.trades.get(parsed[0])
+        if trade is None:
+            return
+        status = order.get('X')
+        role = order_role(parsed[1])
+        for leg in trade.bracket.legs.values():
+            if leg.client_order_id == order.get('c'):
+                leg.status = status
+        if status in CANCELLED_STATUSES:
+            if role == 'entry':
+                self._update(trade.trade_id, status=PositionStatus.CANCELLED)
+                self.remove(trade.trade_id)
+            return
+        if status not in FILLED_STATUSES:
+            return
+
+        price = float(order.get('ap') or 0) or None
+        trade.pnl += float(order.get('rp') or 0)
+        trade.commission += abs(float(order.get('n') or 0))
+        trade.closed.add(parsed[1])
+        now = datetime.now(timezone.utc)
+
+        if role == 'entry':
+            trade.bracket.fill_price = price or trade.bracket.entry_price
+            trade.bracket.filled_at = now
+            trade.status = PositionStatus.OPEN
+            self._update(trade.trade_id, entry_price=trade.bracket.fill_price, entry_time=now, status=trade.status)
+        elif role in EXIT_REASONS:
+            await self._close(trade, price, EXIT_REASONS[role], now)
+        else:
+            # tpN или closeN - закрыта часть позиции
+            trade.status = PositionStatus.PARTIAL_CLOSED
+            self._update(trade.trade_id, status=trade.status, pnl_amoun=trade.pnl, commision=trade.commission)
+
+    async def _close(self, trade: MonitoredTrade, price: Optional[float], reason: str, now: datetime):
+        self.remove(trade.trade_id)
+        trade.status = PositionStatus.CLOSED
+        rr = trade.pnl / trade.risk_amount if trade.risk_amount else 0.0
+        pnl_percent = rr * trade.risk_percent
+        self._update(
+            trade.trade_id,
+            status=trade.status, exit_price=price, exit_reason=reason, exit_time=now,
+            pnl_amoun=trade.pnl, pnl_percent=pnl_percent, commision=trade.commission
+        )
+
+        await self.order_manager.cancel_protective(trade.bracket)
+
+        if self.statistics is not None:
+            try:
+                await self.statistics.on_trade_closed(
+                    trade.user_id, trade.pnl, pnl_percent, trade.commission, rr, now,
+                    setup=trade.setup, pair=trade.symbol
+                )
+            except Exception as e:
+                logger.error(f'Failed to record closed trade {trade.trade_id}: {e!r}')
+
+    # Запись в базу
+
+    def _update(self, trade_id: int, **values):
+        self._updates.setdefault(trade_id, {'id': trade_id}).update(values)
+
+    async def flush(self) -> int:
+        """
+        Записать накопленные изменения сделок
+
+        Returns:
+            Количество обновленных сделок
+        """
+        async with self._lock:
+            if not self._updates:
+                return 0
+            rows, self._updates = list(self._updates.values()), {}
+            # update_many группирует строки по набору колонок
+            try:
+                async with self.session_factory() as session:
+                    return await TradeRepository(session).update_many(rows)
+            except Exception:
+                # Изменения не потеряны: более новые значения перекрывают старые
+                for row in rows:
+                    pending = self._updates.setdefault(row['id'], {})
+                    self._updates[row['id']] = {**row, **pending}
+                raise
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f'Trade updates flush failed: {e!r}')
+
+    def start(self, interval: float = FLUSH_INTERVAL):
+        """Запустить периодическую запись изменений"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def close(self):
+        """Остановить запись, дождаться действий и записать остаток"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._actions, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,157 @@
+"""
+Сервис статистики торговли
+
+Статистика обновляется инкрементально при закрытии каждой сделки
+(StatisticsTracker), измененные периоды сохраняются в таблицу statistics
+раз в STATISTICS_UPDATE_INTERVAL вместе с состоянием аккумуляторов.
+После перезапуска аккумуляторы восстанавливаются из этого состояния, без
+пересчета по всей истории сделок.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from src.analysis.statistics_calculator import (
+    PERIOD_TYPES,
+    StatisticsTracker,
+    calculate_statistics,
+    period_bounds,
+    verify_statistics,
+)
+from src.database.repositories.statistics_repo import StatisticsRepository
+from src.database.repositories.trade_repo import TradeRepository
+from src.utils.cache import Cache, statistics_key
+
+
+class StatisticsService:
+    """Инкрементальная статистика пользователей"""
+
+    def __init__(self, session_factory: Callable, cache: Optional[Cache] = None):
+        """
+        Args:
+            session_factory: Контекстный менеджер сессии (db_manager.session)
+            cache: Кэш, в котором сбрасывается статистика пользователя при
+                закрытии сделки
+        """
+        self.session_factory = session_factory
+        self.cache = cache
+        self.trackers: Dict[int, StatisticsTracker] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+
+    async def tracker(self, user_id: int) -> StatisticsTracker:
+        """
+        Аккумуляторы пользователя (загружаются из БД при первом обращении)
+
+        Одновременные первые обращения ждут одну загрузку, иначе сделка,
+        добавленная в перезаписанный аккумулятор, была бы потеряна.
+        """
+        tracker = self.trackers.get(user_id)
+        if tracker is not None:
+            return tracker
+
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = self._loading[user_id] = asyncio.ensure_future(self._load(user_id))
+            loading.add_done_callback(lambda done: self._loading.pop(user_id, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, user_id: int) -> StatisticsTracker:
+        async with self.session_factory() as session:
+            rows = await StatisticsRepository(session).get_latest(user_id)
+
+        if rows and all(row.accumulator_state for row in rows):
+            tracker = StatisticsTracker()
+            for row in rows:
+                tracker.load(row.period_type, row.period_start, row.accumulator_state)
+        else:
+            # Строки без сохраненного состояния - пересчитываем по истории
+            tracker = await self.rebuild(user_id)
+            tracker.dirty.update(tracker.periods)
+        self.trackers[user_id] = tracker
+        return tracker
+
+    async def on_trade_closed(
+        self,
+        user_id: int,
+        pnl: float,
+        pnl_percent: float,
+        commission: float,
+        rr: float,
+        exit_time: datetime,
+        setup: Optional[str] = None,
+        pair: Optional[str] = None
+    ):
+        """Учесть закрытую сделку (O(1), без обращения к БД после загрузки)"""
+        tracker = await self.tracker(user_id)
+        tracker.add_trade(pnl, pnl_percent, commission, rr, int(exit_time.timestamp() * 1000), setup, pair)
+        if self.cache is not None:
+            await self.cache.delete(*(statistics_key(user_id, period_type) for period_type in PERIOD_TYPES))
+
+    async def statistics(self, user_id: int, period_type: str = 'all_time') -> Optional[dict]:
+        """Статистика текущего периода"""
+        return (await self.tracker(user_id)).statistics(period_type)
+
+    async def flush(self) -> int:
+        """
+        Сохранить измененные периоды всех пользователей
+
+        Returns:
+            Количество сохраненных строк
+        """
+        saved = 0
+        now = datetime.now(timezone.utc)
+        for user_id, tracker in self.trackers.items():
+            rows = tracker.pop_dirty()
+            if not rows:
+                continue
+            async with self.session_factory() as session:
+                saved += await StatisticsRepository(session).save_periods(user_id, rows)
+            # В памяти остаются только текущие периоды
+            tracker.prune(period_bounds('daily', now)[0])
+        return saved
+
+    async def rebuild(self, user_id: int) -> StatisticsTracker:
+        """Построить аккумуляторы заново по всем закрытым сделкам"""
+        async with self.session_factory() as session:
+            trades = await TradeRepository(session).get_closed_trade_arrays(user_id)
+
+        tracker = StatisticsTracker()
+        for row in zip(*(trades[name].tolist() for name in (
+            'pnl', 'pnl_percent', 'commission', 'rr', 'exit_time', 'setup', 'pair'
+        ))):
+            tracker.add_trade(*row)
+        tracker.dirty.clear()
+        return tracker
+
+    async def verify(self, user_id: int) -> Dict[str, List[str]]:
+        """
+        Сверить инкрементальную статистику текущих периодов с полным пересчетом
+
+        Returns:
+            Расходящиеся поля по period_type (пустой словарь - расхождений нет)
+        """
+        tracker = await self.tracker(user_id)
+        async with self.session_factory() as session:
+            trades = await TradeRepository(session).get_closed_trade_arrays(user_id)
+
+        now = datetime.now(timezone.utc)
+        mismatches = {}
+        for period_type in PERIOD_TYPES:
+            start, end = period_bounds(period_type, now)
+            mask = np.ones(len(trades['pnl']), dtype=bool)
+            if start is not None:
+                mask = (trades['exit_time'] >= start.timestamp() * 1000) & (trades['exit_time'] < end.timestamp() * 1000)
+            selected = {name: values[mask] for name, values in trades.items()}
+            if not len(selected['pnl']):
+                continue
+
+            rebuilt = calculate_statistics(**selected)
+            incremental = tracker.statistics(period_type, now) or {}
+            mismatched = verify_statistics(incremental, rebuilt)
+            if mismatched:
+                logger.warning(f'Statistics mismatch for user {user_id} ({period_type}): {", ".join(mismatched)}')
+                mismatches[period_type] = mismatched
+        return mismatches
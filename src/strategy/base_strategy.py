@@ -0,0 +1,259 @@
+"""
+Базовые классы торговых сетапов
+
+Сетапы подключаются через register_setup: зарегистрированные классы
+создаются SMCStrategy по умолчанию. Сетап объявляет в requires
+результаты индикаторов, которые читает из MarketContext; стратегия
+рассчитывает только их (и их зависимости).
+
+Ключ сетапа - строка setup_type: встроенные сетапы используют значения
+SetupType, сетап-плагин - собственную строку и значения по умолчанию
+default_rr_ratio / default_min_confluence. С перечислением SetupType
+ключ сверяется только при записи в БД (модель Signal).
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+import numpy as np
+
+from src.config.constants import (
+    MIN_CONFLUENCE_FACTORS,
+    RR_RATIOS,
+    MarketStructure,
+    SetupType,
+    TimeFrame,
+    TradingSide,
+)
+from src.analysis.candle_store import CandleWindow
+from src.analysis.order_flow import FootprintWindow
+from src.exchange.order_book import Wall
+from src.strategy import confluence
+from src.strategy.indicators.cvd import CVDResult
+from src.strategy.indicators.liquidity_zone import LiquidityZone
+from src.strategy.indicators.order_block import OrderBlock
+from src.strategy.indicators.volume_profile import VolumeProfile
+
+# Отступ стопа за уровень (в долях цены)
+STOP_BUFFER = 0.001
+
+
+def setup_key(setup_type: Union[SetupType, str]) -> str:
+    """Строковый ключ сетапа (значение SetupType или строка плагина)"""
+    return setup_type.value if isinstance(setup_type, SetupType) else str(setup_type)
+
+
+@dataclass
+class TradeSignal:
+    """Торговый сигнал сетапа"""
+    setup_type: str                 # ключ сетапа (setup_key)
+    pair: str
+    timeframe: TimeFrame
+    side: TradingSide
+    entry_price: float
+    stop_loss: float
+    take_profit: float
+    rr_ratio: float
+    timestamp: int
+    confluence_mask: int = 0        # биты факторов (src.strategy.confluence)
+
+    @property
+    def confluence_score(self) -> int:
+        return confluence.count(self.confluence_mask)
+
+    @property
+    def confluence_factors(self) -> List[str]:
+        """Названия факторов (для уведомлений и БД)"""
+        return confluence.decode(self.confluence_mask)
+
+    @property
+    def risk_per_unit(self) -> float:
+        """Расстояние от входа до стопа"""
+        return abs(self.entry_price - self.stop_loss)
+
+
+@dataclass
+class MarketContext:
+    """Результаты индикаторов для одной пары на одном таймфрейме"""
+    pair: str
+    timeframe: TimeFrame
+    window: CandleWindow
+    tier: int = 2
+    order_blocks: List[OrderBlock] = field(default_factory=list)
+    liquidity_zones: List[LiquidityZone] = field(default_factory=list)
+    volume_profile: Optional[VolumeProfile] = None
+    cvd: Optional[CVDResult] = None
+    market_structure: MarketStructure = MarketStructure.UNDEFINED
+    footprint: Optional[FootprintWindow] = None
+    walls: Optional[List[Wall]] = None  # стены стакана пары на момент анализа (OrderBook.walls)
+    indicators: Dict[str, Any] = field(default_factory=dict)   # результаты узлов графа индикаторов
+    timings: Dict[str, float] = field(default_factory=dict)    # время расчета узлов (мс)
+
+    @property
+    def last_close(self) -> float:
+        return float(self.window.close[-1])
+
+    @property
+    def cvd_divergence(self) -> int:
+        """Дивергенция CVD на последней свече: 1, -1 или 0"""
+        return int(self.cvd.divergence[0, -1]) if self.cvd is not None else 0
+
+    @property
+    def flow_ratio(self) -> float:
+        """Доля чистой дельты в объеме окна на последней свече"""
+        return float(self.cvd.flow_ratio[0, -1]) if self.cvd is not None else 0.0
+
+    @property
+    def trend(self) -> int:
+        """Направление тренда структуры рынка: 1, -1 или 0 (консолидация, нет данных)"""
+        if self.market_structure == MarketStructure.BULLISH_TREND:
+            return 1
+        if self.market_structure == MarketStructure.BEARISH_TREND:
+            return -1
+        return 0
+
+    @property
+    def order_flow_bias(self) -> int:
+        """
+        Направление потока ордеров на последней свече: 1, -1 или 0
+
+        По footprint-бару той же свечи (stacked imbalance, затем absorption),
+        без него - по знаку flow_ratio.
+        """
+        footprint = self.footprint
+        if footprint is not None and len(footprint) and len(self.window) \
+                and footprint.timestamp[-1] == self.window.timestamp[-1]:
+            return int(np.sign(footprint.stacked_imbalance[-1]) or footprint.absorption[-1])
+        return int(np.sign(self.flow_ratio))
+
+    def snapshot(self) -> dict:
+        """Сводка индикаторов на последней свече (только простые типы - для кэша и БД)"""
+        profile = self.volume_profile
+        return {
+            'pair': self.pair,
+            'timeframe': self.timeframe.value,
+            'close_time': int(self.window.timestamp[-1]) if len(self.window) else None,
+            'close': self.last_close if len(self.window) else None,
+            'order_blocks': [
+                {'side': block.side.value, 'top': block.top, 'bottom': block.bottom, 'timestamp': block.timestamp}
+                for block in self.order_blocks if not block.mitigated
+            ],
+            'liquidity_zones': [
+                {
+                    'kind': zone.kind, 'price': zone.price, 'touches': zone.touches,
+                    'timestamp': zone.timestamp, 'resting_volume': zone.resting_volume,
+                }
+                for zone in self.liquidity_zones
+            ],
+            'volume_profile': {
+                'poc': profile.poc,
+                'value_area_high': profile.value_area_high,
+                'value_area_low': profile.value_area_low,
+            } if profile is not None else None,
+            'cvd': float(self.cvd.cvd[0, -1]) if self.cvd is not None else None,
+            'cvd_divergence': self.cvd_divergence,
+            'flow_ratio': self.flow_ratio,
+            'structure': MarketStructure(self.market_structure).value,
+        }
+
+
+class BaseSetup(ABC):
+    """Базовый класс торгового сетапа"""
+
+    setup_type: Union[SetupType, str]
+    # Индикаторы (узлы графа SMCStrategy), которые читает evaluate
+    requires: Tuple[str, ...] = ()
+    # Значения по умолчанию для сетапов без записи в RR_RATIOS / MIN_CONFLUENCE_FACTORS
+    default_rr_ratio: Optional[float] = None
+    default_min_confluence: Optional[int] = None
+
+    def __init__(self, rr_ratio: Optional[float] = None, min_confluence: Optional[int] = None):
+        """
+        Args:
+            rr_ratio: Соотношение риск/прибыль (по умолчанию из RR_RATIOS
+                или default_rr_ratio)
+            min_confluence: Минимум факторов confluence (из MIN_CONFLUENCE_FACTORS
+                или default_min_confluence)
+        """
+        key = setup_key(self.setup_type)
+        self.rr_ratio = rr_ratio if rr_ratio is not None else RR_RATIOS.get(key, self.default_rr_ratio)
+        self.min_confluence = (
+            min_confluence if min_confluence is not None
+            else MIN_CONFLUENCE_FACTORS.get(key, self.default_min_confluence)
+        )
+        if self.rr_ratio is None or self.min_confluence is None:
+            raise ValueError(f'Setup {key} has no default rr_ratio or min_confluence')
+
+    @abstractmethod
+    def evaluate(self, context: MarketContext) -> Optional[TradeSignal]:
+        """
+        Проверить условия сетапа на последней закрытой свече
+
+        Args:
+            context: Результаты индикаторов
+
+        Returns:
+            TradeSignal или None
+        """
+
+    def _signal(
+        self,
+        context: MarketContext,
+        side: TradingSide,
+        stop_level: float,
+        factors: int
+    ) -> Optional[TradeSignal]:
+        """Собрать сигнал: стоп за уровнем, тейк по rr_ratio, проверка confluence (factors - маска)"""
+        if confluence.count(factors) < self.min_confluence:
+            return None
+
+        entry = context.last_close
+        if side == TradingSide.LONG:
+            stop = stop_level * (1 - STOP_BUFFER)
+            risk = entry - stop
+        else:
+            stop = stop_level * (1 + STOP_BUFFER)
+            risk = stop - entry
+        if risk <= 0:
+            return None
+
+        take_profit = entry + risk * self.rr_ratio if side == TradingSide.LONG else entry - risk * self.rr_ratio
+        return TradeSignal(
+            setup_type=setup_key(self.setup_type),
+            pair=context.pair,
+            timeframe=context.timeframe,
+            side=side,
+            entry_price=entry,
+            stop_loss=stop,
+            take_profit=take_profit,
+            rr_ratio=self.rr_ratio,
+            timestamp=int(context.window.timestamp[-1]),
+            confluence_mask=factors
+        )
+
+
+# Зарегистрированные сетапы в порядке регистрации
+SETUP_REGISTRY: Dict[str, Type[BaseSetup]] = {}
+
+
+def register_setup(cls: Type[BaseSetup]) -> Type[BaseSetup]:
+    """Декоратор регистрации сетапа (ключ - setup_key(setup_type))"""
+    key = setup_key(cls.setup_type)
+    if key in SETUP_REGISTRY and SETUP_REGISTRY[key] is not cls:
+        raise ValueError(f'Setup {key} is already registered by {SETUP_REGISTRY[key].__name__}')
+    SETUP_REGISTRY[key] = cls
+    return cls
+
+
+def create_setups(enabled: Optional[List[str]] = None) -> List[BaseSetup]:
+    """
+    Экземпляры зарегистрированных сетапов
+
+    Args:
+        enabled: setup_type включенных сетапов (BotSettings.enabled_setup);
+            по умолчанию - все
+    """
+    return [
+        cls() for key, cls in SETUP_REGISTRY.items()
+        if not enabled or key in enabled
+    ]
@@ -0,0 +1,93 @@
+"""
+Факторы confluence в виде битовых масок
+
+Бит фактора - его позиция в CONFLUENCE_FACTORS. Маски хранятся в БД,
+поэтому назначение битов не зависит от порядка импорта: фактор сетапа-
+плагина добавляется в конец CONFLUENCE_FACTORS. Сетапы собирают факторы сигнала в целое
+число операцией |, число факторов - popcount маски. Названия факторов
+нужны только на границе с уведомлениями и БД (decode).
+
+Маски сигналов и сделок обрабатываются массивами NumPy: фильтр по
+минимальному числу факторов, выборка сделок с набором факторов
+(mask & required == required) и win rate по комбинациям без разбора
+списков строк.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import CONFLUENCE_FACTORS
+
+# Маски хранятся в BIGINT
+MAX_FACTORS = 63
+
+if len(CONFLUENCE_FACTORS) > MAX_FACTORS:
+    raise ValueError(f'Too many confluence factors: {len(CONFLUENCE_FACTORS)} > {MAX_FACTORS}')
+
+# Бит маски по имени фактора
+FACTOR_BITS: Dict[str, int] = {name: 1 << index for index, name in enumerate(CONFLUENCE_FACTORS)}
+
+
+def factor_bits(*names: str) -> Tuple[int, ...]:
+    """Биты факторов (для констант модулей сетапов)"""
+    return tuple(FACTOR_BITS[name] for name in names)
+
+
+def encode(names: Iterable[str]) -> int:
+    """Маска набора факторов"""
+    mask = 0
+    for name in names:
+        mask |= FACTOR_BITS[name]
+    return mask
+
+
+def decode(mask: int) -> List[str]:
+    """Названия факторов маски в порядке битов"""
+    return [name for name, bit in FACTOR_BITS.items() if mask & bit]
+
+
+def count(mask: int) -> int:
+    """Число факторов в маске"""
+    return int(mask).bit_count()
+
+
+def counts(masks: np.ndarray) -> np.ndarray:
+    """Число факторов для массива масок"""
+    return np.bitwise_count(np.asarray(masks, dtype=np.int64)).astype(np.int64)
+
+
+def has_all(masks: np.ndarray, names: Iterable[str]) -> np.ndarray:
+    """Маски, содержащие все факторы names"""
+    required = encode(names)
+    return (np.asarray(masks, dtype=np.int64) & required) == required
+
+
+def win_rate(masks: np.ndarray, pnl: np.ndarray, names: Iterable[str] = ()) -> Tuple[int, Optional[float]]:
+    """
+    Win rate сделок, у которых есть все факторы names
+
+    Returns:
+        (количество сделок, win rate в % или None без сделок)
+    """
+    selected = np.asarray(pnl, dtype=np.float64)[has_all(masks, names)]
+    if not len(selected):
+        return 0, None
+    return len(selected), float((selected > 0).mean() * 100)
+
+
+def factor_win_rates(masks: np.ndarray, pnl: np.ndarray) -> Dict[str, Tuple[int, Optional[float]]]:
+    """
+    Win rate сделок с каждым фактором
+
+    Все факторы считаются одной операцией над матрицей битов (сделки x факторы).
+    """
+    masks = np.asarray(masks, dtype=np.int64)
+    wins = np.asarray(pnl, dtype=np.float64) > 0
+    bits = np.array(list(FACTOR_BITS.values()), dtype=np.int64)
+    present = (masks[:, None] & bits) != 0
+    totals = present.sum(axis=0)
+    won = (present & wins[:, None]).sum(axis=0)
+    return {
+        name: (int(total), float(hits / total * 100) if total else None)
+        for name, total, hits in zip(FACTOR_BITS, totals.tolist(), won.tolist())
+    }
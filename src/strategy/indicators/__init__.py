@@ -2,10 +2,13 @@ from .order_block import OrderBlockDetector
 from .liquidity_zone import LiquidityZoneDetector
 from .volume_profile import VolumeProfileAnalyzer
 from .cvd import CVDCalculator
+from .swing_points import SwingIndexRegistry, SwingPointIndex
 
 __all__ = [
     'OrderBlockDetector',
     'LiquidityZoneDetector',
     'VolumeProfileAnalyzer',
-    'CVDCalculator'
+    'CVDCalculator',
+    'SwingIndexRegistry',
+    'SwingPointIndex'
 ]
\ No newline at end of file
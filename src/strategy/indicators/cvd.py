@@ -0,0 +1,154 @@
+"""
+Калькулятор CVD (Cumulative Volume Delta)
+
+Все расчеты выполняются над матрицами (пары, свечи), чтобы обрабатывать
+все отслеживаемые пары одним векторизованным вызовом на таймфрейм.
+Одномерные массивы трактуются как одна пара.
+
+Дельта свечи берется из сделок (покупки - продажи), если она известна,
+иначе оценивается по свече: volume * (close - open) / (high - low).
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from src.config.constants import CVD_SETTINGS
+
+
+@dataclass
+class CVDResult:
+    """Результат расчета CVD для группы пар"""
+    delta: np.ndarray           # дельта по свечам, (пары, свечи)
+    cvd: np.ndarray             # CVD со сбросом каждые reset_period часов
+    flow_ratio: np.ndarray      # чистая дельта окна / объем окна, в [-1, 1]
+    divergence: np.ndarray      # 1 - бычья, -1 - медвежья, 0 - нет (int8)
+
+    @property
+    def last_divergence(self) -> np.ndarray:
+        """Дивергенция на последней свече каждой пары"""
+        return self.divergence[:, -1]
+
+
+class CVDCalculator:
+    """Калькулятор CVD и дивергенций цена/CVD"""
+
+    def __init__(
+        self,
+        reset_period: int = CVD_SETTINGS['reset_period'],
+        divergence_threshold: float = CVD_SETTINGS['divergence_threshold'],
+        lookback: int = CVD_SETTINGS['divergence_lookback']
+    ):
+        """
+        Args:
+            reset_period: Период сброса CVD в часах
+            divergence_threshold: Минимальная доля чистой дельты в объеме окна
+            lookback: Окно поиска дивергенции в свечах
+        """
+        self.reset_ms = int(reset_period * 3600 * 1000)
+        self.divergence_threshold = divergence_threshold
+        self.lookback = lookback
+
+    @staticmethod
+    def estimate_delta(
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray
+    ) -> np.ndarray:
+        """Оценить дельту по свечам (доля тела в диапазоне свечи)"""
+        spread = high - low
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = volume * (close - open) / spread
+        return np.where(spread > 0, delta, 0.0)
+
+    def cumulative(self, delta: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Накопленная дельта со сбросом в начале каждого периода reset_period
+
+        Args:
+            delta: Дельта, (пары, свечи)
+            timestamps: Время открытия свечей в мс, (свечи,) или (пары, свечи)
+
+        Returns:
+            CVD той же формы, что и delta
+        """
+        sessions = np.broadcast_to(np.asarray(timestamps) // self.reset_ms, delta.shape)
+        starts = np.ones(delta.shape, dtype=bool)
+        starts[:, 1:] = sessions[:, 1:] != sessions[:, :-1]
+
+        running = np.cumsum(delta, axis=1)
+        before = running - delta
+
+        # Индекс начала текущей сессии для каждой свечи
+        start_index = np.where(starts, np.arange(delta.shape[1]), 0)
+        np.maximum.accumulate(start_index, axis=1, out=start_index)
+        return running - np.take_along_axis(before, start_index, axis=1)
+
+    def flow_ratio(self, delta: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        """Чистая дельта / объем в скользящем окне lookback свечей"""
+        window = self.lookback
+        net = np.cumsum(delta, axis=1)
+        total = np.cumsum(volume, axis=1)
+        net[:, window:] = net[:, window:] - net[:, :-window]
+        total[:, window:] = total[:, window:] - total[:, :-window]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = net / total
+        return np.where(total > 0, ratio, 0.0)
+
+    def divergence(self, close: np.ndarray, flow_ratio: np.ndarray) -> np.ndarray:
+        """
+        Дивергенция цены и потока объема за окно lookback
+
+        Медвежья: цена за окно выросла, а чистая дельта отрицательна
+        и по модулю превышает divergence_threshold. Бычья - зеркально.
+        """
+        window = self.lookback
+        change = np.zeros(close.shape)
+        change[:, window:] = close[:, window:] - close[:, :-window]
+
+        signal = np.zeros(close.shape, dtype=np.int8)
+        signal[(change < 0) & (flow_ratio >= self.divergence_threshold)] = 1
+        signal[(change > 0) & (flow_ratio <= -self.divergence_threshold)] = -1
+        return signal
+
+    def calculate(
+        self,
+        timestamps: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        trade_delta: Optional[np.ndarray] = None
+    ) -> CVDResult:
+        """
+        Рассчитать CVD и дивергенции для всех пар за один вызов
+
+        Args:
+            timestamps: Время открытия свечей в мс, (свечи,) или (пары, свечи)
+            open, high, low, close, volume: Матрицы (пары, свечи)
+            trade_delta: Дельта по сделкам той же формы; NaN - нет данных,
+                для таких свечей используется оценка по свече
+
+        Returns:
+            CVDResult
+        """
+        open, high, low, close, volume = (
+            np.atleast_2d(np.asarray(column, dtype=np.float64))
+            for column in (open, high, low, close, volume)
+        )
+
+        delta = self.estimate_delta(open, high, low, close, volume)
+        if trade_delta is not None:
+            trade_delta = np.atleast_2d(np.asarray(trade_delta, dtype=np.float64))
+            delta = np.where(np.isnan(trade_delta), delta, trade_delta)
+
+        ratio = self.flow_ratio(delta, volume)
+        return CVDResult(
+            delta=delta,
+            cvd=self.cumulative(delta, timestamps),
+            flow_ratio=ratio,
+            divergence=self.divergence(close, ratio)
+        )
@@ -0,0 +1,177 @@
+"""
+Детектор зон ликвидности
+
+Источники ликвидности:
+    - равные максимумы (buy-side) и равные минимумы (sell-side),
+      найденные по общему SwingPointIndex
+    - максимумы и минимумы завершенных торговых сессий (LIQUIDITY_TIME_ZONES)
+
+Стены стакана (OrderBook.walls) у уровня зоны записываются в
+resting_volume (apply_order_book). Стакан ведется в основном процессе,
+поэтому в процессы анализа передаются только его стены.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from src.config.constants import LIQUIDITY_TIME_ZONES, ORDER_BOOK_SETTINGS
+from src.analysis.candle_store import Candle, CandleWindow
+from src.exchange.order_book import Wall
+from src.strategy.indicators.swing_points import SwingPointIndex
+
+HOUR_MS = 3600 * 1000
+
+
+@dataclass
+class LiquidityZone:
+    """Зона ликвидности"""
+    kind: str                   # buy_side, sell_side, session_high, session_low
+    price: float                # уровень, за которым стоят стопы
+    top: float
+    bottom: float
+    touches: int
+    timestamp: int              # время последнего касания/формирования
+    session: Optional[str] = None
+    resting_volume: float = 0.0  # объем стены стакана у уровня (apply_order_book)
+
+    @property
+    def is_buy_side(self) -> bool:
+        """Ликвидность над ценой (стопы шортистов)"""
+        return self.kind in ('buy_side', 'session_high')
+
+    def is_swept_by(self, candle: Candle) -> bool:
+        """Снята ли ликвидность свечой: прокол уровня тенью с закрытием обратно"""
+        if self.is_buy_side:
+            return candle.high > self.price and candle.close < self.price
+        return candle.low < self.price and candle.close > self.price
+
+
+class _SessionRange:
+    """Диапазон текущего и последнего завершенного экземпляра сессии"""
+
+    def __init__(self, start_hour: int, end_hour: int):
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.current: Optional[List[float]] = None      # [high, low, last_ts]
+        self.completed: Optional[List[float]] = None
+
+    def update(self, candle: Candle):
+        hour = candle.timestamp // HOUR_MS % 24
+        if self.start_hour <= hour < self.end_hour:
+            if self.current is None:
+                self.current = [candle.high, candle.low, candle.timestamp]
+            else:
+                self.current[0] = max(self.current[0], candle.high)
+                self.current[1] = min(self.current[1], candle.low)
+                self.current[2] = candle.timestamp
+        elif self.current is not None:
+            self.completed, self.current = self.current, None
+
+
+class LiquidityZoneDetector:
+    """Детектор зон ликвидности"""
+
+    def __init__(self, swing_index: Optional[SwingPointIndex] = None):
+        """
+        Args:
+            swing_index: Общий индекс swing-точек. Если не передан, детектор
+                создает собственный и сам наполняет его в update(); общий
+                индекс наполняет его владелец (SwingIndexRegistry.sync)
+        """
+        self.owns_index = swing_index is None
+        self.swings = swing_index or SwingPointIndex()
+        self.reset()
+
+    def reset(self):
+        """Сбросить состояние сессий (и собственного индекса)"""
+        if self.owns_index:
+            self.swings.reset()
+        self._sessions: Dict[str, _SessionRange] = {
+            name: _SessionRange(start, end)
+            for name, (start, end) in LIQUIDITY_TIME_ZONES.items()
+        }
+
+    def update(self, candle: Candle):
+        """Обработать закрытую свечу"""
+        if self.owns_index:
+            self.swings.append(candle.timestamp, candle.high, candle.low)
+        for session in self._sessions.values():
+            session.update(candle)
+
+    def detect(self, window: CandleWindow) -> List[LiquidityZone]:
+        """
+        Пересчитать зоны по полному окну свечей
+
+        Общий индекс не перестраивается: он должен быть уже синхронизирован
+        с окном владельцем.
+        """
+        self.reset()
+        for candle in zip(*(column.tolist() for column in window)):
+            self.update(Candle(*candle))
+        return self.zones()
+
+    def equal_level_zones(self) -> List[LiquidityZone]:
+        """Зоны равных максимумов и минимумов"""
+        zones = []
+        for is_high in (True, False):
+            points = self.swings.highs.points if is_high else self.swings.lows.points
+            timestamps = {point.index: point.timestamp for point in points}
+            for cluster in self.swings.equal_levels(is_high):
+                prices = [price for price, _ in cluster]
+                zones.append(LiquidityZone(
+                    kind='buy_side' if is_high else 'sell_side',
+                    price=max(prices) if is_high else min(prices),
+                    top=max(prices),
+                    bottom=min(prices),
+                    touches=len(cluster),
+                    timestamp=max(timestamps[index] for _, index in cluster)
+                ))
+        return zones
+
+    def session_zones(self) -> List[LiquidityZone]:
+        """Максимумы и минимумы последних завершенных сессий"""
+        zones = []
+        for name, session in self._sessions.items():
+            if session.completed is None:
+                continue
+            high, low, timestamp = session.completed
+            zones.append(LiquidityZone('session_high', high, high, high, 1, int(timestamp), name))
+            zones.append(LiquidityZone('session_low', low, low, low, 1, int(timestamp), name))
+        return zones
+
+    def zones(self) -> List[LiquidityZone]:
+        """Все текущие зоны ликвидности"""
+        return self.equal_level_zones() + self.session_zones()
+
+    @staticmethod
+    def apply_order_book(
+        zones: List[LiquidityZone],
+        walls: Sequence[Wall],
+        tolerance: float = ORDER_BOOK_SETTINGS['zone_tolerance']
+    ) -> List[LiquidityZone]:
+        """
+        Отметить зоны, у которых в стакане стоит стена
+
+        Под sell-side зоной ищется стена bid (лимитные покупки, на которые
+        исполнятся стопы), над buy-side - стена ask; из нескольких стен
+        берется наибольшая (как OrderBook.wall_near).
+
+        Args:
+            zones: Зоны ликвидности
+            walls: Стены стакана пары (OrderBook.walls, по убыванию объема)
+            tolerance: Допуск между уровнем зоны и стеной (в % от цены)
+
+        Returns:
+            Те же зоны с заполненным resting_volume
+        """
+        for zone in zones:
+            is_bid, offset = not zone.is_buy_side, zone.price * tolerance / 100
+            wall = next((
+                wall for wall in walls
+                if wall.is_bid == is_bid and abs(wall.price - zone.price) <= offset
+            ), None)
+            zone.resting_volume = wall.volume if wall is not None else 0.0
+        return zones
+
+    def swept_zones(self, candle: Candle) -> List[LiquidityZone]:
+        """Зоны, ликвидность которых снята данной свечой"""
+        return [zone for zone in self.zones() if zone.is_swept_by(candle)]
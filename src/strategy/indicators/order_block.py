@@ -0,0 +1,231 @@
+"""
+Детектор ордер-блоков (Order Blocks)
+
+Бычий ордер-блок - последняя медвежья свеча перед импульсной бычьей свечой,
+закрывшейся выше ее максимума. Медвежий - зеркально. Зона блока - диапазон
+high/low свечи ордер-блока.
+
+Жизненный цикл блока:
+    active -> mitigated (цена вернулась в зону) -> invalidated (закрытие за зоной)
+Инвалидированные и устаревшие (старше max_age свечей) блоки удаляются.
+
+Поддерживаются два режима с одинаковым результатом:
+    update(candle) - потоковый, O(log k) амортизированно на свечу
+    detect(window) - пересчет по полному окну (бэктесты, проверка)
+"""
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import ORDER_BLOCK_SETTINGS, TradingSide
+from src.analysis.candle_store import Candle, CandleWindow
+
+
+@dataclass
+class OrderBlock:
+    """Ордер-блок"""
+    side: TradingSide
+    top: float
+    bottom: float
+    timestamp: int          # время свечи ордер-блока
+    index: int              # номер свечи ордер-блока
+    formed_index: int       # номер импульсной свечи, подтвердившей блок
+    mitigated: bool = False
+
+    def contains(self, price: float) -> bool:
+        """Находится ли цена внутри зоны блока"""
+        return self.bottom <= price <= self.top
+
+
+class OrderBlockDetector:
+    """Детектор ордер-блоков"""
+
+    def __init__(
+        self,
+        min_body_ratio: float = ORDER_BLOCK_SETTINGS['min_body_ratio'],
+        max_age: int = ORDER_BLOCK_SETTINGS['max_age']
+    ):
+        """
+        Args:
+            min_body_ratio: Минимальная доля тела импульсной свечи в ее диапазоне
+            max_age: Сколько свечей после подтверждения блок остается в работе
+        """
+        self.min_body_ratio = min_body_ratio
+        self.max_age = max_age
+        self.reset()
+
+    def reset(self):
+        """Сбросить состояние потокового детектора"""
+        self._index = -1
+        self._previous: Optional[Candle] = None
+        self._blocks: Dict[int, OrderBlock] = {}
+        self._order: Deque[int] = deque()
+
+        # Кучи с ленивым удалением: (ключ, id блока)
+        self._bull_touch: List[Tuple[float, int]] = []     # -top, ждут возврата цены
+        self._bull_break: List[Tuple[float, int]] = []     # -bottom, ждут закрытия ниже
+        self._bear_touch: List[Tuple[float, int]] = []     # bottom
+        self._bear_break: List[Tuple[float, int]] = []     # top
+
+    @property
+    def last_index(self) -> int:
+        """Номер последней обработанной свечи (с reset())"""
+        return self._index
+
+    @property
+    def active_blocks(self) -> List[OrderBlock]:
+        """Действующие (не инвалидированные) блоки в порядке появления"""
+        return list(self._blocks.values())
+
+    def _is_impulse(self, candle: Candle) -> bool:
+        body = abs(candle.close - candle.open)
+        return body > 0 and body >= self.min_body_ratio * (candle.high - candle.low)
+
+    def update(self, candle: Candle) -> Optional[OrderBlock]:
+        """
+        Обработать очередную закрытую свечу
+
+        Args:
+            candle: Закрытая свеча
+
+        Returns:
+            Новый ордер-блок, если свеча его подтвердила
+        """
+        self._index += 1
+        index = self._index
+
+        self._expire(index)
+        self._apply_price(candle)
+
+        block = None
+        previous = self._previous
+        if previous is not None and self._is_impulse(candle):
+            if (previous.close < previous.open and candle.close > candle.open
+                    and candle.close > previous.high):
+                block = self._add(TradingSide.LONG, previous, index)
+            elif (previous.close > previous.open and candle.close < candle.open
+                    and candle.close < previous.low):
+                block = self._add(TradingSide.SHORT, previous, index)
+
+        self._previous = candle
+        return block
+
+    def _add(self, side: TradingSide, candle: Candle, formed_index: int) -> OrderBlock:
+        block = OrderBlock(
+            side=side,
+            top=candle.high,
+            bottom=candle.low,
+            timestamp=candle.timestamp,
+            index=formed_index - 1,
+            formed_index=formed_index
+        )
+        key = formed_index
+        self._blocks[key] = block
+        self._order.append(key)
+
+        if side == TradingSide.LONG:
+            heapq.heappush(self._bull_touch, (-block.top, key))
+            heapq.heappush(self._bull_break, (-block.bottom, key))
+        else:
+            heapq.heappush(self._bear_touch, (block.bottom, key))
+            heapq.heappush(self._bear_break, (block.top, key))
+        return block
+
+    def _expire(self, index: int):
+        while self._order and index - self._order[0] > self.max_age:
+            self._blocks.pop(self._order.popleft(), None)
+
+        heaps = (self._bull_touch, self._bull_break, self._bear_touch, self._bear_break)
+        if sum(map(len, heaps)) > 4 * len(self._blocks) + 64:
+            self._compact()
+
+    def _compact(self):
+        """Удалить из куч записи уже снятых блоков"""
+        for name in ('_bull_touch', '_bull_break', '_bear_touch', '_bear_break'):
+            heap = [item for item in getattr(self, name) if item[1] in self._blocks]
+            heapq.heapify(heap)
+            setattr(self, name, heap)
+
+    def _apply_price(self, candle: Candle):
+        blocks = self._blocks
+
+        # Инвалидация: закрытие за границей зоны
+        heap = self._bull_break
+        while heap and -heap[0][0] > candle.close:
+            blocks.pop(heapq.heappop(heap)[1], None)
+        heap = self._bear_break
+        while heap and heap[0][0] < candle.close:
+            blocks.pop(heapq.heappop(heap)[1], None)
+
+        # Митигация: возврат цены в зону
+        heap = self._bull_touch
+        while heap and -heap[0][0] >= candle.low:
+            block = blocks.get(heapq.heappop(heap)[1])
+            if block is not None:
+                block.mitigated = True
+        heap = self._bear_touch
+        while heap and heap[0][0] <= candle.high:
+            block = blocks.get(heapq.heappop(heap)[1])
+            if block is not None:
+                block.mitigated = True
+
+    def detect(self, window: CandleWindow) -> List[OrderBlock]:
+        """
+        Найти действующие ордер-блоки по полному окну свечей
+
+        Результат совпадает с active_blocks после подачи тех же свечей
+        в update() начиная с reset().
+
+        Args:
+            window: Окно свечей
+
+        Returns:
+            Список действующих блоков в порядке появления
+        """
+        open_ = np.asarray(window.open)
+        high = np.asarray(window.high)
+        low = np.asarray(window.low)
+        close = np.asarray(window.close)
+        timestamps = np.asarray(window.timestamp)
+        count = len(close)
+        if count < 2:
+            return []
+
+        body = close - open_
+        impulse = (body[1:] != 0) & (np.abs(body[1:]) >= self.min_body_ratio * (high[1:] - low[1:]))
+        bullish = impulse & (body[:-1] < 0) & (body[1:] > 0) & (close[1:] > high[:-1])
+        bearish = impulse & (body[:-1] > 0) & (body[1:] < 0) & (close[1:] < low[:-1])
+
+        first_alive = max(count - 1 - self.max_age, 0)
+        candidates = np.flatnonzero(bullish | bearish)
+        candidates = candidates[candidates + 1 >= first_alive]
+
+        blocks = []
+        for index in candidates.tolist():
+            formed = index + 1
+            top, bottom = float(high[index]), float(low[index])
+            end = min(count, formed + self.max_age + 1)
+            is_long = bool(bullish[index])
+
+            if is_long:
+                if (close[formed + 1:end] < bottom).any():
+                    continue
+                mitigated = bool((low[formed + 1:end] <= top).any())
+            else:
+                if (close[formed + 1:end] > top).any():
+                    continue
+                mitigated = bool((high[formed + 1:end] >= bottom).any())
+
+            blocks.append(OrderBlock(
+                side=TradingSide.LONG if is_long else TradingSide.SHORT,
+                top=top,
+                bottom=bottom,
+                timestamp=int(timestamps[index]),
+                index=index,
+                formed_index=formed,
+                mitigated=mitigated
+            ))
+        return blocks
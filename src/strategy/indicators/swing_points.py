@@ -0,0 +1,278 @@
+"""
+Индекс swing-точек (локальных максимумов и минимумов)
+
+Swing high на свече i подтверждается, когда ее максимум - наибольший
+в окне [i - depth, i + depth] (для равных значений берется более поздняя
+свеча). Максимум и минимум окна ведутся монотонными деками, поэтому
+добавление свечи стоит O(1) амортизированно, а построение по окну - O(n).
+
+Цены подтвержденных точек хранятся в отсортированных списках, что дает
+поиск и кластеризацию равных уровней с допуском за O(log n + k).
+
+Один индекс рассчитан на совместное использование: его читают
+LiquidityZoneDetector, сетап Liquidity Grab и анализ структуры рынка.
+SwingIndexRegistry хранит по индексу на (пару, таймфрейм) и подает в него
+каждую закрытую свечу один раз, сколько бы потребителей ни
+синхронизировали серию.
+"""
+import bisect
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import LIQUIDITY_SETTINGS, TimeFrame
+from src.analysis.candle_store import CandleWindow
+
+IndexKey = Tuple[str, TimeFrame]
+# on_close(timestamp, close) - вызывается после добавления свечи в индекс
+CloseListener = Callable[[int, float], None]
+
+
+class SwingPoint(NamedTuple):
+    """Подтвержденная swing-точка"""
+    index: int
+    timestamp: int
+    price: float
+    is_high: bool
+
+
+class _SortedLevels:
+    """Отсортированные цены swing-точек одного типа с ограничением по размеру"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.points: Deque[SwingPoint] = deque()
+        self.prices: List[Tuple[float, int]] = []
+
+    def add(self, point: SwingPoint):
+        self.points.append(point)
+        bisect.insort(self.prices, (point.price, point.index))
+        if len(self.points) > self.limit:
+            old = self.points.popleft()
+            del self.prices[bisect.bisect_left(self.prices, (old.price, old.index))]
+
+    def near(self, price: float, tolerance: float) -> List[Tuple[float, int]]:
+        lo = bisect.bisect_left(self.prices, (price * (1 - tolerance), -1))
+        hi = bisect.bisect_right(self.prices, (price * (1 + tolerance), float('inf')))
+        return self.prices[lo:hi]
+
+    def clusters(self, tolerance: float) -> List[List[Tuple[float, int]]]:
+        """Группы уровней, отличающихся от первого в группе не более чем на tolerance"""
+        groups: List[List[Tuple[float, int]]] = []
+        for level in self.prices:
+            if groups and level[0] <= groups[-1][0][0] * (1 + tolerance):
+                groups[-1].append(level)
+            else:
+                groups.append([level])
+        return [group for group in groups if len(group) > 1]
+
+
+class SwingPointIndex:
+    """Потоковый индекс swing-точек"""
+
+    def __init__(
+        self,
+        depth: int = LIQUIDITY_SETTINGS['swing_depth'],
+        tolerance: float = LIQUIDITY_SETTINGS['equal_level_tolerance'],
+        max_swings: int = LIQUIDITY_SETTINGS['max_swings']
+    ):
+        """
+        Args:
+            depth: Количество свечей с каждой стороны для подтверждения точки
+            tolerance: Допуск равенства уровней в % от цены
+            max_swings: Сколько последних точек каждого типа хранить
+        """
+        self.depth = depth
+        self.tolerance = tolerance / 100
+        self.max_swings = max_swings
+        self._listeners: List[Callable[[SwingPoint], None]] = []
+        self.reset()
+
+    def reset(self):
+        """Очистить индекс"""
+        self._index = -1
+        self._max_deque: Deque[Tuple[int, float, int]] = deque()
+        self._min_deque: Deque[Tuple[int, float, int]] = deque()
+        self.highs = _SortedLevels(self.max_swings)
+        self.lows = _SortedLevels(self.max_swings)
+
+    def subscribe(self, listener: Callable[[SwingPoint], None]):
+        """Подписаться на подтверждение новых swing-точек"""
+        self._listeners.append(listener)
+
+    @property
+    def last_index(self) -> int:
+        """Номер последней добавленной свечи"""
+        return self._index
+
+    @property
+    def swing_highs(self) -> List[SwingPoint]:
+        """Подтвержденные swing high в хронологическом порядке"""
+        return list(self.highs.points)
+
+    @property
+    def swing_lows(self) -> List[SwingPoint]:
+        """Подтвержденные swing low в хронологическом порядке"""
+        return list(self.lows.points)
+
+    def last_high(self) -> Optional[SwingPoint]:
+        return self.highs.points[-1] if self.highs.points else None
+
+    def last_low(self) -> Optional[SwingPoint]:
+        return self.lows.points[-1] if self.lows.points else None
+
+    def append(self, timestamp: int, high: float, low: float) -> List[SwingPoint]:
+        """
+        Добавить закрытую свечу
+
+        Returns:
+            Swing-точки, подтвержденные этой свечой (с задержкой depth свечей)
+        """
+        self._index += 1
+        index = self._index
+        oldest = index - 2 * self.depth
+
+        maxima = self._max_deque
+        while maxima and maxima[-1][1] <= high:
+            maxima.pop()
+        maxima.append((index, high, timestamp))
+        if maxima[0][0] < oldest:
+            maxima.popleft()
+
+        minima = self._min_deque
+        while minima and minima[-1][1] >= low:
+            minima.pop()
+        minima.append((index, low, timestamp))
+        if minima[0][0] < oldest:
+            minima.popleft()
+
+        confirmed = []
+        if oldest >= 0:
+            center = index - self.depth
+            if maxima[0][0] == center:
+                point = SwingPoint(center, maxima[0][2], maxima[0][1], True)
+                self.highs.add(point)
+                confirmed.append(point)
+            if minima[0][0] == center:
+                point = SwingPoint(center, minima[0][2], minima[0][1], False)
+                self.lows.add(point)
+                confirmed.append(point)
+
+        for point in confirmed:
+            for listener in self._listeners:
+                listener(point)
+        return confirmed
+
+    def build(self, window: CandleWindow) -> 'SwingPointIndex':
+        """Перестроить индекс по окну свечей за O(n)"""
+        self.reset()
+        for timestamp, high, low in zip(window.timestamp.tolist(), window.high.tolist(), window.low.tolist()):
+            self.append(timestamp, high, low)
+        return self
+
+    def levels_near(self, price: float, is_high: bool) -> List[Tuple[float, int]]:
+        """Уровни swing-точек в пределах допуска от цены: (price, index)"""
+        levels = self.highs if is_high else self.lows
+        return levels.near(price, self.tolerance)
+
+    def equal_levels(self, is_high: bool) -> List[List[Tuple[float, int]]]:
+        """Кластеры равных максимумов (is_high) или минимумов"""
+        levels = self.highs if is_high else self.lows
+        return levels.clusters(self.tolerance)
+
+
+class SwingIndexRegistry:
+    """
+    Общие индексы swing-точек по (паре, таймфрейму)
+
+    sync() добавляет в индекс только свечи окна, закрытые после последней
+    добавленной. Если окно не продолжает индекс (разрыв или откат истории),
+    индекс очищается, подписчики on_reset уведомляются, и свечи окна
+    подаются заново.
+    """
+
+    def __init__(
+        self,
+        depth: int = LIQUIDITY_SETTINGS['swing_depth'],
+        tolerance: float = LIQUIDITY_SETTINGS['equal_level_tolerance'],
+        max_swings: int = LIQUIDITY_SETTINGS['max_swings']
+    ):
+        self.depth = depth
+        self.tolerance = tolerance
+        self.max_swings = max_swings
+        self.indexes: Dict[IndexKey, SwingPointIndex] = {}
+        self._last: Dict[IndexKey, int] = {}
+        self._close_listeners: Dict[IndexKey, List[CloseListener]] = defaultdict(list)
+        self._reset_listeners: Dict[IndexKey, List[Callable[[], None]]] = defaultdict(list)
+
+    def index(self, pair: str, timeframe: TimeFrame) -> SwingPointIndex:
+        """Индекс серии (создается при первом обращении)"""
+        key = (pair, TimeFrame(timeframe))
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = SwingPointIndex(self.depth, self.tolerance, self.max_swings)
+        return index
+
+    def subscribe(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        on_close: Optional[CloseListener] = None,
+        on_reset: Optional[Callable[[], None]] = None
+    ):
+        """
+        Подписаться на свечи серии
+
+        Args:
+            on_close: Вызывается после добавления каждой свечи в индекс
+            on_reset: Вызывается при очистке индекса перед повторной подачей свечей
+        """
+        key = (pair, TimeFrame(timeframe))
+        if on_close is not None:
+            self._close_listeners[key].append(on_close)
+        if on_reset is not None:
+            self._reset_listeners[key].append(on_reset)
+
+    def reset(self, pair: str, timeframe: TimeFrame):
+        """Очистить индекс серии; следующий sync() подаст окно целиком"""
+        key = (pair, TimeFrame(timeframe))
+        self.index(*key).reset()
+        self._last.pop(key, None)
+        for listener in self._reset_listeners.get(key, ()):
+            listener()
+
+    def sync(self, pair: str, timeframe: TimeFrame, window: CandleWindow) -> SwingPointIndex:
+        """
+        Добавить в индекс закрытые свечи окна, появившиеся с прошлого вызова
+
+        Returns:
+            Индекс серии
+        """
+        key = (pair, TimeFrame(timeframe))
+        index = self.index(*key)
+        timestamps = window.timestamp
+        if not len(timestamps):
+            return index
+
+        start = 0
+        last = self._last.get(key)
+        if last is not None:
+            position = int(np.searchsorted(timestamps, last))
+            if position < len(timestamps) and timestamps[position] == last:
+                start = position + 1
+            else:
+                self.reset(*key)
+        elif index.last_index >= 0:
+            self.reset(*key)
+
+        listeners = self._close_listeners.get(key, ())
+        for timestamp, high, low, close in zip(
+            timestamps[start:].tolist(), window.high[start:].tolist(),
+            window.low[start:].tolist(), window.close[start:].tolist()
+        ):
+            index.append(timestamp, high, low)
+            for listener in listeners:
+                listener(timestamp, close)
+        self._last[key] = int(timestamps[-1])
+        return index
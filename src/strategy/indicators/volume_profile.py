@@ -0,0 +1,356 @@
+"""
+Анализатор Volume Profile (POC и Value Area)
+
+Профиль строится гистограммой по ценовым уровням фиксированного шага:
+объем каждой свечи равномерно распределяется по уровням между ее low и high.
+Распределение записывается в разностный массив (две точки на свечу через
+np.bincount), профиль получается его накопленной суммой. Это позволяет:
+    - строить профили для многих пар одним вызовом (calculate_batch)
+    - вести скользящий профиль, добавляя новую свечу и вычитая
+      выбывающую без перестроения (RollingVolumeProfile)
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.config.constants import TimeFrame, VOLUME_PROFILE_SETTINGS
+from src.analysis.candle_store import CandleWindow
+
+
+@dataclass
+class VolumeProfile:
+    """Профиль объема одной пары"""
+    poc: float
+    value_area_high: float
+    value_area_low: float
+    total_volume: float
+    bin_size: float
+    price_start: float          # нижняя граница первого уровня
+    volumes: np.ndarray         # объем по уровням
+
+    @property
+    def price_levels(self) -> np.ndarray:
+        """Цены середин уровней"""
+        return self.price_start + (np.arange(len(self.volumes)) + 0.5) * self.bin_size
+
+    def in_value_area(self, price: float) -> bool:
+        """Находится ли цена внутри Value Area"""
+        return self.value_area_low <= price <= self.value_area_high
+
+
+@dataclass
+class VolumeProfileBatch:
+    """Профили объема группы пар (по строке на пару)"""
+    poc: np.ndarray
+    value_area_high: np.ndarray
+    value_area_low: np.ndarray
+    total_volume: np.ndarray
+    bin_size: np.ndarray
+    price_start: np.ndarray
+    volumes: np.ndarray         # форма (пары, уровни), строки дополнены нулями
+
+
+def _bin_edges(low: np.ndarray, high: np.ndarray, start: np.ndarray, bin_size: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Номера первого и последнего уровня, которые покрывает каждая свеча"""
+    lo = np.floor((low - start) / bin_size).astype(np.int64)
+    hi = np.floor((high - start) / bin_size).astype(np.int64)
+    return lo, np.maximum(hi, lo)
+
+
+def _value_area(volumes: list, poc_index: int, target: float) -> Tuple[int, int]:
+    """
+    Расширить Value Area от POC в сторону большего соседнего объема
+
+    Returns:
+        Индексы нижнего и верхнего уровня Value Area
+    """
+    lo = hi = poc_index
+    accumulated = volumes[poc_index]
+    last = len(volumes) - 1
+    while accumulated < target and (lo > 0 or hi < last):
+        up = volumes[hi + 1] if hi < last else -1.0
+        down = volumes[lo - 1] if lo > 0 else -1.0
+        if up >= down:
+            hi += 1
+            accumulated += up
+        else:
+            lo -= 1
+            accumulated += down
+    return lo, hi
+
+
+def _value_area_batch(volumes: np.ndarray, poc_index: np.ndarray, target: np.ndarray, sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Векторизованный _value_area для матрицы профилей (шаг цикла - один уровень для всех пар)"""
+    rows = np.arange(len(volumes))
+    lo = poc_index.copy()
+    hi = poc_index.copy()
+    accumulated = volumes[rows, poc_index]
+    last = sizes - 1
+
+    # Заглушка -1 за краями профиля, как в _value_area
+    padded = np.pad(volumes, ((0, 0), (1, 1)), constant_values=-1.0)
+
+    for _ in range(volumes.shape[1]):
+        active = (accumulated < target) & ((lo > 0) | (hi < last))
+        if not active.any():
+            break
+        up = np.where(hi < last, padded[rows, hi + 2], -1.0)
+        down = padded[rows, lo]
+        go_up = active & (up >= down)
+        go_down = active & ~go_up
+        hi += go_up
+        lo -= go_down
+        accumulated += np.where(go_up, up, 0.0) + np.where(go_down, down, 0.0)
+    return lo, hi
+
+
+class VolumeProfileAnalyzer:
+    """Анализатор профиля объема"""
+
+    def __init__(
+        self,
+        value_area_percentage: float = VOLUME_PROFILE_SETTINGS['value_area_percentage'],
+        bin_resolution: Optional[Dict[int, float]] = None
+    ):
+        """
+        Args:
+            value_area_percentage: Процент объема для Value Area
+            bin_resolution: Шаг уровня в % от цены по tier пары (для
+                tier без значения - шаг tier 2)
+        """
+        self.value_area_ratio = value_area_percentage / 100
+        self.bin_resolution = bin_resolution or VOLUME_PROFILE_SETTINGS['price_bin_resolution']
+
+    @staticmethod
+    def periods_for(timeframe: TimeFrame) -> Optional[int]:
+        """Количество свечей в профиле для таймфрейма (profile_periods)"""
+        return VOLUME_PROFILE_SETTINGS['profile_periods'].get(TimeFrame(timeframe))
+
+    def bin_size(self, price: float, tier: int = 2) -> float:
+        """Шаг ценового уровня для пары заданного tier"""
+        resolution = self.bin_resolution.get(tier, self.bin_resolution[2])
+        return float(price) * resolution / 100
+
+    def calculate(
+        self,
+        window: CandleWindow,
+        tier: int = 2,
+        bin_size: Optional[float] = None
+    ) -> Optional[VolumeProfile]:
+        """
+        Построить профиль по окну свечей
+
+        Args:
+            window: Окно свечей
+            tier: Tier пары (определяет шаг уровня)
+            bin_size: Явный шаг уровня
+
+        Returns:
+            VolumeProfile или None для пустого окна
+        """
+        if not len(window):
+            return None
+        if bin_size is None:
+            bin_size = self.bin_size(window.close[-1], tier)
+
+        high = np.asarray(window.high)[None, :]
+        low = np.asarray(window.low)[None, :]
+        volume = np.asarray(window.volume)[None, :]
+        volumes, start, sizes = self._histogram(high, low, volume, np.array([bin_size]))
+        return self._profile(volumes[0, :sizes[0]], float(start[0]), float(bin_size))
+
+    def calculate_batch(
+        self,
+        high: np.ndarray,
+        low: np.ndarray,
+        volume: np.ndarray,
+        bin_sizes: np.ndarray
+    ) -> VolumeProfileBatch:
+        """
+        Построить профили сразу для группы пар
+
+        Args:
+            high: Максимумы, форма (пары, свечи)
+            low: Минимумы, форма (пары, свечи)
+            volume: Объемы, форма (пары, свечи)
+            bin_sizes: Шаг уровня для каждой пары, форма (пары,)
+
+        Returns:
+            VolumeProfileBatch
+        """
+        bin_sizes = np.asarray(bin_sizes, dtype=np.float64)
+        volumes, start, sizes = self._histogram(
+            np.asarray(high, dtype=np.float64),
+            np.asarray(low, dtype=np.float64),
+            np.asarray(volume, dtype=np.float64),
+            bin_sizes
+        )
+
+        total = volumes.sum(axis=1)
+        poc_index = volumes.argmax(axis=1)
+        lo, hi = _value_area_batch(volumes, poc_index, total * self.value_area_ratio, sizes)
+
+        return VolumeProfileBatch(
+            poc=start + (poc_index + 0.5) * bin_sizes,
+            value_area_high=start + (hi + 1) * bin_sizes,
+            value_area_low=start + lo * bin_sizes,
+            total_volume=total,
+            bin_size=bin_sizes,
+            price_start=start,
+            volumes=volumes
+        )
+
+    def rolling(self, timeframe: TimeFrame, bin_size: float) -> 'RollingVolumeProfile':
+        """Создать скользящий профиль с длиной окна из profile_periods"""
+        periods = self.periods_for(timeframe)
+        if periods is None:
+            raise ValueError(f'No profile period configured for {timeframe}')
+        return RollingVolumeProfile(periods, bin_size, self.value_area_ratio)
+
+    @staticmethod
+    def _histogram(high: np.ndarray, low: np.ndarray, volume: np.ndarray, bin_sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Гистограммы объема по уровням для матрицы свечей
+
+        Returns:
+            (volumes (пары, уровни), начало сетки по парам, число уровней по парам)
+        """
+        pairs = high.shape[0]
+        step = bin_sizes[:, None]
+        start = np.floor(low.min(axis=1) / bin_sizes) * bin_sizes
+
+        lo, hi = _bin_edges(low, high, start[:, None], step)
+        # Из-за округления start может оказаться на уровень выше минимума - сдвигаем сетку
+        shift = np.minimum(lo.min(axis=1), 0)
+        lo -= shift[:, None]
+        hi -= shift[:, None]
+        start = start + shift * bin_sizes
+        sizes = hi.max(axis=1) + 1
+        width = int(sizes.max()) + 1
+
+        share = volume / (hi - lo + 1)
+        offsets = (np.arange(pairs) * width)[:, None]
+        diff = np.bincount(
+            np.concatenate(((lo + offsets).ravel(), (hi + 1 + offsets).ravel())),
+            weights=np.concatenate((share.ravel(), -share.ravel())),
+            minlength=pairs * width
+        )
+        volumes = np.cumsum(diff.reshape(pairs, width), axis=1)[:, :-1]
+        return volumes, start, sizes
+
+    def _profile(self, volumes: np.ndarray, start: float, bin_size: float) -> VolumeProfile:
+        total = float(volumes.sum())
+        poc_index = int(volumes.argmax())
+        lo, hi = _value_area(volumes.tolist(), poc_index, total * self.value_area_ratio)
+        return VolumeProfile(
+            poc=start + (poc_index + 0.5) * bin_size,
+            value_area_high=start + (hi + 1) * bin_size,
+            value_area_low=start + lo * bin_size,
+            total_volume=total,
+            bin_size=bin_size,
+            price_start=start,
+            volumes=volumes
+        )
+
+
+class RollingVolumeProfile:
+    """
+    Скользящий профиль объема по последним periods свечам
+
+    Новая свеча добавляется, выбывающая вычитается из разностного массива
+    за O(1). Сетка уровней перестраивается только когда цена выходит за ее
+    пределы (с запасом) или для сброса накопленной погрешности.
+    """
+
+    # Запас сетки в долях диапазона окна с каждой стороны
+    MARGIN = 0.5
+    # Через сколько окон пересобирать профиль для сброса погрешности
+    REBUILD_WINDOWS = 16
+
+    def __init__(self, periods: int, bin_size: float, value_area_ratio: float = 0.7):
+        self.periods = periods
+        self.bin_size = float(bin_size)
+        self.value_area_ratio = value_area_ratio
+
+        self._high = np.zeros(periods)
+        self._low = np.zeros(periods)
+        self._volume = np.zeros(periods)
+        self._head = 0
+        self._size = 0
+
+        self._start = 0.0
+        self._diff = np.zeros(0)
+        self._bins = np.zeros((periods, 2), dtype=np.int64)
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def update(self, high: float, low: float, volume: float):
+        """Добавить закрытую свечу в профиль"""
+        position = self._head
+        if self._size == self.periods:
+            self._apply(position, -1.0)
+
+        self._high[position] = high
+        self._low[position] = low
+        self._volume[position] = volume
+        self._head = (position + 1) % self.periods
+        self._size = min(self._size + 1, self.periods)
+        self._updates += 1
+
+        lo = int(np.floor((low - self._start) / self.bin_size))
+        hi = max(int(np.floor((high - self._start) / self.bin_size)), lo)
+        if (lo < 0 or hi + 1 >= len(self._diff)
+                or self._updates >= self.REBUILD_WINDOWS * self.periods):
+            self._rebuild()
+        else:
+            self._bins[position] = (lo, hi)
+            self._apply(position, 1.0)
+
+    def _apply(self, position: int, sign: float):
+        lo, hi = self._bins[position]
+        share = sign * self._volume[position] / (hi - lo + 1)
+        self._diff[lo] += share
+        self._diff[hi + 1] -= share
+
+    def _rebuild(self):
+        """Пересобрать сетку и разностный массив по текущему окну"""
+        size = self._size
+        high, low, volume = self._high[:size], self._low[:size], self._volume[:size]
+
+        margin = max((high.max() - low.min()) * self.MARGIN, self.bin_size)
+        self._start = np.floor((low.min() - margin) / self.bin_size) * self.bin_size
+        lo, hi = _bin_edges(low, high, self._start, self.bin_size)
+        width = int(np.ceil((high.max() + margin - self._start) / self.bin_size)) + 2
+
+        share = volume / (hi - lo + 1)
+        self._diff = np.bincount(
+            np.concatenate((lo, hi + 1)),
+            weights=np.concatenate((share, -share)),
+            minlength=width
+        )
+        self._bins[:size, 0] = lo
+        self._bins[:size, 1] = hi
+        self._updates = 0
+
+    def profile(self) -> Optional[VolumeProfile]:
+        """Текущий профиль окна"""
+        if not self._size:
+            return None
+
+        volumes = np.cumsum(self._diff)[:-1]
+        np.maximum(volumes, 0.0, out=volumes)
+        total = float(volumes.sum())
+        poc_index = int(volumes.argmax())
+        lo, hi = _value_area(volumes.tolist(), poc_index, total * self.value_area_ratio)
+        return VolumeProfile(
+            poc=self._start + (poc_index + 0.5) * self.bin_size,
+            value_area_high=self._start + (hi + 1) * self.bin_size,
+            value_area_low=self._start + lo * self.bin_size,
+            total_volume=total,
+            bin_size=self.bin_size,
+            price_start=self._start,
+            volumes=volumes
+        )
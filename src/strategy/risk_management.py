@@ -0,0 +1,510 @@
+"""
+Риск-менеджмент и расчет размера позиций
+
+Сигналы одного цикла анализа оцениваются вместе (RiskManager.evaluate):
+ширина стопа, плечо и риск считаются векторно по всем кандидатам, затем
+кандидаты ранжируются и допускаются по очереди, пока позволяют лимиты
+портфеля пользователя:
+
+- max_concurrent_trades и max_daily_trades - число позиций и входов за день;
+- max_daily_loss - реализованный убыток дня плюс риск открытых позиций;
+- max_weekly_drawdown - просадка от максимума капитала недели;
+- max_correlated_risk - риск портфеля с учетом корреляции пар,
+  sqrt(w' C w), где w - риск позиций (% депозита) со знаком направления,
+  C - корреляционная матрица доходностей пар (CorrelationCache);
+- стакан пары (OrderBookManager), если он синхронизирован: стена против
+  направления сделки между входом и тейком отклоняет сигнал, объем
+  позиции ограничен долей max_depth_share глубины стороны, по которой
+  исполняется вход.
+
+Если лимит дневного убытка, коррелированного риска или глубины стакана
+не позволяет взять полный риск, риск сигнала уменьшается до допустимого; сигнал отклоняется,
+если остается меньше MIN_RISK_FRACTION от желаемого.
+
+Состояние лимитов (RiskState) хранится в памяти и обновляется событиями
+открытия и закрытия сделок, проверки не обращаются к базе.
+"""
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.constants import (
+    LEVERAGE_MULTIPLIERS,
+    ORDER_BOOK_SETTINGS,
+    RISK_MANAGEMENT,
+    STOP_LOSS_PERCENTAGES,
+    TimeFrame,
+    TradingSide,
+)
+from src.config.settings import settings
+from src.analysis.candle_store import CandleStore
+from src.analysis.statistics_calculator import period_bounds
+from src.analysis.volatility import volatility_regime
+from src.exchange.order_book import OrderBookManager
+from src.strategy.base_strategy import TradeSignal
+
+# Ликвидация должна быть не ближе LIQUIDATION_BUFFER ширин стопа
+LIQUIDATION_BUFFER = 2.0
+# Минимальная доля желаемого риска, при которой сигнал еще допускается
+MIN_RISK_FRACTION = 0.25
+# Мемкоины (категория STOP_LOSS_PERCENTAGES meme_coins)
+MEME_COINS = {'DOGE', 'SHIB', 'PEPE', 'FLOKI', 'BONK', 'WIF', '1000PEPE', '1000SHIB', '1000BONK'}
+# Корреляции: таймфрейм, число доходностей и время жизни матрицы (секунды)
+CORRELATION_TIMEFRAME = TimeFrame.H1
+CORRELATION_WINDOW = 168
+CORRELATION_TTL = 900
+
+
+def pair_category(pair: str, volatility: Optional[float] = None) -> str:
+    """
+    Категория пары для STOP_LOSS_PERCENTAGES
+
+    Альткоины классифицируются по суточной волатильности (%), если она
+    известна: от HIGH_VOLATILITY_THRESHOLD - small_caps. Без оценки
+    используется список TIER1_PAIRS.
+    """
+    base = pair.split('-')[0]
+    if base in ('BTC', 'ETH'):
+        return base
+    if base in MEME_COINS:
+        return 'meme_coins'
+    if volatility is not None and np.isfinite(volatility):
+        return 'small_caps' if volatility >= settings.HIGH_VOLATILITY_THRESHOLD else 'major_alts'
+    if pair in settings.TIER1_PAIRS:
+        return 'major_alts'
+    return 'small_caps'
+
+
+class CorrelationCache:
+    """Корреляционная матрица доходностей пар с пересчетом раз в ttl"""
+
+    def __init__(
+        self,
+        store: CandleStore,
+        timeframe: TimeFrame = CORRELATION_TIMEFRAME,
+        window: int = CORRELATION_WINDOW,
+        ttl: float = CORRELATION_TTL
+    ):
+        self.store = store
+        self.timeframe = TimeFrame(timeframe)
+        self.window = window
+        self.ttl = ttl
+        self.pairs: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._matrix = np.eye(0)
+        self._updated = 0.0
+
+    def refresh(self, pairs: Iterable[str]):
+        """
+        Пересчитать матрицу по общим закрытым свечам пар
+
+        Пары без достаточной истории считаются некоррелированными.
+        """
+        pairs = sorted(set(pairs))
+        closes = {}
+        common = None
+        for pair in pairs:
+            if (pair, self.timeframe) not in self.store:
+                continue
+            window = self.store.window(pair, self.timeframe, self.window + 1)
+            if len(window) < 3:
+                continue
+            closes[pair] = window
+            common = window.timestamp if common is None else np.intersect1d(common, window.timestamp)
+
+        matrix = np.eye(len(pairs))
+        if common is not None and len(common) >= 3 and len(closes) > 1:
+            names = list(closes)
+            returns = np.array([
+                np.diff(np.log(closes[pair].close[np.isin(closes[pair].timestamp, common)]))
+                for pair in names
+            ])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                corr = np.nan_to_num(np.corrcoef(returns))
+            positions = np.array([pairs.index(pair) for pair in names])
+            matrix[np.ix_(positions, positions)] = corr
+            np.fill_diagonal(matrix, 1.0)
+
+        self.pairs = pairs
+        self._index = {pair: i for i, pair in enumerate(pairs)}
+        self._matrix = matrix
+        self._updated = time.monotonic()
+
+    def matrix(self, pairs: Sequence[str]) -> np.ndarray:
+        """Матрица корреляций для pairs (в их порядке)"""
+        if time.monotonic() - self._updated > self.ttl or any(pair not in self._index for pair in pairs):
+            self.refresh([*self.pairs, *pairs])
+        index = np.array([self._index[pair] for pair in pairs], dtype=np.int64)
+        return self._matrix[np.ix_(index, index)]
+
+
+@dataclass
+class RiskLimits:
+    """Лимиты риска пользователя (% депозита)"""
+    risk_per_trade: float = RISK_MANAGEMENT['max_risk_per_trade']
+    max_concurrent_trades: int = RISK_MANAGEMENT['max_concurrent_trades']
+    max_daily_trades: int = RISK_MANAGEMENT['max_daily_trades']
+    max_daily_loss: float = RISK_MANAGEMENT['max_daily_loss']
+    max_weekly_drawdown: float = RISK_MANAGEMENT['max_weekly_drawdown']
+    max_correlated_risk: float = RISK_MANAGEMENT['max_correlated_risk']
+
+    @classmethod
+    def from_settings(cls, bot_settings) -> 'RiskLimits':
+        """Лимиты из BotSettings пользователя, не выше глобальных"""
+        return cls(
+            risk_per_trade=min(bot_settings.risk_per_trade, RISK_MANAGEMENT['max_risk_per_trade']),
+            max_concurrent_trades=min(bot_settings.max_concurrent_trades, RISK_MANAGEMENT['max_concurrent_trades']),
+            max_daily_loss=min(bot_settings.max_daily_loss, RISK_MANAGEMENT['max_daily_loss']),
+        )
+
+
+@dataclass
+class OpenPosition:
+    """Открытая позиция в состоянии риска"""
+    pair: str
+    direction: int
+    risk_amount: float
+    margin: float = 0.0
+
+
+@dataclass
+class RiskState:
+    """Состояние лимитов пользователя"""
+    balance: float
+    limits: RiskLimits = field(default_factory=RiskLimits)
+    positions: Dict[str, OpenPosition] = field(default_factory=dict)
+    day_start: Optional[datetime] = None
+    week_start: Optional[datetime] = None
+    daily_trades: int = 0
+    daily_pnl: float = 0.0
+    week_equity: float = 0.0    # капитал недели относительно начала
+    week_peak: float = 0.0
+
+    def roll(self, now: datetime):
+        """Начать новые сутки или неделю"""
+        day = period_bounds('daily', now)[0]
+        if self.day_start != day:
+            self.day_start, self.daily_trades, self.daily_pnl = day, 0, 0.0
+        week = period_bounds('weekly', now)[0]
+        if self.week_start != week:
+            self.week_start, self.week_equity, self.week_peak = week, 0.0, 0.0
+
+    @property
+    def open_risk(self) -> float:
+        return sum(position.risk_amount for position in self.positions.values())
+
+    @property
+    def used_margin(self) -> float:
+        return sum(position.margin for position in self.positions.values())
+
+    @property
+    def weekly_drawdown(self) -> float:
+        """Просадка от максимума капитала недели (%)"""
+        start = self.balance - self.week_equity
+        peak = start + self.week_peak
+        return (self.week_peak - self.week_equity) / peak * 100 if peak > 0 else 0.0
+
+    @property
+    def daily_loss_budget(self) -> float:
+        """Допустимый риск новых сделок в рамках дневного лимита (в валюте)"""
+        start = self.balance - self.daily_pnl
+        allowed = start * self.limits.max_daily_loss / 100
+        return allowed + min(self.daily_pnl, 0.0) - self.open_risk
+
+
+@dataclass
+class Admission:
+    """Решение по сигналу"""
+    signal: TradeSignal
+    admitted: bool
+    reason: Optional[str] = None
+    risk_percent: float = 0.0
+    risk_amount: float = 0.0
+    quantity: float = 0.0
+    leverage: int = 1
+    margin: float = 0.0
+
+
+class RiskManager:
+    """Пакетная проверка сигналов и расчет позиций по лимитам портфеля"""
+
+    def __init__(
+        self,
+        correlations: Optional[CorrelationCache] = None,
+        max_leverage: int = settings.MAX_LEVERAGE,
+        books: Optional[OrderBookManager] = None
+    ):
+        """
+        Args:
+            correlations: Кэш корреляций пар (без него пары некоррелированы)
+            max_leverage: Максимальное плечо
+            books: Стаканы пар (без них проверки стакана не выполняются)
+        """
+        self.correlations = correlations
+        self.max_leverage = max_leverage
+        self.books = books
+        self.states: Dict[int, RiskState] = {}
+
+    # Состояние пользователей
+
+    def state(self, user_id: int) -> Optional[RiskState]:
+        return self.states.get(user_id)
+
+    def restore(
+        self,
+        user_id: int,
+        balance: float,
+        limits: Optional[RiskLimits] = None,
+        closed: Optional[Mapping[str, np.ndarray]] = None,
+        positions: Iterable[OpenPosition] = (),
+        now: Optional[datetime] = None
+    ) -> RiskState:
+        """
+        Восстановить состояние пользователя
+
+        Args:
+            balance: Текущий баланс
+            closed: Закрытые сделки (TradeRepository.get_closed_trade_arrays)
+            positions: Открытые позиции
+        """
+        now = now or datetime.now(timezone.utc)
+        state = RiskState(balance, limits or RiskLimits())
+        state.roll(now)
+        state.positions = {position.pair: position for position in positions}
+        if closed is not None and len(closed['pnl']):
+            exit_time, pnl = closed['exit_time'], closed['pnl']
+            today = exit_time >= state.day_start.timestamp() * 1000
+            state.daily_trades = int(today.sum())
+            state.daily_pnl = float(pnl[today].sum())
+            week = pnl[exit_time >= state.week_start.timestamp() * 1000]
+            if len(week):
+                equity = np.cumsum(week)
+                state.week_equity = float(equity[-1])
+                state.week_peak = float(max(equity.max(), 0.0))
+        self.states[user_id] = state
+        return state
+
+    def set_balance(self, user_id: int, balance: float):
+        state = self.states.get(user_id)
+        if state is not None:
+            state.balance = balance
+
+    def on_trade_opened(self, user_id: int, admission: Admission, now: Optional[datetime] = None):
+        """Учесть открытую по решению evaluate сделку"""
+        state = self.states[user_id]
+        state.roll(now or datetime.now(timezone.utc))
+        signal = admission.signal
+        state.positions[signal.pair] = OpenPosition(
+            signal.pair, 1 if signal.side == TradingSide.LONG else -1, admission.risk_amount, admission.margin
+        )
+        state.daily_trades += 1
+
+    async def on_trade_closed(
+        self,
+        user_id: int,
+        pnl: float,
+        pnl_percent: float,
+        commission: float,
+        rr: float,
+        exit_time: datetime,
+        setup: Optional[str] = None,
+        pair: Optional[str] = None
+    ):
+        """
+        Учесть закрытую сделку (сигнатура StatisticsService.on_trade_closed)
+
+        pnl - результат за вычетом комиссий, как и в restore
+        """
+        state = self.states.get(user_id)
+        if state is None:
+            return
+        state.roll(exit_time)
+        state.positions.pop(pair, None)
+        state.balance += pnl
+        state.daily_pnl += pnl
+        state.week_equity += pnl
+        state.week_peak = max(state.week_peak, state.week_equity)
+
+    # Оценка сигналов
+
+    def size(
+        self,
+        signals: Sequence[TradeSignal],
+        balance: float,
+        risk_percent: float,
+        volatility: Optional[Mapping[str, float]] = None,
+        max_leverage: Optional[Mapping[str, int]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Размер позиций и плечо для сигналов без учета портфеля
+
+        Returns:
+            Колонки: stop_percent, valid (стоп в пределах категории),
+            leverage, risk_amount, quantity, margin
+        """
+        volatility = volatility or {}
+        max_leverage = max_leverage or {}
+        entry = np.array([signal.entry_price for signal in signals], dtype=np.float64)
+        risk_per_unit = np.array([signal.risk_per_unit for signal in signals], dtype=np.float64)
+        stop_percent = np.divide(risk_per_unit * 100, entry, out=np.zeros_like(entry), where=entry > 0)
+        max_stop = np.array([
+            STOP_LOSS_PERCENTAGES[pair_category(signal.pair, volatility.get(signal.pair))][1] for signal in signals
+        ])
+        valid = (stop_percent > 0) & (stop_percent <= max_stop)
+
+        leverage = np.array([
+            min(LEVERAGE_MULTIPLIERS[volatility_regime(volatility.get(signal.pair))], max_leverage.get(signal.pair, self.max_leverage))
+            for signal in signals
+        ], dtype=np.float64)
+        # Ликвидация (~100 / плечо %) за стопом с запасом
+        liquidation_cap = np.floor(np.divide(100, stop_percent * LIQUIDATION_BUFFER, out=np.full_like(entry, np.inf), where=valid))
+        leverage = np.clip(np.minimum(leverage, liquidation_cap), 1, self.max_leverage)
+
+        risk_amount = np.full_like(entry, balance * risk_percent / 100)
+        quantity = np.divide(risk_amount, risk_per_unit, out=np.zeros_like(entry), where=valid)
+        return {
+            'stop_percent': stop_percent,
+            'valid': valid,
+            'leverage': leverage,
+            'risk_amount': risk_amount,
+            'quantity': quantity,
+            'margin': quantity * entry / leverage,
+        }
+
+    def liquidity(self, signal: TradeSignal) -> Tuple[Optional[str], float]:
+        """
+        Проверка сигнала по стакану пары
+
+        Returns:
+            (причина отказа или None, максимальный объем позиции в валюте
+            котировки); без синхронизированного стакана - (None, inf)
+        """
+        book = self.books.get(signal.pair) if self.books is not None else None
+        if book is None:
+            return None, math.inf
+        is_long = signal.side == TradingSide.LONG
+        low, high = sorted((signal.entry_price, signal.take_profit))
+        if any(wall.is_bid != is_long and low < wall.price < high for wall in book.walls()):
+            return 'order_book_wall', 0.0
+        bid, ask = book.depth(notional=True)
+        return None, (ask if is_long else bid) * ORDER_BOOK_SETTINGS['max_depth_share'] / 100
+
+    @staticmethod
+    def rank(signals: Sequence[TradeSignal]) -> np.ndarray:
+        """Порядок рассмотрения сигналов: по числу факторов, затем по RR"""
+        score = np.array([signal.confluence_score for signal in signals], dtype=np.float64)
+        rr = np.array([signal.rr_ratio for signal in signals], dtype=np.float64)
+        return np.lexsort((-rr, -score))
+
+    def evaluate(
+        self,
+        user_id: int,
+        signals: Sequence[TradeSignal],
+        volatility: Optional[Mapping[str, float]] = None,
+        max_leverage: Optional[Mapping[str, int]] = None,
+        now: Optional[datetime] = None
+    ) -> List[Admission]:
+        """
+        Оценить сигналы цикла анализа против портфеля пользователя
+
+        Состояние не меняется: допущенные сделки учитываются через
+        on_trade_opened после размещения.
+
+        Args:
+            volatility: Суточная волатильность пар (%) для выбора плеча
+            max_leverage: Максимальное плечо пар (TradingPair.max_leverage)
+
+        Returns:
+            Решения в порядке signals
+        """
+        state = self.states.get(user_id)
+        if state is None:
+            return [Admission(signal, False, 'no_state') for signal in signals]
+        if not signals:
+            return []
+        state.roll(now or datetime.now(timezone.utc))
+        limits = state.limits
+        sized = self.size(signals, state.balance, limits.risk_per_trade, volatility, max_leverage)
+
+        # Корреляционный риск: позиции и кандидаты в одной матрице, риск в % депозита
+        open_positions = list(state.positions.values())
+        pairs = list(dict.fromkeys([position.pair for position in open_positions] + [signal.pair for signal in signals]))
+        index = {pair: i for i, pair in enumerate(pairs)}
+        corr = self.correlations.matrix(pairs) if self.correlations is not None else np.eye(len(pairs))
+        weights = np.zeros(len(pairs))
+        for position in open_positions:
+            weights[index[position.pair]] += position.direction * position.risk_amount / state.balance * 100
+        exposure = corr @ weights
+        variance = float(weights @ exposure)
+        cap = limits.max_correlated_risk ** 2
+
+        slots = min(
+            limits.max_concurrent_trades - len(state.positions),
+            limits.max_daily_trades - state.daily_trades
+        )
+        budget = state.daily_loss_budget
+        margin_left = state.balance - state.used_margin
+        blocked = state.weekly_drawdown >= limits.max_weekly_drawdown
+        taken = set(state.positions)
+
+        admissions: List[Optional[Admission]] = [None] * len(signals)
+        for i in self.rank(signals):
+            signal = signals[i]
+            reason = None
+            if blocked:
+                reason = 'weekly_drawdown'
+            elif not sized['valid'][i]:
+                reason = 'stop_width'
+            elif signal.pair in taken:
+                reason = 'pair_taken'
+            elif slots <= 0:
+                reason = 'max_trades'
+            else:
+                reason, max_notional = self.liquidity(signal)
+            if reason is not None:
+                admissions[i] = Admission(signal, False, reason)
+                continue
+
+            j = index[signal.pair]
+            direction = 1 if signal.side == TradingSide.LONG else -1
+            desired = sized['risk_amount'][i]
+            # Наибольший риск r (%), при котором sqrt(w' C w) <= cap
+            correlated = -direction * exposure[j] + math.sqrt(max(exposure[j] ** 2 + cap - variance, 0.0))
+            caps = {
+                'daily_loss': budget,
+                'correlated_risk': correlated * state.balance / 100,
+                'depth': max_notional * signal.risk_per_unit / signal.entry_price,
+            }
+            binding = min(caps, key=caps.get)
+            risk_amount = min(desired, caps[binding])
+            scale = risk_amount / desired if desired > 0 else 0.0
+            margin = sized['margin'][i] * scale
+            if scale < MIN_RISK_FRACTION:
+                reason = binding
+            elif margin > margin_left:
+                reason = 'margin'
+            if reason is not None:
+                admissions[i] = Admission(signal, False, reason)
+                continue
+
+            risk_percent = risk_amount / state.balance * 100
+            weight = direction * risk_percent
+            exposure += corr[:, j] * weight
+            variance += 2 * weight * (exposure[j] - corr[j, j] * weight) + corr[j, j] * weight ** 2
+            slots -= 1
+            budget -= risk_amount
+            margin_left -= margin
+            taken.add(signal.pair)
+            admissions[i] = Admission(
+                signal, True,
+                risk_percent=risk_percent,
+                risk_amount=risk_amount,
+                quantity=float(sized['quantity'][i] * scale),
+                leverage=int(sized['leverage'][i]),
+                margin=float(margin),
+            )
+        return admissions
@@ -0,0 +1,9 @@
+from .order_block_reversal import OrderBlockReversal
+from .liquidity_grab import LiquidityGrab
+from .poc_bounce import PocBounce
+
+__all__ = [
+    'OrderBlockReversal',
+    'LiquidityGrab',
+    'PocBounce'
+]
@@ -0,0 +1,67 @@
+"""
+Сетап Liquidity Grab
+
+Прокол зоны ликвидности тенью и закрытие обратно за уровень:
+снятие sell-side ликвидности - лонг, buy-side - шорт.
+"""
+from typing import Optional
+
+from src.analysis.candle_store import Candle
+from src.config.constants import SetupType, TradingSide
+from src.strategy.base_strategy import BaseSetup, MarketContext, TradeSignal, register_setup
+from src.strategy.confluence import factor_bits
+
+(
+    LIQUIDITY_SWEEP, EQUAL_LEVELS, SESSION_LEVEL, MULTIPLE_TOUCHES, DEPTH_WALL,
+    CVD_DIVERGENCE, VALUE_AREA, ORDER_BLOCK, MARKET_STRUCTURE
+) = factor_bits(
+    'liquidity_sweep', 'equal_levels', 'session_level', 'multiple_touches', 'depth_wall',
+    'cvd_divergence', 'value_area', 'order_block', 'market_structure'
+)
+
+
+@register_setup
+class LiquidityGrab(BaseSetup):
+    """Снятие ликвидности"""
+
+    setup_type = SetupType.LIQUIDITY_GRAB
+    requires = ('order_blocks', 'liquidity_zones', 'volume_profile', 'cvd', 'market_structure')
+
+    def evaluate(self, context: MarketContext) -> Optional[TradeSignal]:
+        window = context.window
+        candle = Candle(*(column[-1].item() for column in window))
+
+        swept = [zone for zone in context.liquidity_zones if zone.is_swept_by(candle)]
+        if not swept:
+            return None
+
+        # Самая "толстая" снятая зона
+        zone = max(swept, key=lambda item: item.touches)
+        side = TradingSide.SHORT if zone.is_buy_side else TradingSide.LONG
+        direction = 1 if side == TradingSide.LONG else -1
+
+        factors = LIQUIDITY_SWEEP
+        if zone.kind in ('buy_side', 'sell_side'):
+            factors |= EQUAL_LEVELS
+        else:
+            factors |= SESSION_LEVEL
+        if zone.touches >= 3:
+            factors |= MULTIPLE_TOUCHES
+        if zone.resting_volume > 0:
+            factors |= DEPTH_WALL
+        if context.cvd_divergence == direction:
+            factors |= CVD_DIVERGENCE
+        if context.trend == direction:
+            factors |= MARKET_STRUCTURE
+
+        profile = context.volume_profile
+        if profile is not None and profile.in_value_area(candle.close):
+            factors |= VALUE_AREA
+
+        for block in context.order_blocks:
+            if block.side == side and (block.contains(candle.low) if direction == 1 else block.contains(candle.high)):
+                factors |= ORDER_BLOCK
+                break
+
+        stop_level = candle.low if direction == 1 else candle.high
+        return self._signal(context, side, stop_level, factors)
@@ -0,0 +1,66 @@
+"""
+Сетап Order Block Reversal
+
+Возврат цены в действующий ордер-блок и закрытие свечи в сторону блока.
+"""
+from typing import Optional
+
+from src.config.constants import SetupType, TradingSide
+from src.strategy.base_strategy import BaseSetup, MarketContext, TradeSignal, register_setup
+from src.strategy.confluence import factor_bits
+
+ORDER_BLOCK, VALUE_AREA, POC_CONFLUENCE, CVD_DIVERGENCE, ORDER_FLOW, LIQUIDITY_SWEEP, MARKET_STRUCTURE = factor_bits(
+    'order_block', 'value_area', 'poc_confluence', 'cvd_divergence', 'order_flow', 'liquidity_sweep', 'market_structure'
+)
+
+
+@register_setup
+class OrderBlockReversal(BaseSetup):
+    """Разворот от ордер-блока"""
+
+    setup_type = SetupType.ORDER_BLOCK_REVERSAL
+    requires = ('order_blocks', 'liquidity_zones', 'volume_profile', 'cvd', 'market_structure')
+
+    def evaluate(self, context: MarketContext) -> Optional[TradeSignal]:
+        window = context.window
+        open_, high, low, close = (
+            float(window.open[-1]), float(window.high[-1]),
+            float(window.low[-1]), float(window.close[-1])
+        )
+
+        for block in reversed(context.order_blocks):
+            if block.formed_index >= len(window) - 1:
+                continue
+
+            if block.side == TradingSide.LONG:
+                touched = low <= block.top and close > block.bottom and close > open_
+            else:
+                touched = high >= block.bottom and close < block.top and close < open_
+            if not touched:
+                continue
+
+            factors = ORDER_BLOCK
+            profile = context.volume_profile
+            if profile is not None:
+                if profile.in_value_area(close):
+                    factors |= VALUE_AREA
+                if block.contains(profile.poc):
+                    factors |= POC_CONFLUENCE
+
+            direction = 1 if block.side == TradingSide.LONG else -1
+            if context.cvd_divergence == direction:
+                factors |= CVD_DIVERGENCE
+            if context.order_flow_bias == direction:
+                factors |= ORDER_FLOW
+            if context.trend == direction:
+                factors |= MARKET_STRUCTURE
+
+            for zone in context.liquidity_zones:
+                if zone.is_buy_side != (direction == 1) and low <= zone.price <= high:
+                    factors |= LIQUIDITY_SWEEP
+                    break
+
+            stop_level = block.bottom if direction == 1 else block.top
+            return self._signal(context, block.side, stop_level, factors)
+
+        return None
@@ -0,0 +1,55 @@
+"""
+Сетап POC Bounce
+
+Возврат цены к POC профиля объема и отбой с закрытием по другую сторону.
+"""
+from typing import Optional
+
+from src.config.constants import SetupType, TradingSide
+from src.strategy.base_strategy import BaseSetup, MarketContext, TradeSignal, register_setup
+from src.strategy.confluence import factor_bits
+
+POC_TOUCH, VALUE_AREA, ORDER_FLOW, CVD_DIVERGENCE, ORDER_BLOCK, MARKET_STRUCTURE = factor_bits(
+    'poc_touch', 'value_area', 'order_flow', 'cvd_divergence', 'order_block', 'market_structure'
+)
+
+
+@register_setup
+class PocBounce(BaseSetup):
+    """Отбой от POC"""
+
+    setup_type = SetupType.POC_BOUNCE
+    requires = ('order_blocks', 'volume_profile', 'cvd', 'market_structure')
+
+    def evaluate(self, context: MarketContext) -> Optional[TradeSignal]:
+        profile = context.volume_profile
+        window = context.window
+        if profile is None or len(window) < 2:
+            return None
+
+        poc = profile.poc
+        high, low, close = float(window.high[-1]), float(window.low[-1]), float(window.close[-1])
+        previous_close = float(window.close[-2])
+
+        if low <= poc < close and previous_close > poc:
+            side = TradingSide.LONG
+        elif high >= poc > close and previous_close < poc:
+            side = TradingSide.SHORT
+        else:
+            return None
+        direction = 1 if side == TradingSide.LONG else -1
+
+        factors = POC_TOUCH
+        if profile.in_value_area(close):
+            factors |= VALUE_AREA
+        if context.order_flow_bias == direction:
+            factors |= ORDER_FLOW
+        if context.cvd_divergence == direction:
+            factors |= CVD_DIVERGENCE
+        if context.trend == direction:
+            factors |= MARKET_STRUCTURE
+        if any(block.side == side and block.contains(poc) for block in context.order_blocks):
+            factors |= ORDER_BLOCK
+
+        stop_level = min(low, poc - profile.bin_size) if direction == 1 else max(high, poc + profile.bin_size)
+        return self._signal(context, side, stop_level, factors)
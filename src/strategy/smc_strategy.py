@@ -0,0 +1,396 @@
+"""
+Стратегия Smart Money Concepts
+
+Индикаторы - узлы графа зависимостей (IndicatorNode): узел объявляет
+узлы, результаты которых использует, и функцию расчета. Для анализа
+собираются только узлы, нужные включенным сетапам (BaseSetup.requires),
+с их зависимостями; каждый узел считается один раз на (пару, таймфрейм,
+свечу), результаты общие для всех сетапов и сохраняются до следующей
+свечи серии. Время расчета узлов накапливается для отчета
+timing_report().
+
+Ордер-блоки ведутся потоковыми детекторами по (паре, таймфрейму): в
+детектор подаются только закрытые свечи окна, появившиеся с прошлого
+анализа серии (OrderBlockDetector.update), а полный пересчет выполняется
+лишь при разрыве истории. Swing-точки для зон ликвидности берутся из
+общего SwingIndexRegistry, зоны у стен стакана (MarketContext.walls)
+отмечаются resting_volume. В одном процессе (бэктест) тот же реестр
+можно передать MarketStructureMonitor, в планировщике реестры основного
+процесса и процессов пула раздельны.
+
+Структура рынка (узел market_structure) ведется StructureTracker на том
+же индексе swing-точек. В планировщике ее передает MarketStructureMonitor
+основного процесса (indicators), чтобы сетапы видели ту же структуру, по
+которой рассылаются события BOS / CHoCH.
+"""
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.constants import TimeFrame
+from src.analysis.candle_store import Candle, CandleWindow
+from src.analysis.market_analyzer import StructureTracker
+from src.analysis.order_flow import FootprintWindow
+from src.exchange.order_book import Wall
+from src.strategy.base_strategy import BaseSetup, MarketContext, TradeSignal, create_setups
+from src.strategy.indicators import (
+    CVDCalculator,
+    LiquidityZoneDetector,
+    OrderBlockDetector,
+    SwingIndexRegistry,
+    VolumeProfileAnalyzer,
+)
+from src.strategy.indicators.order_block import OrderBlock
+# Импорт регистрирует встроенные сетапы
+from src.strategy import setups  # noqa: F401
+
+# Узлы, результаты которых записываются в одноименные поля MarketContext
+CONTEXT_FIELDS = ('order_blocks', 'liquidity_zones', 'volume_profile', 'cvd', 'market_structure')
+
+ContextKey = Tuple[str, TimeFrame]
+
+
+class IndicatorNode(NamedTuple):
+    """Узел графа индикаторов"""
+    name: str
+    requires: Tuple[str, ...]
+    # compute(context, результаты requires по порядку) -> результат узла
+    compute: Callable[..., Any]
+
+
+class NodeTiming:
+    """Накопленное время расчета узла"""
+
+    __slots__ = ('calls', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms: float):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+
+class SMCStrategy:
+    """Стратегия Smart Money Concepts"""
+
+    def __init__(
+        self,
+        setups: Optional[Sequence[BaseSetup]] = None,
+        order_blocks: Optional[OrderBlockDetector] = None,
+        swings: Optional[SwingIndexRegistry] = None,
+        volume_profile: Optional[VolumeProfileAnalyzer] = None,
+        cvd: Optional[CVDCalculator] = None
+    ):
+        """
+        Args:
+            setups: Сетапы для проверки (по умолчанию - все зарегистрированные)
+            order_blocks, volume_profile, cvd: Настроенные индикаторы
+                (по умолчанию - с параметрами из constants)
+            swings: Общие индексы swing-точек по (паре, таймфрейму)
+        """
+        self.setups: List[BaseSetup] = list(setups) if setups is not None else create_setups()
+        self.order_blocks = order_blocks or OrderBlockDetector()
+        self.swings = swings or SwingIndexRegistry()
+        self.volume_profile = volume_profile or VolumeProfileAnalyzer()
+        self.cvd = cvd or CVDCalculator()
+
+        self.nodes: Dict[str, IndicatorNode] = {}
+        self.timings: Dict[str, NodeTiming] = {}
+        self._contexts: Dict[ContextKey, Tuple[tuple, MarketContext]] = {}
+        # Потоковые детекторы ордер-блоков и время последней поданной свечи
+        self._block_streams: Dict[ContextKey, Tuple[OrderBlockDetector, int]] = {}
+        self._liquidity: Dict[ContextKey, LiquidityZoneDetector] = {}
+        self._structure: Dict[ContextKey, StructureTracker] = {}
+        self.add_node('order_blocks', (), self._order_blocks)
+        self.add_node('liquidity_zones', (), self._liquidity_zones)
+        self.add_node('market_structure', (), self._market_structure)
+        self.add_node('volume_profile', (), self._volume_profile)
+        self.add_node('trade_delta', (), self._trade_delta)
+        self.add_node('cvd', ('trade_delta',), self._cvd)
+
+    # Граф индикаторов
+
+    def add_node(self, name: str, requires: Iterable[str], compute: Callable[..., Any]):
+        """
+        Зарегистрировать узел (или заменить существующий)
+
+        Args:
+            name: Имя результата (на него ссылаются BaseSetup.requires)
+            requires: Узлы, результаты которых передаются в compute
+            compute: compute(context, *результаты requires)
+        """
+        node = IndicatorNode(name, tuple(requires), compute)
+        previous = self.nodes.get(name)
+        self.nodes[name] = node
+        try:
+            self.plan([name])
+        except ValueError:
+            if previous is None:
+                del self.nodes[name]
+            else:
+                self.nodes[name] = previous
+            raise
+        self._contexts.clear()
+
+    def plan(self, targets: Iterable[str]) -> List[str]:
+        """
+        Узлы для расчета targets в порядке зависимостей
+
+        Raises:
+            ValueError: Неизвестный узел или цикл в графе
+        """
+        order: List[str] = []
+        state: Dict[str, bool] = {}     # False - в обходе, True - добавлен
+
+        def visit(name: str, path: Tuple[str, ...]):
+            if state.get(name):
+                return
+            if name in state:
+                raise ValueError(f'Indicator dependency cycle: {" -> ".join(path + (name,))}')
+            node = self.nodes.get(name)
+            if node is None:
+                raise ValueError(f'Unknown indicator: {name}')
+            state[name] = False
+            for dependency in node.requires:
+                visit(dependency, path + (name,))
+            state[name] = True
+            order.append(name)
+
+        for target in targets:
+            visit(target, ())
+        return order
+
+    def required(self) -> List[str]:
+        """Узлы, которые нужны сетапам стратегии"""
+        return list(dict.fromkeys(name for setup in self.setups for name in setup.requires))
+
+    def _order_blocks(self, context: MarketContext) -> List[OrderBlock]:
+        """
+        Действующие ордер-блоки серии по потоковому детектору
+
+        В детектор подаются свечи окна после последней поданной; если окно
+        не продолжает серию (разрыв или откат истории), детектор строится
+        заново. Номера свечей блоков приводятся к номерам в окне, блоки,
+        сформированные до начала окна, не возвращаются (как в detect()).
+        """
+        window = context.window
+        key = (context.pair, context.timeframe)
+        timestamps = window.timestamp
+        start = 0
+        stream = self._block_streams.get(key)
+        if stream is None:
+            detector = OrderBlockDetector(self.order_blocks.min_body_ratio, self.order_blocks.max_age)
+        else:
+            detector, last = stream
+            position = int(np.searchsorted(timestamps, last))
+            if position < len(timestamps) and timestamps[position] == last:
+                start = position + 1
+            else:
+                detector.reset()
+        for candle in zip(*(column[start:].tolist() for column in window)):
+            detector.update(Candle(*candle))
+        self._block_streams[key] = (detector, int(timestamps[-1]))
+
+        offset = detector.last_index - (len(window) - 1)
+        return [
+            replace(block, index=block.index - offset, formed_index=block.formed_index - offset)
+            for block in detector.active_blocks if block.index >= offset
+        ]
+
+    def _liquidity_zones(self, context: MarketContext):
+        """Зоны ликвидности по общему индексу swing-точек серии и стенам стакана"""
+        key = (context.pair, context.timeframe)
+        detector = self._liquidity.get(key)
+        if detector is None:
+            detector = self._liquidity[key] = LiquidityZoneDetector(self.swings.index(*key))
+        self.swings.sync(context.pair, context.timeframe, context.window)
+        zones = detector.detect(context.window)
+        if context.walls:
+            LiquidityZoneDetector.apply_order_book(zones, context.walls)
+        return zones
+
+    def _market_structure(self, context: MarketContext):
+        """Структура рынка серии по автомату на общем индексе swing-точек"""
+        key = (context.pair, context.timeframe)
+        tracker = self._structure.get(key)
+        if tracker is None:
+            index = self.swings.index(*key)
+            tracker = self._structure[key] = StructureTracker(*key, swings=index)
+            self.swings.subscribe(*key, on_close=tracker.on_close, on_reset=tracker.reset)
+            if index.last_index >= 0:
+                # Свечи, поданные в общий индекс до подписки, автомат не видел
+                self.swings.reset(*key)
+        self.swings.sync(context.pair, context.timeframe, context.window)
+        return tracker.structure
+
+    def _volume_profile(self, context: MarketContext):
+        periods = self.volume_profile.periods_for(context.timeframe)
+        if not periods:
+            return None
+        profile_window = CandleWindow(*(column[-periods:] for column in context.window))
+        return self.volume_profile.calculate(profile_window, context.tier)
+
+    @staticmethod
+    def _trade_delta(context: MarketContext) -> Optional[np.ndarray]:
+        """Дельта по сделкам для свечей, у которых есть footprint-бар"""
+        footprint, window = context.footprint, context.window
+        if footprint is None or not len(footprint):
+            return None
+        trade_delta = np.full(len(window), np.nan)
+        index = np.searchsorted(footprint.timestamp, window.timestamp)
+        index[index == len(footprint)] = 0
+        matched = footprint.timestamp[index] == window.timestamp
+        trade_delta[matched] = footprint.delta[index[matched]]
+        return trade_delta
+
+    def _cvd(self, context: MarketContext, trade_delta: Optional[np.ndarray]):
+        window = context.window
+        return self.cvd.calculate(
+            window.timestamp, window.open, window.high, window.low, window.close, window.volume,
+            trade_delta
+        )
+
+    def evaluate(self, context: MarketContext, targets: Iterable[str]) -> MarketContext:
+        """
+        Рассчитать узлы targets и их зависимости (уже рассчитанные пропускаются)
+
+        Результаты записываются в context.indicators и в одноименные поля
+        MarketContext, время расчета - в context.timings.
+        """
+        for name in self.plan(targets):
+            if name in context.indicators:
+                continue
+            node = self.nodes[name]
+            started = time.perf_counter()
+            value = node.compute(context, *(context.indicators[dependency] for dependency in node.requires))
+            elapsed = (time.perf_counter() - started) * 1000
+            context.timings[name] = elapsed
+            self.timings.setdefault(name, NodeTiming()).add(elapsed)
+            self._set(context, name, value)
+        return context
+
+    @staticmethod
+    def _set(context: MarketContext, name: str, value: Any):
+        context.indicators[name] = value
+        if name in CONTEXT_FIELDS:
+            setattr(context, name, value)
+
+    def timing_report(self, reset: bool = False) -> List[dict]:
+        """
+        Время расчета узлов с момента создания (или прошлого сброса)
+
+        Returns:
+            Узлы по убыванию суммарного времени: name, calls, total_ms, avg_ms, max_ms, share
+        """
+        total = sum(timing.total_ms for timing in self.timings.values()) or 1.0
+        report = sorted((
+            {
+                'name': name,
+                'calls': timing.calls,
+                'total_ms': timing.total_ms,
+                'avg_ms': timing.total_ms / timing.calls if timing.calls else 0.0,
+                'max_ms': timing.max_ms,
+                'share': timing.total_ms / total,
+            }
+            for name, timing in self.timings.items()
+        ), key=lambda row: row['total_ms'], reverse=True)
+        if reset:
+            self.timings.clear()
+        return report
+
+    def context(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        window: CandleWindow,
+        tier: int = 2,
+        footprint: Optional[FootprintWindow] = None,
+        walls: Optional[Sequence[Wall]] = None
+    ) -> MarketContext:
+        """
+        Контекст серии на последней свече окна
+
+        Контекст той же свечи (того же footprint и тех же стен стакана)
+        переиспользуется вместе с уже рассчитанными узлами.
+        """
+        timeframe = TimeFrame(timeframe)
+        key = (pair, timeframe)
+        walls = list(walls) if walls is not None else None
+        bar = (
+            int(window.timestamp[-1]) if len(window) else None, len(window), tier,
+            int(footprint.timestamp[-1]) if footprint is not None and len(footprint) else None,
+            walls,
+        )
+        cached = self._contexts.get(key)
+        if cached is not None and cached[0] == bar:
+            return cached[1]
+        context = MarketContext(
+            pair=pair, timeframe=timeframe, window=window, tier=tier, footprint=footprint, walls=walls
+        )
+        self._contexts[key] = (bar, context)
+        return context
+
+    def build_context(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        window: CandleWindow,
+        tier: int = 2,
+        footprint: Optional[FootprintWindow] = None,
+        targets: Optional[Iterable[str]] = None,
+        indicators: Optional[Dict[str, Any]] = None,
+        walls: Optional[Sequence[Wall]] = None
+    ) -> MarketContext:
+        """
+        Рассчитать индикаторы для окна свечей
+
+        Args:
+            footprint: Footprint-бары того же таймфрейма (OrderFlowEngine.window);
+                их дельта заменяет оценку дельты по свечам в CVD
+            targets: Узлы для расчета (по умолчанию - все поля MarketContext)
+            indicators: Готовые результаты узлов для этого окна (не пересчитываются)
+            walls: Стены стакана пары (OrderBook.walls) для зон ликвидности;
+                имеют смысл только для последней свечи, в бэктесте не передаются
+        """
+        context = self.context(pair, timeframe, window, tier, footprint, walls)
+        for name, value in (indicators or {}).items():
+            self._set(context, name, value)
+        if len(window) < 2:
+            return context
+        return self.evaluate(context, CONTEXT_FIELDS if targets is None else targets)
+
+    def analyze(
+        self,
+        pair: str,
+        timeframe: TimeFrame,
+        window: CandleWindow,
+        tier: int = 2,
+        footprint: Optional[FootprintWindow] = None,
+        indicators: Optional[Dict[str, Any]] = None,
+        walls: Optional[Sequence[Wall]] = None
+    ) -> Tuple[MarketContext, List[TradeSignal]]:
+        """
+        Проанализировать пару на таймфрейме
+
+        Рассчитываются только индикаторы, нужные сетапам (кроме переданных
+        в indicators).
+
+        Returns:
+            (контекст индикаторов, сигналы сетапов)
+        """
+        context = self.build_context(pair, timeframe, window, tier, footprint, self.required(), indicators, walls)
+        if len(window) < 2:
+            return context, []
+
+        signals = []
+        for setup in self.setups:
+            signal = setup.evaluate(context)
+            if signal is not None:
+                signals.append(signal)
+        return context, signals
@@ -0,0 +1,245 @@
+"""
+Двухуровневый кэш: L1 в памяти процесса перед общим Redis
+
+Значения сериализуются msgpack вместе со временем истечения, поэтому
+запись, прочитанная из Redis в L1, истекает в тот же момент, что и в
+Redis. L1 ограничен по размеру и вытесняет давно не использованные
+записи (LRU).
+
+get_or_set выполняет вычисление значения один раз на ключ: внутри
+процесса повторные запросы ждут уже запущенное вычисление, между
+процессами - короткую блокировку в Redis (SET NX). Ошибки Redis не
+прерывают работу: кэш деградирует до L1 и прямого вычисления.
+"""
+import asyncio
+import dataclasses
+import time
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import msgpack
+import numpy as np
+from loguru import logger
+
+from src.config.constants import CACHE_TTL, TimeFrame
+
+# Время жизни блокировки вычисления и интервал ожидания чужого результата
+LOCK_TTL = 10.0
+LOCK_POLL = 0.05
+
+_MISSING = object()
+
+
+def _default(value: Any) -> Any:
+    """Приведение типов, которые msgpack не сериализует"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def pack(value: Any, expires_at: float) -> bytes:
+    """Сериализовать значение с временем истечения (unix, секунды)"""
+    return msgpack.packb([expires_at, value], default=_default, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Tuple[float, Any]:
+    """Разобрать запись: (время истечения, значение)"""
+    expires_at, value = msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return expires_at, value
+
+
+# Ключи кэша
+
+def contracts_key() -> str:
+    return 'contracts'
+
+
+def indicators_key(pair: str, timeframe: TimeFrame, close_time: Optional[int] = None) -> str:
+    """Снимок индикаторов на закрытии свечи (close_time=None - последний снимок)"""
+    return f'indicators:{pair}:{TimeFrame(timeframe).value}:{close_time if close_time is not None else "latest"}'
+
+
+def balance_key() -> str:
+    return 'account:balance'
+
+
+def positions_key() -> str:
+    return 'account:positions'
+
+
+def statistics_key(user_id: int, period_type: str) -> str:
+    return f'statistics:{user_id}:{period_type}'
+
+
+class Cache:
+    """Кэш с L1 в памяти и общим Redis"""
+
+    def __init__(self, redis=None, prefix: str = 'smc', l1_size: int = 2048):
+        """
+        Args:
+            redis: Асинхронный клиент Redis (redis.asyncio или совместимый по
+                get/set/delete); None - только L1
+            prefix: Префикс ключей в Redis
+            l1_size: Максимум записей в L1
+        """
+        self.redis = redis
+        self.prefix = prefix
+        self.l1_size = l1_size
+        self._l1: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}:{key}'
+
+    def _l1_get(self, key: str) -> Any:
+        entry = self._l1.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= time.time():
+            del self._l1[key]
+            return _MISSING
+        self._l1.move_to_end(key)
+        return entry[1]
+
+    def _l1_set(self, key: str, value: Any, expires_at: float):
+        self._l1[key] = (expires_at, value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        """Получить значение (L1, затем Redis)"""
+        value = self._l1_get(key)
+        if value is not _MISSING:
+            return value
+        if self.redis is None:
+            return default
+
+        try:
+            data = await self.redis.get(self._key(key))
+        except Exception as e:
+            logger.warning(f'Cache read failed for {key}: {e!r}')
+            return default
+        if data is None:
+            return default
+
+        expires_at, value = unpack(data)
+        if expires_at <= time.time():
+            return default
+        self._l1_set(key, value, expires_at)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> Any:
+        """
+        Записать значение в L1 и Redis на ttl секунд
+
+        Returns:
+            Значение после сериализации (в том виде, в каком его прочитают
+            другие процессы: списки вместо массивов NumPy и т.д.)
+        """
+        expires_at = time.time() + ttl
+        data = pack(value, expires_at)
+        value = unpack(data)[1]
+        self._l1_set(key, value, expires_at)
+        if self.redis is None:
+            return value
+        try:
+            await self.redis.set(self._key(key), data, px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            logger.warning(f'Cache write failed for {key}: {e!r}')
+        return value
+
+    async def delete(self, *keys: str):
+        """Удалить значения"""
+        for key in keys:
+            self._l1.pop(key, None)
+        if self.redis is None or not keys:
+            return
+        try:
+            await self.redis.delete(*(self._key(key) for key in keys))
+        except Exception as e:
+            logger.warning(f'Cache delete failed for {", ".join(keys)}: {e!r}')
+
+    async def _acquire(self, key: str) -> bool:
+        """Блокировка вычисления между процессами (True - вычисляем сами)"""
+        if self.redis is None:
+            return True
+        try:
+            return bool(await self.redis.set(
+                self._key(f'lock:{key}'), b'1', nx=True, px=int(LOCK_TTL * 1000)
+            ))
+        except Exception:
+            return True
+
+    async def _compute(self, key: str, factory: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        locked = await self._acquire(key)
+        if not locked:
+            # Значение вычисляет другой процесс - ждем его результат
+            deadline = time.monotonic() + LOCK_TTL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL)
+                value = await self.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+
+        try:
+            return await self.set(key, await factory(), ttl)
+        finally:
+            if locked and self.redis is not None:
+                try:
+                    await self.redis.delete(self._key(f'lock:{key}'))
+                except Exception:
+                    pass
+
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        kind: Optional[str] = None
+    ) -> Any:
+        """
+        Получить значение или вычислить его один раз для всех ожидающих
+
+        Args:
+            key: Ключ
+            factory: Корутина-функция, вычисляющая значение
+            ttl: Время жизни (секунды)
+            kind: Ключ CACHE_TTL, если ttl не задан
+        """
+        value = await self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        ttl = ttl if ttl is not None else CACHE_TTL[kind]
+        future = self._inflight[key] = asyncio.ensure_future(self._compute(key, factory, ttl))
+        future.add_done_callback(lambda done: self._inflight.pop(key) if self._inflight.get(key) is done else None)
+        return await asyncio.shield(future)
+
+    async def store_snapshot(self, snapshot: dict):
+        """Сохранить снимок индикаторов (MarketContext.snapshot) по времени свечи и как последний"""
+        pair, timeframe = snapshot['pair'], snapshot['timeframe']
+        ttl = CACHE_TTL['indicators']
+        await self.set(indicators_key(pair, timeframe, snapshot['close_time']), snapshot, ttl)
+        await self.set(indicators_key(pair, timeframe), snapshot, ttl)
+
+
+async def create_redis(url: str):
+    """Подключение к Redis для Cache (значения - bytes)"""
+    # redis нужен только здесь: Cache принимает любой совместимый клиент
+    from redis import asyncio as redis
+    return redis.from_url(url, decode_responses=False)
@@ -0,0 +1,76 @@
+"""
+Форматирование сообщений бота
+"""
+from typing import List, Optional
+
+from src.config.constants import EMOJI
+
+
+def _number(value: Optional[float], digits: int = 2) -> str:
+    return f'{value:,.{digits}f}' if value is not None else '-'
+
+
+def format_statistics(stats: dict, period_type: str) -> str:
+    """Статистика периода (поля модели Statistics)"""
+    lines = [
+        f'{EMOJI["statistics"]} **Statistics ({period_type})**',
+        '',
+        f'**Trades:** {stats["total_trades"]} ({stats["winning_trades"]}W / {stats["losing_trades"]}L)',
+        f'**Win Rate:** {_number(stats["win_rate"], 1)}%',
+        f'**Total PnL:** {_number(stats["total_pnl"])} USDT',
+        f'**Profit Factor:** {_number(stats["profit_factor"])}',
+        f'**Average RR:** {_number(stats["average_rr"])}',
+        f'**Sharpe:** {_number(stats["sharpe_ratio"])}',
+        f'**Max Drawdown:** {_number(stats["max_drawdown"])} USDT ({stats["max_drawdown_duration"]}h)',
+    ]
+    for title, groups in (('By setup', stats['stats_by_setup']), ('By pair', stats['stats_by_pair'])):
+        if groups:
+            lines += ['', f'**{title}:**']
+            lines += [
+                f'• {label}: {group["trades"]} trades, {_number(group["win_rate"], 1)}%, {_number(group["total_pnl"])} USDT'
+                for label, group in groups.items()
+            ]
+    return '\n'.join(lines)
+
+
+def format_balance(balance: dict) -> str:
+    """Баланс фьючерсного счета BingX"""
+    account = balance.get('balance', balance)
+    return '\n'.join([
+        f'{EMOJI["money"]} **Balance**',
+        '',
+        f'**Balance:** {_number(float(account.get("balance", 0)))} USDT',
+        f'**Equity:** {_number(float(account.get("equity", 0)))} USDT',
+        f'**Available Margin:** {_number(float(account.get("availableMargin", 0)))} USDT',
+        f'**Unrealized PnL:** {_number(float(account.get("unrealizedProfit", 0)))} USDT',
+    ])
+
+
+def format_positions(positions: List[dict]) -> str:
+    """Открытые позиции BingX"""
+    if not positions:
+        return 'No open positions'
+    lines = [f'{EMOJI["chart"]} **Open Positions**', '']
+    for position in positions:
+        side = position.get('positionSide', '')
+        emoji = EMOJI['long' if side == 'LONG' else 'short']
+        lines.append(
+            f'{emoji} {position.get("symbol")} {side} {position.get("positionAmt")} @ {position.get("avgPrice")} '
+            f'(PnL {_number(float(position.get("unrealizedProfit", 0)))} USDT, {position.get("leverage")}x)'
+        )
+    return '\n'.join(lines)
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """Снимок индикаторов пары (MarketContext.snapshot)"""
+    profile = snapshot.get('volume_profile') or {}
+    lines = [
+        f'{EMOJI["analysis"]} **{snapshot["pair"]} {snapshot["timeframe"]}**',
+        '',
+        f'**Close:** {snapshot["close"]}',
+        f'**POC:** {profile.get("poc", "-")} (VA {profile.get("value_area_low", "-")} - {profile.get("value_area_high", "-")})',
+        f'**CVD:** {_number(snapshot.get("cvd"))} (flow {_number(snapshot.get("flow_ratio"))}, divergence {snapshot.get("cvd_divergence")})',
+        f'**Order Blocks:** {len(snapshot["order_blocks"])}',
+        f'**Liquidity Zones:** {len(snapshot["liquidity_zones"])}',
+    ]
+    return '\n'.join(lines)
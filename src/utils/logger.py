@@ -21,9 +21,9 @@ def setup_logger(name: Optional[str] = None):
     # Удаляем стандартный обработчик
     logger.remove()
 
-    # Создаем директорию для логов
-    log_dir = Path('logs')
-    log_dir.mkdir(exist_ok=True)
+    # Создаем директорию для логов (рядом с LOG_FILE)
+    log_dir = Path(settings.LOG_FILE).parent
+    log_dir.mkdir(parents=True, exist_ok=True)
 
     # Формат логов
     log_format = (
@@ -47,7 +47,7 @@ def setup_logger(name: Optional[str] = None):
     logger.add(
         settings.LOG_FILE,
         format=log_format,
-        lever=settings.LOG_LEVEL,
+        level=settings.LOG_LEVEL,
         rotation='500 MB',
         retention='1 week',
         compression='zip',
@@ -58,9 +58,9 @@ def setup_logger(name: Optional[str] = None):
 
     # Добавляем отдельный файл для ошибок
     logger.add(
-        'logs/error.log',
+        log_dir / 'error.log',
         format=log_format,
-        lever='ERROR',
+        level='ERROR',
         rotation='100 MB',
         retention='1 month',
         compression='zip',
@@ -71,9 +71,9 @@ def setup_logger(name: Optional[str] = None):
 
     # Добавляем файл для торговых операций
     logger.add(
-        'logs/trading.log',
+        log_dir / 'trading.log',
         format=log_format,
-        lever='INFO',
+        level='INFO',
         filter=lambda record: 'trading' in record['extra'],
         rotation='1 day',
         retention='1 month',
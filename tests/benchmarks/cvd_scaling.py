@@ -0,0 +1,87 @@
+"""
+Бенчмарк CVDCalculator: масштабирование по числу пар
+
+Сравнивает один векторизованный вызов calculate() на матрице (пары, свечи)
+с расчетом по одной паре в цикле. Данные синтетические, с фиксированным
+seed, поэтому прогоны воспроизводимы.
+
+Запуск:
+    python -m tests.benchmarks.cvd_scaling
+    python -m tests.benchmarks.cvd_scaling --pairs 10 100 500 --candles 1000 --repeat 20
+"""
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from src.strategy.indicators.cvd import CVDCalculator
+
+CANDLE_MS = 5 * 60 * 1000
+
+
+def make_candles(pairs: int, candles: int, seed: int = 0) -> dict:
+    """Синтетические свечи (пары, свечи)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, (pairs, candles)), axis=1))
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    spread = np.abs(rng.normal(0, 0.001, (pairs, candles))) * close
+    return {
+        'timestamps': np.arange(candles, dtype=np.int64) * CANDLE_MS,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(10, 1000, (pairs, candles)),
+    }
+
+
+def best_of(function: Callable[[], object], repeat: int) -> float:
+    """Лучшее время вызова (мс)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def run(pairs: List[int], candles: int, repeat: int, seed: int) -> List[dict]:
+    calculator = CVDCalculator()
+    rows = []
+    for count in pairs:
+        data = make_candles(count, candles, seed)
+        columns = [data[name] for name in ('open', 'high', 'low', 'close', 'volume')]
+        batched = best_of(lambda: calculator.calculate(data['timestamps'], *columns), repeat)
+        looped = best_of(lambda: [
+            calculator.calculate(data['timestamps'], *(column[pair] for column in columns))
+            for pair in range(count)
+        ], max(1, repeat // 5))
+        rows.append({
+            'pairs': count,
+            'batched_ms': batched,
+            'per_pair_us': batched / count * 1000,
+            'looped_ms': looped,
+            'speedup': looped / batched if batched else float('inf'),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CVDCalculator scaling benchmark')
+    parser.add_argument('--pairs', type=int, nargs='+', default=[10, 50, 100, 250, 500])
+    parser.add_argument('--candles', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"pairs":>6} {"batched, ms":>12} {"per pair, us":>13} {"loop, ms":>10} {"speedup":>8}')
+    for row in run(args.pairs, args.candles, args.repeat, args.seed):
+        print(
+            f'{row["pairs"]:>6} {row["batched_ms"]:>12.2f} {row["per_pair_us"]:>13.1f} '
+            f'{row["looped_ms"]:>10.2f} {row["speedup"]:>8.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Общие настройки тестов
+
+Обязательные переменные окружения Settings задаются до импорта модулей
+src, чтобы тесты не зависели от .env. Файлы логов пишутся во временный
+каталог, а не в logs/ репозитория.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+LOG_DIR = tempfile.mkdtemp(prefix='smc-test-logs-')
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+
+for name, value in {
+    'BOT_TOKEN': 'test-token',
+    'ADMIN_IDS': '1',
+    'DB_PASSWORD': 'test',
+    'BINGX_API_KEY': 'test-key',
+    'BINGX_SECRET_KEY': 'test-secret',
+}.items():
+    os.environ.setdefault(name, value)
+os.environ['LOG_FILE'] = os.path.join(LOG_DIR, 'trading_bot.log')
@@ -0,0 +1,49 @@
+"""
+Тесты FootprintAggregator: уровни цен и сигналы закрытых баров
+"""
+import numpy as np
+import pytest
+
+from src.analysis.order_flow import TICK_DTYPE, FootprintAggregator
+from src.config.constants import TimeFrame
+
+MINUTE = 60_000
+
+
+def ticks(trades):
+    """Сделки (время, цена, объем, сторона)"""
+    return np.array(trades, dtype=TICK_DTYPE)
+
+
+def aggregator() -> FootprintAggregator:
+    return FootprintAggregator(TimeFrame.M1, tick_size=0.1, capacity=10, stacked_levels=3)
+
+
+def buy_stack(start: float = 100.0, levels: int = 6):
+    """Покупки на levels уровнях подряд без продаж (серия imbalance покупок)"""
+    return [(index, round(start + index * 0.1, 1), 1.0, 1) for index in range(levels)]
+
+
+def test_tick_aligned_prices_map_to_their_own_level():
+    footprint = aggregator()
+    # 100.1 / 0.1 и 100.3 / 0.1 в float чуть меньше целого
+    footprint.add(ticks([(0, 100.1, 1.0, 1), (1, 100.2, 1.0, 1), (2, 100.3, 3.0, -1)]))
+    footprint.close(MINUTE)
+
+    window = footprint.window()
+    assert window.poc[-1] == pytest.approx(100.3)
+    assert window.row_price[-1] == pytest.approx(100.1)
+
+
+def test_signals_of_bar_closed_within_one_batch():
+    next_bar = [(MINUTE, 100.0, 1.0, -1)]
+
+    separate = aggregator()
+    separate.add(ticks(buy_stack()))
+    separate.add(ticks(next_bar))
+
+    batched = aggregator()
+    batched.add(ticks(buy_stack() + next_bar))
+
+    assert separate.window().stacked_imbalance[-1] == 5
+    assert batched.window().stacked_imbalance[-1] == 5
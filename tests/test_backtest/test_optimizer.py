@@ -0,0 +1,35 @@
+"""
+Тесты разбора параметров оптимизатора
+"""
+import pytest
+
+from src.backtest.optimizer import ParameterGrid, build_candidate_strategy, params_key, split_params
+
+RESOLUTIONS = [{1: 0.05, 2: 0.1}, {1: 0.1, 2: 0.2}]
+
+
+def test_split_params_separates_setup_groups():
+    indicator, setup = split_params({'cvd.reset_period': 'daily', 'rr.poc_bounce': 3.0, 'min_confluence.poc_bounce': 2})
+
+    assert indicator == {'cvd.reset_period': 'daily'}
+    assert setup == {'rr.poc_bounce': 3.0, 'min_confluence.poc_bounce': 2}
+
+
+def test_split_params_rejects_groups_the_strategy_ignores():
+    with pytest.raises(ValueError, match='order_flow.imbalance_ratio'):
+        split_params({'order_flow.imbalance_ratio': 3.0})
+
+
+def test_dict_valued_params_are_sampled_and_keyed():
+    grid = ParameterGrid({'volume_profile.price_bin_resolution': RESOLUTIONS, 'rr.poc_bounce': [2.0, 3.0]})
+
+    samples = grid.sample(3, seed=1)
+
+    assert len({params_key(params) for params in samples}) == 3
+    assert params_key({'a': {2: 0.1, 1: 0.05}}) == params_key({'a': {1: 0.05, 2: 0.1}})
+
+
+def test_candidate_strategy_applies_bin_resolution():
+    strategy = build_candidate_strategy({'volume_profile.price_bin_resolution': RESOLUTIONS[1]})
+
+    assert strategy.volume_profile.bin_size(100.0, tier=1) == pytest.approx(0.1)
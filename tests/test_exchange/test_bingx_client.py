@@ -0,0 +1,240 @@
+"""
+Тесты BingXClient против локального aiohttp-сервера
+"""
+import asyncio
+import hashlib
+import hmac
+import time
+
+import orjson
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from src.exchange.bingx_client import BingXClient, TokenBucket
+from src.exchange.exceptions import BingXAPIError, ExchangeConnectionError, RateLimitError
+from src.utils.cache import Cache
+
+pytestmark = pytest.mark.asyncio
+
+KLINES = '/openApi/swap/v3/quote/klines'
+BALANCE = '/openApi/swap/v2/user/balance'
+CONTRACTS = '/openApi/swap/v2/quote/contracts'
+SECRET = 'stub-secret'
+
+
+class StubExchange:
+    """Локальный HTTP-сервер с заданными ответами по путям"""
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = []          # (path, query)
+        self.peers = set()      # адреса клиентских соединений
+        self.delay = 0.0
+        self.runner = None
+        self.url = None
+
+    def reply(self, path, data=None, code=0, msg='', status=200, headers=None, body=None):
+        self.routes[path] = (status, body if body is not None else {'code': code, 'msg': msg, 'data': data}, headers or {})
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits.append((request.path, request.query_string))
+        self.peers.add(request.transport.get_extra_info('peername'))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        status, body, headers = self.routes.get(request.path, (404, {'code': 404, 'msg': 'not found'}, {}))
+        if isinstance(body, str):
+            return web.Response(status=status, text=body, headers=headers, content_type='text/html')
+        return web.Response(status=status, body=orjson.dumps(body), headers=headers, content_type='application/json')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def count(self, path: str) -> int:
+        return sum(1 for hit, _ in self.hits if hit == path)
+
+
+def kline(timestamp: int) -> dict:
+    return {'time': timestamp, 'open': '1', 'high': '2', 'low': '0.5', 'close': '1.5', 'volume': '10'}
+
+
+@pytest_asyncio.fixture
+async def exchange():
+    stub = StubExchange()
+    await stub.start()
+    yield stub
+    await stub.stop()
+
+
+@pytest_asyncio.fixture
+async def client(exchange):
+    async with BingXClient('key', SECRET, exchange.url) as client:
+        yield client
+
+
+async def test_requests_reuse_pooled_connection(exchange, client):
+    exchange.reply(KLINES, [kline(60_000), kline(0)])
+
+    for _ in range(10):
+        rows = await client.get_klines('BTC-USDT', '1m', limit=2)
+
+    assert exchange.count(KLINES) == 10
+    assert len(exchange.peers) == 1
+    assert rows[:, 0].tolist() == [0, 60_000]
+
+
+async def test_signed_request_carries_valid_signature(exchange, client):
+    exchange.reply(BALANCE, {'balance': {'balance': '100'}})
+
+    await client.request('GET', BALANCE, {'recvWindow': 5000}, signed=True)
+
+    _, query = exchange.hits[-1]
+    payload, signature = query.rsplit('&signature=', 1)
+    assert 'timestamp=' in payload
+    assert signature == hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+async def test_token_bucket_throttles_requests(exchange):
+    exchange.reply(KLINES, [])
+    # 5 запросов сразу, дальше 10 в секунду
+    async with BingXClient('key', SECRET, exchange.url, rate_limits={'market': (5, 0.5), 'account': (5, 0.5), 'trade': (5, 0.5)}) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client.get_klines('BTC-USDT', '1m', limit=index + 1) for index in range(10)))
+        elapsed = time.monotonic() - started
+
+    assert exchange.count(KLINES) == 10
+    assert elapsed >= 0.45
+
+
+async def test_token_bucket_pause_delays_next_acquire():
+    bucket = TokenBucket(10, 1.0)
+    bucket.pause(0.2)
+
+    started = time.monotonic()
+    await bucket.acquire()
+
+    assert time.monotonic() - started >= 0.2
+
+
+async def test_concurrent_identical_gets_are_coalesced(exchange, client):
+    exchange.reply(KLINES, [kline(0)])
+    exchange.delay = 0.05
+
+    results = await asyncio.gather(*(client.get_klines('BTC-USDT', '1m', limit=1) for _ in range(5)))
+    await client.get_klines('ETH-USDT', '1m', limit=1)
+
+    assert exchange.count(KLINES) == 2
+    assert all((rows == results[0]).all() for rows in results)
+    assert not client._inflight
+
+
+async def test_cancelled_first_caller_does_not_cancel_others(exchange, client):
+    exchange.reply(KLINES, [kline(0)])
+    exchange.delay = 0.1
+
+    first = asyncio.create_task(client.get_klines('BTC-USDT', '1m', limit=1))
+    await asyncio.sleep(0.02)
+    second = asyncio.create_task(client.get_klines('BTC-USDT', '1m', limit=1))
+    await asyncio.sleep(0.02)
+    first.cancel()
+
+    rows = await second
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert rows[:, 0].tolist() == [0]
+    assert exchange.count(KLINES) == 1
+
+
+async def test_coalesced_error_reaches_every_caller(exchange, client):
+    exchange.reply(KLINES, code=80001, msg='bad symbol')
+    exchange.delay = 0.05
+
+    results = await asyncio.gather(
+        *(client.get_klines('BAD-USDT', '1m', limit=1) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert exchange.count(KLINES) == 1
+    assert all(isinstance(result, BingXAPIError) and result.code == 80001 for result in results)
+
+
+async def test_http_rate_limit_maps_to_rate_limit_error(exchange, client):
+    exchange.reply(KLINES, status=429, headers={'Retry-After': '0.3'})
+
+    with pytest.raises(RateLimitError) as error:
+        await client.get_klines('BTC-USDT', '1m')
+
+    assert error.value.code == 429
+    assert error.value.retry_after == pytest.approx(0.3)
+    # Группа market приостановлена на Retry-After
+    started = time.monotonic()
+    await client._buckets['market'].acquire()
+    assert time.monotonic() - started >= 0.25
+
+
+async def test_rate_limit_code_maps_to_rate_limit_error(exchange, client):
+    exchange.reply(KLINES, code=100410, msg='frequency limit')
+
+    with pytest.raises(RateLimitError) as error:
+        await client.get_klines('BTC-USDT', '1m')
+
+    assert error.value.code == 100410
+    assert error.value.path == KLINES
+
+
+async def test_api_error_code_maps_to_api_error(exchange, client):
+    exchange.reply(BALANCE, code=100001, msg='signature verification failed')
+
+    with pytest.raises(BingXAPIError) as error:
+        await client.request('GET', BALANCE, signed=True)
+
+    assert not isinstance(error.value, RateLimitError)
+    assert error.value.code == 100001
+
+
+async def test_gateway_error_page_maps_to_connection_error(exchange, client):
+    exchange.reply(KLINES, status=502, body='<html><body>502 Bad Gateway</body></html>')
+
+    with pytest.raises(ExchangeConnectionError, match='HTTP 502'):
+        await client.get_klines('BTC-USDT', '1m')
+
+
+async def test_non_json_client_error_maps_to_api_error(exchange, client):
+    exchange.reply(BALANCE, status=403, body='<html>Forbidden</html>')
+
+    with pytest.raises(BingXAPIError) as error:
+        await client.request('GET', BALANCE, signed=True)
+
+    assert error.value.code == 403
+
+
+async def test_connection_failure_maps_to_connection_error(exchange):
+    url = exchange.url
+    await exchange.stop()
+
+    async with BingXClient('key', SECRET, url) as client:
+        with pytest.raises(ExchangeConnectionError):
+            await client.get_klines('BTC-USDT', '1m')
+
+    await exchange.start()
+
+
+async def test_contracts_are_served_from_cache(exchange):
+    exchange.reply(CONTRACTS, [{'symbol': 'BTC-USDT', 'tradeMinQuantity': 0.0001}])
+
+    async with BingXClient('key', SECRET, exchange.url, cache=Cache()) as client:
+        first = await client.get_contracts()
+        second = await client.get_contracts()
+
+    assert exchange.count(CONTRACTS) == 1
+    assert first == second == [{'symbol': 'BTC-USDT', 'tradeMinQuantity': 0.0001}]
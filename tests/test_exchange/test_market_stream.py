@@ -0,0 +1,270 @@
+"""
+Тесты MarketDataStream: кадры воспроизводятся локальным WebSocket-сервером
+"""
+import asyncio
+import gzip
+import time
+
+import numpy as np
+import orjson
+import pytest
+import pytest_asyncio
+import websockets
+
+from src.config.constants import TimeFrame
+from src.analysis.candle_store import Candle, CandleStore
+from src.exchange import market_stream
+from src.exchange.market_stream import MarketDataStream, decode_message
+
+pytestmark = pytest.mark.asyncio
+
+MINUTE = 60_000
+
+
+def frame(message) -> bytes:
+    """Кадр в формате BingX: JSON или служебная строка, сжатые gzip"""
+    payload = message if isinstance(message, bytes) else orjson.dumps(message)
+    return gzip.compress(payload)
+
+
+def kline(pair: str, timestamp: int, close: float, timeframe: str = '1m') -> bytes:
+    return frame({
+        'dataType': f'{pair}@kline_{timeframe}',
+        'data': [{'T': timestamp, 'o': 100.0, 'h': close + 1, 'l': 99.0, 'c': close, 'v': 5.0}],
+    })
+
+
+class StubMarket:
+    """
+    Локальный WebSocket-сервер
+
+    Каждое соединение получает очередной сценарий из scripts: список кадров
+    (bytes) или пауз (float, секунды). После сценария сервер закрывает
+    соединение, если close_after=True, иначе держит его открытым.
+    """
+
+    def __init__(self, scripts, close_after: bool = False):
+        self.scripts = list(scripts)
+        self.close_after = close_after
+        self.connections = 0
+        self.subscriptions = []     # подписки по соединениям
+        self.received = []          # прочие сообщения клиента
+        self.server = None
+        self.url = None
+
+    async def handler(self, ws, path=None):
+        number = self.connections
+        self.connections += 1
+        subscriptions = []
+        self.subscriptions.append(subscriptions)
+
+        async def reader():
+            async for message in ws:
+                try:
+                    request = orjson.loads(message)
+                except orjson.JSONDecodeError:
+                    self.received.append(message)
+                    continue
+                subscriptions.append(request['dataType'])
+
+        reading = asyncio.create_task(reader())
+        try:
+            # Кадры отправляются после подписки на все потоки соединения
+            await asyncio.sleep(0.05)
+            for step in self.scripts[number] if number < len(self.scripts) else ():
+                if isinstance(step, float):
+                    await asyncio.sleep(step)
+                else:
+                    await ws.send(step)
+            if self.close_after:
+                await ws.close()
+            else:
+                await reading
+        finally:
+            reading.cancel()
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, '127.0.0.1', 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f'ws://127.0.0.1:{port}'
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class FakeClient:
+    """REST-клиент с заданной историей свечей (не больше max_limit свечей за запрос, как у биржи)"""
+
+    def __init__(self, rows=None, max_limit: int = 1440):
+        self.rows = np.asarray(rows if rows is not None else np.zeros((0, 6)), dtype=np.float64)
+        self.max_limit = max_limit
+        self.calls = []
+
+    async def get_klines(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        self.calls.append((symbol, interval, start_time, end_time))
+        rows = self.rows
+        if start_time is not None:
+            rows = rows[rows[:, 0] >= start_time]
+        return rows[:min(limit, self.max_limit)]
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError('condition not reached')
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(market_stream, 'RECONNECT_DELAY', 0.05)
+
+
+@pytest_asyncio.fixture
+async def run_stream():
+    started = []
+
+    async def run(server: StubMarket, stream_kwargs: dict, client=None):
+        await server.start()
+        stream = MarketDataStream(client or FakeClient(), CandleStore(), url=server.url, **stream_kwargs)
+        closed = []
+
+        async def on_candle(pair, timeframe, candle):
+            closed.append((pair, timeframe, candle))
+
+        stream.on_candle(on_candle)
+        await stream.start()
+        started.append((stream, server))
+        return stream, closed
+
+    yield run
+    for stream, server in started:
+        await stream.stop()
+        await server.stop()
+
+
+async def test_decode_message_handles_gzip_and_ping():
+    assert decode_message(frame(b'Ping')) is None
+    assert decode_message('Ping') is None
+    assert decode_message(frame({'dataType': 'x', 'data': 1})) == {'dataType': 'x', 'data': 1}
+    assert decode_message('{"code": 0}') == {'code': 0}
+
+
+async def test_subscriptions_are_split_across_connections(run_stream):
+    server = StubMarket([])
+    await run_stream(server, {
+        'pairs': ['BTC-USDT', 'ETH-USDT'],
+        'timeframes': ['1m', '5m'],
+        'trades': True,
+        'depth': True,
+        'streams_per_connection': 4,
+    })
+
+    await wait_for(lambda: sum(map(len, server.subscriptions)) == 8)
+    assert server.connections == 2
+    assert sorted(stream for subscriptions in server.subscriptions for stream in subscriptions) == sorted([
+        'BTC-USDT@kline_1m', 'BTC-USDT@kline_5m', 'BTC-USDT@trade', 'BTC-USDT@depth20@100ms',
+        'ETH-USDT@kline_1m', 'ETH-USDT@kline_5m', 'ETH-USDT@trade', 'ETH-USDT@depth20@100ms',
+    ])
+    assert all(len(subscriptions) == 4 for subscriptions in server.subscriptions)
+
+
+async def test_incremental_depth_subscription(run_stream):
+    server = StubMarket([])
+    await run_stream(server, {'pairs': ['BTC-USDT'], 'timeframes': [], 'trades': False, 'incremental_depth': True})
+
+    await wait_for(lambda: server.subscriptions and server.subscriptions[0])
+    assert server.subscriptions[0] == ['BTC-USDT@incrDepth']
+
+
+async def test_ping_frame_is_answered_with_pong(run_stream):
+    server = StubMarket([[frame(b'Ping'), frame(b'Ping')]])
+    await run_stream(server, {'pairs': ['BTC-USDT'], 'timeframes': ['1m'], 'trades': False, 'depth': False})
+
+    await wait_for(lambda: len(server.received) == 2)
+    assert server.received == ['Pong', 'Pong']
+
+
+async def test_candle_closes_when_next_candle_arrives(run_stream):
+    server = StubMarket([[
+        kline('BTC-USDT', 0, 101.0),
+        kline('BTC-USDT', 0, 102.0),        # обновление формирующейся свечи
+        kline('BTC-USDT', MINUTE, 103.0),   # новая свеча закрывает предыдущую
+        kline('BTC-USDT', MINUTE, 104.0),
+    ]])
+    stream, closed = await run_stream(server, {'pairs': ['BTC-USDT'], 'timeframes': ['1m'], 'trades': False, 'depth': False})
+
+    await wait_for(lambda: stream._forming.get(('BTC-USDT', TimeFrame.M1)) == Candle(MINUTE, 100.0, 105.0, 99.0, 104.0, 5.0))
+    assert closed == [('BTC-USDT', TimeFrame.M1, Candle(0, 100.0, 103.0, 99.0, 102.0, 5.0))]
+    assert stream.store.last_timestamp('BTC-USDT', TimeFrame.M1) == 0
+
+
+async def test_trades_and_depth_are_dispatched():
+    server = StubMarket([[
+        frame({'dataType': 'BTC-USDT@trade', 'data': {'p': '100', 'q': '1', 'm': False}}),
+        frame({'dataType': 'BTC-USDT@depth20@100ms', 'data': {'bids': [['99', '1']], 'asks': [['101', '2']]}}),
+        frame({'code': 0, 'id': 'subscription-ack'}),
+    ]])
+    stream = MarketDataStream(FakeClient(), CandleStore(), ['BTC-USDT'], [], url=None)
+    trades, depth = [], []
+
+    async def on_trades(pair, items):
+        trades.append((pair, items))
+
+    async def on_depth(pair, data):
+        depth.append((pair, data))
+
+    await server.start()
+    stream.url = server.url
+    stream.on_trades(on_trades)
+    stream.on_depth(on_depth)
+    await stream.start()
+    try:
+        await wait_for(lambda: trades and depth)
+    finally:
+        await stream.stop()
+        await server.stop()
+
+    assert trades == [('BTC-USDT', [{'p': '100', 'q': '1', 'm': False}])]
+    assert depth == [('BTC-USDT', {'bids': [['99', '1']], 'asks': [['101', '2']]})]
+
+
+async def test_reconnect_resubscribes_and_backfills_missed_candles(run_stream):
+    now = 1_700_000_000_000 // MINUTE * MINUTE
+    first = now - 10 * MINUTE
+    # Формирующаяся на момент разрыва свеча и закрывшиеся за время разрыва есть только в REST
+    client = FakeClient([[first + index * MINUTE, 100, 101, 99, 100.5, 1] for index in range(1, 5)])
+    server = StubMarket([
+        [kline('BTC-USDT', first, 100.0), kline('BTC-USDT', first + MINUTE, 100.0), 0.05],
+        [kline('BTC-USDT', first + 5 * MINUTE, 100.0), kline('BTC-USDT', first + 6 * MINUTE, 100.0)],
+    ], close_after=True)
+    stream, closed = await run_stream(
+        server, {'pairs': ['BTC-USDT'], 'timeframes': ['1m'], 'trades': False, 'depth': False}, client
+    )
+
+    await wait_for(lambda: len(closed) == 6)
+    assert server.connections >= 2
+    assert server.subscriptions[1] == ['BTC-USDT@kline_1m']
+    assert client.calls[0][:3] == ('BTC-USDT', '1m', first + MINUTE)
+    assert [candle.timestamp for _, _, candle in closed] == [first + index * MINUTE for index in range(6)]
+
+
+async def test_backfill_pages_through_long_outage(run_stream, monkeypatch):
+    monkeypatch.setattr(market_stream, 'BACKFILL_LIMIT', 4)
+    now = int(time.time() * 1000) // MINUTE * MINUTE
+    first = now - 12 * MINUTE
+    # Разрыв длиннее одной страницы: 10 свечей закрылись без потока
+    client = FakeClient([[first + index * MINUTE, 100, 101, 99, 100.5, 1] for index in range(1, 12)], max_limit=4)
+    server = StubMarket([
+        [kline('BTC-USDT', first, 100.0), kline('BTC-USDT', first + MINUTE, 100.0), 0.05],
+        [],
+    ], close_after=True)
+    stream, closed = await run_stream(
+        server, {'pairs': ['BTC-USDT'], 'timeframes': ['1m'], 'trades': False, 'depth': False}, client
+    )
+
+    await wait_for(lambda: len(closed) == 12)
+    assert [call[2] for call in client.calls[:3]] == [first + MINUTE, first + 5 * MINUTE, first + 9 * MINUTE]
+    assert [candle.timestamp for _, _, candle in closed] == [first + index * MINUTE for index in range(12)]
@@ -0,0 +1,119 @@
+"""
+Тесты OrderBook на записанных сообщениях потока incrDepth (tests/test_exchange/fixtures)
+"""
+import asyncio
+from pathlib import Path
+
+import orjson
+import pytest
+
+from src.exchange.order_book import OrderBookManager, Wall, replay_depth_file
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+DEPTH = FIXTURES / 'depth_btc_usdt.jsonl'
+DEPTH_GAP = FIXTURES / 'depth_btc_usdt_gap.jsonl'
+
+
+def frames(path: Path):
+    """Сообщения файла: (символ, data)"""
+    for line in path.read_bytes().splitlines():
+        message = orjson.loads(line)
+        yield message['dataType'].partition('@')[0], message['data']
+
+
+class FakeClient:
+    """REST-клиент со снимком стакана"""
+
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+        self.calls = []
+
+    async def get_depth(self, symbol, limit=100):
+        self.calls.append((symbol, limit))
+        await asyncio.sleep(0.01)
+        return self.snapshot
+
+
+def test_replay_applies_snapshot_and_updates():
+    book = replay_depth_file(DEPTH)['BTC-USDT']
+
+    assert book.synced
+    assert book.update_id == 102
+    assert book.timestamp == 1700000000200
+    assert book.bids.levels(3) == [(99.95, 0.5), (99.9, 3.0), (99.8, 2.0)]
+    assert book.asks.levels(2) == [(100.2, 1.0), (100.3, 2.0)]     # 100.1 удален объемом 0
+    assert book.best_bid == 99.95
+    assert book.best_ask == 100.2
+    assert book.spread == pytest.approx(0.25)
+    assert book.mid == pytest.approx(100.075)
+
+
+def test_depth_sums_levels_within_percent_of_mid():
+    book = replay_depth_file(DEPTH)['BTC-USDT']
+
+    # 1% от mid: bid 99.0 и ask выше 101.07575 вне диапазона
+    assert book.depth(1.0) == pytest.approx((7.5, 25.0))
+    bid, ask = book.depth(1.0, notional=True)
+    assert bid == pytest.approx(99.95 * 0.5 + 99.9 * 3 + 99.8 * 2 + 99.7 + 99.6)
+    assert ask == pytest.approx(100.2 + 100.3 * 2 + 100.4 + 100.5 * 20 + 101.0)
+    assert book.imbalance(1.0) == pytest.approx((7.5 - 25.0) / 32.5)
+
+
+def test_walls_are_levels_far_above_median_volume():
+    book = replay_depth_file(DEPTH)['BTC-USDT']
+
+    assert book.walls(2.0, 5.0) == [
+        Wall(100.5, 20.0, False, 20.0),
+        Wall(99.0, 12.0, True, 8.0),
+    ]
+    # В диапазоне 1% bid 99.0 не учитывается
+    assert [wall.price for wall in book.walls(1.0, 5.0)] == [100.5]
+    assert book.wall_near(100.45, is_bid=False, tolerance=0.1) == Wall(100.5, 20.0, False, 20.0)
+    assert book.wall_near(100.5, is_bid=True, tolerance=0.1) is None
+
+
+def test_replay_stops_applying_updates_after_sequence_gap():
+    book = replay_depth_file(DEPTH_GAP)['BTC-USDT']
+
+    # Изменение 103 пропущено: 104 и 105 не применяются
+    assert not book.synced
+    assert book.update_id == 102
+    assert book.bids.volumes[99.9] == 3.0
+    assert 100.2 in book.asks.volumes
+
+
+@pytest.mark.asyncio
+async def test_manager_resyncs_from_rest_after_sequence_gap():
+    client = FakeClient({
+        'lastUpdateId': 104,
+        'bids': [['99.95', '0.5'], ['99.9', '4'], ['99.8', '2']],
+        'asks': [['100.2', '1'], ['100.5', '20']],
+    })
+    manager = OrderBookManager(client)
+
+    for symbol, data in frames(DEPTH_GAP):
+        await manager.on_depth(symbol, data)
+    assert manager.get('BTC-USDT') is None
+    await asyncio.gather(*manager._resyncs.values())
+
+    book = manager.get('BTC-USDT')
+    assert client.calls == [('BTC-USDT', manager.snapshot_limit)]
+    assert book is not None
+    assert book.update_id == 105
+    # Снимок 104, поверх него изменение 105, пришедшее во время загрузки
+    assert book.bids.levels(2) == [(99.95, 0.5), (99.9, 4.0)]
+    assert book.best_ask == 100.5
+    assert not manager._pending
+
+
+@pytest.mark.asyncio
+async def test_manager_stays_unsynced_when_snapshot_is_older_than_updates():
+    client = FakeClient({'lastUpdateId': 101, 'bids': [['99.9', '1']], 'asks': [['100.1', '1']]})
+    manager = OrderBookManager(client)
+
+    for symbol, data in frames(DEPTH_GAP):
+        await manager.on_depth(symbol, data)
+    await asyncio.gather(*manager._resyncs.values())
+
+    assert manager.get('BTC-USDT') is None
+    await manager.close()
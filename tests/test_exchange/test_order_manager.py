@@ -0,0 +1,241 @@
+"""
+Тесты OrderManager: BingXClient против локальной поддельной биржи
+"""
+import itertools
+
+import orjson
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from src.config.constants import PositionStatus, TradingSide
+from src.exchange.bingx_client import BingXClient
+from src.exchange.order_manager import Bracket, BracketError, OrderManager
+
+pytestmark = pytest.mark.asyncio
+
+ORDER = '/openApi/swap/v2/trade/order'
+BATCH = '/openApi/swap/v2/trade/batchOrders'
+
+
+class FakeExchange:
+    """
+    Локальный HTTP-сервер с книгой ордеров по clientOrderID
+
+    Рыночные ордера исполняются сразу по price. Ордер с clientOrderID из
+    reject отклоняется, повторный clientOrderID - ошибка биржи. Для путей
+    из drop ордера регистрируются, но соединение закрывается без ответа.
+    """
+
+    def __init__(self, price: float = 100.0):
+        self.price = price
+        self.orders = {}        # clientOrderID -> ордер
+        self.events = []        # (действие, clientOrderID) в порядке обработки
+        self.hits = []          # (метод, путь)
+        self.reject = set()
+        self.drop = set()
+        self.ids = itertools.count(1)
+        self.runner = None
+        self.url = None
+
+    def _place(self, params: dict) -> dict:
+        client_id = params['clientOrderID']
+        if client_id in self.reject:
+            return {'code': 101204, 'msg': 'order rejected', 'clientOrderID': client_id}
+        market = params['type'] == 'MARKET'
+        order = self.orders[client_id] = {
+            **params,
+            'orderId': next(self.ids),
+            'status': 'FILLED' if market else 'NEW',
+            'avgPrice': str(self.price) if market else '0',
+        }
+        self.events.append(('place', client_id))
+        return order
+
+    @staticmethod
+    def _reply(data=None, code=0, msg=''):
+        return web.Response(body=orjson.dumps({'code': code, 'msg': msg, 'data': data}), content_type='application/json')
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits.append((request.method, request.path))
+        params = dict(request.query)
+        params.pop('signature', None)
+        params.pop('timestamp', None)
+
+        if request.path == BATCH:
+            orders = orjson.loads(params['batchOrders'])
+            if any(order['clientOrderID'] in self.orders for order in orders):
+                return self._reply(code=101400, msg='duplicate clientOrderID')
+            result = {'orders': [self._place(order) for order in orders]}
+        elif request.path == ORDER and request.method == 'POST':
+            if params['clientOrderID'] in self.orders:
+                return self._reply(code=101400, msg='duplicate clientOrderID')
+            result = {'order': self._place(params)}
+            if 'code' in result['order']:
+                return self._reply(code=result['order']['code'], msg=result['order']['msg'])
+        elif request.path == ORDER and request.method == 'GET':
+            order = self.orders.get(params['clientOrderID'])
+            if order is None:
+                return self._reply(code=80016, msg='order not exist')
+            result = {'order': order}
+        elif request.path == ORDER and request.method == 'DELETE':
+            order = self.orders.get(params['clientOrderID'])
+            if order is None or order['status'] != 'NEW':
+                return self._reply(code=80018, msg='order is not active')
+            order['status'] = 'CANCELLED'
+            self.events.append(('cancel', params['clientOrderID']))
+            result = {'order': order}
+        else:
+            return self._reply(code=404, msg='not found')
+
+        if request.path in self.drop:
+            self.drop.discard(request.path)
+            request.transport.close()
+        return self._reply(result)
+
+    def count(self, method: str, path: str) -> int:
+        return self.hits.count((method, path))
+
+    def active(self):
+        """clientOrderID неисполненных ордеров"""
+        return sorted(client_id for client_id, order in self.orders.items() if order['status'] == 'NEW')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def bracket(trade_id: int = 1) -> Bracket:
+    return Bracket(trade_id, 'BTC-USDT', TradingSide.LONG, 0.02, 100.0, 95.0, 110.0)
+
+
+@pytest_asyncio.fixture
+async def exchange():
+    fake = FakeExchange()
+    await fake.start()
+    yield fake
+    await fake.stop()
+
+
+@pytest_asyncio.fixture
+async def client(exchange):
+    async with BingXClient('key', 'secret', exchange.url) as client:
+        yield client
+
+
+def manager(client, **kwargs) -> OrderManager:
+    return OrderManager(
+        client, partial_close_targets=(1.0,), partial_close_percentages=(50.0,),
+        breakeven_level=1.0, fill_timeout=0.5, **kwargs
+    )
+
+
+async def test_bracket_is_placed_in_one_batch(exchange, client):
+    placed = await manager(client).place_bracket(bracket(), quantity_step=0.001)
+
+    assert exchange.events == [
+        ('place', 'smc-1-entry'), ('place', 'smc-1-sl'), ('place', 'smc-1-tp1'), ('place', 'smc-1-tp'),
+    ]
+    assert exchange.active() == ['smc-1-sl', 'smc-1-tp', 'smc-1-tp1']
+    assert exchange.count('POST', BATCH) == 1
+    assert (exchange.orders['smc-1-tp1']['quantity'], exchange.orders['smc-1-tp1']['stopPrice']) == (0.01, 105.0)
+    assert exchange.orders['smc-1-sl']['side'] == 'SELL'
+    assert placed.fill_price == 100.0
+    values = placed.trade_values()
+    assert values['status'] == PositionStatus.OPEN
+    assert (values['entry_order_id'], values['stop_order_id'], values['tp_order_id']) == ('1', '2', '4')
+
+
+async def test_unbatched_bracket_places_every_order(exchange, client):
+    await manager(client, use_batch=False).place_bracket(bracket())
+
+    assert sorted(client_id for _, client_id in exchange.events) == [
+        'smc-1-entry', 'smc-1-sl', 'smc-1-tp', 'smc-1-tp1',
+    ]
+
+
+async def test_partial_batch_failure_rolls_back(exchange, client):
+    exchange.reject.add('smc-1-tp')
+
+    with pytest.raises(BracketError, match='tp'):
+        await manager(client).place_bracket(bracket())
+
+    # Защитные ордера отменены, исполненный вход закрыт рыночным ордером
+    assert exchange.active() == []
+    assert sorted(exchange.events[3:5]) == [('cancel', 'smc-1-sl'), ('cancel', 'smc-1-tp1')]
+    assert exchange.events[-1] == ('place', 'smc-1-rollback')
+    rollback = exchange.orders['smc-1-rollback']
+    assert (rollback['type'], rollback['side'], rollback['quantity']) == ('MARKET', 'SELL', '0.02')
+
+
+async def test_lost_batch_response_is_recovered_by_client_order_id(exchange, client):
+    exchange.drop.add(BATCH)
+
+    placed = await manager(client).place_bracket(bracket())
+
+    # Ордера размещены, их id получены запросами по clientOrderID
+    assert exchange.count('GET', ORDER) == 4
+    assert len(exchange.orders) == 4
+    assert placed.order_id('sl') == '2'
+    assert placed.fill_price == 100.0
+
+
+async def test_resent_bracket_does_not_duplicate_orders(exchange, client):
+    orders = manager(client)
+    await orders.place_bracket(bracket())
+
+    # Повторная отправка той же сделки (например, после перезапуска)
+    placed = await orders.place_bracket(bracket())
+
+    assert len(exchange.orders) == 4
+    assert len(exchange.events) == 4
+    assert placed.order_id('entry') == '1'
+    assert placed.fill_price == 100.0
+
+
+async def test_lost_order_response_is_recovered_by_client_order_id(exchange, client):
+    orders = manager(client, use_batch=False)
+    placed = await orders.place_bracket(bracket())
+    exchange.drop.add(ORDER)
+
+    leg = await orders.close(placed, 0.01)
+
+    assert exchange.count('GET', ORDER) == 1
+    assert leg is not None and leg.order_id == '5'
+    assert [client_id for action, client_id in exchange.events].count('smc-1-close') == 1
+
+
+async def test_breakeven_places_new_stop_before_cancelling_old(exchange, client):
+    orders = manager(client)
+    placed = await orders.place_bracket(bracket())
+
+    assert not await orders.on_price(placed, 104.0)
+    assert await orders.on_price(placed, 105.0)
+
+    assert exchange.events[-2:] == [('place', 'smc-1-sl1'), ('cancel', 'smc-1-sl')]
+    assert exchange.orders['smc-1-sl1']['stopPrice'] == '100.0'
+    assert placed.stop_loss == 100.0
+    assert placed.order_id('sl') == '5'
+    assert placed.breakeven
+    assert not await orders.on_price(placed, 106.0)
+
+
+async def test_failed_stop_move_keeps_old_stop(exchange, client):
+    orders = manager(client)
+    placed = await orders.place_bracket(bracket())
+    exchange.reject.add('smc-1-sl1')
+
+    assert not await orders.move_stop(placed, 100.0)
+
+    assert exchange.active() == ['smc-1-sl', 'smc-1-tp', 'smc-1-tp1']
+    assert placed.stop_loss == 95.0
+    assert placed.order_id('sl') == '2'
@@ -0,0 +1,63 @@
+"""
+Тесты стен стакана у зон ликвидности
+"""
+import numpy as np
+import pytest
+
+from src.analysis.candle_store import window_from_rows
+from src.config.constants import TimeFrame
+from src.exchange.order_book import Wall
+from src.scheduler.tasks import analyze_pairs_chunk
+from src.strategy.indicators.liquidity_zone import LiquidityZone, LiquidityZoneDetector
+from src.strategy.smc_strategy import SMCStrategy
+
+
+def equal_highs_rows(count=30, peaks=(5, 15)):
+    """Часовые свечи с двумя равными swing high на 102"""
+    rows = np.zeros((count, 6))
+    rows[:, 0] = np.arange(count) * 3_600_000
+    rows[:, 1] = rows[:, 4] = 100.0
+    rows[:, 2] = 100.5
+    rows[:, 3] = 99.5
+    rows[:, 5] = 1.0
+    rows[list(peaks), 2] = 102.0
+    return rows
+
+
+def test_apply_order_book_takes_wall_of_matching_side():
+    zones = [
+        LiquidityZone('buy_side', 102.0, 102.0, 102.0, 2, 0),
+        LiquidityZone('sell_side', 98.0, 98.0, 98.0, 2, 0),
+    ]
+    walls = [
+        Wall(102.05, 500.0, True, 9.0),     # bid у buy-side зоны не считается
+        Wall(102.05, 300.0, False, 6.0),
+        Wall(101.0, 200.0, False, 5.0),     # дальше допуска
+    ]
+
+    LiquidityZoneDetector.apply_order_book(zones, walls)
+
+    assert zones[0].resting_volume == pytest.approx(300.0)
+    assert zones[1].resting_volume == 0.0
+
+
+def test_strategy_marks_zones_with_walls():
+    strategy = SMCStrategy(setups=[])
+    window = window_from_rows(equal_highs_rows())
+    walls = [Wall(102.05, 300.0, False, 6.0)]
+
+    context = strategy.build_context('BTC-USDT', TimeFrame.H1, window, targets=['liquidity_zones'], walls=walls)
+
+    zone, = [zone for zone in context.liquidity_zones if zone.kind == 'buy_side']
+    assert zone.price == pytest.approx(102.0)
+    assert zone.resting_volume == pytest.approx(300.0)
+
+
+def test_pool_task_passes_walls_to_zones():
+    payload = ('BTC-USDT', 1, {TimeFrame.H1: equal_highs_rows()}, [Wall(102.05, 300.0, False, 6.0)], {})
+
+    result, = analyze_pairs_chunk([payload])
+
+    assert result.error is None
+    zones = [zone for zone in result.snapshot['liquidity_zones'] if zone['kind'] == 'buy_side']
+    assert zones and zones[0]['resting_volume'] == pytest.approx(300.0)
@@ -0,0 +1,66 @@
+"""
+Тесты структуры рынка в сетапах
+"""
+import numpy as np
+
+from src.analysis.candle_store import window_from_rows
+from src.config.constants import MarketStructure, TimeFrame, TradingSide
+from src.scheduler.tasks import analyze_pairs_chunk
+from src.strategy.base_strategy import MarketContext
+from src.strategy.indicators.liquidity_zone import LiquidityZone
+from src.strategy.setups.liquidity_grab import LiquidityGrab
+from src.strategy.smc_strategy import SMCStrategy
+
+
+def breakout_rows(count=30, peak=5, breakout=20):
+    """Часовые свечи: swing high на 102 и закрытие выше него"""
+    rows = np.zeros((count, 6))
+    rows[:, 0] = np.arange(count) * 3_600_000
+    rows[:, 1] = rows[:, 4] = 100.0
+    rows[:, 2] = 100.5
+    rows[:, 3] = 99.5
+    rows[:, 5] = 1.0
+    rows[peak, 2] = 102.0
+    rows[breakout:, 2] = 103.5
+    rows[breakout:, 4] = 103.0
+    return rows
+
+
+def test_strategy_tracks_structure_on_swing_index():
+    strategy = SMCStrategy(setups=[])
+    window = window_from_rows(breakout_rows())
+
+    context = strategy.build_context('BTC-USDT', TimeFrame.H1, window, targets=['market_structure'])
+
+    assert context.market_structure == MarketStructure.BULLISH_TREND
+    assert context.trend == 1
+
+
+def test_pool_task_uses_structure_from_payload():
+    indicators = {TimeFrame.H1: {'market_structure': MarketStructure.BEARISH_TREND}}
+
+    result, = analyze_pairs_chunk([('BTC-USDT', 1, {TimeFrame.H1: breakout_rows()}, None, indicators)])
+
+    assert result.error is None
+    assert result.snapshot['structure'] == MarketStructure.BEARISH_TREND.value
+
+
+def test_setup_scores_trend_aligned_with_signal():
+    rows = np.array([
+        [0, 100.0, 100.5, 99.5, 100.0, 1.0],
+        [3_600_000, 100.0, 100.5, 97.5, 99.0, 1.0],     # прокол sell-side зоны на 98
+    ])
+    zone = LiquidityZone('sell_side', 98.0, 98.0, 98.0, 2, 0)
+    setup = LiquidityGrab(min_confluence=1)
+
+    def evaluate(structure):
+        context = MarketContext(
+            'BTC-USDT', TimeFrame.H1, window_from_rows(rows),
+            liquidity_zones=[zone], market_structure=structure
+        )
+        return setup.evaluate(context)
+
+    signal = evaluate(MarketStructure.BULLISH_TREND)
+    assert signal.side == TradingSide.LONG
+    assert 'market_structure' in signal.confluence_factors
+    assert 'market_structure' not in evaluate(MarketStructure.BEARISH_TREND).confluence_factors
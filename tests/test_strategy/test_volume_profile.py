@@ -0,0 +1,45 @@
+"""
+Тесты VolumeProfileAnalyzer на ценах, кратных шагу цены
+"""
+import numpy as np
+import pytest
+
+from src.analysis.candle_store import Candle, CandleStore
+from src.config.constants import TimeFrame
+from src.strategy.indicators.volume_profile import VolumeProfileAnalyzer
+
+
+def window(lows, highs, volumes=None):
+    store = CandleStore()
+    volumes = volumes if volumes is not None else [1.0] * len(lows)
+    for index, (low, high, volume) in enumerate(zip(lows, highs, volumes)):
+        store.append('BTC-USDT', TimeFrame.M1, Candle(index * 60_000, low, high, low, high, volume))
+    return store.window('BTC-USDT', TimeFrame.M1, len(lows))
+
+
+def test_tick_aligned_low_is_inside_first_level():
+    # floor(0.7 / 0.01) = 69: без сдвига сетки уровень low был бы -1
+    profile = VolumeProfileAnalyzer().calculate(window([0.7, 0.71], [0.72, 0.73]), bin_size=0.01)
+
+    assert profile.price_start <= 0.7
+    assert profile.total_volume == pytest.approx(2.0)
+    assert profile.volumes.min() >= 0
+
+
+def test_batch_handles_tick_aligned_prices():
+    rng = np.random.default_rng(7)
+    analyzer = VolumeProfileAnalyzer()
+
+    for _ in range(200):
+        low = np.round(rng.uniform(0.5, 2.0, (4, 30)), 2)
+        high = low + np.round(rng.uniform(0.0, 0.1, (4, 30)), 2)
+        batch = analyzer.calculate_batch(high, low, np.ones((4, 30)), np.full(4, 0.01))
+
+        assert (batch.price_start <= low.min(axis=1) + 1e-12).all()
+        assert batch.total_volume == pytest.approx(np.full(4, 30.0))
+
+
+def test_unknown_tier_uses_tier_two_resolution():
+    analyzer = VolumeProfileAnalyzer(bin_resolution={1: 0.05, 2: 0.1})
+
+    assert analyzer.bin_size(100.0, tier=3) == pytest.approx(analyzer.bin_size(100.0, tier=2))
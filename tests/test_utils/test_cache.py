@@ -0,0 +1,188 @@
+"""
+Тесты Cache: L1 в памяти и общий Redis (поддельный, в памяти процесса)
+"""
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from src.utils import cache as cache_module
+from src.utils.cache import Cache
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    """Redis в памяти: get/set(px, nx)/delete"""
+
+    def __init__(self):
+        self.data = {}          # ключ -> (значение, время истечения)
+        self.commands = []
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    async def get(self, key):
+        self.commands.append(('get', key))
+        entry = self._alive(key)
+        return entry[0] if entry is not None else None
+
+    async def set(self, key, value, px=None, nx=False):
+        self.commands.append(('set', key))
+        if nx and self._alive(key) is not None:
+            return None
+        self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+        return True
+
+    async def delete(self, *keys):
+        self.commands.append(('delete', *keys))
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+class BrokenRedis:
+    """Redis, недоступный на каждой команде"""
+
+    async def get(self, key):
+        raise ConnectionError('redis is down')
+
+    async def set(self, key, value, px=None, nx=False):
+        raise ConnectionError('redis is down')
+
+    async def delete(self, *keys):
+        raise ConnectionError('redis is down')
+
+
+class Factory:
+    """Счетчик вычислений значения"""
+
+    def __init__(self, value, delay: float = 0.05):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+async def test_l1_evicts_least_recently_used():
+    cache = Cache(l1_size=2)
+    await cache.set('a', 1, ttl=60)
+    await cache.set('b', 2, ttl=60)
+    assert await cache.get('a') == 1      # 'a' становится последней использованной
+
+    await cache.set('c', 3, ttl=60)
+
+    assert await cache.get('b') is None
+    assert await cache.get('a') == 1
+    assert await cache.get('c') == 3
+
+
+async def test_l1_entry_expires_after_ttl():
+    cache = Cache()
+    await cache.set('a', 1, ttl=0.05)
+    assert await cache.get('a') == 1
+
+    await asyncio.sleep(0.08)
+
+    assert await cache.get('a', 'missing') == 'missing'
+    assert 'a' not in cache._l1
+
+
+async def test_value_read_from_redis_keeps_original_expiry():
+    redis = FakeRedis()
+    writer, reader = Cache(redis), Cache(redis)
+    await writer.set('a', {'price': 1.5}, ttl=0.1)
+
+    assert await reader.get('a') == {'price': 1.5}
+    reads = len(redis.commands)
+    assert await reader.get('a') == {'price': 1.5}
+    assert len(redis.commands) == reads         # второе чтение из L1
+
+    await asyncio.sleep(0.12)
+    assert await reader.get('a') is None
+
+
+async def test_set_returns_value_as_other_processes_read_it():
+    cache = Cache(FakeRedis())
+
+    value = await cache.set('a', {'close': np.float64(1.5), 'levels': np.array([1, 2])}, ttl=60)
+
+    assert value == {'close': 1.5, 'levels': [1, 2]}
+    assert type(value['close']) is float
+
+
+async def test_get_or_set_computes_once_within_process():
+    cache = Cache(FakeRedis())
+    factory = Factory([1, 2, 3])
+
+    results = await asyncio.gather(*(cache.get_or_set('a', factory, ttl=60) for _ in range(5)))
+
+    assert factory.calls == 1
+    assert results == [[1, 2, 3]] * 5
+    assert not cache._inflight
+    assert await cache.get_or_set('a', factory, ttl=60) == [1, 2, 3]
+    assert factory.calls == 1
+
+
+async def test_get_or_set_uses_ttl_of_kind(monkeypatch):
+    monkeypatch.setitem(cache_module.CACHE_TTL, 'contracts', 0.05)
+    cache = Cache()
+    factory = Factory('v', delay=0)
+
+    await cache.get_or_set('a', factory, kind='contracts')
+    await asyncio.sleep(0.08)
+    await cache.get_or_set('a', factory, kind='contracts')
+
+    assert factory.calls == 2
+
+
+async def test_get_or_set_waits_for_lock_holder_in_other_process(monkeypatch):
+    monkeypatch.setattr(cache_module, 'LOCK_POLL', 0.01)
+    redis = FakeRedis()
+    first, second = Cache(redis), Cache(redis)
+    first_factory, second_factory = Factory('first', delay=0.1), Factory('second')
+
+    results = await asyncio.gather(
+        first.get_or_set('a', first_factory, ttl=60),
+        second.get_or_set('a', second_factory, ttl=60),
+    )
+
+    assert results == ['first', 'first']
+    assert (first_factory.calls, second_factory.calls) == (1, 0)
+    assert 'smc:lock:a' not in redis.data
+    assert 'smc:a' in redis.data
+
+
+async def test_lock_is_released_when_factory_fails():
+    redis = FakeRedis()
+    cache = Cache(redis)
+
+    async def failing():
+        raise ValueError('exchange error')
+
+    with pytest.raises(ValueError):
+        await cache.get_or_set('a', failing, ttl=60)
+
+    assert 'smc:lock:a' not in redis.data
+    assert not cache._inflight
+    assert await cache.get_or_set('a', Factory('v', delay=0), ttl=60) == 'v'
+
+
+async def test_redis_errors_fall_back_to_l1_and_direct_computation():
+    cache = Cache(BrokenRedis())
+    factory = Factory('v')
+
+    results = await asyncio.gather(*(cache.get_or_set('a', factory, ttl=60) for _ in range(3)))
+
+    assert results == ['v'] * 3
+    assert factory.calls == 1
+    assert await cache.get('a') == 'v'
+    await cache.delete('a')
+    assert await cache.get('a') is None